@@ -6,6 +6,17 @@ from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict, field
 
 
+# journald fields materialized as typed logs columns (field name -> SQL type)
+DEFAULT_PROMOTED_FIELDS = {
+    "_COMM": "TEXT",
+    "_EXE": "TEXT",
+    "_CMDLINE": "TEXT",
+    "_TRANSPORT": "TEXT",
+    "_BOOT_ID": "TEXT",
+    "SYSLOG_IDENTIFIER": "TEXT",
+}
+
+
 @dataclass
 class LogSource:
     """Configuration for a log ingestion source"""
@@ -23,6 +34,18 @@ class ChimeraConfig:
     socket_path: str
     max_ingest_limit: int = 10000
     default_retention_days: int = 30
+    retention: Dict[str, Any] = field(default_factory=dict)
+    promoted_fields: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_PROMOTED_FIELDS))
+    writer: Dict[str, Any] = field(default_factory=dict)
+    process_split: Dict[str, Any] = field(default_factory=dict)
+    sharding: Dict[str, Any] = field(default_factory=dict)
+    storage: Dict[str, Any] = field(default_factory=dict)
+    maintenance: Dict[str, Any] = field(default_factory=dict)
+    jobs: Dict[str, Any] = field(default_factory=dict)
+    query_limits: Dict[str, Any] = field(default_factory=dict)
+    embeddings: Dict[str, Any] = field(default_factory=dict)
+    templates: Dict[str, Any] = field(default_factory=dict)
+    indexer: Dict[str, Any] = field(default_factory=dict)
 
     @classmethod
     def load(cls, config_path: Optional[str] = None) -> 'ChimeraConfig':
@@ -56,6 +79,18 @@ class ChimeraConfig:
             'socket_path': self.socket_path,
             'max_ingest_limit': self.max_ingest_limit,
             'default_retention_days': self.default_retention_days,
+            'retention': self.retention,
+            'promoted_fields': self.promoted_fields,
+            'writer': self.writer,
+            'process_split': self.process_split,
+            'sharding': self.sharding,
+            'storage': self.storage,
+            'maintenance': self.maintenance,
+            'jobs': self.jobs,
+            'query_limits': self.query_limits,
+            'embeddings': self.embeddings,
+            'templates': self.templates,
+            'indexer': self.indexer,
         }
 
     @classmethod
@@ -68,6 +103,18 @@ class ChimeraConfig:
             socket_path=data.get('socket_path', '/run/chimera/api.sock'),
             max_ingest_limit=data.get('max_ingest_limit', 10000),
             default_retention_days=data.get('default_retention_days', 30),
+            retention=data.get('retention', {}),
+            promoted_fields=data.get('promoted_fields', dict(DEFAULT_PROMOTED_FIELDS)),
+            writer=data.get('writer', {}),
+            process_split=data.get('process_split', {}),
+            sharding=data.get('sharding', {}),
+            storage=data.get('storage', {}),
+            maintenance=data.get('maintenance', {}),
+            jobs=data.get('jobs', {}),
+            query_limits=data.get('query_limits', {}),
+            embeddings=data.get('embeddings', {}),
+            templates=data.get('templates', {}),
+            indexer=data.get('indexer', {}),
         )
 
     @classmethod
@@ -113,8 +160,122 @@ class ChimeraConfig:
             ],
             db_path=os.environ.get('CHIMERA_DB_PATH', '/var/lib/chimera/chimera.duckdb'),
             socket_path=os.environ.get('CHIMERA_API_SOCKET', '/run/chimera/api.sock'),
+            retention={
+                'enabled': True,
+                'tables': {},  # table name -> days; unset tables use default_retention_days
+                'sources': {},  # logs.source value -> days
+                'chunk_size': 5000,
+                'max_chunks_per_run': 200,
+                'interval_seconds': 3600,
+                'checkpoint_interval_seconds': 21600,
+            },
+            writer={
+                'enabled': True,
+                'queue_size': 1000,  # pending requests per kind before producers block
+                'max_batch_rows': 5000,  # rows grouped into one transaction
+                'max_latency_ms': 50,  # longest a request waits for its group to fill
+            },
+            process_split={
+                'enabled': False,  # worker process owns the database; the API reads snapshots
+                'worker_socket_path': '/run/chimera/worker.sock',
+                'snapshot_dir': '/var/lib/chimera/snapshots',
+                'publish_interval_seconds': 60,
+                'keep_snapshots': 3,
+            },
+            sharding={
+                'enabled': False,  # each log source writes its own DuckDB file
+                'directory': '/var/lib/chimera/shards',
+            },
+            storage={
+                'threads': 'auto',  # or a fixed count
+                'memory_limit': 'auto',  # or a DuckDB size such as '4GB'
+                'cpu_share': 0.5,  # fraction of host cores when threads is 'auto'
+                'memory_share': 0.25,  # fraction of host RAM when memory_limit is 'auto'
+                'temp_directory': None,  # spill directory; None keeps <database>.tmp
+                'preserve_insertion_order': True,
+                'checkpoint_threshold': '16MB',
+                'profiles': {  # requests of each workload using the database at once
+                    'ingest': {'concurrency': 4},
+                    'interactive': {'concurrency': 16},
+                    'batch': {'concurrency': 2},
+                },
+            },
+            maintenance={
+                'enabled': True,
+                'max_concurrent': 1,  # maintenance jobs running at once
+                'nice': 10,  # CPU niceness of job threads
+                'ionice_class': 'idle',  # idle|best-effort; job threads only get idle disk time
+                'jitter': 0.1,  # +/- fraction of each interval, spreads jobs apart
+                'defer_seconds': 5,  # retry delay while interactive requests are running
+                'max_defer_seconds': 300,  # run anyway after deferring this long
+                'jobs': {},  # name -> {interval_seconds, priority, enabled, jitter}; retention
+                            # and checkpoint intervals default to the retention section
+            },
+            jobs={
+                'max_workers': 2,  # async commands (async=true) running at once
+                'keep_finished': 100,  # finished jobs kept for JOB STATUS/LIST
+            },
+            query_limits={
+                'timeouts': {'QUERY_LOGS': 30, 'DISCOVER': 15},  # seconds before ERR timeout
+                'default_timeout_seconds': 30,
+                'cost_guard': {
+                    'enabled': False,
+                    'max_estimated_rows': 50000000,  # planner estimate of rows scanned
+                    'action': 'reject',  # reject (ERR too-expensive) or downgrade
+                    'downgrade_timeout_seconds': 5,  # deadline for downgraded queries
+                },
+            },
+            embeddings={
+                'provider': 'ollama',  # ollama | hashing (local n-gram hashing, works offline)
+                'concurrency': 4,  # Ollama embedding requests in flight
+                'initial_batch_size': 32,  # texts per /api/embed request, adapted to latency
+                'max_batch_size': 256,
+                'target_latency_ms': 2000,
+                'max_retries': 3,
+                'backoff_seconds': 0.5,
+                'cache': True,  # reuse vectors for identical normalized texts
+                'cache_max_age_days': 30,
+                'index_mode': 'rows',  # rows | templates (one vector per mined template)
+                'rows_per_template': 3,
+                'hybrid': {
+                    'candidates': 50,  # rows from each retriever before fusion
+                    'rrf_k': 60,
+                    'mmr_lambda': 0.7,  # 1.0 = relevance only, lower = more diverse
+                    'lexical_since_seconds': 604800,  # BM25 window when SEARCH has no since
+                },
+                'vector_backend': 'chromadb',  # chromadb | duckdb (FLOAT[N] column next to logs) | mmap
+                'shard_by': 'none',  # chromadb: none | day | hour (one row collection per UTC period)
+                'mmap': {
+                    'directory': '/var/lib/chimera/vectors',  # one subdirectory per day
+                    'dtype': 'float16',  # float16 | int8
+                    'ivf_min_vectors': 50000,  # per-day partition size that gets an IVF quantizer
+                    'nprobe': 8,
+                },
+            },
+            templates={
+                'enabled': True,  # mine message templates at ingest (log_templates table)
+                'depth': 4,
+                'similarity': 0.4,  # share of matching tokens needed to join a template
+                'max_children': 100,
+            },
+            indexer={
+                'enabled': False,  # embed new rows in the background as they are ingested
+                'batch_rows': 500,
+                'duty_cycle': 0.5,  # share of wall time spent embedding while behind
+            },
         )
 
+    def get_retention_days(self, table: str, source: Optional[str] = None) -> int:
+        """Get retention in days for a table (and optionally a logs source)"""
+        if source is not None:
+            days = self.retention.get('sources', {}).get(source)
+            if days is not None:
+                return int(days)
+        days = self.retention.get('tables', {}).get(table)
+        if days is not None:
+            return int(days)
+        return self.default_retention_days
+
     def get_enabled_sources(self) -> List[LogSource]:
         """Get list of enabled log sources"""
         return [source for source in self.log_sources if source.enabled]
@@ -1,6 +1,11 @@
 import os
+import json
 import logging
-from typing import Optional
+from typing import Dict, List, Optional
+
+from . import bulk, log_dictionary, promoted_fields, query_guard, raw_store, rollups, snapshots, storage, text_index, trigram_index
+from .config import DEFAULT_PROMOTED_FIELDS
+from .log_store import SEVERITY_LEVELS
 
 logger = logging.getLogger("chimera")
 
@@ -13,6 +18,9 @@ except Exception as exc:  # pragma: no cover
 
 DEFAULT_DB_PATH = os.environ.get("CHIMERA_DB_PATH", os.path.abspath(os.path.join(os.getcwd(), "data/chimera.duckdb")))
 
+# log_raw rows decompressed per page when backfilling a newly promoted field
+PROMOTED_BACKFILL_BATCH_SIZE = 10000
+
 
 def ensure_parent_directory(path: str) -> None:
     parent = os.path.dirname(path)
@@ -26,18 +34,24 @@ def ensure_parent_directory(path: str) -> None:
             logger.error(f"Error ensuring parent directory {parent}: {e}")
 
 
-def get_connection(db_path: Optional[str] = None):
+def get_connection(db_path: Optional[str] = None, profile: Optional[str] = None):
+    """Open the database, sized for the workload profile (ingest|interactive|batch)"""
     if duckdb is None:
         logger.error("Attempted to get DB connection but duckdb module is not installed.")
         raise RuntimeError("duckdb module is not installed; please install python3-duckdb or pip install duckdb")
     path = db_path or DEFAULT_DB_PATH
     ensure_parent_directory(path)
+    # Published snapshots are owned by the worker process; readers never write them
+    read_only = snapshots.is_snapshot_path(path)
     try:
-        conn = duckdb.connect(path, read_only=False)
+        conn = duckdb.connect(path, read_only=read_only)
         logger.info(f"Successfully connected to DuckDB at {path}")
     except Exception as e:
         logger.error(f"Failed to connect to DuckDB at {path}: {e}")
         raise RuntimeError(f"Failed to connect to DuckDB at {path}: {e}") from e
+    storage.apply_settings(conn, profile)
+    # Under a command deadline, the connection's queries are interrupted with the rest
+    query_guard.track(conn)
     return conn
 
 
@@ -65,20 +79,36 @@ def _ensure_column_exists(conn, table_name: str, column_name: str, column_type:
             )
 
 
+def ensure_id_sequence(conn, sequence: str, table: str) -> None:
+    """Create the id sequence of a table, starting past ids allocated before it existed"""
+    exists = conn.execute(
+        "SELECT COUNT(*) FROM duckdb_sequences() WHERE sequence_name = ? AND database_name = current_database()",
+        [sequence],
+    ).fetchone()[0]
+    if exists:
+        return
+    start = conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+    conn.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence} START {int(start)}")
+
+
 def _migrate_logs_table(conn) -> None:
     """Handle migration of existing logs table if needed."""
     try:
         table_exists = conn.execute(
-            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'logs'"
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'logs' AND table_catalog = current_database()"
         ).fetchone()[0]
         if table_exists:
-            # Ensure optional columns exist (pre-migration)
-            _ensure_column_exists(conn, "logs", "fingerprint", "TEXT")
-            _ensure_column_exists(conn, "logs", "cursor", "TEXT")
+            # Ensure optional columns exist (pre-migration); the encoded view adds them to logs_data
+            _ensure_logs_column(conn, "fingerprint", "TEXT")
+            _ensure_logs_column(conn, "cursor", "TEXT")
+            if log_dictionary.is_encoded(conn):
+                # logs_data was created from a logs table that already had ids
+                return
             # If id column missing, migrate to new table with synthetic IDs
             id_missing = (
                 conn.execute(
-                    "SELECT COUNT(*) FROM information_schema.columns WHERE table_name='logs' AND column_name='id'"
+                    "SELECT COUNT(*) FROM information_schema.columns WHERE table_name='logs' AND column_name='id' "
+                    "AND table_catalog = current_database()"
                 ).fetchone()[0]
                 == 0
             )
@@ -135,6 +165,7 @@ def _create_tables(conn) -> None:
                 unit TEXT,
                 facility TEXT,
                 severity TEXT,
+                severity_level TINYINT,
                 pid INTEGER,
                 uid INTEGER,
                 gid INTEGER,
@@ -169,11 +200,11 @@ def _create_tables(conn) -> None:
     # Create log_embeddings table
     try:
         conn.execute(
-            """
+            f"""
             CREATE TABLE IF NOT EXISTS log_embeddings (
                 log_id BIGINT PRIMARY KEY,
                 indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (log_id) REFERENCES logs(id)
+                FOREIGN KEY (log_id) REFERENCES {log_dictionary.physical_table(conn)}(id)
             );
             """
         )
@@ -182,6 +213,27 @@ def _create_tables(conn) -> None:
         logger.error(f"Error creating log_embeddings table: {e}")
         raise
 
+    # Create embedding_cache table (vectors keyed by model and normalized-text hash)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                text_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                embedding FLOAT[] NOT NULL,
+                hits BIGINT NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (model, text_hash)
+            );
+            """
+        )
+        logger.debug("Table 'embedding_cache' created or already exists.")
+    except Exception as e:
+        logger.error(f"Error creating embedding_cache table: {e}")
+        raise
+
     # Create system_alerts table
     try:
         conn.execute(
@@ -202,6 +254,204 @@ def _create_tables(conn) -> None:
         logger.error(f"Error creating system_alerts table: {e}")
         raise
 
+    # Create text index tables (token postings + BM25 corpus statistics)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_terms (
+                term TEXT NOT NULL,
+                log_id BIGINT NOT NULL,
+                ts TIMESTAMP NOT NULL,
+                tf INTEGER NOT NULL,
+                doc_len INTEGER NOT NULL
+            );
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_term_stats (
+                name TEXT PRIMARY KEY,
+                doc_count BIGINT NOT NULL DEFAULT 0,
+                total_len BIGINT NOT NULL DEFAULT 0
+            );
+            """
+        )
+        logger.debug("Text index tables created or already exist.")
+    except Exception as e:
+        logger.error(f"Error creating text index tables: {e}")
+        raise
+
+    # Create raw payload side table (compressed, fetched on demand by id)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_raw (
+                id BIGINT PRIMARY KEY,
+                ts TIMESTAMP NOT NULL,
+                codec TEXT NOT NULL,
+                payload BLOB NOT NULL
+            );
+            """
+        )
+        logger.debug("Table 'log_raw' created or already exists.")
+    except Exception as e:
+        logger.error(f"Error creating log_raw table: {e}")
+        raise
+
+    # Create trigram postings table (substring / regex candidate pruning)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_trigrams (
+                trigram TEXT NOT NULL,
+                log_id BIGINT NOT NULL,
+                ts TIMESTAMP NOT NULL
+            );
+            """
+        )
+        logger.debug("Table 'log_trigrams' created or already exists.")
+    except Exception as e:
+        logger.error(f"Error creating log_trigrams table: {e}")
+        raise
+
+    # Create template tables (mined message templates and per-row assignments)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_templates (
+                template_id BIGINT PRIMARY KEY,
+                template TEXT NOT NULL,
+                token_count INTEGER NOT NULL,
+                route TEXT[] NOT NULL,
+                count BIGINT NOT NULL DEFAULT 0,
+                first_seen TIMESTAMP,
+                last_seen TIMESTAMP
+            );
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_template_ids (
+                log_id BIGINT PRIMARY KEY,
+                ts TIMESTAMP NOT NULL,
+                template_id BIGINT NOT NULL,
+                params TEXT[]
+            );
+            """
+        )
+        logger.debug("Template tables created or already exist.")
+    except Exception as e:
+        logger.error(f"Error creating template tables: {e}")
+        raise
+
+    # Create template_embeddings table (which template texts are in the vector index)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS template_embeddings (
+                template_id BIGINT PRIMARY KEY,
+                template TEXT NOT NULL,
+                indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        logger.debug("Table 'template_embeddings' created or already exists.")
+    except Exception as e:
+        logger.error(f"Error creating template_embeddings table: {e}")
+        raise
+
+    # Create log_ingest_seq table (commit-ordered sequence numbers for new log rows)
+    try:
+        conn.execute("CREATE SEQUENCE IF NOT EXISTS log_ingest_counter START 1")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_ingest_seq (
+                seq BIGINT PRIMARY KEY,
+                log_id BIGINT NOT NULL,
+                ts TIMESTAMP NOT NULL,
+                ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS indexer_state (
+                name TEXT PRIMARY KEY,
+                watermark_seq BIGINT NOT NULL,
+                watermark_ts TIMESTAMP,
+                indexed BIGINT NOT NULL DEFAULT 0,
+                skipped BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        logger.debug("Tables 'log_ingest_seq' and 'indexer_state' created or already exist.")
+    except Exception as e:
+        logger.error(f"Error creating log_ingest_seq table: {e}")
+        raise
+
+    # Create rollup tables (log counts per bucket, host, source, unit, severity)
+    for _grain, table, _unit in rollups.ROLLUP_GRAINS:
+        try:
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    bucket TIMESTAMP NOT NULL,
+                    hostname TEXT,
+                    source TEXT,
+                    unit TEXT,
+                    severity TEXT,
+                    severity_level TINYINT,
+                    count BIGINT NOT NULL
+                );
+                """
+            )
+            logger.debug(f"Table '{table}' created or already exists.")
+        except Exception as e:
+            logger.error(f"Error creating {table} table: {e}")
+            raise
+
+    # Create promoted_fields registry (journald field -> typed logs column)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS promoted_fields (
+                field TEXT PRIMARY KEY,
+                column_name TEXT NOT NULL,
+                type TEXT NOT NULL
+            );
+            """
+        )
+        logger.debug("Table 'promoted_fields' created or already exists.")
+    except Exception as e:
+        logger.error(f"Error creating promoted_fields table: {e}")
+        raise
+
+    # Create chimera_meta table (schema flags and bookkeeping)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chimera_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        logger.debug("Table 'chimera_meta' created or already exists.")
+    except Exception as e:
+        logger.error(f"Error creating chimera_meta table: {e}")
+        raise
+
+
+def _encoded_index_def(index_def: str) -> str:
+    """Map a logs(col) index definition onto logs_data(col_code)"""
+    table, columns = index_def.rstrip(")").split("(", 1)
+    if table != "logs":
+        return index_def
+    codes = ", ".join(log_dictionary.code_column(c.strip()) for c in columns.split(","))
+    return f"{log_dictionary.ENCODED_TABLE}({codes})"
+
 
 def _create_indexes(conn) -> None:
     """Create all required database indexes."""
@@ -210,6 +460,10 @@ def _create_indexes(conn) -> None:
         ("idx_logs_unit", "logs(unit)"),
         ("idx_logs_hostname", "logs(hostname)"),
         ("idx_logs_severity", "logs(severity)"),
+        ("idx_logs_ts_severity_level", "logs(ts, severity_level)"),
+        ("idx_log_terms_term", "log_terms(term)"),
+        ("idx_log_trigrams_trigram", "log_trigrams(trigram)"),
+        ("idx_log_template_ids_template", "log_template_ids(template_id, ts)"),
     ]
 
     unique_indexes = [
@@ -217,6 +471,11 @@ def _create_indexes(conn) -> None:
         ("uidx_logs_fingerprint", "logs(fingerprint)"),
     ]
 
+    # In the encoded layout logs is a view; index the physical table's codes
+    if log_dictionary.is_encoded(conn):
+        indexes = [(name, _encoded_index_def(d)) for name, d in indexes]
+        unique_indexes = [(name, _encoded_index_def(d)) for name, d in unique_indexes]
+
     # Create regular indexes
     for index_name, index_def in indexes:
         try:
@@ -234,8 +493,207 @@ def _create_indexes(conn) -> None:
             logger.warning(f"Could not create unique index '{index_name}': {e}")
 
 
+def _backfill_text_index(conn) -> None:
+    """Seed text index statistics once; pre-existing logs are indexed by text_index.build_pending."""
+    try:
+        seeded = conn.execute("SELECT COUNT(*) FROM log_term_stats WHERE name = 'logs'").fetchone()[0]
+        if seeded:
+            return
+        conn.execute("INSERT INTO log_term_stats (name, doc_count, total_len) VALUES ('logs', 0, 0)")
+        existing = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+        if existing:
+            logger.info(f"Text index build pending for {existing} existing logs")
+        set_meta(conn, text_index.META_KEY, "pending" if existing else "built")
+    except Exception as e:
+        logger.warning(f"Text index backfill failed or skipped: {e}")
+
+
+def get_meta(conn, key: str) -> Optional[str]:
+    """Read a value from chimera_meta (None when unset)"""
+    row = conn.execute("SELECT value FROM chimera_meta WHERE key = ?", [key]).fetchone()
+    return row[0] if row else None
+
+
+def set_meta(conn, key: str, value: str) -> None:
+    """Write a value to chimera_meta"""
+    conn.execute(
+        "INSERT INTO chimera_meta (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP) "
+        "ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+        [key, value],
+    )
+
+
+def _backfill_trigram_index(conn) -> None:
+    """Index pre-existing logs into the trigram table once."""
+    try:
+        if get_meta(conn, "trigram_index") == "built":
+            return
+        existing = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+        if existing:
+            logger.info(f"Building trigram index for {existing} existing logs...")
+            trigram_index.rebuild(conn)
+        set_meta(conn, "trigram_index", "built")
+    except Exception as e:
+        logger.warning(f"Trigram index backfill failed or skipped: {e}")
+
+
+def _ensure_logs_column(conn, column_name: str, column_type: str) -> None:
+    """Add a logs column in either layout; the encoded view is rebuilt to expose it."""
+    if not log_dictionary.is_encoded(conn):
+        _ensure_column_exists(conn, "logs", column_name, column_type)
+        return
+    present = conn.execute(
+        "SELECT COUNT(*) FROM pragma_table_info('logs') WHERE name = ?", [column_name]
+    ).fetchone()[0]
+    if not present:
+        _ensure_column_exists(conn, log_dictionary.ENCODED_TABLE, column_name, column_type)
+        log_dictionary.create_logs_view(conn)
+
+
+def _backfill_promoted_field(conn, field_name: str, column: str, sql_type: str) -> int:
+    """Fill a new promoted column from inline logs.raw and the compressed log_raw payloads.
+
+    log_raw is decompressed a page of ids at a time; returns rows updated.
+    """
+    table = log_dictionary.physical_table(conn)
+    # Rows written before the side table existed keep their payload inline
+    conn.execute(
+        f"UPDATE {table} SET {column} = TRY_CAST(json_extract_string(raw, '$.{field_name}') AS {sql_type}) "
+        f"WHERE raw IS NOT NULL AND {column} IS NULL"
+    )
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS promoted_backfill (id BIGINT, value TEXT)")
+    conn.execute("DELETE FROM promoted_backfill")
+    batch_size = PROMOTED_BACKFILL_BATCH_SIZE
+    updated = 0
+    after_id = None
+    while True:
+        if after_id is None:
+            page = conn.execute("SELECT id, payload FROM log_raw ORDER BY id LIMIT ?", [batch_size]).fetchall()
+        else:
+            page = conn.execute(
+                "SELECT id, payload FROM log_raw WHERE id > ? ORDER BY id LIMIT ?", [after_id, batch_size]
+            ).fetchall()
+        if not page:
+            break
+        after_id = page[-1][0]
+        ids, values = [], []
+        for log_id, payload in page:
+            try:
+                entry = json.loads(raw_store.decompress(payload))
+            except Exception:
+                continue
+            value = promoted_fields.convert(entry.get(field_name), sql_type) if isinstance(entry, dict) else None
+            if value is not None:
+                ids.append(log_id)
+                values.append(str(value))
+        if bulk.insert_columns(conn, "promoted_backfill", {"id": ids, "value": values}, {"id": "int64", "value": object}):
+            updated += conn.execute(
+                f"UPDATE {table} SET {column} = TRY_CAST(b.value AS {sql_type}) FROM promoted_backfill b "
+                f"WHERE {table}.id = b.id AND {table}.{column} IS NULL"
+            ).fetchone()[0]
+            conn.execute("DELETE FROM promoted_backfill")
+    return updated
+
+
+def ensure_promoted_fields(conn, promoted: Dict[str, str]) -> List[str]:
+    """Sync promoted journald field columns with configuration.
+
+    New fields get a typed logs column, backfilled from inline and compressed raw payloads.
+    Fields dropped from configuration are unregistered; their column is kept.
+    Returns the newly promoted field names.
+    """
+    specs = promoted_fields.validate(promoted)
+    registered = {spec[0] for spec in promoted_fields.get_specs(conn)}
+    added = []
+    for field_name, column, sql_type in specs:
+        _ensure_logs_column(conn, column, sql_type)
+        if field_name in registered:
+            continue
+        try:
+            _backfill_promoted_field(conn, field_name, column, sql_type)
+        except Exception as e:
+            logger.warning(f"Could not backfill promoted field {field_name}: {e}")
+        conn.execute(
+            "INSERT INTO promoted_fields (field, column_name, type) VALUES (?, ?, ?)",
+            [field_name, column, sql_type],
+        )
+        added.append(field_name)
+    wanted = [spec[0] for spec in specs]
+    for field_name in registered - set(wanted):
+        conn.execute("DELETE FROM promoted_fields WHERE field = ?", [field_name])
+    if added:
+        logger.info(f"Promoted journald fields: {', '.join(added)}")
+    return added
+
+
+def _seed_promoted_fields(conn) -> None:
+    """Register the default promoted fields on first initialization."""
+    try:
+        if get_meta(conn, "promoted_fields") is not None:
+            return
+        ensure_promoted_fields(conn, DEFAULT_PROMOTED_FIELDS)
+        set_meta(conn, "promoted_fields", "seeded")
+    except Exception as e:
+        logger.warning(f"Promoted field setup failed or skipped: {e}")
+
+
+def _backfill_severity_level(conn) -> None:
+    """Fill severity_level for rows written before the column existed, once."""
+    try:
+        if get_meta(conn, "severity_level") == "built":
+            return
+        # DuckDB rewrites updates of indexed columns as delete+insert, which the
+        # log_embeddings foreign key rejects; the index is (re)created afterwards
+        conn.execute("DROP INDEX IF EXISTS idx_logs_ts_severity_level")
+        cases = " ".join(f"WHEN '{name}' THEN {level}" for name, level in SEVERITY_LEVELS.items())
+        if log_dictionary.is_encoded(conn):
+            table = log_dictionary.ENCODED_TABLE
+            conn.execute(
+                f"UPDATE {table} SET severity_level = CASE dim.value {cases} END "
+                f"FROM {log_dictionary.dimension_table('severity')} dim "
+                f"WHERE dim.code = {table}.severity_code AND {table}.severity_level IS NULL"
+            )
+        else:
+            conn.execute(
+                f"UPDATE logs SET severity_level = CASE severity {cases} END "
+                "WHERE severity_level IS NULL AND severity IS NOT NULL"
+            )
+        set_meta(conn, "severity_level", "built")
+    except Exception as e:
+        logger.warning(f"severity_level backfill failed or skipped: {e}")
+
+
+def _backfill_rollups(conn) -> None:
+    """Build rollups for logs written before they (or their current layout) existed, once."""
+    try:
+        for _grain, table, _unit in rollups.ROLLUP_GRAINS:
+            _ensure_column_exists(conn, table, "severity_level", "TINYINT")
+        if get_meta(conn, "rollups") == rollups.ROLLUP_VERSION:
+            return
+        if conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]:
+            logger.info("Building log rollups for existing logs...")
+            rollups.rebuild(conn)
+        set_meta(conn, "rollups", rollups.ROLLUP_VERSION)
+    except Exception as e:
+        logger.warning(f"Rollup backfill failed or skipped: {e}")
+
+
+def is_read_only(conn) -> bool:
+    """True when conn is attached read-only (e.g. a published snapshot)"""
+    try:
+        row = conn.execute(
+            "SELECT readonly FROM duckdb_databases() WHERE database_name = current_database()"
+        ).fetchone()
+    except Exception:
+        return False
+    return bool(row) and row[0] is True
+
+
 def initialize_schema(conn) -> None:
     """Initialize database schema with tables and indexes."""
+    if is_read_only(conn):
+        # Snapshots are published from an initialized database
+        return
     logger.info("Initializing database schema...")
 
     # Handle migration of existing installations
@@ -245,12 +703,22 @@ def initialize_schema(conn) -> None:
     _create_tables(conn)
 
     # Backfill columns for existing installations (idempotent, without warnings)
-    _ensure_column_exists(conn, "logs", "fingerprint", "TEXT")
-    _ensure_column_exists(conn, "logs", "cursor", "TEXT")
+    _ensure_logs_column(conn, "fingerprint", "TEXT")
+    _ensure_logs_column(conn, "cursor", "TEXT")
+    _ensure_logs_column(conn, "severity_level", "TINYINT")
+    _seed_promoted_fields(conn)
+
+    # Backfill column values before indexes cover them
+    _backfill_severity_level(conn)
 
     # Create all indexes
     _create_indexes(conn)
 
+    # Build derived indexes for data written before they existed
+    _backfill_text_index(conn)
+    _backfill_trigram_index(conn)
+    _backfill_rollups(conn)
+
     logger.info("Database schema initialization complete.")
 
 def clear_table(conn, table_name: str) -> None:
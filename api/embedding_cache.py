@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import hashlib
+import re
+import logging
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger("chimera")
+
+
+# Content-addressed embedding cache: vectors keyed by (model, hash of the
+# normalized text), so repeated log lines are embedded once per model
+_WHITESPACE = re.compile(r"\s+")
+
+LOOKUP_CHUNK = 1000
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace; case and content are kept since they change the embedding"""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+def dedupe(texts: Sequence[str]) -> Tuple[List[str], List[str], List[int]]:
+    """Collapse identical texts.
+
+    Returns (hashes, unique texts, index into the unique list for each input).
+    """
+    hashes: List[str] = []
+    unique: List[str] = []
+    positions: Dict[str, int] = {}
+    mapping: List[int] = []
+    for text in texts:
+        key = text_hash(text)
+        if key not in positions:
+            positions[key] = len(unique)
+            hashes.append(key)
+            unique.append(text)
+        mapping.append(positions[key])
+    return hashes, unique, mapping
+
+
+def lookup(conn, model: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+    """Cached vectors for the given hashes; read-only, record() stamps the hits"""
+    keys = list(dict.fromkeys(hashes))
+    found: Dict[str, List[float]] = {}
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[i:i + LOOKUP_CHUNK]
+        rows = conn.execute(
+            "SELECT text_hash, embedding FROM embedding_cache "
+            "WHERE model = ? AND text_hash IN (SELECT UNNEST(?::TEXT[]))",
+            [model, chunk],
+        ).fetchall()
+        found.update({key: list(vector) for key, vector in rows})
+    return found
+
+
+def store(conn, model: str, entries: Dict[str, List[float]]) -> int:
+    """Insert new vectors; returns entries written"""
+    records = [(key, model, len(vector), vector) for key, vector in entries.items() if vector]
+    if not records:
+        return 0
+    conn.executemany(
+        "INSERT INTO embedding_cache (text_hash, model, dim, embedding) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT DO NOTHING",
+        records,
+    )
+    return len(records)
+
+
+def record(conn, model: str, used: Sequence[str], entries: Dict[str, List[float]]) -> int:
+    """Stamp the hits of one batch as used and insert its new vectors; runs on the writer"""
+    if used:
+        conn.execute(
+            "UPDATE embedding_cache SET hits = hits + 1, last_used_at = CURRENT_TIMESTAMP "
+            "WHERE model = ? AND text_hash IN (SELECT UNNEST(?::TEXT[]))",
+            [model, list(used)],
+        )
+    return store(conn, model, entries)
+
+
+def prune(conn, max_age_days: int) -> int:
+    """Drop entries not used for max_age_days; returns entries removed"""
+    removed = conn.execute(
+        "SELECT COUNT(*) FROM embedding_cache WHERE last_used_at < CURRENT_TIMESTAMP - to_days(?)",
+        [int(max_age_days)],
+    ).fetchone()[0]
+    if removed:
+        conn.execute(
+            "DELETE FROM embedding_cache WHERE last_used_at < CURRENT_TIMESTAMP - to_days(?)",
+            [int(max_age_days)],
+        )
+    return int(removed)
+
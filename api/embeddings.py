@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 import datetime as dt
+import random
 import requests
+import requests.adapters
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import List, Dict, Any, Optional, Tuple
 import threading
 import time
@@ -9,6 +12,65 @@ import logging
 logger = logging.getLogger("chimera")
 
 from .db import get_connection
+from . import embedding_cache, hybrid_search, jobs, mmap_index, query_guard, rollups, shards, text_index, vector_store, writer
+from .hashing_embedder import HashingEmbeddingClient
+from .log_store import ERROR_SEVERITY_LEVEL
+
+
+# Embedding request tuning (see configure); batches go to Ollama's multi-input
+# /api/embed endpoint with a bounded number of requests in flight
+DEFAULT_EMBEDDING_SETTINGS = {
+    "provider": "ollama",  # ollama | hashing (local n-gram feature hashing, no model server)
+    "hashing": {},  # hashing provider settings, see hashing_embedder.DEFAULT_HASHING_SETTINGS
+    "concurrency": 4,  # requests in flight
+    "initial_batch_size": 32,
+    "max_batch_size": 256,
+    "target_latency_ms": 2000,  # batches grow while faster than half this, shrink when slower
+    "max_retries": 3,
+    "backoff_seconds": 0.5,  # doubled on every retry
+    "cache": True,  # reuse vectors for identical texts (embedding_cache table)
+    "cache_max_age_days": 30,  # drop cache entries unused for this long
+    "index_mode": "rows",  # rows: one vector per log row; templates: one per mined template
+    "rows_per_template": 3,  # templates mode: newest matching rows returned per template hit
+    "vector_backend": "chromadb",  # chromadb | duckdb (FLOAT[N] columns next to logs) | mmap
+    "shard_by": "none",  # chromadb: none | day | hour (one row collection per UTC day or hour of log time)
+    "mmap": {},  # mmap backend settings, see mmap_index.DEFAULT_MMAP_SETTINGS
+    "hybrid": {},  # SEARCH mode=hybrid settings, see hybrid_search.DEFAULT_HYBRID_SETTINGS
+}
+
+EMBEDDING_PROVIDERS = ("ollama", "hashing")
+INDEX_MODES = ("rows", "templates")
+VECTOR_BACKENDS = ("chromadb", "duckdb", "mmap")
+# Shard collection name suffix format and width in seconds per granularity
+SHARD_GRANULARITIES = {"day": ("%Y%m%d", 86400), "hour": ("%Y%m%d%H", 3600)}
+TEMPLATE_COLLECTION = "template_embeddings"
+# Templates mode: newest rows per template considered when source/unit/severity filters apply
+TEMPLATE_CANDIDATE_FACTOR = 50
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_settings: Dict[str, Any] = {}
+
+
+def configure(settings: Optional[Dict[str, Any]]) -> None:
+    """Set the embeddings section used by embedding clients in this process"""
+    global _settings
+    _settings = dict(settings or {})
+
+
+def embedding_settings() -> Dict[str, Any]:
+    return {**DEFAULT_EMBEDDING_SETTINGS, **_settings}
+
+
+def make_embedding_client(ollama_url: str, ollama_model: str):
+    """Embedding client for the configured provider"""
+    settings = embedding_settings()
+    provider = settings["provider"]
+    if provider == "hashing":
+        return HashingEmbeddingClient.from_settings(settings["hashing"])
+    if provider != "ollama":
+        raise ValueError(f"Unknown embeddings provider: {provider}")
+    return OllamaEmbeddingClient(ollama_url, ollama_model)
 
 
 class OllamaEmbeddingClient:
@@ -17,9 +79,23 @@ class OllamaEmbeddingClient:
     def __init__(self, base_url: str = "http://localhost:11434", model: str = "nomic-embed-text"):
         self.base_url = base_url.rstrip('/')
         self.model = model
+        settings = embedding_settings()
+        self.concurrency = max(1, int(settings["concurrency"]))
+        self.max_batch_size = max(1, int(settings["max_batch_size"]))
+        self.batch_size = min(self.max_batch_size, max(1, int(settings["initial_batch_size"])))
+        self.target_latency = float(settings["target_latency_ms"]) / 1000
+        self.max_retries = max(0, int(settings["max_retries"]))
+        self.backoff_seconds = float(settings["backoff_seconds"])
         self.session = requests.Session()
+        # One pooled keep-alive connection per in-flight request
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         # Configure timeouts
         self.timeout = (10, 30)  # (connection timeout, read timeout)
+        self._embed_supported = True
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "texts": 0, "failed_texts": 0}
 
     def get_embedding(self, text: str) -> Optional[List[float]]:
         """Get embedding for a text string"""
@@ -36,33 +112,100 @@ class OllamaEmbeddingClient:
             data = response.json()
             return data.get("embedding")
         except Exception as e:
-            print(f"Error getting embedding: {e}")
+            logger.error(f"Error getting embedding: {e}")
             return None
 
-    def get_embeddings_batch(self, texts: List[str], batch_size: int = 10) -> List[Optional[List[float]]]:
-        """Get embeddings for multiple texts in batches"""
-        embeddings = []
-
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            batch_embeddings = []
-
-            for text in batch:
-                embedding = self.get_embedding(text)
-                batch_embeddings.append(embedding)
+    def _post_with_retry(self, path: str, payload: Dict[str, Any]) -> requests.Response:
+        """POST, retrying connection errors and retryable statuses with exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(self.backoff_seconds * (2 ** (attempt - 1)) * random.uniform(0.8, 1.2))
+            with self._lock:
+                self.stats["requests"] += 1
+            try:
+                response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                continue
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                continue
+            return response
+        raise RuntimeError("unreachable")
+
+    def _embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed one batch with a single /api/embed call (per-text calls on older Ollama)"""
+        if self._embed_supported:
+            try:
+                response = self._post_with_retry("/api/embed", {"model": self.model, "input": texts})
+                if response.status_code == 404:
+                    logger.info("Ollama has no /api/embed; falling back to per-text /api/embeddings")
+                    self._embed_supported = False
+                else:
+                    response.raise_for_status()
+                    embeddings = response.json().get("embeddings") or []
+                    if len(embeddings) == len(texts):
+                        return embeddings
+                    logger.warning(f"Ollama returned {len(embeddings)} embeddings for {len(texts)} inputs")
+                    return [None] * len(texts)
+            except Exception as e:
+                logger.error(f"Error getting embeddings batch: {e}")
+                return [None] * len(texts)
+        return [self.get_embedding(text) for text in texts]
 
-            embeddings.extend(batch_embeddings)
-            time.sleep(0.1)  # Rate limiting
+    def _adapt(self, size: int, elapsed: float) -> None:
+        """Grow the batch size while requests are fast, halve it when they are slow"""
+        with self._lock:
+            if elapsed > self.target_latency:
+                self.batch_size = max(1, self.batch_size // 2)
+            elif elapsed < self.target_latency / 2 and size >= self.batch_size:
+                self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+
+    def get_embeddings_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[Optional[List[float]]]:
+        """Get embeddings for multiple texts, in order; failed texts come back as None"""
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        if batch_size:
+            self.batch_size = min(self.max_batch_size, max(1, int(batch_size)))
+
+        def run(start: int, batch: List[str]) -> Tuple[int, List[Optional[List[float]]], float]:
+            started = time.monotonic()
+            return start, self._embed_batch(batch), time.monotonic() - started
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="chimera-embed") as pool:
+            pending = set()
+            next_start = 0
+            finished = 0
+            while next_start < len(texts) or pending:
+                # Inside an INDEX job, a cancel stops before the next batch goes out
+                jobs.check_cancelled()
+                # Keep up to `concurrency` batches in flight, sized by the latest latency
+                while next_start < len(texts) and len(pending) < self.concurrency:
+                    batch = texts[next_start:next_start + self.batch_size]
+                    pending.add(pool.submit(run, next_start, batch))
+                    next_start += len(batch)
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, batch_embeddings, elapsed = future.result()
+                    embeddings[start:start + len(batch_embeddings)] = batch_embeddings
+                    self._adapt(len(batch_embeddings), elapsed)
+                    finished += len(batch_embeddings)
+                jobs.report_progress(finished, len(texts), "embedding")
 
+        with self._lock:
+            self.stats["texts"] += len(texts)
+            self.stats["failed_texts"] += sum(1 for e in embeddings if e is None)
         return embeddings
 
 
 class ChromaDBClient:
     """Client for ChromaDB vector database"""
 
-    def __init__(self, persist_directory: str = "/var/lib/chimera/chromadb"):
+    def __init__(self, persist_directory: str = "/var/lib/chimera/chromadb",
+                 collection_name: str = "log_embeddings"):
         self.persist_directory = persist_directory
-        self.collection_name = "log_embeddings"
+        self.collection_name = collection_name
         self._client = None
         self._collection = None
         self._lock = threading.Lock()
@@ -103,17 +246,20 @@ class ChromaDBClient:
         return self._collection
 
     def add_embeddings(self, ids: List[str], embeddings: List[List[float]],
-                      metadatas: List[Dict[str, Any]], documents: List[str]) -> None:
-        """Add embeddings to the collection"""
+                      metadatas: List[Dict[str, Any]], documents: List[str], upsert: bool = False) -> None:
+        """Add embeddings to the collection (replacing existing ids when upsert is set)"""
         with self._lock:
             collection = self._get_collection()
-            # Convert embeddings to proper format for ChromaDB
-            embedding_data = []
-            for emb in embeddings:
-                if emb is not None:
-                    embedding_data.append(emb)
-                else:
-                    embedding_data.append([0.0] * 384)  # Default embedding size
+            # Texts that failed to embed are left out rather than stored as a placeholder vector
+            keep = [i for i, emb in enumerate(embeddings) if emb is not None]
+            if len(keep) < len(embeddings):
+                logger.warning(f"Skipping {len(embeddings) - len(keep)} entries without an embedding")
+                ids = [ids[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+                documents = [documents[i] for i in keep]
+            if not keep:
+                return
+            embedding_data = [embeddings[i] for i in keep]
 
             # Ensure metadatas have proper types for ChromaDB
             safe_metadatas = []
@@ -128,7 +274,8 @@ class ChromaDBClient:
                         safe_meta[k] = str(v)  # Convert complex types to strings
                 safe_metadatas.append(safe_meta)
 
-            collection.add(
+            write = collection.upsert if upsert else collection.add
+            write(
                 ids=ids,
                 embeddings=embedding_data,
                 metadatas=safe_metadatas,
@@ -153,6 +300,175 @@ class ChromaDBClient:
             collection = self._get_collection()
             collection.delete(ids=ids)
 
+    def count(self) -> int:
+        with self._lock:
+            return int(self._get_collection().count())
+
+    def drop(self) -> None:
+        """Delete the whole collection"""
+        with self._lock:
+            self._get_client().delete_collection(self.collection_name)
+            self._collection = None
+
+
+class ShardedChromaClient:
+    """Row vectors in one ChromaDB collection per UTC day or hour of log time.
+
+    Searches query only the shards overlapping the time window and merge their
+    top-k lists; retention drops whole shards instead of deleting ids. Vectors
+    written before sharding was switched on stay in the unsharded collection,
+    which is searched as one more shard and emptied by id until it is dropped.
+    """
+
+    def __init__(self, persist_directory: str = "/var/lib/chimera/chromadb", granularity: str = "day",
+                 prefix: str = "log_embeddings"):
+        if granularity not in SHARD_GRANULARITIES:
+            raise ValueError(f"Unknown embeddings shard_by: {granularity}")
+        self.persist_directory = persist_directory
+        self.granularity = granularity
+        self.prefix = prefix
+        self.base = ChromaDBClient(persist_directory, prefix)  # owns the shared chromadb client
+        self._shards: Dict[str, ChromaDBClient] = {}
+        self._lock = threading.Lock()
+
+    def shard_name(self, ts_epoch: float) -> str:
+        fmt, _width = SHARD_GRANULARITIES[self.granularity]
+        return f"{self.prefix}_{dt.datetime.fromtimestamp(ts_epoch, dt.timezone.utc).strftime(fmt)}"
+
+    def _bounds(self, name: str) -> Optional[Tuple[float, float]]:
+        """[start, end) epoch seconds covered by a shard name, None for other collections"""
+        fmt, width = SHARD_GRANULARITIES[self.granularity]
+        suffix = name[len(self.prefix) + 1:]
+        if not name.startswith(f"{self.prefix}_") or not suffix.isdigit() or len(suffix) != (10 if "%H" in fmt else 8):
+            return None
+        start = dt.datetime.strptime(suffix, fmt).replace(tzinfo=dt.timezone.utc).timestamp()
+        return start, start + width
+
+    def shards(self) -> Dict[str, Tuple[float, float]]:
+        """Existing shard collections and their time bounds, oldest first"""
+        collections = self.base._get_client().list_collections()
+        bounds = {}
+        for collection in collections:
+            name = getattr(collection, "name", collection)
+            span = self._bounds(name)
+            if span is not None:
+                bounds[name] = span
+        return dict(sorted(bounds.items(), key=lambda item: item[1]))
+
+    def has_legacy(self) -> bool:
+        """True while the unsharded collection from before sharding still exists"""
+        return any(getattr(collection, "name", collection) == self.prefix
+                   for collection in self.base._get_client().list_collections())
+
+    def _shard(self, name: str) -> ChromaDBClient:
+        if name == self.prefix:
+            return self.base
+        with self._lock:
+            shard = self._shards.get(name)
+            if shard is None:
+                shard = ChromaDBClient(self.persist_directory, name)
+                shard._client = self.base._get_client()
+                self._shards[name] = shard
+            return shard
+
+    def add_embeddings(self, ids: List[str], embeddings: List[List[float]],
+                       metadatas: List[Dict[str, Any]], documents: List[str], upsert: bool = False) -> None:
+        """Add row embeddings to the shard of each row's ts_epoch"""
+        groups: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(self.shard_name(float(metadata.get("ts_epoch") or 0.0)), []).append(i)
+        for name, positions in groups.items():
+            self._shard(name).add_embeddings(
+                [ids[i] for i in positions], [embeddings[i] for i in positions],
+                [metadatas[i] for i in positions], [documents[i] for i in positions], upsert=upsert,
+            )
+
+    def plan(self, since_epoch: Optional[float]) -> List[Tuple[str, bool]]:
+        """(shard, lies wholly inside the window) for shards overlapping [since, now], newest first.
+
+        The legacy unsharded collection comes last and always gets the time filter.
+        """
+        planned = [
+            (name, since_epoch is None or start >= since_epoch)
+            for name, (start, end) in self.shards().items()
+            if since_epoch is None or end > since_epoch
+        ][::-1]
+        if self.has_legacy():
+            planned.append((self.prefix, since_epoch is None))
+        return planned
+
+    def search(self, query_embedding: List[float], n_results: int = 10, since_epoch: Optional[float] = None,
+               where: Optional[Dict[str, Any]] = None, inner_where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Merged top-k over the planned shards, in ChromaDB's result layout.
+
+        `where` applies to the shard the window starts in; shards wholly inside
+        the window get `inner_where`, which can leave out the time condition.
+        """
+        merged = []
+        planned = self.plan(since_epoch)
+        for name, inside in planned:
+            results = self._shard(name).search(query_embedding, n_results, (inner_where if inside else where) or None)
+            merged.extend(zip(
+                (results.get("distances") or [[]])[0],
+                (results.get("ids") or [[]])[0],
+                (results.get("metadatas") or [[]])[0],
+                (results.get("documents") or [[]])[0] or [None] * len((results.get("ids") or [[]])[0]),
+            ))
+        merged.sort(key=lambda item: item[0])
+        top = merged[:n_results]
+        return {
+            "ids": [[item[1] for item in top]],
+            "distances": [[item[0] for item in top]],
+            "metadatas": [[item[2] for item in top]],
+            "documents": [[item[3] for item in top]],
+            "shards_searched": len(planned),
+        }
+
+    def delete_embeddings(self, ids: List[str]) -> None:
+        """Delete ids from the legacy collection, dropping it once empty; sharded rows go with their shard"""
+        if not self.has_legacy():
+            return
+        self.base.delete_embeddings(ids)
+        if self.base.count() == 0:
+            self.base.drop()
+            logger.info(f"Dropped the emptied unsharded collection {self.prefix}")
+
+    def drop_before(self, cutoff: dt.datetime) -> Tuple[int, int]:
+        """Drop shards that end at or before the cutoff; returns (shards, vectors) dropped"""
+        cutoff_epoch = cutoff.replace(tzinfo=cutoff.tzinfo or dt.timezone.utc).timestamp()
+        shards = vectors = 0
+        for name, (_start, end) in self.shards().items():
+            if end > cutoff_epoch:
+                break
+            shard = self._shard(name)
+            vectors += shard.count()
+            shard.drop()
+            with self._lock:
+                self._shards.pop(name, None)
+            shards += 1
+        return shards, vectors
+
+
+def record_indexed_logs(conn, log_ids: List[int]) -> int:
+    """Mark logs as embedded"""
+    for log_id in log_ids:
+        conn.execute(
+            "INSERT OR IGNORE INTO log_embeddings (log_id, indexed_at) VALUES (?, CURRENT_TIMESTAMP)",
+            [log_id]
+        )
+    return len(log_ids)
+
+
+def write_embedding_batch(conn, payload: Dict[str, Any]) -> int:
+    """Mark an indexed batch's logs as embedded and record its embedding cache use"""
+    cache = payload.get("cache")
+    if cache:
+        embedding_cache.record(conn, cache["model"], cache["used"], cache["entries"])
+    return record_indexed_logs(conn, payload.get("log_ids") or [])
+
+
+writer.register_handler("embeddings", write_embedding_batch)
+
 
 class SemanticSearchEngine:
     """Semantic search engine for log messages"""
@@ -160,28 +476,74 @@ class SemanticSearchEngine:
     def __init__(self, db_path: Optional[str] = None,
                  ollama_url: str = "http://localhost:11434",
                  ollama_model: str = "nomic-embed-text",
-                 chroma_persist_dir: str = "/var/lib/chimera/chromadb"):
+                 chroma_persist_dir: str = "/var/lib/chimera/chromadb",
+                 shard: Optional[str] = None):
         self.db_path = db_path
-        self.embedding_client = OllamaEmbeddingClient(ollama_url, ollama_model)
+        # Indexing runs per database file: main, or one per-source shard
+        self.shard = shard
+        self.embedding_client = make_embedding_client(ollama_url, ollama_model)
         self.chroma_client = ChromaDBClient(chroma_persist_dir)
+        self.template_client = ChromaDBClient(chroma_persist_dir, TEMPLATE_COLLECTION)
+        self.chroma_persist_dir = chroma_persist_dir
+        self._mmap_index: Optional[mmap_index.MmapVectorIndex] = None
+        self._row_shards: Optional[ShardedChromaClient] = None
         self._lock = threading.Lock()
+        self.last_index_stats: Dict[str, int] = {}
+        # Embedding cache hits and new vectors of the batch being indexed
+        self._cache_writes: Optional[Dict[str, Any]] = None
+
+    def _connect(self, profile: str = "batch"):
+        """Connection for indexing: main, or the engine's shard"""
+        if self.shard:
+            return shards.connect(self.db_path, self.shard, profile=profile)
+        return get_connection(self.db_path, profile=profile)
+
+    @staticmethod
+    def index_mode() -> str:
+        mode = embedding_settings()["index_mode"]
+        if mode not in INDEX_MODES:
+            raise ValueError(f"Unknown embeddings index_mode: {mode}")
+        return mode
+
+    @staticmethod
+    def vector_backend() -> str:
+        backend = embedding_settings()["vector_backend"]
+        if backend not in VECTOR_BACKENDS:
+            raise ValueError(f"Unknown embeddings vector_backend: {backend}")
+        return backend
+
+    def local_index(self) -> "mmap_index.MmapVectorIndex":
+        """The memory-mapped index (mmap backend), opened on first use"""
+        if self._mmap_index is None:
+            self._mmap_index = mmap_index.MmapVectorIndex.from_settings(embedding_settings()["mmap"])
+        return self._mmap_index
+
+    def row_shards(self) -> Optional[ShardedChromaClient]:
+        """Time-sharded row collections (chromadb backend with shard_by set), else None"""
+        granularity = embedding_settings()["shard_by"]
+        if self.vector_backend() != "chromadb" or granularity in (None, "", "none"):
+            return None
+        if self._row_shards is None or self._row_shards.granularity != granularity:
+            self._row_shards = ShardedChromaClient(self.chroma_persist_dir, granularity)
+        return self._row_shards
 
     def index_logs(self, log_ids: Optional[List[int]] = None,
                    since_seconds: int = 86400) -> Tuple[int, int]:
         """Index logs for semantic search"""
-        conn = get_connection(self.db_path)
+        if self.index_mode() == "templates":
+            return self.index_templates(log_ids, since_seconds)
+        conn = self._connect()
         try:
             # Get logs to index
             if log_ids:
-                placeholders = ','.join(['?' for _ in log_ids])
-                sql = f"""
+                sql = """
                     SELECT id, ts, hostname, source, unit, severity, message
                     FROM logs
-                    WHERE id IN ({placeholders}) AND id NOT IN (
-                        SELECT log_id FROM log_embeddings
+                    WHERE id IN (SELECT UNNEST(?::BIGINT[])) AND NOT EXISTS (
+                        SELECT 1 FROM log_embeddings e WHERE e.log_id = logs.id
                     )
                 """
-                params = log_ids
+                params = [list(log_ids)]
             else:
                 since_ts = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=since_seconds)
                 sql = """
@@ -218,6 +580,7 @@ class SemanticSearchEngine:
                 metadatas.append({
                     "log_id": log_id,
                     "ts": ts.isoformat() if ts else "",
+                    "ts_epoch": ts.replace(tzinfo=dt.timezone.utc).timestamp() if ts else 0.0,
                     "hostname": hostname or "",
                     "source": source or "",
                     "unit": unit or "",
@@ -227,7 +590,7 @@ class SemanticSearchEngine:
                 ids.append(f"log_{log_id}")
 
             # Get embeddings
-            embeddings = self.embedding_client.get_embeddings_batch(texts)
+            embeddings = self._embed_texts(conn, texts)
 
             # Filter out failed embeddings
             valid_data = []
@@ -236,39 +599,137 @@ class SemanticSearchEngine:
                     valid_data.append((ids[i], embedding, metadatas[i], documents[i]))
 
             if not valid_data:
-                return (0, 0)
+                # Nothing embedded: report the rows as failed so callers retry
+                return (0, len(logs))
 
-            # Add to ChromaDB
+            # Add to the vector index
             ids, embeddings, metadatas, documents = zip(*valid_data)
-            logger.debug(f"Adding {len(ids)} embeddings to ChromaDB. Sample metadata: {metadatas[0] if metadatas else 'N/A'}")
-            self.chroma_client.add_embeddings(list(ids), list(embeddings), list(metadatas), list(documents))
+            if self.vector_backend() == "duckdb":
+                vector_store.upsert(conn, vector_store.LOG_VECTORS, [m["log_id"] for m in metadatas], list(embeddings))
+            elif self.vector_backend() == "mmap":
+                self.local_index().add(
+                    [m["log_id"] for m in metadatas],
+                    [dt.datetime.fromtimestamp(m["ts_epoch"], dt.timezone.utc) for m in metadatas],
+                    list(embeddings),
+                )
+            else:
+                logger.debug(f"Adding {len(ids)} embeddings to ChromaDB. Sample metadata: {metadatas[0] if metadatas else 'N/A'}")
+                (self.row_shards() or self.chroma_client).add_embeddings(
+                    list(ids), list(embeddings), list(metadatas), list(documents))
 
             # Record in database
-            for log_id, _, _, _ in valid_data:
-                conn.execute(
-                    "INSERT OR IGNORE INTO log_embeddings (log_id, indexed_at) VALUES (?, CURRENT_TIMESTAMP)",
-                    [int(log_id.split('_')[1])]
-                )
+            indexed_ids = [int(log_id.split('_')[1]) for log_id, _, _, _ in valid_data]
+            self._write_batch(conn, {"log_ids": indexed_ids, "cache": self._cache_writes})
 
             return (len(valid_data), len(logs))
 
         finally:
             conn.close()
 
+    def index_templates(self, log_ids: Optional[List[int]] = None,
+                        since_seconds: int = 86400) -> Tuple[int, int]:
+        """Embed each mined template seen in the window once (again after it generalizes)"""
+        if self.vector_backend() == "mmap":
+            raise ValueError("templates index_mode needs the chromadb or duckdb vector backend")
+        conn = self._connect()
+        try:
+            if log_ids:
+                scope = "lt.template_id IN (SELECT template_id FROM log_template_ids WHERE log_id IN (SELECT UNNEST(?::BIGINT[])))"
+                params: list = [log_ids]
+            else:
+                since_ts = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) - dt.timedelta(seconds=since_seconds)
+                scope = "lt.last_seen >= ?"
+                params = [since_ts]
+            templates = conn.execute(f"""
+                SELECT lt.template_id, lt.template
+                FROM log_templates lt
+                LEFT JOIN template_embeddings te USING (template_id)
+                WHERE {scope} AND (te.template IS NULL OR te.template <> lt.template)
+                ORDER BY lt.last_seen DESC
+                LIMIT 1000
+            """, params).fetchall()
+            if not templates:
+                self.last_index_stats = {}
+                return (0, 0)
+
+            embeddings = self._embed_texts(conn, [template for _id, template in templates])
+            valid = [(template_id, template, embedding)
+                     for (template_id, template), embedding in zip(templates, embeddings) if embedding is not None]
+            if not valid:
+                return (0, len(templates))
+
+            if self.vector_backend() == "duckdb":
+                vector_store.upsert(conn, vector_store.TEMPLATE_VECTORS,
+                                    [template_id for template_id, _t, _e in valid],
+                                    [embedding for _id, _t, embedding in valid])
+            else:
+                self.template_client.add_embeddings(
+                    [f"tpl_{template_id}" for template_id, _t, _e in valid],
+                    [embedding for _id, _t, embedding in valid],
+                    [{"template_id": template_id} for template_id, _t, _e in valid],
+                    [template for _id, template, _e in valid],
+                    upsert=True,
+                )
+            conn.executemany(
+                "INSERT INTO template_embeddings (template_id, template, indexed_at) VALUES (?, ?, CURRENT_TIMESTAMP) "
+                "ON CONFLICT (template_id) DO UPDATE SET template = excluded.template, indexed_at = excluded.indexed_at",
+                [(template_id, template) for template_id, template, _e in valid],
+            )
+            self._write_batch(conn, {"log_ids": [], "cache": self._cache_writes})
+            return (len(valid), len(templates))
+
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn, payload: Dict[str, Any]) -> None:
+        """Apply an indexed batch's bookkeeping on the writer, in one transaction"""
+        # A shard has no shared writer; its own writer lock is held by the caller
+        if self.shard or not writer.submit(self.db_path, "embeddings", payload):
+            writer.run_in_transaction(conn, "embeddings", payload)
+
+    def _embed_texts(self, conn, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed texts once per distinct normalized text, reusing cached vectors.
+
+        Cache hits and new vectors are left in `_cache_writes` for the batch's
+        write, so the cache is only written through the writer.
+        """
+        model = self.embedding_client.model
+        use_cache = bool(embedding_settings()["cache"])
+        hashes, unique, mapping = embedding_cache.dedupe(texts)
+        vectors: Dict[str, Optional[List[float]]] = {}
+        if use_cache:
+            try:
+                vectors.update(embedding_cache.lookup(conn, model, hashes))
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+        missing = [i for i, key in enumerate(hashes) if key not in vectors]
+        fresh = self.embedding_client.get_embeddings_batch([unique[i] for i in missing]) if missing else []
+        new_entries = {hashes[i]: vector for i, vector in zip(missing, fresh) if vector is not None}
+        self._cache_writes = {"model": model, "used": list(vectors), "entries": new_entries} if use_cache else None
+        vectors.update(new_entries)
+        self.last_index_stats = {
+            "texts": len(texts),
+            "unique": len(unique),
+            "cached": len(unique) - len(missing),
+            "embedded": len(new_entries),
+        }
+        return [vectors.get(hashes[i]) for i in mapping]
+
     def _build_where_clause(self, since_seconds: Optional[int], source: Optional[str],
                            unit: Optional[str], severity: Optional[str]) -> Dict[str, Any]:
         """Build where clause for ChromaDB search"""
-        where_clause = {}
+        # "ts" is an ISO string; numeric range filters need the epoch copy
+        conditions: List[Dict[str, Any]] = []
         if since_seconds:
             since_ts = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=since_seconds)
-            where_clause["ts"] = {"$gte": since_ts.timestamp()}
-        if source:
-            where_clause["source"] = source
-        if unit:
-            where_clause["unit"] = unit
-        if severity:
-            where_clause["severity"] = severity
-        return where_clause
+            conditions.append({"ts_epoch": {"$gte": since_ts.timestamp()}})
+        for key, value in (("source", source), ("unit", unit), ("severity", severity)):
+            if value:
+                conditions.append({key: value})
+        # ChromaDB takes one condition per where clause; several need an explicit $and
+        if len(conditions) > 1:
+            return {"$and": conditions}
+        return conditions[0] if conditions else {}
 
     def _extract_log_ids(self, results: Any) -> List[int]:
         """Extract log IDs from ChromaDB search results"""
@@ -287,22 +748,29 @@ class SemanticSearchEngine:
                             continue
         return log_ids
 
+    @staticmethod
+    def _format_result(row: tuple, similarity: float) -> Dict[str, Any]:
+        log_id, ts, hostname, src, unit, sev, pid, message = row
+        return {
+            "id": log_id,
+            "ts": ts.isoformat() if ts else "",
+            "hostname": hostname or "",
+            "source": src,
+            "unit": unit or "",
+            "severity": sev,
+            "pid": pid,
+            "message": message,
+            "similarity": similarity,
+        }
+
     def _combine_results(self, logs: List[tuple], results: Any) -> List[Dict[str, Any]]:
-        """Combine database logs with search similarity scores"""
+        """Combine database logs (id first) with search scores, in search rank order"""
+        by_id = {row[0]: row for row in logs}
+        distances = (results.get("distances") or [[]])[0]
         search_results = []
-        for i, (ts, hostname, src, unit, sev, pid, message) in enumerate(logs):
-            if (results.get("distances") and results["distances"] and
-                len(results["distances"]) > 0 and i < len(results["distances"][0])):
-                search_results.append({
-                    "ts": ts.isoformat() if ts else "",
-                    "hostname": hostname or "",
-                    "source": src,
-                    "unit": unit or "",
-                    "severity": sev,
-                    "pid": pid,
-                    "message": message,
-                    "similarity": 1.0 - results["distances"][0][i],  # Convert distance to similarity
-                })
+        for log_id, distance in zip(self._extract_log_ids(results), distances):
+            if log_id in by_id:
+                search_results.append(self._format_result(by_id[log_id], 1.0 - distance))  # Convert distance to similarity
         return search_results
 
     def search_logs(self, query: str, n_results: int = 10,
@@ -316,9 +784,23 @@ class SemanticSearchEngine:
         if not query_embedding:
             return []
 
+        if self.index_mode() == "templates":
+            return self._search_templates(query_embedding, n_results, since_seconds, source, unit, severity)
+        if self.vector_backend() == "duckdb":
+            return self._search_duckdb(query_embedding, n_results, since_seconds, source, unit, severity)
+        if self.vector_backend() == "mmap":
+            return self._search_mmap(query_embedding, n_results, since_seconds, source, unit, severity)
+
         # Build where clause and search ChromaDB
         where_clause = self._build_where_clause(since_seconds, source, unit, severity)
-        results = self.chroma_client.search(query_embedding, n_results, where_clause)
+        row_shards = self.row_shards()
+        if row_shards is not None:
+            # Only shards overlapping the window are queried; those wholly inside it skip the time filter
+            since_epoch = time.time() - since_seconds if since_seconds else None
+            results = row_shards.search(query_embedding, n_results, since_epoch, where_clause,
+                                    self._build_where_clause(None, source, unit, severity))
+        else:
+            results = self.chroma_client.search(query_embedding, n_results, where_clause)
 
         # Extract log IDs from results
         log_ids = self._extract_log_ids(results)
@@ -330,12 +812,13 @@ class SemanticSearchEngine:
         try:
             placeholders = ','.join(['?' for _ in log_ids])
             sql = f"""
-                SELECT ts, hostname, source, unit, severity, pid, message
+                SELECT id, ts, hostname, source, unit, severity, pid, message
                 FROM logs
                 WHERE id IN ({placeholders})
-                ORDER BY ts DESC
             """
             cur = conn.cursor()
+            query_guard.track(cur)
+            shards.federate(cur)
             cur.execute(sql, log_ids)
             logs = cur.fetchall()
 
@@ -344,11 +827,245 @@ class SemanticSearchEngine:
         finally:
             conn.close()
 
+    def search_lexical(self, query: str, n_results: int = 10,
+                       since_seconds: Optional[int] = None,
+                       source: Optional[str] = None,
+                       unit: Optional[str] = None,
+                       severity: Optional[str] = None) -> List[Dict[str, Any]]:
+        """BM25 over the term index, scoring rows that contain any query term.
+
+        Any-term matching reads every posting of every query term, so without
+        since_seconds the search covers hybrid.lexical_since_seconds, and it
+        runs under the SEARCH deadline.
+        """
+        if not since_seconds:
+            settings = {**hybrid_search.DEFAULT_HYBRID_SETTINGS, **embedding_settings()["hybrid"]}
+            since_seconds = int(settings["lexical_since_seconds"]) or None
+        filters, filter_params = self._sql_filters(since_seconds, source, unit, severity)
+        since_ts = filter_params[0] if since_seconds else dt.datetime(1970, 1, 1)
+        conn = get_connection(self.db_path)
+        try:
+            shards.federate(conn)
+            match_cte = text_index.build_match_cte(conn, query, since_ts, require_all=False)
+            if match_cte is None:
+                return []
+            hits_sql, hits_params = match_cte
+            where = f"WHERE {' AND '.join(filters)}" if filters else ""
+            deadline = query_guard.Deadline(conn, query_guard.timeout_for("SEARCH"))
+            try:
+                with deadline:
+                    rows = conn.execute(
+                        f"WITH hits AS ({hits_sql}) "
+                        "SELECT l.id, l.ts, l.hostname, l.source, l.unit, l.severity, l.pid, l.message, hits.score "
+                        f"FROM hits JOIN logs l ON l.id = hits.log_id {where} "
+                        "ORDER BY hits.score DESC, l.ts DESC LIMIT ?",
+                        hits_params + filter_params + [n_results],
+                    ).fetchall()
+            except Exception:
+                if deadline.reason:
+                    raise query_guard.DeadlineExceeded(f"lexical search {deadline.reason}")
+                raise
+        finally:
+            conn.close()
+        return [{**self._format_result(row[:8], None), "bm25": row[8]} for row in rows]
+
+    def search_hybrid(self, query: str, n_results: int = 10,
+                      since_seconds: Optional[int] = None,
+                      source: Optional[str] = None,
+                      unit: Optional[str] = None,
+                      severity: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Lexical and vector retrieval in parallel, fused by RRF and diversified by MMR.
+
+        Returns (results, meta) where meta holds per-retriever timings and hit
+        counts. A failing retriever is reported in meta and the other one's
+        results are still returned.
+        """
+        settings = {**hybrid_search.DEFAULT_HYBRID_SETTINGS, **embedding_settings()["hybrid"]}
+        candidates = max(n_results, int(settings["candidates"]))
+        args = (query, candidates, since_seconds, source, unit, severity)
+
+        # The pool threads join the caller's deadline (SEARCH), so it interrupts both searches
+        deadline = query_guard.active()
+
+        def timed(retriever):
+            started = time.monotonic()
+            try:
+                with query_guard.joined(deadline):
+                    return retriever(*args), None, time.monotonic() - started
+            except Exception as exc:
+                logger.warning(f"Hybrid search retriever failed: {exc}")
+                return [], str(exc), time.monotonic() - started
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="chimera-hybrid") as pool:
+            lexical_future = pool.submit(timed, self.search_lexical)
+            vector_future = pool.submit(timed, self.search_logs)
+            lexical, lexical_error, lexical_seconds = lexical_future.result()
+            vector, vector_error, vector_seconds = vector_future.result()
+
+        fusion_started = time.monotonic()
+        fused = hybrid_search.reciprocal_rank_fusion({"lexical": lexical, "vector": vector}, int(settings["rrf_k"]))
+        results = hybrid_search.mmr(fused, n_results, float(settings["mmr_lambda"]))
+        for result in results:
+            result.setdefault("bm25", None)
+        finished = time.monotonic()
+
+        meta = {
+            "mode": "hybrid",
+            "lexical_ms": round(lexical_seconds * 1000, 2),
+            "vector_ms": round(vector_seconds * 1000, 2),
+            "fusion_ms": round((finished - fusion_started) * 1000, 2),
+            "total_ms": round((finished - started) * 1000, 2),
+            "lexical_hits": len(lexical),
+            "vector_hits": len(vector),
+        }
+        if lexical_error:
+            meta["lexical_error"] = lexical_error
+        if vector_error:
+            meta["vector_error"] = vector_error
+        return results, meta
+
+    @staticmethod
+    def _sql_filters(since_seconds: Optional[int], source: Optional[str], unit: Optional[str],
+                     severity: Optional[str]) -> Tuple[List[str], list]:
+        """Search filters as SQL over the logs alias l"""
+        filters: List[str] = []
+        params: list = []
+        if since_seconds:
+            filters.append("l.ts >= ?")
+            params.append(dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) - dt.timedelta(seconds=since_seconds))
+        for column, value in (("source", source), ("unit", unit), ("severity", severity)):
+            if value:
+                filters.append(f"l.{column} = ?")
+                params.append(value)
+        return filters, params
+
+    def _search_duckdb(self, query_embedding: List[float], n_results: int,
+                       since_seconds: Optional[int], source: Optional[str],
+                       unit: Optional[str], severity: Optional[str]) -> List[Dict[str, Any]]:
+        """Exact filtered search: similarity computed in DuckDB over rows passing the filters"""
+        filters, filter_params = self._sql_filters(since_seconds, source, unit, severity)
+        conn = get_connection(self.db_path)
+        try:
+            shards.federate(conn)
+            dim = vector_store.dimensions(conn, vector_store.LOG_VECTORS)
+            if dim is None:
+                return []
+            rows = conn.execute(
+                vector_store.search_logs_sql(dim, filters),
+                [query_embedding] + filter_params + [n_results],
+            ).fetchall()
+        finally:
+            conn.close()
+        return [self._format_result(row[:8], row[8]) for row in rows]
+
+    def _search_mmap(self, query_embedding: List[float], n_results: int,
+                     since_seconds: Optional[int], source: Optional[str],
+                     unit: Optional[str], severity: Optional[str]) -> List[Dict[str, Any]]:
+        """Top-k from the local index (time-pruned by partition), then filtered in DuckDB"""
+        since_ts = (dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=since_seconds)) if since_seconds else None
+        # Dimension filters run after the vector scan, so over-fetch when they are set
+        oversample = 4 if (source or unit or severity) else 1
+        hits = self.local_index().search(query_embedding, n_results * oversample, since=since_ts)
+        if not hits:
+            return []
+
+        filters, filter_params = self._sql_filters(None, source, unit, severity)
+        filters.append("l.id IN (SELECT UNNEST(?::BIGINT[]))")
+        filter_params.append([key for key, _similarity in hits])
+        conn = get_connection(self.db_path)
+        try:
+            shards.federate(conn)
+            rows = conn.execute(
+                "SELECT l.id, l.ts, l.hostname, l.source, l.unit, l.severity, l.pid, l.message "
+                f"FROM logs l WHERE {' AND '.join(filters)}",
+                filter_params,
+            ).fetchall()
+        finally:
+            conn.close()
+        by_id = {row[0]: row for row in rows}
+        results = [self._format_result(by_id[key], similarity) for key, similarity in hits if key in by_id]
+        return results[:n_results]
+
+    def _nearest_templates(self, query_embedding: List[float], limit: int) -> List[Tuple[int, float]]:
+        """(template_id, similarity) from the configured vector backend, best first"""
+        if self.vector_backend() == "duckdb":
+            conn = get_connection(self.db_path)
+            try:
+                return vector_store.nearest(conn, vector_store.TEMPLATE_VECTORS, query_embedding, limit)
+            finally:
+                conn.close()
+        results = self.template_client.search(query_embedding, limit)
+        hits = []
+        for metadata, distance in zip((results.get("metadatas") or [[]])[0], (results.get("distances") or [[]])[0]):
+            if metadata and metadata.get("template_id") not in (None, ""):
+                hits.append((int(metadata["template_id"]), 1.0 - float(distance)))
+        return hits
+
+    def _search_templates(self, query_embedding: List[float], n_results: int,
+                          since_seconds: Optional[int], source: Optional[str],
+                          unit: Optional[str], severity: Optional[str]) -> List[Dict[str, Any]]:
+        """Nearest templates from the vector index, expanded to their newest matching rows in DuckDB"""
+        # Filters run in SQL, so over-fetch templates in case some have no rows in scope
+        hits = self._nearest_templates(query_embedding, n_results * 4)
+        if not hits:
+            return []
+
+        filters, filter_params = self._sql_filters(since_seconds, source, unit, severity)
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        rows_per_template = int(embedding_settings()["rows_per_template"])
+        # Only the newest template rows are joined to logs; other filters may
+        # reject some of them, so those searches take a deeper candidate list
+        candidates = rows_per_template * (TEMPLATE_CANDIDATE_FACTOR if source or unit or severity else 1)
+        since_sql, since_params = ("AND t.ts >= ?", filter_params[:1]) if since_seconds else ("", [])
+        params = [[template_id for template_id, _s in hits], [similarity for _id, similarity in hits],
+                  list(range(len(hits)))] + since_params + [candidates] + filter_params
+        params += [rows_per_template, n_results]
+
+        conn = get_connection(self.db_path)
+        try:
+            shards.federate(conn)
+            # matches: the template's total count, kept by the miner, instead of
+            # counting every row of the template in scope
+            rows = conn.execute(f"""
+                WITH hits AS (
+                    SELECT UNNEST(?::BIGINT[]) AS template_id, UNNEST(?::DOUBLE[]) AS similarity,
+                           UNNEST(?::INTEGER[]) AS rank
+                ), candidates AS (
+                    SELECT t.template_id, t.log_id, t.ts
+                    FROM log_template_ids t
+                    WHERE t.template_id IN (SELECT template_id FROM hits) {since_sql}
+                    QUALIFY row_number() OVER (PARTITION BY t.template_id ORDER BY t.ts DESC) <= ?
+                ), totals AS (
+                    SELECT template_id, SUM(count) AS matches
+                    FROM log_templates
+                    WHERE template_id IN (SELECT template_id FROM hits)
+                    GROUP BY template_id
+                )
+                SELECT l.id, l.ts, l.hostname, l.source, l.unit, l.severity, l.pid, l.message,
+                       h.similarity, h.template_id, m.matches
+                FROM candidates c
+                JOIN hits h ON h.template_id = c.template_id
+                JOIN logs l ON l.id = c.log_id AND l.ts = c.ts
+                LEFT JOIN totals m ON m.template_id = h.template_id
+                {where}
+                QUALIFY row_number() OVER (PARTITION BY h.template_id ORDER BY l.ts DESC) <= ?
+                ORDER BY h.rank, l.ts DESC
+                LIMIT ?
+            """, params).fetchall()
+        finally:
+            conn.close()
+
+        return [
+            {**self._format_result(row[:8], row[8]), "template_id": row[9], "matches": row[10]}
+            for row in rows
+        ]
+
     def cleanup_old_embeddings(self, days: int = 30) -> int:
         """Clean up old embeddings"""
         cutoff_date = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=days)
 
-        conn = get_connection(self.db_path)
+        conn = get_connection(self.db_path, profile="batch")
         try:
             # Get old embedding IDs
             cur = conn.cursor()
@@ -356,11 +1073,27 @@ class SemanticSearchEngine:
                 "SELECT log_id FROM log_embeddings WHERE indexed_at < ?",
                 [cutoff_date]
             )
-            old_ids = [f"log_{row[0]}" for row in cur.fetchall()]
-
+            old_log_ids = [row[0] for row in cur.fetchall()]
+            old_ids = [f"log_{log_id}" for log_id in old_log_ids]
+            duckdb_backend = self.vector_backend() == "duckdb"
+
+            if self.vector_backend() == "mmap":
+                # Day partitions are the unit of deletion, by log time
+                dropped = self.local_index().drop_before(cutoff_date)
+                if dropped:
+                    logger.info(f"Dropped {dropped} vectors from the local index")
+            row_shards = self.row_shards()
+            if row_shards is not None:
+                # Whole shards go, by log time, instead of deleting ids one by one
+                dropped_shards, dropped = row_shards.drop_before(cutoff_date)
+                if dropped_shards:
+                    logger.info(f"Dropped {dropped_shards} vector shards ({dropped} vectors)")
             if old_ids:
-                # Delete from ChromaDB
-                self.chroma_client.delete_embeddings(old_ids)
+                # Delete from the vector index
+                if duckdb_backend:
+                    vector_store.remove_keys(conn, vector_store.LOG_VECTORS, old_log_ids)
+                elif self.vector_backend() == "chromadb":
+                    (row_shards or self.chroma_client).delete_embeddings(old_ids)
 
                 # Delete from database
                 conn.execute(
@@ -368,6 +1101,29 @@ class SemanticSearchEngine:
                     [cutoff_date]
                 )
 
+            # Template vectors go once their template has not been seen for `days`
+            old_templates = [row[0] for row in conn.execute(
+                "SELECT te.template_id FROM template_embeddings te JOIN log_templates lt USING (template_id) "
+                "WHERE lt.last_seen < ?",
+                [cutoff_date.replace(tzinfo=None)]
+            ).fetchall()]
+            if old_templates:
+                if duckdb_backend:
+                    vector_store.remove_keys(conn, vector_store.TEMPLATE_VECTORS, old_templates)
+                else:
+                    self.template_client.delete_embeddings([f"tpl_{template_id}" for template_id in old_templates])
+                conn.execute(
+                    "DELETE FROM template_embeddings WHERE template_id IN (SELECT UNNEST(?::BIGINT[]))",
+                    [old_templates]
+                )
+                old_ids += [f"tpl_{template_id}" for template_id in old_templates]
+
+            settings = embedding_settings()
+            if settings["cache"]:
+                pruned = embedding_cache.prune(conn, int(settings["cache_max_age_days"]))
+                if pruned:
+                    logger.info(f"Pruned {pruned} unused embedding cache entries")
+
             return len(old_ids)
 
         finally:
@@ -390,14 +1146,17 @@ class AnomalyDetector:
 
             # 1. Detect unusual error spikes
             cur = conn.cursor()
-            cur.execute("""
-                SELECT unit, COUNT(*) as error_count
-                FROM logs
-                WHERE ts >= ? AND severity IN ('err', 'crit', 'emerg')
-                GROUP BY unit
-                HAVING error_count > 10
-                ORDER BY error_count DESC
-            """, [since_ts])
+            query_guard.track(cur)
+            # Rollups of every per-source shard count too
+            shards.federate(cur)
+            error_sql, error_params = rollups.counts_since_sql(
+                since_ts, ["unit"], max_severity_level=ERROR_SEVERITY_LEVEL
+            )
+            cur.execute(
+                f"SELECT unit, count AS error_count FROM ({error_sql}) "
+                "WHERE error_count > 10 ORDER BY error_count DESC",
+                error_params,
+            )
 
             for unit, error_count in cur.fetchall():
                 anomalies.append({
@@ -409,14 +1168,12 @@ class AnomalyDetector:
                 })
 
             # 2. Detect unusual log volume
-            cur.execute("""
-                SELECT source, COUNT(*) as log_count
-                FROM logs
-                WHERE ts >= ?
-                GROUP BY source
-                HAVING log_count > 1000
-                ORDER BY log_count DESC
-            """, [since_ts])
+            volume_sql, volume_params = rollups.counts_since_sql(since_ts, ["source"])
+            cur.execute(
+                f"SELECT source, count AS log_count FROM ({volume_sql}) "
+                "WHERE log_count > 1000 ORDER BY log_count DESC",
+                volume_params,
+            )
 
             for source, log_count in cur.fetchall():
                 anomalies.append({
@@ -428,14 +1185,12 @@ class AnomalyDetector:
                 })
 
             # 3. Detect missing expected logs
-            cur.execute("""
-                SELECT unit, MAX(ts) as last_seen
-                FROM logs
-                WHERE unit IN ('systemd', 'sshd', 'cron') AND ts >= ?
-                GROUP BY unit
-            """, [since_ts])
-
             expected_units = {'systemd', 'sshd', 'cron'}
+            seen_sql, seen_params = rollups.counts_since_sql(
+                since_ts, ["unit"], {"unit": sorted(expected_units)}
+            )
+            cur.execute(f"SELECT unit, count FROM ({seen_sql})", seen_params)
+
             seen_units = {row[0] for row in cur.fetchall()}
             missing_units = expected_units - seen_units
 
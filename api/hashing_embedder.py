@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import re
+import threading
+import zlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import jobs
+
+logger = logging.getLogger("chimera")
+
+
+# Model-free embeddings: word and character n-grams are hashed into a fixed
+# number of buckets (the hashing trick), with a hash-derived sign so collisions
+# cancel out on average, and each vector is L2-normalized. Lines that share
+# tokens and fragments land close together; there is no semantic knowledge, so
+# it is a cheap offline default and first-pass retriever, not an LLM substitute.
+DEFAULT_HASHING_SETTINGS = {
+    "dim": 512,
+    "word_ngrams": 2,  # word 1..N-grams
+    "char_ngrams": [3, 5],  # character n-gram lengths (inclusive) within each word
+    "char_weight": 0.5,  # weight of character n-grams relative to word n-grams
+    "batch_size": 4096,  # texts hashed per NumPy pass
+}
+
+_TOKEN = re.compile(r"[a-z0-9_]+(?:[.\-/:][a-z0-9_]+)*")
+_DIGITS = re.compile(r"\d+")
+_EMPTY_FEATURE = "\x00empty"
+CACHE_MAX_ENTRIES = 200000  # cached token and phrase features
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens with digit runs collapsed, so ids and counters do not split vocabularies"""
+    return [_DIGITS.sub("0", token) for token in _TOKEN.findall((text or "").lower())]
+
+
+class HashingEmbeddingClient:
+    """Embedding client with the same interface as OllamaEmbeddingClient, computed locally"""
+
+    def __init__(self, dim: int = 512, word_ngrams: int = 2, char_ngrams: Sequence[int] = (3, 5),
+                 char_weight: float = 0.5, batch_size: int = 4096):
+        self.dim = max(8, int(dim))
+        self.word_ngrams = max(1, int(word_ngrams))
+        self.char_min, self.char_max = (int(char_ngrams[0]), int(char_ngrams[1])) if char_ngrams else (0, -1)
+        self.char_weight = float(char_weight)
+        self.batch_size = max(1, int(batch_size))
+        # Part of the cache key: vectors from different parameters are not comparable
+        self.model = f"hashing-d{self.dim}-w{self.word_ngrams}-c{self.char_min}:{self.char_max}"
+        self._cache: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "texts": 0, "failed_texts": 0}
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Dict[str, Any]]) -> "HashingEmbeddingClient":
+        merged = {**DEFAULT_HASHING_SETTINGS, **(settings or {})}
+        return cls(merged["dim"], merged["word_ngrams"], merged["char_ngrams"],
+                   merged["char_weight"], merged["batch_size"])
+
+    def _hash(self, features: List[str], weights: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """(bucket, signed weight) arrays for named features"""
+        hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in features), dtype=np.uint32, count=len(features))
+        # Low bits pick the bucket, the top bit the sign
+        buckets = (hashes % np.uint32(self.dim)).astype(np.int64)
+        values = np.where(hashes >> np.uint32(31), -1.0, 1.0) * np.asarray(weights)
+        return buckets, values
+
+    def _token(self, token: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Features of one token (its word feature and character n-grams), cached"""
+        cached = self._cache.get(token)
+        if cached is None:
+            features = [f"w{token}"]
+            padded = f" {token} "
+            if self.char_weight:
+                for n in range(self.char_min, self.char_max + 1):
+                    features.extend(f"c{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+            cached = self._hash(features, [1.0] + [self.char_weight] * (len(features) - 1))
+            self._remember(token, cached)
+        return cached
+
+    def _phrase(self, tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Word n-gram feature (n > 1), cached"""
+        key = "\x01" + " ".join(tokens)
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self._hash([f"w{key[1:]}"], [1.0])
+            self._remember(key, cached)
+        return cached
+
+    def _remember(self, key: str, value: Tuple[np.ndarray, np.ndarray]) -> None:
+        # Log vocabularies are small once digits are collapsed; start over if one is not
+        if len(self._cache) >= CACHE_MAX_ENTRIES:
+            self._cache.clear()
+        self._cache[key] = value
+
+    def embed_matrix(self, texts: Sequence[str]) -> np.ndarray:
+        """L2-normalized float32 matrix, one row per text"""
+        parts: List[Tuple[np.ndarray, np.ndarray]] = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        with self._lock:
+            for row, text in enumerate(texts):
+                tokens = tokenize(text)
+                features = [self._token(token) for token in tokens]
+                for n in range(2, self.word_ngrams + 1):
+                    features.extend(self._phrase(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+                if not features:
+                    features = [self._token(_EMPTY_FEATURE)]
+                parts.extend(features)
+                lengths[row] = sum(len(buckets) for buckets, _values in features)
+        if not parts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        flat = np.bincount(
+            rows * self.dim + np.concatenate([buckets for buckets, _values in parts]),
+            weights=np.concatenate([values for _buckets, values in parts]),
+            minlength=len(texts) * self.dim,
+        ).reshape(len(texts), self.dim)
+        # Sublinear term frequency keeps repeated tokens from dominating
+        matrix = np.sign(flat) * np.log1p(np.abs(flat))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32)
+
+    def get_embedding(self, text: str) -> Optional[List[float]]:
+        return self.embed_matrix([text])[0].tolist()
+
+    def get_embeddings_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[Optional[List[float]]]:
+        """Embeddings for texts, in order; never fails for a single text"""
+        size = max(1, int(batch_size or self.batch_size))
+        embeddings: List[Optional[List[float]]] = []
+        for start in range(0, len(texts), size):
+            jobs.check_cancelled()
+            embeddings.extend(self.embed_matrix(texts[start:start + size]).tolist())
+            jobs.report_progress(len(embeddings), len(texts), "embedding")
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["texts"] += len(texts)
+        return embeddings
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import logging
+from typing import Any, Dict, FrozenSet, List, Sequence
+
+from . import text_index
+
+logger = logging.getLogger("chimera")
+
+
+# Hybrid retrieval: BM25 over the term index finds exact identifiers (error
+# codes, PIDs, IPs), the vector index finds paraphrases. Their ranked lists are
+# merged with reciprocal rank fusion, which needs no score calibration between
+# the two, and the fused top-k is diversified with maximal marginal relevance
+# so near-identical lines do not fill every slot.
+DEFAULT_HYBRID_SETTINGS = {
+    "candidates": 50,  # rows taken from each retriever before fusion
+    "rrf_k": 60,  # rank offset; larger values flatten the preference for top ranks
+    "mmr_lambda": 0.7,  # 1.0 ranks by relevance only, lower values favor diversity
+    "lexical_since_seconds": 604800,  # window of the BM25 search when SEARCH has no since
+}
+
+
+def reciprocal_rank_fusion(ranked_lists: Dict[str, Sequence[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
+    """Merge ranked result lists (keyed by retriever name) by summed 1 / (k + rank).
+
+    Results are matched on "id". Each fused result keeps the first copy seen,
+    gains a "<name>_rank" (1-based) for every list it appears in and a "score".
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for name, results in ranked_lists.items():
+        for rank, result in enumerate(results, start=1):
+            entry = fused.get(result["id"])
+            if entry is None:
+                entry = fused[result["id"]] = {**result, "score": 0.0}
+            else:
+                for key, value in result.items():
+                    if entry.get(key) is None:
+                        entry[key] = value
+            entry[f"{name}_rank"] = rank
+            entry["score"] += 1.0 / (k + rank)
+    for entry in fused.values():
+        for name in ranked_lists:
+            entry.setdefault(f"{name}_rank", None)
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+
+
+def _terms(result: Dict[str, Any]) -> FrozenSet[str]:
+    return frozenset(text_index.tokenize(result.get("message"), with_parts=False))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def mmr(results: Sequence[Dict[str, Any]], k: int, lambda_: float = 0.7) -> List[Dict[str, Any]]:
+    """Pick k results by maximal marginal relevance.
+
+    Relevance is the fused score scaled to [0, 1]; redundancy is the term-set
+    Jaccard similarity to the closest already picked message. Lexical overlap
+    is what makes log lines redundant (same template, different parameters),
+    and it needs no extra embedding calls.
+    """
+    if not results:
+        return []
+    top = max(result["score"] for result in results) or 1.0
+    terms = [_terms(result) for result in results]
+    redundancy = [0.0] * len(results)  # similarity to the closest picked result
+    remaining = list(range(len(results)))
+    picked: List[int] = []
+    while remaining and len(picked) < k:
+        best = max(remaining, key=lambda i: lambda_ * results[i]["score"] / top - (1 - lambda_) * redundancy[i])
+        picked.append(best)
+        remaining.remove(best)
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], _jaccard(terms[i], terms[best]))
+    return [results[i] for i in picked]
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+import datetime as dt
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .db import get_connection
+from . import ingest_seq, shards, storage
+from .scheduler import lower_thread_priority
+
+logger = logging.getLogger("chimera")
+
+
+# Incremental embedding indexer: a background thread embeds log rows past a
+# persisted ingest-sequence watermark in bounded batches, instead of anti-joining
+# logs against log_embeddings on every INDEX. It spends at most `duty_cycle` of
+# wall time embedding while behind, so a slow backend slows the indexer rather
+# than the other way round, and backs off exponentially while the backend fails.
+DEFAULT_INDEXER_SETTINGS = {
+    "enabled": False,
+    "batch_rows": 500,
+    "idle_seconds": 5.0,  # poll interval once caught up
+    "duty_cycle": 0.5,  # share of wall time spent embedding while behind
+    "max_backoff_seconds": 300.0,  # cap on the wait after failed batches
+    "max_attempts": 3,  # a batch whose rows keep failing to embed is skipped after this many tries
+    "gap_grace_seconds": 30.0,  # how long a missing sequence number may be a write still committing
+    "backfill_seconds": 86400,  # on first start, queue unembedded rows this recent
+}
+
+STATE_NAME = "embeddings"
+THROUGHPUT_SMOOTHING = 0.3  # weight of the newest batch in rows_per_second
+
+
+def load_state(conn) -> Optional[Dict[str, Any]]:
+    row = conn.execute(
+        "SELECT watermark_seq, watermark_ts, indexed, skipped, updated_at FROM indexer_state WHERE name = ?",
+        [STATE_NAME],
+    ).fetchone()
+    if row is None:
+        return None
+    return {"watermark_seq": row[0], "watermark_ts": row[1], "indexed": row[2], "skipped": row[3], "updated_at": row[4]}
+
+
+def save_state(conn, watermark_seq: int, watermark_ts, indexed: int, skipped: int) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO indexer_state (name, watermark_seq, watermark_ts, indexed, skipped, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+        [STATE_NAME, int(watermark_seq), watermark_ts, int(indexed), int(skipped)],
+    )
+
+
+def lag_stats(conn) -> Dict[str, Any]:
+    """Persisted progress and how far it trails ingest"""
+    state = load_state(conn) or {"watermark_seq": 0, "watermark_ts": None, "indexed": 0, "skipped": 0, "updated_at": None}
+    head_seq, _head_ts = ingest_seq.head(conn)
+    lag_rows, lag_seconds = ingest_seq.pending(conn, state["watermark_seq"])
+    return {**state, "head_seq": head_seq, "lag_rows": lag_rows, "lag_seconds": lag_seconds}
+
+
+class EmbeddingIndexer:
+    """Embed new log rows in ingest order and persist the watermark after each batch"""
+
+    def __init__(self, db_path: Optional[str], settings: Optional[Dict[str, Any]] = None, engine=None,
+                 busy: Optional[Callable[[], bool]] = None, shard: Optional[str] = None):
+        merged = {**DEFAULT_INDEXER_SETTINGS, **(settings or {})}
+        self.db_path = db_path
+        # Each per-source shard has its own ingest sequence and watermark, so it
+        # gets its own indexer; the main one drives them from its loop
+        self.shard = shard
+        self.settings = settings
+        self._shard_indexers: Dict[str, "EmbeddingIndexer"] = {}
+        self.batch_rows = max(1, int(merged["batch_rows"]))
+        self.idle_seconds = max(0.0, float(merged["idle_seconds"]))
+        self.duty_cycle = min(1.0, max(0.01, float(merged["duty_cycle"])))
+        self.max_backoff_seconds = max(0.0, float(merged["max_backoff_seconds"]))
+        self.max_attempts = max(1, int(merged["max_attempts"]))
+        self.gap_grace_seconds = max(0.0, float(merged["gap_grace_seconds"]))
+        self.backfill_seconds = int(merged["backfill_seconds"])
+        if engine is None:
+            from .embeddings import SemanticSearchEngine
+            engine = SemanticSearchEngine(db_path, shard=shard)
+        self.engine = engine
+        self.busy = busy
+
+        self.watermark = 0
+        self.watermark_ts = None
+        self.indexed = 0
+        self.skipped = 0
+        self.batches = 0
+        self.failures = 0
+        self.attempts = 0  # consecutive failed batches, for the backoff
+        self.retries = 0  # tries of the batch at the watermark that embedded only some rows
+        self.wait_seconds = 0.0
+        self.last_batch_ms: Optional[float] = None
+        self.rows_per_second: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._gaps: Dict[int, float] = {}  # first missing seq -> when it was first seen
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="chimera-indexer", daemon=True)
+        self._thread.start()
+        logger.info(f"Embedding indexer started (batch_rows={self.batch_rows}, duty_cycle={self.duty_cycle})")
+
+    def stop(self, timeout: float = 30.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        lower_thread_priority()
+        while not self._stop.is_set():
+            if self._is_busy():
+                self._stop.wait(max(1.0, self.idle_seconds))
+                continue
+            try:
+                self.run_once()
+            except Exception as exc:
+                logger.warning(f"Embedding indexer batch failed: {exc}")
+                self._record_failure(str(exc))
+            self._stop.wait(self.wait_seconds)
+
+    def _is_busy(self) -> bool:
+        try:
+            return bool(self.busy and self.busy())
+        except Exception:
+            return False
+
+    def _load(self, conn) -> None:
+        state = load_state(conn)
+        if state is None:
+            since_ts = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) - dt.timedelta(seconds=self.backfill_seconds)
+            queued = ingest_seq.backfill(conn, since_ts) if self.backfill_seconds > 0 else 0
+            if queued:
+                logger.info(f"Embedding indexer queued {queued} existing rows")
+            save_state(conn, 0, None, 0, 0)
+        else:
+            self.watermark = int(state["watermark_seq"])
+            self.watermark_ts = state["watermark_ts"]
+            self.indexed = int(state["indexed"])
+            self.skipped = int(state["skipped"])
+        self._loaded = True
+
+    def _select_batch(self, rows: List[Tuple[int, int, Any]]) -> List[Tuple[int, int, Any]]:
+        """Rows up to the first recent gap in the sequence.
+
+        A missing number is either a rolled-back write (gone for good) or a
+        write that has not committed yet; it only stops the watermark until it
+        has been missing for gap_grace_seconds.
+        """
+        now = time.monotonic()
+        expected = self.watermark + 1
+        batch = []
+        for seq, log_id, ts in rows:
+            if seq != expected and now - self._gaps.setdefault(expected, now) < self.gap_grace_seconds:
+                break
+            batch.append((seq, log_id, ts))
+            expected = seq + 1
+        return batch
+
+    def _connect(self, profile: str = "batch"):
+        if self.shard:
+            return shards.connect(self.db_path, self.shard, profile=profile)
+        return get_connection(self.db_path, profile=profile)
+
+    def run_once(self) -> Dict[str, Any]:
+        """Embed one batch past the watermark, then one per shard; returns what happened"""
+        if self.shard:
+            with shards.writing(self.shard):
+                return self._run_batch()
+        result = self._run_batch()
+        shard_results = {}
+        for name in (shards.list_shards(shards.directory()) if shards.directory() else {}):
+            child = self._shard_indexers.get(name)
+            if child is None:
+                child = self._shard_indexers[name] = EmbeddingIndexer(self.db_path, self.settings, shard=name)
+            try:
+                shard_results[name] = child.run_once()
+            except Exception as exc:
+                logger.warning(f"Embedding indexer batch failed for shard {name}: {exc}")
+                shard_results[name] = child._record_failure(str(exc))
+            # A shard that is behind keeps the loop going
+            self.wait_seconds = min(self.wait_seconds, child.wait_seconds)
+        if shard_results:
+            result["shards"] = shard_results
+        return result
+
+    def _run_batch(self) -> Dict[str, Any]:
+        with self._lock, storage.workload("batch"):
+            conn = self._connect()
+            try:
+                if not self._loaded:
+                    self._load(conn)
+                rows = ingest_seq.rows_after(conn, self.watermark, self.batch_rows)
+            finally:
+                conn.close()
+
+            batch = self._select_batch(rows)
+            if not batch:
+                self.wait_seconds = self.idle_seconds
+                return {"rows": 0, "indexed": 0, "waiting_on_gap": bool(rows)}
+
+            started = time.monotonic()
+            try:
+                indexed, total = self.engine.index_logs(log_ids=[log_id for _seq, log_id, _ts in batch])
+            except Exception as exc:
+                logger.warning(f"Embedding indexer could not index {len(batch)} rows: {exc}")
+                return self._record_failure(str(exc), batch)
+            elapsed = time.monotonic() - started
+
+            if indexed < total:
+                self.retries += 1
+                if self.retries < self.max_attempts:
+                    return self._record_failure(f"{total - indexed} of {total} texts failed to embed", batch)
+                logger.warning(f"Embedding indexer skipping {total - indexed} rows that failed {self.max_attempts} times")
+                self.skipped += total - indexed
+
+            self._advance(batch, indexed)
+            self.last_batch_ms = round(elapsed * 1000, 2)
+            if total and elapsed > 0:
+                rate = total / elapsed
+                self.rows_per_second = round(rate if self.rows_per_second is None else
+                                             THROUGHPUT_SMOOTHING * rate + (1 - THROUGHPUT_SMOOTHING) * self.rows_per_second, 2)
+            # Still behind: rest in proportion to the work just done; caught up: poll
+            if len(rows) >= self.batch_rows:
+                self.wait_seconds = elapsed * (1 - self.duty_cycle) / self.duty_cycle
+            else:
+                self.wait_seconds = self.idle_seconds
+            return {"rows": len(batch), "indexed": indexed, "waiting_on_gap": len(batch) < len(rows)}
+
+    def _advance(self, batch: List[Tuple[int, int, Any]], indexed: int) -> None:
+        self.watermark, _log_id, self.watermark_ts = batch[-1]
+        self.indexed += indexed
+        self.batches += 1
+        self.attempts = 0
+        self.retries = 0
+        self.last_error = None
+        self._gaps = {seq: seen for seq, seen in self._gaps.items() if seq > self.watermark}
+        conn = self._connect()
+        try:
+            save_state(conn, self.watermark, self.watermark_ts, self.indexed, self.skipped)
+        finally:
+            conn.close()
+
+    def _record_failure(self, error: str, batch: Optional[list] = None) -> Dict[str, Any]:
+        self.failures += 1
+        self.attempts += 1
+        self.last_error = error
+        self.wait_seconds = min(self.max_backoff_seconds, max(1.0, self.idle_seconds) * 2 ** (self.attempts - 1))
+        return {"rows": len(batch or []), "indexed": 0, "error": error}
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._connect("interactive")
+        try:
+            lag = lag_stats(conn)
+        finally:
+            conn.close()
+        stats = {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "watermark_seq": lag["watermark_seq"],
+            "watermark_ts": lag["watermark_ts"],
+            "head_seq": lag["head_seq"],
+            "lag_rows": lag["lag_rows"],
+            "lag_seconds": lag["lag_seconds"],
+            "indexed": self.indexed,
+            "skipped": self.skipped,
+            "batches": self.batches,
+            "failures": self.failures,
+            "batch_rows": self.batch_rows,
+            "duty_cycle": self.duty_cycle,
+            "last_batch_ms": self.last_batch_ms,
+            "rows_per_second": self.rows_per_second,
+            "wait_seconds": round(self.wait_seconds, 2),
+            "last_error": self.last_error,
+        }
+        if self._shard_indexers:
+            stats["shards"] = {name: child.get_stats() for name, child in self._shard_indexers.items()}
+        return stats
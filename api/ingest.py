@@ -1,9 +1,11 @@
 import json
-import hashlib
 import subprocess
 import datetime as dt
 import logging
-from typing import Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import writer
+from .log_store import SEVERITY_NAMES, compute_log_identity, severity_level
 
 logger = logging.getLogger("chimera")
 
@@ -23,16 +25,7 @@ def validate_journald_cursor(cursor: str) -> bool:
 
 
 def _parse_priority(value: Optional[str]) -> Optional[str]:
-    mapping = {
-        "0": "emerg",
-        "1": "alert",
-        "2": "crit",
-        "3": "err",
-        "4": "warning",
-        "5": "notice",
-        "6": "info",
-        "7": "debug",
-    }
+    mapping = {str(level): name for level, name in SEVERITY_NAMES.items()}
     if value is None:
         return None
     return mapping.get(str(value), str(value))
@@ -92,9 +85,10 @@ def _journalctl_json_lines(last_seconds: int, limit: Optional[int], after_cursor
             continue
 
 
-def ingest_journal_into_duckdb(conn, last_seconds: int = 3600, limit: Optional[int] = None) -> Tuple[int, int]:
+def ingest_journal_into_duckdb(conn, last_seconds: int = 3600, limit: Optional[int] = None,
+                               db_path: Optional[str] = None) -> Tuple[int, int]:
     logger.info(f"Starting journald ingestion for last {last_seconds}s, limit {limit or 'None'}")
-    rows: List[Tuple] = []
+    rows: List[Dict[str, Any]] = []
     # Find last cursor
     last_cursor_row = conn.execute("SELECT cursor FROM ingest_state WHERE source = 'journald'").fetchone()
     after_cursor: Optional[str] = last_cursor_row[0] if last_cursor_row and last_cursor_row[0] else None
@@ -119,51 +113,43 @@ def ingest_journal_into_duckdb(conn, last_seconds: int = 3600, limit: Optional[i
             cursor = entry.get("__CURSOR")
             if cursor:
                 last_seen_cursor = cursor
-            # Compute a lightweight fingerprint to dedupe when cursor is missing
-            fp_src = f"{ts}|{hostname}|{unit}|{severity}|{pid}|{message}".encode()
-            fingerprint = hashlib.sha256(fp_src).hexdigest()
-            # Deterministic numeric id from fingerprint (first 8 bytes of sha256)
-            digest = hashlib.sha256(fp_src).digest()
-            numeric_id = int.from_bytes(digest[:8], byteorder="big", signed=True)
-            rows.append((numeric_id, ts, hostname, "journald", unit, facility, severity, pid, uid, gid, message, raw_json, fingerprint, cursor))
+            row = {
+                "ts": ts,
+                "hostname": hostname,
+                "source": "journald",
+                "unit": unit,
+                "facility": facility,
+                "severity": severity,
+                "severity_level": severity_level(severity),
+                "pid": pid,
+                "uid": uid,
+                "gid": gid,
+                "message": message,
+                "raw": raw_json,
+                "cursor": cursor,
+                # Full entry, for promoted field columns
+                "journal": entry,
+            }
+            # Deterministic id and fingerprint to dedupe when cursor is missing
+            row["id"], row["fingerprint"] = compute_log_identity(row)
+            rows.append(row)
 
         if not rows:
             logger.info("No new journald entries to ingest.")
             return (0, 0)
 
-        cur = conn.cursor()
-        inserted_count = 0
+        # Rows and the cursor advance are written together, through the server's
+        # writer when it owns db_path
+        payload = {"rows": rows, "source": "journald", "cursor": last_seen_cursor}
         try:
-            # Get count before insert
-            count_before = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
-            cur.executemany(
-                """
-                INSERT INTO logs (id, ts, hostname, source, unit, facility, severity, pid, uid, gid, message, raw, fingerprint, cursor)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT DO NOTHING
-                """,
-                rows,
-            )
-            # Get count after insert and calculate difference
-            count_after = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
-            inserted_count = count_after - count_before
+            request = writer.submit(db_path, "logs", payload) if db_path else None
+            inserted = request.result if request else writer.run_in_transaction(conn, "logs", payload)
+            inserted_count = len(inserted)
             logger.info(f"Attempted to insert {len(rows)} journald entries. Actual inserted count: {inserted_count}")
         except Exception as e:
             logger.error(f"Error during batch insert of journald logs: {e}")
             raise
 
-        # Update last cursor if advanced
-        if last_seen_cursor:
-            try:
-                conn.execute(
-                    "INSERT OR REPLACE INTO ingest_state(source, cursor, updated_at) VALUES('journald', ?, CURRENT_TIMESTAMP)",
-                    [last_seen_cursor],
-                )
-                logger.debug(f"Updated journald ingest cursor to {last_seen_cursor}")
-            except Exception as e:
-                logger.error(f"Error updating ingest_state cursor for journald: {e}")
-                raise
-
         total_logs_in_db = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
         logger.info(f"Journald ingestion complete. Total logs in DB: {total_logs_in_db}")
         return (inserted_count, total_logs_in_db)
@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 import json
-import hashlib
 import subprocess
 import datetime as dt
 import os
@@ -12,6 +11,8 @@ from abc import ABC, abstractmethod
 
 from .config import LogSource
 from .db import get_connection
+from . import shards, storage, writer
+from .log_store import SEVERITY_NAMES, compute_log_identity, severity_level
 
 
 class LogParser(ABC):
@@ -64,19 +65,19 @@ class JournaldParser(LogParser):
             "unit": unit,
             "facility": facility,
             "severity": severity,
+            "severity_level": severity_level(severity),
             "pid": pid,
             "uid": uid,
             "gid": gid,
             "message": message,
             "raw": json.dumps(entry),
             "cursor": cursor,
+            # Full entry, for promoted field columns
+            "journal": entry,
         }
 
     def _parse_priority(self, value: Optional[str]) -> Optional[str]:
-        mapping = {
-            "0": "emerg", "1": "alert", "2": "crit", "3": "err",
-            "4": "warning", "5": "notice", "6": "info", "7": "debug",
-        }
+        mapping = {str(level): name for level, name in SEVERITY_NAMES.items()}
         if value is None:
             return None
         return mapping.get(str(value), str(value))
@@ -124,6 +125,7 @@ class SyslogParser(LogParser):
                 "unit": program,
                 "facility": None,
                 "severity": severity,
+                "severity_level": severity_level(severity),
                 "pid": pid_int,
                 "uid": None,
                 "gid": None,
@@ -136,13 +138,7 @@ class SyslogParser(LogParser):
 
     def _parse_priority(self, priority: str) -> str:
         priority_int = int(priority)
-        severity_level = priority_int & 0x07
-
-        severity_map = {
-            0: "emerg", 1: "alert", 2: "crit", 3: "err",
-            4: "warning", 5: "notice", 6: "info", 7: "debug"
-        }
-        return severity_map.get(severity_level, "info")
+        return SEVERITY_NAMES.get(priority_int & 0x07, "info")
 
 
 class ContainerLogParser(LogParser):
@@ -165,6 +161,7 @@ class ContainerLogParser(LogParser):
         try:
             ts = dt.datetime.fromisoformat(timestamp.replace('Z', '+00:00')).replace(tzinfo=None)
             container_name = source_info.get('container_name', 'unknown')
+            severity = "info" if stream == "stdout" else "warning"
 
             return {
                 "ts": ts,
@@ -172,7 +169,8 @@ class ContainerLogParser(LogParser):
                 "source": "container",
                 "unit": container_name,
                 "facility": None,
-                "severity": "info" if stream == "stdout" else "warning",
+                "severity": severity,
+                "severity_level": severity_level(severity),
                 "pid": None,
                 "uid": None,
                 "gid": None,
@@ -187,8 +185,10 @@ class ContainerLogParser(LogParser):
 class IngestionFramework:
     """Framework for ingesting logs from various sources"""
 
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(self, db_path: Optional[str] = None, shard_dir: Optional[str] = None):
         self.db_path = db_path
+        # When set, each source writes to its own shard file (see api/shards.py)
+        self.shard_dir = shard_dir
         self.parsers = {
             "journald": JournaldParser(),
             "file": SyslogParser(),
@@ -197,6 +197,14 @@ class IngestionFramework:
 
     def ingest_source(self, source: LogSource, last_seconds: int = 3600, limit: Optional[int] = None) -> Tuple[int, int]:
         """Ingest logs from a specific source"""
+        with storage.workload("ingest"):
+            if self.shard_dir:
+                # The shard's single writer: retention, indexing and snapshots take turns with it
+                with shards.writing(shards.shard_name(source.name)):
+                    return self._ingest(source, last_seconds, limit)
+            return self._ingest(source, last_seconds, limit)
+
+    def _ingest(self, source: LogSource, last_seconds: int, limit: Optional[int]) -> Tuple[int, int]:
         if source.type == "journald":
             return self._ingest_journald(source, last_seconds, limit)
         elif source.type == "file":
@@ -206,9 +214,20 @@ class IngestionFramework:
         else:
             raise ValueError(f"Unsupported source type: {source.type}")
 
+    def _connect(self, source: LogSource):
+        """Connection for a source's writes: its shard when sharding is enabled"""
+        conn = get_connection(self.db_path, profile="ingest")
+        if self.shard_dir:
+            try:
+                shards.use_source_shard(conn, self.shard_dir, source.name)
+            except Exception:
+                conn.close()
+                raise
+        return conn
+
     def _ingest_journald(self, source: LogSource, last_seconds: int, limit: Optional[int]) -> Tuple[int, int]:
         """Ingest from journald"""
-        conn = get_connection(self.db_path)
+        conn = self._connect(source)
         try:
             # Get last cursor for this source
             last_cursor_row = conn.execute(
@@ -254,7 +273,7 @@ class IngestionFramework:
                         filtered_lines.append(line)
                 lines = filtered_lines
 
-            return self._process_entries(conn, source.name, lines, after_cursor)
+            return self._process_entries(conn, source.name, lines, after_cursor, source.config)
 
         finally:
             conn.close()
@@ -310,7 +329,7 @@ class IngestionFramework:
 
     def _ingest_files(self, source: LogSource, last_seconds: int, limit: Optional[int]) -> Tuple[int, int]:
         """Ingest from log files"""
-        conn = get_connection(self.db_path)
+        conn = self._connect(source)
         try:
             paths = source.config.get('paths', [])
             patterns = source.config.get('patterns', ['*.log'])
@@ -326,14 +345,14 @@ class IngestionFramework:
             # Parse files and extract entries
             entries = self._parse_files(valid_files, limit)
 
-            return self._process_entries(conn, source.name, entries, None)
+            return self._process_entries(conn, source.name, entries, None, source.config)
 
         finally:
             conn.close()
 
     def _ingest_containers(self, source: LogSource, last_seconds: int, limit: Optional[int]) -> Tuple[int, int]:
         """Ingest from containers (Docker)"""
-        conn = get_connection(self.db_path)
+        conn = self._connect(source)
         try:
             runtime = source.config.get('runtime', 'docker')
             include_patterns = source.config.get('include_patterns', ['*'])
@@ -387,12 +406,13 @@ class IngestionFramework:
                         if parsed:
                             entries.append(parsed)
 
-            return self._process_entries(conn, source.name, entries, None)
+            return self._process_entries(conn, source.name, entries, None, source.config)
 
         finally:
             conn.close()
 
-    def _process_entries(self, conn, source_name: str, entries: List[Any], last_cursor: Optional[str]) -> Tuple[int, int]:
+    def _process_entries(self, conn, source_name: str, entries: List[Any], last_cursor: Optional[str],
+                         source_config: Optional[Dict[str, Any]] = None) -> Tuple[int, int]:
         """Process parsed entries and insert into database"""
         if not entries:
             return (0, 0)
@@ -420,21 +440,25 @@ class IngestionFramework:
             elif isinstance(raw_value, dict):
                 raw_value = json.dumps(raw_value)
 
-            # Compute fingerprint
-            fp_src = f"{entry['ts']}|{entry['hostname']}|{entry['unit']}|{entry['severity']}|{entry['pid']}|{entry['message']}".encode()
-            fingerprint = hashlib.sha256(fp_src).hexdigest()
-
-            # Deterministic numeric id from fingerprint (first 8 bytes of sha256)
-            import hashlib as _hashlib
-            digest = _hashlib.sha256(fp_src).digest()
-            numeric_id = int.from_bytes(digest[:8], byteorder="big", signed=True)
-            row = (
-                numeric_id,
-                entry['ts'], entry['hostname'], entry['source'], entry['unit'],
-                entry['facility'], entry['severity'], entry['pid'], entry['uid'],
-                entry['gid'], entry['message'], raw_value, fingerprint, entry['cursor']
-            )
-            rows.append(row)
+            numeric_id, fingerprint = compute_log_identity(entry)
+            rows.append({
+                "id": numeric_id,
+                "ts": entry['ts'],
+                "hostname": entry['hostname'],
+                "source": entry['source'],
+                "unit": entry['unit'],
+                "facility": entry['facility'],
+                "severity": entry['severity'],
+                "severity_level": entry.get('severity_level'),
+                "pid": entry['pid'],
+                "uid": entry['uid'],
+                "gid": entry['gid'],
+                "message": entry['message'],
+                "raw": raw_value,
+                "fingerprint": fingerprint,
+                "cursor": entry['cursor'],
+                "journal": entry.get('journal'),
+            })
 
             if entry['cursor']:
                 last_seen_cursor = entry['cursor']
@@ -442,25 +466,19 @@ class IngestionFramework:
         if not rows:
             return (0, 0)
 
-        # Insert into database
-        cur = conn.cursor()
-        cur.executemany(
-            """
-            INSERT INTO logs (id, ts, hostname, source, unit, facility, severity, pid, uid, gid, message, raw, fingerprint, cursor)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT DO NOTHING
-            """,
-            rows,
-        )
-
-        # Update cursor if advanced
-        if last_seen_cursor and last_seen_cursor != last_cursor:
-            conn.execute(
-                "INSERT OR REPLACE INTO ingest_state(source, cursor, updated_at) VALUES(?, ?, CURRENT_TIMESTAMP)",
-                [source_name, last_seen_cursor],
-            )
-
-        return (len(rows), conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0])
+        # Rows, derived indexes and the cursor advance land in one transaction; the
+        # server's writer applies it when it owns this database
+        payload = {
+            "rows": rows,
+            "source": source_name,
+            "cursor": last_seen_cursor if last_seen_cursor != last_cursor else None,
+            "source_config": source_config,
+        }
+        # A shard is written only by its own source, so it skips the shared writer
+        request = None if self.shard_dir else writer.submit(self.db_path, "logs", payload)
+        inserted = request.result if request else writer.run_in_transaction(conn, "logs", payload)
+
+        return (len(inserted), conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0])
 
     def _unit_matches_pattern(self, unit: str, pattern: str) -> bool:
         # Simple glob-like pattern matching where * matches any substring
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("chimera")
+
+
+# Ingest sequence: every inserted log row gets the next value of the
+# log_ingest_counter sequence in the transaction that writes it. Row ids are
+# content hashes and ts is event time, so neither tells a consumer which rows
+# are new; the sequence does, and consumers keep a watermark over it.
+def record_log_rows(conn, rows: List[Dict[str, Any]]) -> int:
+    """Number newly inserted rows"""
+    if not rows:
+        return 0
+    conn.execute(
+        "INSERT INTO log_ingest_seq (seq, log_id, ts) "
+        "SELECT nextval('log_ingest_counter'), log_id, ts "
+        "FROM (SELECT UNNEST(?::BIGINT[]) AS log_id, UNNEST(?::TIMESTAMP[]) AS ts)",
+        [[row["id"] for row in rows], [row["ts"] for row in rows]],
+    )
+    return len(rows)
+
+
+def remove_log_ids(conn, log_ids: List[int]) -> None:
+    if log_ids:
+        conn.execute("DELETE FROM log_ingest_seq WHERE log_id IN (SELECT UNNEST(?::BIGINT[]))", [log_ids])
+
+
+def head(conn) -> Tuple[int, Optional[Any]]:
+    """(highest sequence number, its row's ts); (0, None) before the first row"""
+    row = conn.execute("SELECT seq, ts FROM log_ingest_seq ORDER BY seq DESC LIMIT 1").fetchone()
+    return (int(row[0]), row[1]) if row else (0, None)
+
+
+def pending(conn, watermark: int) -> Tuple[int, Optional[float]]:
+    """(rows past the watermark, seconds since the oldest of them was ingested)"""
+    row = conn.execute(
+        "SELECT COUNT(*), date_diff('millisecond', MIN(ingested_at), CURRENT_TIMESTAMP::TIMESTAMP) "
+        "FROM log_ingest_seq WHERE seq > ?",
+        [int(watermark)],
+    ).fetchone()
+    return int(row[0]), (row[1] / 1000.0 if row[1] is not None else None)
+
+
+def rows_after(conn, watermark: int, limit: int) -> List[Tuple[int, int, Any]]:
+    """(seq, log_id, ts) past the watermark, in sequence order"""
+    return conn.execute(
+        "SELECT seq, log_id, ts FROM log_ingest_seq WHERE seq > ? ORDER BY seq LIMIT ?",
+        [int(watermark), int(limit)],
+    ).fetchall()
+
+
+def backfill(conn, since_ts) -> int:
+    """Sequence rows at or after since_ts that predate the sequence and are not embedded yet"""
+    return len(conn.execute(
+        """
+        INSERT INTO log_ingest_seq (seq, log_id, ts)
+        SELECT nextval('log_ingest_counter'), id, ts FROM (
+            SELECT l.id, l.ts FROM logs l
+            WHERE l.ts >= ?
+              AND NOT EXISTS (SELECT 1 FROM log_ingest_seq s WHERE s.log_id = l.id)
+              AND NOT EXISTS (SELECT 1 FROM log_embeddings e WHERE e.log_id = l.id)
+            ORDER BY l.ts
+        )
+        RETURNING seq
+        """,
+        [since_ts],
+    ).fetchall())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+import datetime as dt
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("chimera")
+
+
+# Background jobs for long-running socket commands. A job runs the command's
+# handler against a capture buffer instead of the client socket, so it keeps
+# going after the client disconnects and its output is read back later.
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_KEEP_FINISHED = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+_current = threading.local()
+
+
+class JobCancelled(BaseException):
+    """Raised inside a job at a cancellation checkpoint.
+
+    A BaseException, like KeyboardInterrupt, so the handlers' blanket
+    `except Exception` error replies do not swallow it.
+    """
+
+
+def report_progress(done: int, total: Optional[int] = None, step: Optional[str] = None,
+                    job: Optional["Job"] = None) -> None:
+    """Record progress for a job (default: the one on this thread); no-op outside jobs"""
+    job = job or getattr(_current, "job", None)
+    if job is not None:
+        job.progress = {"done": done, "total": total, "step": step}
+
+
+def check_cancelled(job: Optional["Job"] = None) -> None:
+    """Stop a job (default: the one on this thread) if it was cancelled; no-op outside jobs"""
+    job = job or getattr(_current, "job", None)
+    if job is not None and job.cancel_event.is_set():
+        raise JobCancelled(job.id)
+
+
+def current_job() -> Optional["Job"]:
+    return getattr(_current, "job", None)
+
+
+class OutputCapture:
+    """Socket stand-in that buffers what a handler sends"""
+
+    def __init__(self):
+        self.data = b""
+        self._lock = threading.Lock()
+
+    def sendall(self, data: bytes) -> None:
+        with self._lock:
+            self.data += data
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            text = self.data.decode(errors="replace")
+        return [line for line in text.splitlines() if line]
+
+
+class Job:
+    """One submitted command, its progress and its captured output"""
+
+    def __init__(self, command: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.command = command
+        self.status = QUEUED
+        self.created_at = dt.datetime.now(dt.timezone.utc)
+        self.started_at: Optional[dt.datetime] = None
+        self.finished_at: Optional[dt.datetime] = None
+        self.progress: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.output = OutputCapture()
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        item: Dict[str, Any] = {
+            "id": self.id,
+            "command": self.command,
+            "status": self.status,
+            "progress": self.progress,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+        if self.started_at:
+            end = self.finished_at or dt.datetime.now(dt.timezone.utc)
+            item["duration_seconds"] = round((end - self.started_at).total_seconds(), 3)
+        if include_result and self.status in FINISHED_STATES:
+            item["result"] = self.output.lines()
+        return item
+
+
+class JobManager:
+    """Run jobs on a small worker pool and keep the most recent finished ones"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, keep_finished: int = DEFAULT_KEEP_FINISHED):
+        self.max_workers = max(1, int(max_workers))
+        self.keep_finished = max(1, int(keep_finished))
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chimera-job")
+
+    def submit(self, command: str, func: Callable[[OutputCapture], None]) -> Job:
+        """Queue func(output) as a job; returns it immediately"""
+        job = Job(command)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, func)
+        logger.info(f"Job {job.id} queued: {command}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Request cancellation; queued jobs never start, running ones stop at their next checkpoint"""
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED_STATES:
+            job.cancel_event.set()
+        return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is not None:
+            job.done_event.wait(timeout)
+        return job
+
+    def shutdown(self) -> None:
+        for job in self.list():
+            job.cancel_event.set()
+        self._pool.shutdown(wait=False)
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.status in FINISHED_STATES]
+        finished.sort(key=lambda j: j.finished_at or j.created_at)
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.id]
+
+    def _run(self, job: Job, func: Callable[[OutputCapture], None]) -> None:
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = dt.datetime.now(dt.timezone.utc)
+        _current.job = job
+        started = time.monotonic()
+        try:
+            func(job.output)
+            lines = job.output.lines()
+            if lines and lines[0].startswith("ERR "):
+                job.error = lines[0][4:]
+                self._finish(job, FAILED)
+            else:
+                self._finish(job, DONE)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as exc:
+            job.error = str(exc)
+            logger.error(f"Job {job.id} failed: {exc}")
+            self._finish(job, FAILED)
+        finally:
+            _current.job = None
+            logger.info(f"Job {job.id} {job.status} after {time.monotonic() - started:.1f}s")
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = dt.datetime.now(dt.timezone.utc)
+        job.done_event.set()
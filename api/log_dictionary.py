@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("chimera")
+
+
+# Low-cardinality logs columns stored as integer codes in the encoded layout
+ENCODED_COLUMNS = ["hostname", "source", "unit", "facility", "severity"]
+
+# Physical table behind the `logs` view when the layout is encoded
+ENCODED_TABLE = "logs_data"
+
+# Tables holding a foreign key to the logs table; they follow it across layouts
+REFERENCING_TABLES = ["log_embeddings"]
+
+
+def code_column(column: str) -> str:
+    """Physical column name for a logs column in the encoded layout"""
+    return f"{column}_code" if column in ENCODED_COLUMNS else column
+
+
+def dimension_table(column: str) -> str:
+    return f"log_dim_{column}"
+
+
+def is_encoded(conn) -> bool:
+    """True when `logs` is the decoding view over logs_data"""
+    row = conn.execute(
+        "SELECT table_type FROM information_schema.tables "
+        "WHERE table_name = 'logs' AND table_catalog = current_database()"
+    ).fetchone()
+    return bool(row) and row[0] == "VIEW"
+
+
+def physical_table(conn) -> str:
+    """Table that log writes and deletes must target"""
+    return ENCODED_TABLE if is_encoded(conn) else "logs"
+
+
+def _database_key(conn) -> str:
+    row = conn.execute(
+        "SELECT path FROM duckdb_databases() WHERE database_name = current_database()"
+    ).fetchone()
+    return (row[0] if row else None) or f"memory:{id(conn)}"
+
+
+class LogDictionary:
+    """In-memory value -> code maps for the dimension tables, appending on miss"""
+
+    def __init__(self):
+        self.codes: Dict[str, Dict[str, int]] = {col: {} for col in ENCODED_COLUMNS}
+        self.lock = threading.Lock()
+
+    def load(self, conn) -> None:
+        for col in ENCODED_COLUMNS:
+            rows = conn.execute(f"SELECT value, code FROM {dimension_table(col)}").fetchall()
+            self.codes[col] = dict(rows)
+
+    def encode(self, conn, column: str, value: Optional[str]) -> Optional[int]:
+        if value is None:
+            return None
+        codes = self.codes[column]
+        code = codes.get(value)
+        if code is not None:
+            return code
+        with self.lock:
+            table = dimension_table(column)
+            # Another connection may have appended it since we loaded
+            row = conn.execute(f"SELECT code FROM {table} WHERE value = ?", [value]).fetchone()
+            if row:
+                code = row[0]
+            else:
+                code = conn.execute(f"SELECT COALESCE(MAX(code), 0) + 1 FROM {table}").fetchone()[0]
+                conn.execute(f"INSERT INTO {table} (code, value) VALUES (?, ?)", [code, value])
+            codes[value] = code
+            return code
+
+    def encode_row(self, conn, row: Dict[str, Any], columns: List[str]) -> List[Any]:
+        return [
+            self.encode(conn, col, row.get(col)) if col in ENCODED_COLUMNS else row.get(col)
+            for col in columns
+        ]
+
+
+_dictionaries: Dict[str, LogDictionary] = {}
+_dictionaries_lock = threading.Lock()
+
+
+def get_dictionary(conn) -> LogDictionary:
+    """Process-wide dictionary for the database behind `conn`"""
+    key = _database_key(conn)
+    with _dictionaries_lock:
+        dictionary = _dictionaries.get(key)
+        if dictionary is None:
+            dictionary = LogDictionary()
+            dictionary.load(conn)
+            _dictionaries[key] = dictionary
+        return dictionary
+
+
+def invalidate(conn) -> None:
+    """Forget cached codes, e.g. after a rollback discarded appended entries"""
+    try:
+        key = _database_key(conn)
+    except Exception:
+        return
+    with _dictionaries_lock:
+        _dictionaries.pop(key, None)
+
+
+def lookup_codes(conn, column: str, values: List[str]) -> List[int]:
+    """Codes of known values of an encoded column; unknown values have none"""
+    codes = get_dictionary(conn).codes[column]
+    found = []
+    for value in values:
+        code = codes.get(value)
+        if code is None:
+            # Appended by another process since the dictionary was loaded
+            row = conn.execute(f"SELECT code FROM {dimension_table(column)} WHERE value = ?", [value]).fetchone()
+            code = row[0] if row else None
+        if code is not None:
+            found.append(code)
+    return found
+
+
+def equals_clause(conn, column: str, value: str) -> Tuple[str, list]:
+    """`column = value` against logs_data, comparing codes instead of decoded strings"""
+    if column not in ENCODED_COLUMNS:
+        return f"{column} = ?", [value]
+    codes = lookup_codes(conn, column, [value])
+    if not codes:
+        return "FALSE", []
+    return f"{code_column(column)} = ?", codes
+
+
+def decode_sql(inner_sql: str, columns: List[str], order_by: str = "") -> str:
+    """Decode the code columns of a query over logs_data after it filtered and limited.
+
+    `inner_sql` must select `code_column(col)` for every encoded column in
+    `columns`; only its result rows are joined against the dimension tables.
+    """
+    selects = []
+    joins = []
+    for col in columns:
+        if col in ENCODED_COLUMNS:
+            alias = f"dim_{col}"
+            selects.append(f"{alias}.value AS {col}")
+            joins.append(f"LEFT JOIN {dimension_table(col)} {alias} ON {alias}.code = q.{code_column(col)}")
+        else:
+            selects.append(f"q.{col}")
+    sql = f"SELECT {', '.join(selects)} FROM ({inner_sql}) q {' '.join(joins)}"
+    return sql + (f" ORDER BY {order_by}" if order_by else "")
+
+
+def _columns(conn, table: str) -> List[tuple]:
+    return conn.execute(
+        f"SELECT name, type, \"notnull\", pk FROM pragma_table_info('{table}') ORDER BY cid"
+    ).fetchall()
+
+
+def _column_ddl(name: str, col_type: str, notnull: bool, pk: bool) -> str:
+    ddl = f"{name} {col_type}"
+    if pk:
+        ddl += " PRIMARY KEY"
+    elif notnull:
+        ddl += " NOT NULL"
+    return ddl
+
+
+def create_logs_view(conn) -> None:
+    """(Re)create the `logs` view decoding logs_data; picks up added columns"""
+    selects = []
+    joins = []
+    for name, _type, _notnull, _pk in _columns(conn, ENCODED_TABLE):
+        column = name[:-len("_code")] if name.endswith("_code") else None
+        if column in ENCODED_COLUMNS:
+            alias = f"dim_{column}"
+            selects.append(f"{alias}.value AS {column}")
+            joins.append(f"LEFT JOIN {dimension_table(column)} {alias} ON {alias}.code = d.{name}")
+        else:
+            selects.append(f"d.{name}")
+    conn.execute(
+        f"CREATE OR REPLACE VIEW logs AS SELECT {', '.join(selects)} FROM {ENCODED_TABLE} d {' '.join(joins)}"
+    )
+
+
+def _rebuild_referencing_tables(conn, target: str, body) -> None:
+    """Run `body` with FK-referencing tables detached, then re-point them at `target`"""
+    saved = []
+    for table in REFERENCING_TABLES:
+        row = conn.execute("SELECT sql FROM duckdb_tables() WHERE table_name = ? AND database_name = current_database()", [table]).fetchone()
+        if not row:
+            continue
+        conn.execute(f"CREATE TEMP TABLE {table}_backup AS SELECT * FROM {table}")
+        conn.execute(f"DROP TABLE {table}")
+        saved.append((table, row[0]))
+    body()
+    for table, sql in saved:
+        sql = re.sub(r"REFERENCES\s+\w+\s*\(", f"REFERENCES {target}(", sql)
+        conn.execute(sql)
+        conn.execute(f"INSERT INTO {table} SELECT * FROM temp.{table}_backup")
+        conn.execute(f"DROP TABLE temp.{table}_backup")
+
+
+def encode_logs(conn) -> Dict[str, Any]:
+    """Migrate the plain logs table to logs_data + dimension tables + `logs` view"""
+    if is_encoded(conn):
+        return status(conn)
+    columns = _columns(conn, "logs")
+
+    def body():
+        for col in ENCODED_COLUMNS:
+            table = dimension_table(col)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (code INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE)")
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(
+                f"INSERT INTO {table} (code, value) "
+                f"SELECT ROW_NUMBER() OVER (ORDER BY v), v FROM (SELECT DISTINCT {col} AS v FROM logs WHERE {col} IS NOT NULL)"
+            )
+        ddl = []
+        selects = []
+        joins = []
+        for name, col_type, notnull, pk in columns:
+            if name in ENCODED_COLUMNS:
+                ddl.append(f"{code_column(name)} INTEGER")
+                selects.append(f"dim_{name}.code")
+                joins.append(f"LEFT JOIN {dimension_table(name)} dim_{name} ON dim_{name}.value = l.{name}")
+            else:
+                ddl.append(_column_ddl(name, col_type, notnull, pk))
+                selects.append(f"l.{name}")
+        conn.execute(f"CREATE TABLE {ENCODED_TABLE} ({', '.join(ddl)})")
+        conn.execute(f"INSERT INTO {ENCODED_TABLE} SELECT {', '.join(selects)} FROM logs l {' '.join(joins)}")
+        conn.execute("DROP TABLE logs")
+        create_logs_view(conn)
+
+    _migrate(conn, ENCODED_TABLE, body)
+    logger.info("Encoded logs dimensions into dictionary tables")
+    return status(conn)
+
+
+def decode_logs(conn) -> Dict[str, Any]:
+    """Reverse encode_logs: materialise the view back into a plain logs table"""
+    if not is_encoded(conn):
+        return status(conn)
+    columns = _columns(conn, ENCODED_TABLE)
+
+    def body():
+        ddl = []
+        names = []
+        for name, col_type, notnull, pk in columns:
+            column = name[:-len("_code")] if name.endswith("_code") else None
+            if column in ENCODED_COLUMNS:
+                ddl.append(f"{column} TEXT")
+                names.append(column)
+            else:
+                ddl.append(_column_ddl(name, col_type, notnull, pk))
+                names.append(name)
+        conn.execute("CREATE TABLE logs_plain AS SELECT * FROM logs")
+        conn.execute("DROP VIEW logs")
+        conn.execute(f"DROP TABLE {ENCODED_TABLE}")
+        conn.execute(f"CREATE TABLE logs ({', '.join(ddl)})")
+        cols = ", ".join(names)
+        conn.execute(f"INSERT INTO logs ({cols}) SELECT {cols} FROM logs_plain")
+        conn.execute("DROP TABLE logs_plain")
+        for col in ENCODED_COLUMNS:
+            conn.execute(f"DROP TABLE IF EXISTS {dimension_table(col)}")
+
+    _migrate(conn, "logs", body)
+    logger.info("Decoded logs dimensions back into plain columns")
+    return status(conn)
+
+
+def _migrate(conn, target: str, body) -> None:
+    conn.begin()
+    try:
+        _rebuild_referencing_tables(conn, target, body)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        invalidate(conn)
+
+
+def status(conn) -> Dict[str, Any]:
+    """Layout, dictionary sizes and database size"""
+    encoded = is_encoded(conn)
+    result: Dict[str, Any] = {
+        "layout": "encoded" if encoded else "plain",
+        "rows": conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0],
+    }
+    if encoded:
+        result["dictionary"] = {
+            col: conn.execute(f"SELECT COUNT(*) FROM {dimension_table(col)}").fetchone()[0]
+            for col in ENCODED_COLUMNS
+        }
+    try:
+        size = conn.execute("PRAGMA database_size").fetchone()
+        result["database_size"] = size[1] if size else None
+    except Exception:
+        result["database_size"] = None
+    return result
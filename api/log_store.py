@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import ingest_seq, log_dictionary, promoted_fields, raw_store, rollups, templates, text_index, trigram_index
+
+logger = logging.getLogger("chimera")
+
+
+# Column order used for every insert into logs; raw payloads go to log_raw
+LOG_COLUMNS = [
+    "id", "ts", "hostname", "source", "unit", "facility", "severity", "severity_level",
+    "pid", "uid", "gid", "message", "fingerprint", "cursor",
+]
+
+# syslog severity levels (lower is more severe)
+SEVERITY_NAMES = {
+    0: "emerg", 1: "alert", 2: "crit", 3: "err",
+    4: "warning", 5: "notice", 6: "info", 7: "debug",
+}
+SEVERITY_LEVELS = {name: level for level, name in SEVERITY_NAMES.items()}
+
+# Levels at or below this count as errors (emerg, alert, crit, err)
+ERROR_SEVERITY_LEVEL = SEVERITY_LEVELS["err"]
+
+
+def severity_level(severity: Optional[str]) -> Optional[int]:
+    """Numeric level for a severity name (None for unknown names)"""
+    if severity is None:
+        return None
+    return SEVERITY_LEVELS.get(severity)
+
+
+def compute_log_identity(entry: Dict[str, Any]) -> Tuple[int, str]:
+    """Compute (numeric id, fingerprint) for a parsed log entry"""
+    fp_src = f"{entry['ts']}|{entry['hostname']}|{entry['unit']}|{entry['severity']}|{entry['pid']}|{entry['message']}".encode()
+    digest = hashlib.sha256(fp_src).digest()
+    # Deterministic numeric id from fingerprint (first 8 bytes of sha256)
+    numeric_id = int.from_bytes(digest[:8], byteorder="big", signed=True)
+    return numeric_id, digest.hex()
+
+
+def insert_log_rows(conn, rows: List[Dict[str, Any]],
+                    source_config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Insert log rows and maintain derived indexes in the caller's transaction.
+
+    Rows already present (by id, fingerprint or cursor) are skipped. Raw
+    payloads are reduced by the source's raw policy before they are stored.
+    Returns the rows that were actually inserted.
+    """
+    if not rows:
+        return []
+    if source_config:
+        for row in rows:
+            row["raw"] = raw_store.apply_policy(row.get("raw"), source_config)
+
+    # Collapse duplicates inside the batch; the database handles the rest
+    unique: Dict[int, Dict[str, Any]] = {}
+    for row in rows:
+        if row.get("severity_level") is None:
+            row["severity_level"] = severity_level(row.get("severity"))
+        unique.setdefault(row["id"], row)
+    batch = list(unique.values())
+
+    # Encoded layout: dimension columns are written as dictionary codes
+    encoded = log_dictionary.is_encoded(conn)
+    table = log_dictionary.ENCODED_TABLE if encoded else "logs"
+    physical = [log_dictionary.code_column(col) for col in LOG_COLUMNS] if encoded else list(LOG_COLUMNS)
+    # Promoted journald fields are stored as plain typed columns in either layout
+    field_specs = promoted_fields.get_specs(conn)
+    physical += [column for _field, column, _type in field_specs]
+    columns = ", ".join(physical)
+    placeholders = ", ".join("?" for _ in physical)
+    # Row-at-a-time on purpose: a multi-row INSERT ... ON CONFLICT treats NULL
+    # cursors as conflicting with each other, which would drop file/container rows
+    insert_sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) ON CONFLICT DO NOTHING RETURNING id"
+
+    new_rows = []
+    dictionary = log_dictionary.get_dictionary(conn) if encoded else None
+    for row in batch:
+        values = (dictionary.encode_row(conn, row, LOG_COLUMNS) if dictionary
+                  else [row.get(col) for col in LOG_COLUMNS])
+        if field_specs:
+            values = list(values) + list(promoted_fields.extract(row.get("journal"), field_specs).values())
+        if conn.execute(insert_sql, values).fetchone():
+            new_rows.append(row)
+
+    raw_store.store_rows(conn, new_rows)
+    text_index.index_log_rows(conn, new_rows)
+    trigram_index.index_log_rows(conn, new_rows)
+    rollups.add_log_rows(conn, new_rows)
+    templates.index_log_rows(conn, new_rows)
+    ingest_seq.record_log_rows(conn, new_rows)
+
+    logger.debug(f"Wrote {len(new_rows)} of {len(rows)} log rows")
+    return new_rows
+
+
+def write_log_batch(conn, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert a batch of log rows and maintain derived indexes in one transaction.
+
+    Rows already present (by id, fingerprint or cursor) are skipped. Returns the
+    rows that were actually inserted.
+    """
+    if not rows:
+        return []
+
+    conn.begin()
+    try:
+        new_rows = insert_log_rows(conn, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # Dictionary codes and templates written during the failed batch were rolled back too
+        log_dictionary.invalidate(conn)
+        templates.invalidate(conn)
+        raise
+    return new_rows
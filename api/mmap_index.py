@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+import datetime as dt
+import json
+import os
+import shutil
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("chimera")
+
+
+# Local vector index: one directory per day of log time holding append-only,
+# memory-mapped arrays. Vectors are L2-normalized and stored as float16 or
+# int8 (with a per-vector scale), so cosine similarity is a dot product and
+# nothing is read until a search pages it in. Large partitions get an IVF
+# coarse quantizer: k-means centroids plus a list id per vector, and searches
+# only score the vectors in the `nprobe` lists closest to the query.
+DEFAULT_MMAP_SETTINGS = {
+    "directory": "/var/lib/chimera/vectors",
+    "dtype": "float16",  # float16 | int8
+    "ivf_min_vectors": 50000,  # train a coarse quantizer once a partition has this many vectors
+    "ivf_lists": 0,  # 0: sqrt(vectors)
+    "nprobe": 8,
+    "batch_rows": 65536,  # rows scored per NumPy batch
+}
+
+DTYPES = {"float16": np.float16, "int8": np.int8}
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 20000
+
+KEYS = "keys.i64"  # written last: its length is the partition's committed row count
+TIMES = "ts.i64"  # epoch seconds of the log row
+SCALES = "scales.f32"  # int8 only
+ASSIGN = "assign.i32"  # IVF list per vector
+CENTROIDS = "centroids.npy"
+META = "meta.json"
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+
+def _lock_for(directory: str) -> threading.Lock:
+    with _locks_lock:
+        return _locks.setdefault(os.path.abspath(directory), threading.Lock())
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _kmeans(sample: np.ndarray, lists: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on normalized vectors; returns normalized centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for i in range(lists):
+            members = sample[assign == i]
+            if len(members):
+                centroids[i] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+    return centroids.astype(np.float32)
+
+
+class Partition:
+    """One day's append-only arrays"""
+
+    def __init__(self, path: str, dtype: str):
+        self.path = path
+        self.dtype = dtype
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _vectors_file(self) -> str:
+        return self._file(f"vectors.{'i8' if self.dtype == 'int8' else 'f16'}")
+
+    def meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._file(META)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def count(self) -> int:
+        try:
+            return os.path.getsize(self._file(KEYS)) // 8
+        except FileNotFoundError:
+            return 0
+
+    def _read(self, name: str, dtype, count: int, dim: int = 0) -> np.ndarray:
+        shape = (count, dim) if dim else (count,)
+        if count == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode="r", shape=shape)
+
+    def append(self, keys: np.ndarray, times: np.ndarray, vectors: np.ndarray,
+               ivf_min_vectors: int, ivf_lists: int) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        meta = self.meta()
+        dim = vectors.shape[1]
+        if meta is None:
+            meta = {"dim": dim, "dtype": self.dtype}
+            with open(self._file(META), "w") as f:
+                json.dump(meta, f)
+        elif meta["dim"] != dim or meta["dtype"] != self.dtype:
+            raise ValueError(f"Partition {self.path} holds {meta['dim']}-d {meta['dtype']} vectors, got {dim}-d {self.dtype}")
+        self._truncate_torn(dim)
+
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            stored = np.round(vectors / scales[:, None]).astype(np.int8)
+            with open(self._file(SCALES), "ab") as f:
+                f.write(scales.astype(np.float32).tobytes())
+        else:
+            stored = vectors.astype(np.float16)
+        with open(self._vectors_file(), "ab") as f:
+            f.write(stored.tobytes())
+        with open(self._file(TIMES), "ab") as f:
+            f.write(times.astype(np.int64).tobytes())
+        centroids = self.centroids()
+        if centroids is not None:
+            with open(self._file(ASSIGN), "ab") as f:
+                f.write(np.argmax(vectors @ centroids.T, axis=1).astype(np.int32).tobytes())
+        with open(self._file(KEYS), "ab") as f:
+            f.write(keys.astype(np.int64).tobytes())
+
+        if centroids is None and self.count() >= ivf_min_vectors > 0:
+            self.train_ivf(ivf_lists)
+
+    def _truncate_torn(self, dim: int) -> None:
+        """Cut every array back to count() rows.
+
+        Keys are written last, so an append torn by a crash leaves rows in the
+        other files (and maybe part of a key) that no key points at. The next
+        append would shift them against their keys.
+        """
+        count = self.count()
+        row_bytes = {
+            KEYS: 8,
+            TIMES: 8,
+            os.path.basename(self._vectors_file()): dim * np.dtype(DTYPES[self.dtype]).itemsize,
+            SCALES: 4,
+            ASSIGN: 4,
+        }
+        for name, size in row_bytes.items():
+            path = self._file(name)
+            try:
+                if os.path.getsize(path) > count * size:
+                    logger.warning(f"Truncating torn append in {path} to {count} rows")
+                    os.truncate(path, count * size)
+            except FileNotFoundError:
+                pass
+
+    def centroids(self) -> Optional[np.ndarray]:
+        try:
+            return np.load(self._file(CENTROIDS))
+        except FileNotFoundError:
+            return None
+
+    def vectors(self, count: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        meta = self.meta() or {}
+        dim = int(meta.get("dim", 0))
+        vectors = self._read(self._vectors_file(), DTYPES[self.dtype], count, dim)
+        scales = self._read(SCALES, np.float32, count) if self.dtype == "int8" else None
+        return vectors, scales
+
+    def train_ivf(self, lists: int = 0) -> int:
+        """Fit the coarse quantizer on a sample and assign every stored vector"""
+        count = self.count()
+        if count == 0:
+            return 0
+        lists = int(lists) or max(1, int(np.sqrt(count)))
+        lists = min(lists, count)
+        vectors, scales = self.vectors(count)
+        rng = np.random.default_rng(0)
+        sample_idx = np.sort(rng.choice(count, size=min(count, KMEANS_SAMPLE), replace=False))
+        sample = self._decode(vectors[sample_idx], scales[sample_idx] if scales is not None else None)
+        centroids = _kmeans(_normalize(sample), lists)
+        assign = np.empty(count, dtype=np.int32)
+        for start in range(0, count, KMEANS_SAMPLE):
+            block = self._decode(vectors[start:start + KMEANS_SAMPLE],
+                                 scales[start:start + KMEANS_SAMPLE] if scales is not None else None)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        # Readers take the centroids as the sign that every vector has a list id
+        assign.tofile(self._file(ASSIGN + ".tmp"))
+        os.replace(self._file(ASSIGN + ".tmp"), self._file(ASSIGN))
+        with open(self._file(CENTROIDS + ".tmp"), "wb") as f:
+            np.save(f, centroids)
+        os.replace(self._file(CENTROIDS + ".tmp"), self._file(CENTROIDS))
+        logger.info(f"Trained IVF with {lists} lists over {count} vectors in {self.path}")
+        return lists
+
+    @staticmethod
+    def _decode(block: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        decoded = block.astype(np.float32)
+        if scales is not None:
+            decoded *= np.asarray(scales, dtype=np.float32)[:, None]
+        return decoded
+
+    def search(self, query: np.ndarray, k: int, since: Optional[int], nprobe: int,
+               batch_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, keys) of this partition"""
+        count = self.count()
+        if count == 0:
+            return np.empty(0, np.float32), np.empty(0, np.int64)
+        keys = self._read(KEYS, np.int64, count)
+        vectors, scales = self.vectors(count)
+
+        rows = None
+        centroids = self.centroids()
+        if centroids is not None and nprobe < len(centroids):
+            assign = self._read(ASSIGN, np.int32, count)
+            probe = np.argsort(-(centroids @ query))[:nprobe]
+            rows = np.flatnonzero(np.isin(assign, probe))
+        if since is not None:
+            recent = self._read(TIMES, np.int64, count) >= since
+            rows = np.flatnonzero(recent) if rows is None else rows[recent[rows]]
+
+        best_scores: List[np.ndarray] = []
+        best_keys: List[np.ndarray] = []
+        total = count if rows is None else len(rows)
+        for start in range(0, total, batch_rows):
+            if rows is None:
+                idx = slice(start, start + batch_rows)
+                block_keys = keys[idx]
+            else:
+                idx = rows[start:start + batch_rows]
+                block_keys = keys[idx]
+            scores = self._decode(vectors[idx], scales[idx] if scales is not None else None) @ query
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                scores, block_keys = scores[top], np.asarray(block_keys)[top]
+            best_scores.append(scores)
+            best_keys.append(np.asarray(block_keys))
+        if not best_scores:
+            return np.empty(0, np.float32), np.empty(0, np.int64)
+        return np.concatenate(best_scores), np.concatenate(best_keys)
+
+
+class MmapVectorIndex:
+    """Day-partitioned memory-mapped vector index with batched NumPy top-k"""
+
+    def __init__(self, directory: str, dtype: str = "float16", ivf_min_vectors: int = 50000,
+                 ivf_lists: int = 0, nprobe: int = 8, batch_rows: int = 65536):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.directory = directory
+        self.dtype = dtype
+        self.ivf_min_vectors = int(ivf_min_vectors)
+        self.ivf_lists = int(ivf_lists)
+        self.nprobe = max(1, int(nprobe))
+        self.batch_rows = max(1, int(batch_rows))
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Dict[str, Any]]) -> "MmapVectorIndex":
+        merged = {**DEFAULT_MMAP_SETTINGS, **(settings or {})}
+        return cls(merged["directory"], merged["dtype"], merged["ivf_min_vectors"],
+                   merged["ivf_lists"], merged["nprobe"], merged["batch_rows"])
+
+    def partitions(self) -> Dict[str, Partition]:
+        """Day -> partition, oldest first"""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return {}
+        result = {}
+        for name in names:
+            try:
+                dt.date.fromisoformat(name)
+            except ValueError:
+                continue
+            result[name] = Partition(os.path.join(self.directory, name), self.dtype)
+        return result
+
+    def add(self, keys: Sequence[int], timestamps: Sequence[dt.datetime], vectors: Sequence[Sequence[float]]) -> int:
+        """Append vectors under the day of their log timestamp (UTC)"""
+        if not len(keys):
+            return 0
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        epochs = np.array([_epoch(ts) for ts in timestamps], dtype=np.int64)
+        days = np.array([dt.datetime.fromtimestamp(int(e), dt.timezone.utc).date().isoformat() for e in epochs])
+        key_array = np.asarray(keys, dtype=np.int64)
+        with _lock_for(self.directory):
+            for day in sorted(set(days)):
+                mask = days == day
+                Partition(os.path.join(self.directory, day), self.dtype).append(
+                    key_array[mask], epochs[mask], matrix[mask], self.ivf_min_vectors, self.ivf_lists)
+        return len(keys)
+
+    def search(self, query: Sequence[float], k: int = 10,
+               since: Optional[dt.datetime] = None) -> List[Tuple[int, float]]:
+        """(key, cosine similarity) of the k nearest vectors, best first"""
+        vector = _normalize(np.asarray([query], dtype=np.float32))[0]
+        since_epoch = _epoch(since) if since is not None else None
+        since_day = dt.datetime.fromtimestamp(since_epoch, dt.timezone.utc).date().isoformat() if since is not None else None
+        scores: List[np.ndarray] = []
+        keys: List[np.ndarray] = []
+        for day, partition in self.partitions().items():
+            if since_day is not None and day < since_day:
+                continue
+            meta = partition.meta()
+            if meta is None:
+                continue
+            if meta["dim"] != len(vector):
+                raise ValueError(f"Index holds {meta['dim']}-dimensional vectors, query has {len(vector)}")
+            part_scores, part_keys = partition.search(vector, k, since_epoch, self.nprobe, self.batch_rows)
+            scores.append(part_scores)
+            keys.append(part_keys)
+        if not scores:
+            return []
+        all_scores = np.concatenate(scores)
+        all_keys = np.concatenate(keys)
+        order = np.argsort(-all_scores, kind="stable")[:k]
+        return [(int(all_keys[i]), float(all_scores[i])) for i in order]
+
+    def drop_before(self, cutoff: dt.datetime) -> int:
+        """Delete whole day partitions older than the cutoff's day; returns vectors dropped"""
+        cutoff_day = dt.datetime.fromtimestamp(_epoch(cutoff), dt.timezone.utc).date().isoformat()
+        dropped = 0
+        with _lock_for(self.directory):
+            for day, partition in self.partitions().items():
+                if day < cutoff_day:
+                    dropped += partition.count()
+                    shutil.rmtree(partition.path, ignore_errors=True)
+        return dropped
+
+
+def _epoch(ts: dt.datetime) -> int:
+    """Epoch seconds; naive timestamps are UTC like the logs table"""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=dt.timezone.utc)
+    return int(ts.timestamp())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("chimera")
+
+
+# SQL types a promoted field may use
+PROMOTED_TYPES = ("TEXT", "INTEGER", "BIGINT", "DOUBLE", "BOOLEAN")
+
+# journald field names: uppercase letters, digits and underscores
+FIELD_NAME_PATTERN = re.compile(r"^[A-Z0-9_]{1,64}$")
+
+COLUMN_PREFIX = "field_"
+
+# (journald field, logs column, SQL type)
+FieldSpec = Tuple[str, str, str]
+
+
+def column_name(field_name: str) -> str:
+    """logs column holding a promoted journald field, e.g. _BOOT_ID -> field_boot_id"""
+    return COLUMN_PREFIX + field_name.lstrip("_").lower()
+
+
+def validate(promoted: Dict[str, str]) -> List[FieldSpec]:
+    """Check a promoted_fields config mapping and turn it into specs"""
+    specs = []
+    columns = set()
+    for field_name, sql_type in promoted.items():
+        if not FIELD_NAME_PATTERN.match(field_name):
+            raise ValueError(f"Invalid promoted field name: {field_name}")
+        sql_type = str(sql_type).upper()
+        if sql_type not in PROMOTED_TYPES:
+            raise ValueError(f"Unsupported type {sql_type} for promoted field {field_name}")
+        column = column_name(field_name)
+        if column in columns:
+            raise ValueError(f"Promoted field {field_name} collides on column {column}")
+        columns.add(column)
+        specs.append((field_name, column, sql_type))
+    return specs
+
+
+def get_specs(conn) -> List[FieldSpec]:
+    """Promoted fields registered in this database"""
+    return [tuple(r) for r in conn.execute(
+        "SELECT field, column_name, type FROM promoted_fields ORDER BY field"
+    ).fetchall()]
+
+
+def convert(value: Any, sql_type: str) -> Any:
+    """Convert a journald field value to the column type (None when it does not fit)"""
+    if value is None or isinstance(value, (list, dict)):
+        # Binary or repeated journald fields are not promoted
+        return None
+    try:
+        if sql_type in ("INTEGER", "BIGINT"):
+            return int(value)
+        if sql_type == "DOUBLE":
+            return float(value)
+        if sql_type == "BOOLEAN":
+            return str(value).lower() in ("1", "true", "yes", "on")
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+def extract(entry: Optional[Dict[str, Any]], specs: List[FieldSpec]) -> Dict[str, Any]:
+    """Typed column values for the promoted fields of one journald entry"""
+    if not entry:
+        return {column: None for _field, column, _type in specs}
+    return {column: convert(entry.get(field_name), sql_type) for field_name, column, sql_type in specs}
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+import datetime as dt
+import json
+import select
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from . import rollups
+
+logger = logging.getLogger("chimera")
+
+
+# Deadlines, client-disconnect cancellation and planner-based cost guards for
+# the SQL behind interactive socket commands
+DEFAULT_TIMEOUTS = {
+    "QUERY_LOGS": 30,
+    "DISCOVER": 15,
+    "SEARCH": 30,
+    "ANOMALIES": 60,
+    "REPORT": 300,
+}
+DEFAULT_TIMEOUT_SECONDS = 30
+DEFAULT_POLL_INTERVAL = 0.1
+
+DEFAULT_COST_GUARD = {
+    "enabled": False,
+    "max_estimated_rows": 50_000_000,  # planner estimate of rows read by filtered scans
+    "action": "reject",  # reject: ERR too-expensive; downgrade: run with downgrade_timeout_seconds
+    "downgrade_timeout_seconds": 5,
+}
+
+SCAN_OPERATORS = ("SEQ_SCAN", "TABLE_SCAN", "INDEX_SCAN")
+
+TIMEOUT = "timeout"
+DISCONNECTED = "disconnected"
+
+_settings: Dict[str, Any] = {}
+# The Deadline running on this thread, which connections opened under it join
+_active = threading.local()
+
+
+def configure(settings: Optional[Dict[str, Any]]) -> None:
+    """Set the query_limits section used by the socket handlers in this process"""
+    global _settings
+    _settings = dict(settings or {})
+
+
+def timeout_for(command: str) -> float:
+    timeouts = {**DEFAULT_TIMEOUTS, **_settings.get("timeouts", {})}
+    return float(timeouts.get(command, _settings.get("default_timeout_seconds", DEFAULT_TIMEOUT_SECONDS)))
+
+
+def cost_guard() -> Dict[str, Any]:
+    return {**DEFAULT_COST_GUARD, **_settings.get("cost_guard", {})}
+
+
+def client_disconnected(sock) -> bool:
+    """True once the peer has closed its end; a half-closed (write-shutdown) client still counts as connected"""
+    try:
+        fileno = sock.fileno()
+    except Exception:
+        return False  # not a real socket (job output capture, tests)
+    if fileno < 0:
+        return True
+    poller = select.poll()
+    poller.register(fileno, select.POLLHUP | select.POLLERR)
+    return any(events & (select.POLLHUP | select.POLLERR | select.POLLNVAL) for _fd, events in poller.poll(0))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a connection is opened under a Deadline that already fired"""
+
+
+def track(cursor) -> None:
+    """Put a connection or cursor under the Deadline running on this thread, if any.
+
+    get_connection calls this for every connection; code that runs queries on
+    a conn.cursor() tracks the cursor too, since interrupting a connection
+    does not stop its cursors.
+    """
+    deadline = getattr(_active, "deadline", None)
+    if deadline is not None:
+        deadline.watch(cursor)
+
+
+def active() -> Optional["Deadline"]:
+    """The Deadline running on this thread, if any"""
+    return getattr(_active, "deadline", None)
+
+
+@contextmanager
+def joined(deadline: Optional["Deadline"]) -> Iterator[None]:
+    """Let connections opened on this (worker) thread join another thread's Deadline"""
+    outer = getattr(_active, "deadline", None)
+    _active.deadline = deadline
+    try:
+        yield
+    finally:
+        _active.deadline = outer
+
+
+class Deadline:
+    """Interrupt running queries when time runs out or the client goes away.
+
+    Used as a context manager around execute/fetch, or around a whole command
+    whose connections join it through track(); afterwards `reason` says why
+    the queries were interrupted (None if they were not).
+    """
+
+    def __init__(self, cursor, seconds: float, client=None, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.cursors = [cursor] if cursor is not None else []
+        self.seconds = max(0.0, float(seconds))
+        self.client = client
+        self.poll_interval = poll_interval
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "Deadline":
+        self._expires = time.monotonic() + self.seconds
+        self._outer = getattr(_active, "deadline", None)
+        _active.deadline = self
+        self._thread = threading.Thread(target=self._watch, name="chimera-deadline", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _active.deadline = self._outer
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def watch(self, cursor) -> None:
+        with self._lock:
+            if self.reason is not None:
+                raise DeadlineExceeded(self.reason)
+            self.cursors.append(cursor)
+
+    def _watch(self) -> None:
+        while True:
+            remaining = self._expires - time.monotonic()
+            if self._stop.wait(max(0.0, min(self.poll_interval, remaining))):
+                return
+            if time.monotonic() >= self._expires:
+                self.reason = TIMEOUT
+            elif self.client is not None and client_disconnected(self.client):
+                self.reason = DISCONNECTED
+            else:
+                continue
+            with self._lock:
+                cursors = list(self.cursors)
+            for cursor in cursors:
+                try:
+                    cursor.interrupt()
+                except Exception as exc:
+                    logger.debug(f"Query interrupt failed: {exc}")
+            return
+
+
+def _scan_estimates(node: Dict[str, Any], filtered: List[int], unfiltered: List[int]) -> None:
+    info = node.get("extra_info") or {}
+    if node.get("name") in SCAN_OPERATORS:
+        try:
+            rows = int(info.get("Estimated Cardinality", 0))
+        except (TypeError, ValueError):
+            rows = 0
+        (filtered if info.get("Filters") else unfiltered).append(rows)
+    for child in node.get("children", []):
+        _scan_estimates(child, filtered, unfiltered)
+
+
+def estimate_scan_rows(cursor, sql: str, params: list) -> int:
+    """Planner estimate of rows read by the query's filtered scans (all scans if none filter).
+
+    Late-materialization row fetches show up as unfiltered scans of the whole
+    table, so they only count when nothing is filtered.
+    """
+    rows = cursor.execute(f"EXPLAIN (FORMAT json) {sql}", params).fetchall()
+    filtered: List[int] = []
+    unfiltered: List[int] = []
+    for _kind, plan in rows:
+        for node in json.loads(plan):
+            _scan_estimates(node, filtered, unfiltered)
+    return sum(filtered) if filtered else sum(unfiltered)
+
+
+def estimate_window_rows(cursor, since: dt.datetime, filters: Optional[Dict[str, Sequence[Any]]] = None,
+                         max_severity_level: Optional[int] = None) -> int:
+    """Rows logged since `since` matching the dimension filters, counted from the rollups"""
+    sql, params = rollups.counts_since_sql(since, [], filters, max_severity_level)
+    return int(cursor.execute(sql, params).fetchone()[0])
+
+
+def check_cost(cursor, sql: str, params: list, since: Optional[dt.datetime] = None,
+               filters: Optional[Dict[str, Sequence[Any]]] = None,
+               max_severity_level: Optional[int] = None) -> Optional[str]:
+    """None when the query may run as-is, else the configured action (reject|downgrade).
+
+    The planner cannot see how many rows a ts range covers, so with `since`
+    the rollups count the window (narrowed by the filters rollups are keyed
+    by) and the smaller of that and the planner's estimate is used.
+    """
+    guard = cost_guard()
+    if not guard.get("enabled"):
+        return None
+    try:
+        estimate = estimate_scan_rows(cursor, sql, params)
+        if since is not None:
+            estimate = min(estimate, estimate_window_rows(cursor, since, filters, max_severity_level))
+    except Exception as exc:
+        logger.debug(f"Cost estimate failed, running query unguarded: {exc}")
+        return None
+    if estimate <= int(guard["max_estimated_rows"]):
+        return None
+    logger.warning(f"Query estimated to scan ~{estimate} rows (limit {guard['max_estimated_rows']}): {guard['action']}")
+    return "downgrade" if guard.get("action") == "downgrade" else "reject"
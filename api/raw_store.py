@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import json
+import logging
+import zlib
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("chimera")
+
+
+# Per-source raw payload policies (LogSource.config["raw_policy"])
+RAW_POLICY_FULL = "full"
+RAW_POLICY_FIELDS = "fields"  # keep only LogSource.config["raw_fields"]
+RAW_POLICY_NONE = "none"
+RAW_POLICIES = (RAW_POLICY_FULL, RAW_POLICY_FIELDS, RAW_POLICY_NONE)
+
+RAW_CODEC = "zlib"
+COMPRESSION_LEVEL = 6
+
+
+# Source name -> config, for callers that only know the name (INGEST_JOURNAL
+# writes as "journald"); a source type maps to its first enabled source
+_source_configs: Dict[str, Dict[str, Any]] = {}
+
+
+def configure(log_sources: List[Any]) -> None:
+    """Register the raw policies of the configured log sources"""
+    configs: Dict[str, Dict[str, Any]] = {}
+    for source in log_sources:
+        if source.enabled:
+            configs.setdefault(source.type, source.config or {})
+    for source in log_sources:
+        configs[source.name] = source.config or {}
+    _source_configs.clear()
+    _source_configs.update(configs)
+
+
+def source_config(name: Optional[str]) -> Optional[Dict[str, Any]]:
+    return _source_configs.get(name) if name else None
+
+
+def apply_policy(raw: Optional[str], source_config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Reduce a raw JSON payload according to the source's raw policy"""
+    if raw is None:
+        return None
+    config = source_config or {}
+    policy = config.get("raw_policy", RAW_POLICY_FULL)
+    if policy == RAW_POLICY_NONE:
+        return None
+    if policy == RAW_POLICY_FIELDS:
+        try:
+            payload = json.loads(raw)
+        except Exception:
+            return None
+        if not isinstance(payload, dict):
+            return None
+        fields = config.get("raw_fields", [])
+        subset = {key: payload[key] for key in fields if key in payload}
+        return json.dumps(subset) if subset else None
+    if policy != RAW_POLICY_FULL:
+        logger.warning(f"Unknown raw_policy '{policy}', keeping full payload")
+    return raw
+
+
+def compress(raw: str) -> bytes:
+    return zlib.compress(raw.encode(), COMPRESSION_LEVEL)
+
+
+def decompress(payload: bytes) -> str:
+    return zlib.decompress(payload).decode()
+
+
+def store_rows(conn, rows: List[Dict[str, Any]]) -> int:
+    """Write compressed raw payloads for newly inserted rows; returns rows stored"""
+    records = [
+        (row["id"], row["ts"], RAW_CODEC, compress(row["raw"]))
+        for row in rows if row.get("raw") is not None
+    ]
+    if not records:
+        return 0
+    conn.executemany(
+        "INSERT INTO log_raw (id, ts, codec, payload) VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING",
+        records,
+    )
+    return len(records)
+
+
+def fetch(conn, log_id: int) -> Optional[str]:
+    """Raw payload for a log id; rows written before the side table fall back to logs.raw"""
+    row = conn.execute("SELECT codec, payload FROM log_raw WHERE id = ?", [log_id]).fetchone()
+    if row:
+        return decompress(row[1])
+    legacy = conn.execute("SELECT raw FROM logs WHERE id = ?", [log_id]).fetchone()
+    return legacy[0] if legacy else None
+
+
+def remove_log_ids(conn, log_ids: List[int]) -> None:
+    if log_ids:
+        conn.execute("DELETE FROM log_raw WHERE id IN (SELECT UNNEST(?::BIGINT[]))", [log_ids])
@@ -7,6 +7,8 @@ from typing import Dict, Any, Optional
 from pathlib import Path
 
 from .db import get_connection
+from . import jobs, query_guard, rollups, shards
+from .log_store import ERROR_SEVERITY_LEVEL, SEVERITY_LEVELS
 from .system_health import SystemHealthMonitor
 
 
@@ -19,51 +21,41 @@ class ReportGenerator:
 
     def _get_log_summary(self, since_seconds: int = 86400) -> Dict[str, Any]:
         """Get summary statistics for logs"""
-        conn = get_connection(self.db_path)
+        conn = get_connection(self.db_path, profile="batch")
         try:
             since_ts = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=since_seconds)
 
             cur = conn.cursor()
+            query_guard.track(cur)
+            shards.federate(cur)
 
+            # Counts are served from the rollups: O(buckets), not O(rows)
             # Total log count
-            cur.execute("SELECT COUNT(*) FROM logs WHERE ts >= ?", [since_ts])
+            total_sql, total_params = rollups.counts_since_sql(since_ts, [])
+            cur.execute(total_sql, total_params)
             total_logs_row = cur.fetchone()
             total_logs = total_logs_row[0] if total_logs_row else 0
 
             # Logs by severity
-            cur.execute("""
-                SELECT severity, COUNT(*)
-                FROM logs
-                WHERE ts >= ?
-                GROUP BY severity
-                ORDER BY COUNT(*) DESC
-            """, [since_ts])
+            sev_sql, sev_params = rollups.counts_since_sql(since_ts, ["severity"])
+            cur.execute(f"SELECT severity, count FROM ({sev_sql}) ORDER BY count DESC", sev_params)
             severity_counts = dict(cur.fetchall())
 
             # Top units by log volume
-            cur.execute("""
-                SELECT unit, COUNT(*)
-                FROM logs
-                WHERE ts >= ?
-                GROUP BY unit
-                ORDER BY COUNT(*) DESC
-                LIMIT 10
-            """, [since_ts])
+            unit_sql, unit_params = rollups.counts_since_sql(since_ts, ["unit"])
+            cur.execute(f"SELECT unit, count FROM ({unit_sql}) ORDER BY count DESC LIMIT 10", unit_params)
             top_units = dict(cur.fetchall())
 
             # Top sources
-            cur.execute("""
-                SELECT source, COUNT(*)
-                FROM logs
-                WHERE ts >= ?
-                GROUP BY source
-                ORDER BY COUNT(*) DESC
-                LIMIT 5
-            """, [since_ts])
+            source_sql, source_params = rollups.counts_since_sql(since_ts, ["source"])
+            cur.execute(f"SELECT source, count FROM ({source_sql}) ORDER BY count DESC LIMIT 5", source_params)
             top_sources = dict(cur.fetchall())
 
             # Error rate
-            error_count = sum(severity_counts.get(sev, 0) for sev in ['err', 'crit', 'emerg'])
+            error_count = sum(
+                count for sev, count in severity_counts.items()
+                if SEVERITY_LEVELS.get(sev, len(SEVERITY_LEVELS)) <= ERROR_SEVERITY_LEVEL
+            )
             error_rate = (error_count / total_logs * 100) if total_logs > 0 else 0
 
             return {
@@ -124,21 +116,23 @@ class ReportGenerator:
         """Get anomaly detection summary"""
         try:
             # Simple inline anomaly detection
-            conn = get_connection(self.db_path)
+            conn = get_connection(self.db_path, profile="batch")
             try:
                 since_ts = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=since_seconds)
                 anomalies = []
 
                 # Detect error spikes
                 cur = conn.cursor()
-                cur.execute("""
-                    SELECT unit, COUNT(*) as error_count
-                    FROM logs
-                    WHERE ts >= ? AND severity IN ('err', 'crit', 'emerg')
-                    GROUP BY unit
-                    HAVING error_count > 10
-                    ORDER BY error_count DESC
-                """, [since_ts])
+                query_guard.track(cur)
+                shards.federate(cur)
+                error_sql, error_params = rollups.counts_since_sql(
+                    since_ts, ["unit"], max_severity_level=ERROR_SEVERITY_LEVEL
+                )
+                cur.execute(
+                    f"SELECT unit, count AS error_count FROM ({error_sql}) "
+                    "WHERE error_count > 10 ORDER BY error_count DESC",
+                    error_params,
+                )
 
                 for unit, error_count in cur.fetchall():
                     anomalies.append({
@@ -148,14 +142,12 @@ class ReportGenerator:
                     })
 
                 # Detect high volume
-                cur.execute("""
-                    SELECT source, COUNT(*) as log_count
-                    FROM logs
-                    WHERE ts >= ?
-                    GROUP BY source
-                    HAVING log_count > 1000
-                    ORDER BY log_count DESC
-                """, [since_ts])
+                volume_sql, volume_params = rollups.counts_since_sql(since_ts, ["source"])
+                cur.execute(
+                    f"SELECT source, count AS log_count FROM ({volume_sql}) "
+                    "WHERE log_count > 1000 ORDER BY log_count DESC",
+                    volume_params,
+                )
 
                 for source, log_count in cur.fetchall():
                     anomalies.append({
@@ -202,15 +194,24 @@ class ReportGenerator:
         """Generate a comprehensive daily report"""
         report_time = dt.datetime.now(dt.timezone.utc)
 
+        sections = (
+            ("log_analytics", self._get_log_summary),
+            ("system_health", self._get_system_health_summary),
+            ("anomalies", self._get_anomaly_summary),
+        )
+        summary: Dict[str, Any] = {}
+        for done, (name, section) in enumerate(sections):
+            # A cancelled REPORT job stops between sections
+            jobs.check_cancelled()
+            jobs.report_progress(done, len(sections), name)
+            summary[name] = section(since_seconds)
+        jobs.report_progress(len(sections), len(sections), "recommendations")
+
         report = {
             "report_id": f"daily_{report_time.strftime('%Y%m%d')}",
             "generated_at": report_time.isoformat(),
             "period_hours": since_seconds // 3600,
-            "summary": {
-                "log_analytics": self._get_log_summary(since_seconds),
-                "system_health": self._get_system_health_summary(since_seconds),
-                "anomalies": self._get_anomaly_summary(since_seconds)
-            }
+            "summary": summary,
         }
 
         # Add recommendations
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+import datetime as dt
+import threading
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from .db import get_connection
+from . import ingest_seq, log_dictionary, raw_store, rollups, shards, storage, templates, text_index, trigram_index, vector_store, writer
+
+logger = logging.getLogger("chimera")
+
+
+# Tables subject to retention and the timestamp column that ages them out
+RETENTION_TABLES = {
+    "logs": "ts",
+    "log_embeddings": "indexed_at",
+    "system_metrics": "timestamp",
+    "system_alerts": "timestamp",
+    "security_audits": "scan_time",
+}
+
+# Per-source shard files hold only these
+SHARD_RETENTION_TABLES = ("logs", "log_embeddings")
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_MAX_CHUNKS_PER_RUN = 200
+DEFAULT_INTERVAL_SECONDS = 3600
+DEFAULT_CHECKPOINT_INTERVAL_SECONDS = 21600
+
+
+class RetentionManager:
+    """Enforce per-table and per-source retention with incremental, chunked purges"""
+
+    def __init__(self, db_path: Optional[str] = None, config=None, chroma_client=None):
+        self.db_path = db_path
+        self.config = config
+        self._chroma_client = chroma_client
+        self._row_shards = None
+        self._shard_conn = None  # set while a per-source shard is being purged
+        settings = config.retention if config is not None else {}
+        self.chunk_size = int(settings.get("chunk_size", DEFAULT_CHUNK_SIZE))
+        self.max_chunks_per_run = int(settings.get("max_chunks_per_run", DEFAULT_MAX_CHUNKS_PER_RUN))
+        self.checkpoint_interval = int(settings.get("checkpoint_interval_seconds", DEFAULT_CHECKPOINT_INTERVAL_SECONDS))
+        self._last_checkpoint = time.monotonic()
+        self._lock = threading.Lock()
+        self._running = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _retention_days(self, table: str, source: Optional[str] = None) -> int:
+        if self.config is None:
+            return 30
+        return self.config.get_retention_days(table, source)
+
+    def _source_overrides(self) -> Dict[str, int]:
+        if self.config is None:
+            return {}
+        return {src: int(days) for src, days in self.config.retention.get("sources", {}).items()}
+
+    def _get_chroma_client(self):
+        if self._chroma_client is None:
+            from .embeddings import ChromaDBClient
+            self._chroma_client = ChromaDBClient()
+        return self._chroma_client
+
+    def _get_row_shards(self):
+        """Time-sharded row collections when the chromadb backend is sharded, else None"""
+        from .embeddings import ShardedChromaClient, embedding_settings
+        settings = embedding_settings()
+        granularity = settings["shard_by"]
+        if settings["vector_backend"] != "chromadb" or granularity in (None, "", "none"):
+            return None
+        if self._row_shards is None or self._row_shards.granularity != granularity:
+            self._row_shards = ShardedChromaClient(granularity=granularity)
+        return self._row_shards
+
+    def get_policy(self) -> Dict[str, Any]:
+        """Describe the effective retention policy"""
+        return {
+            "tables": {table: self._retention_days(table) for table in RETENTION_TABLES},
+            "sources": self._source_overrides(),
+            "chunk_size": self.chunk_size,
+            "max_chunks_per_run": self.max_chunks_per_run,
+            "checkpoint_interval_seconds": self.checkpoint_interval,
+        }
+
+    def _write(self, func):
+        """Apply func(conn) in one transaction on the writer (or a connection of our own)"""
+        if self._shard_conn is not None:
+            # Shards skip the shared writer; the caller holds the shard's write lock
+            return writer.run_in_transaction(self._shard_conn, "maintenance", writer.MaintenanceTask(func))
+        return writer.run_write(self.db_path, func)
+
+    def _purge(self, conn, table: str, column: str, now: dt.datetime, dry_run: bool) -> Dict[str, Any]:
+        if table == "logs":
+            return self._purge_logs(conn, now, dry_run)
+        cutoff = now - dt.timedelta(days=self._retention_days(table))
+        if table == "log_embeddings":
+            return self._purge_embeddings(conn, cutoff, dry_run)
+        return self._purge_table(conn, table, column, cutoff, dry_run)
+
+    def _purge_shards(self, now: dt.datetime, dry_run: bool) -> Dict[str, Dict[str, Any]]:
+        """Apply the logs and embeddings policies inside every per-source shard file"""
+        results: Dict[str, Dict[str, Any]] = {}
+        for name in (shards.list_shards(shards.directory()) if shards.directory() else {}):
+            results[name] = {}
+            with shards.writing(name):
+                try:
+                    self._shard_conn = shards.connect(self.db_path, name)
+                except Exception as e:
+                    logger.error(f"Retention could not open shard '{name}': {e}")
+                    results[name] = {table: {"error": str(e)} for table in SHARD_RETENTION_TABLES}
+                    continue
+                try:
+                    for table in SHARD_RETENTION_TABLES:
+                        started = time.perf_counter()
+                        try:
+                            result = self._purge(self._shard_conn, table, RETENTION_TABLES[table], now, dry_run)
+                        except Exception as e:
+                            logger.error(f"Retention failed for table '{table}' of shard '{name}': {e}")
+                            results[name][table] = {"error": str(e)}
+                            continue
+                        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                        results[name][table] = result
+                finally:
+                    self._shard_conn.close()
+                    self._shard_conn = None
+        return results
+
+    @staticmethod
+    def _ensure_stats_table(conn) -> None:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS retention_runs (
+                run_at TIMESTAMP NOT NULL,
+                table_name TEXT NOT NULL,
+                deleted_rows BIGINT,
+                chunks INTEGER,
+                duration_ms DOUBLE,
+                cutoff TIMESTAMP,
+                checkpointed BOOLEAN DEFAULT FALSE
+            );
+        """)
+
+    def _table_exists(self, conn, table: str) -> bool:
+        row = conn.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ? AND table_catalog = current_database()",
+            [table]
+        ).fetchone()
+        return bool(row and row[0])
+
+    def _delete_vectors(self, log_ids: List[int]) -> int:
+        """Best-effort removal of vectors for purged logs"""
+        if not log_ids:
+            return 0
+        from .embeddings import embedding_settings
+        backend = embedding_settings()["vector_backend"]
+        if backend == "duckdb":
+            return len(log_ids)  # removed from log_vectors in the purge transaction
+        if backend == "mmap":
+            # Local day partitions are dropped whole by embedding cleanup; until
+            # then, vectors of purged rows fall out of the join with logs
+            return 0
+        ids = [f"log_{log_id}" for log_id in log_ids]
+        try:
+            shards = self._get_row_shards()
+            if shards is not None:
+                # Shards are dropped whole once their hour or day has aged out;
+                # only the unsharded collection from before sharding is cleaned by id
+                shards.delete_embeddings(ids)
+                return 0
+            self._get_chroma_client().delete_embeddings(ids)
+            return len(log_ids)
+        except Exception as e:
+            logger.warning(f"Retention could not delete {len(log_ids)} vectors: {e}")
+            return 0
+
+    def _purge_log_chunk(self, cutoff: dt.datetime, source_clause: str,
+                         source_params: list) -> Tuple[int, List[int]]:
+        """Delete one time-ordered chunk of logs; returns (deleted, embedded ids)"""
+        def detach(conn) -> Tuple[List[int], List[int]]:
+            ids = [row[0] for row in conn.execute(
+                f"SELECT id FROM logs WHERE ts < ?{source_clause} ORDER BY ts LIMIT ?",
+                [cutoff] + source_params + [self.chunk_size]
+            ).fetchall()]
+            if not ids:
+                return [], []
+            embedded = [row[0] for row in conn.execute(
+                "SELECT log_id FROM log_embeddings WHERE log_id IN (SELECT UNNEST(?::BIGINT[]))",
+                [ids]
+            ).fetchall()]
+            if embedded:
+                conn.execute(
+                    "DELETE FROM log_embeddings WHERE log_id IN (SELECT UNNEST(?::BIGINT[]))",
+                    [embedded]
+                )
+            return ids, embedded
+
+        def delete(conn) -> None:
+            rollups.remove_log_ids(conn, ids)
+            raw_store.remove_log_ids(conn, ids)
+            text_index.remove_log_ids(conn, ids, max_ts=cutoff)
+            trigram_index.remove_log_ids(conn, ids, max_ts=cutoff)
+            templates.remove_log_ids(conn, ids)
+            ingest_seq.remove_log_ids(conn, ids)
+            vector_store.remove_keys(conn, vector_store.LOG_VECTORS, embedded)
+            conn.execute(
+                f"DELETE FROM {log_dictionary.physical_table(conn)} WHERE id IN (SELECT UNNEST(?::BIGINT[]))", [ids]
+            )
+
+        # DuckDB checks foreign keys against committed state, so the referencing
+        # embedding rows are removed in a transaction of their own first
+        ids, embedded = self._write(detach)
+        if not ids:
+            return 0, []
+        self._write(delete)
+        return len(ids), embedded
+
+    def _purge_logs(self, conn, now: dt.datetime, dry_run: bool) -> Dict[str, Any]:
+        """Purge logs per source override, then everything else at the table default"""
+        overrides = self._source_overrides()
+        passes = []
+        for source, days in overrides.items():
+            passes.append((now - dt.timedelta(days=days), " AND source = ?", [source]))
+        default_cutoff = now - dt.timedelta(days=self._retention_days("logs"))
+        if overrides:
+            placeholders = ",".join("?" for _ in overrides)
+            passes.append((default_cutoff,
+                           f" AND (source IS NULL OR source NOT IN ({placeholders}))",
+                           list(overrides)))
+        else:
+            passes.append((default_cutoff, "", []))
+
+        deleted = 0
+        chunks = 0
+        vectors = 0
+        for cutoff, clause, params in passes:
+            if dry_run:
+                row = conn.execute(
+                    f"SELECT COUNT(*) FROM logs WHERE ts < ?{clause}", [cutoff] + params
+                ).fetchone()
+                deleted += row[0] if row else 0
+                continue
+            while chunks < self.max_chunks_per_run:
+                count, embedded = self._purge_log_chunk(cutoff, clause, params)
+                if count == 0:
+                    break
+                chunks += 1
+                deleted += count
+                vectors += self._delete_vectors(embedded)
+                if count < self.chunk_size:
+                    break
+        return {"deleted": deleted, "chunks": chunks, "vectors_deleted": vectors, "cutoff": default_cutoff}
+
+    def _purge_embeddings(self, conn, cutoff: dt.datetime, dry_run: bool) -> Dict[str, Any]:
+        """Purge embedding bookkeeping (and vectors) older than the cutoff"""
+        if dry_run:
+            row = conn.execute("SELECT COUNT(*) FROM log_embeddings WHERE indexed_at < ?", [cutoff]).fetchone()
+            return {"deleted": row[0] if row else 0, "chunks": 0, "vectors_deleted": 0, "cutoff": cutoff}
+
+        deleted = 0
+        chunks = 0
+        vectors = 0
+        def purge_chunk(write_conn) -> List[int]:
+            ids = [row[0] for row in write_conn.execute(
+                "SELECT log_id FROM log_embeddings WHERE indexed_at < ? ORDER BY indexed_at LIMIT ?",
+                [cutoff, self.chunk_size]
+            ).fetchall()]
+            if ids:
+                write_conn.execute("DELETE FROM log_embeddings WHERE log_id IN (SELECT UNNEST(?::BIGINT[]))", [ids])
+                vector_store.remove_keys(write_conn, vector_store.LOG_VECTORS, ids)
+            return ids
+
+        while chunks < self.max_chunks_per_run:
+            ids = self._write(purge_chunk)
+            if not ids:
+                break
+            chunks += 1
+            deleted += len(ids)
+            vectors += self._delete_vectors(ids)
+            if len(ids) < self.chunk_size:
+                break
+        shards = self._get_row_shards()
+        if shards is not None:
+            try:
+                _dropped, dropped_vectors = shards.drop_before(cutoff)
+                vectors += dropped_vectors
+            except Exception as e:
+                logger.warning(f"Retention could not drop vector shards: {e}")
+        return {"deleted": deleted, "chunks": chunks, "vectors_deleted": vectors, "cutoff": cutoff}
+
+    def _purge_table(self, conn, table: str, column: str, cutoff: dt.datetime, dry_run: bool) -> Dict[str, Any]:
+        """Purge a plain time-series table in rowid chunks ordered by time"""
+        if dry_run:
+            row = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} < ?", [cutoff]).fetchone()
+            return {"deleted": row[0] if row else 0, "chunks": 0, "cutoff": cutoff}
+
+        deleted = 0
+        chunks = 0
+        def purge_chunk(write_conn) -> int:
+            row = write_conn.execute(
+                f"DELETE FROM {table} WHERE rowid IN ("
+                f"SELECT rowid FROM {table} WHERE {column} < ? ORDER BY {column} LIMIT ?)",
+                [cutoff, self.chunk_size]
+            ).fetchone()
+            return row[0] if row else 0
+
+        while chunks < self.max_chunks_per_run:
+            count = self._write(purge_chunk)
+            if count == 0:
+                break
+            chunks += 1
+            deleted += count
+            if count < self.chunk_size:
+                break
+        return {"deleted": deleted, "chunks": chunks, "cutoff": cutoff}
+
+    def checkpoint(self, conn, force: bool = False) -> bool:
+        """Run CHECKPOINT when the checkpoint interval has elapsed"""
+        if not force and time.monotonic() - self._last_checkpoint < self.checkpoint_interval:
+            return False
+        try:
+            conn.execute("CHECKPOINT")
+            self._last_checkpoint = time.monotonic()
+            logger.info("Retention checkpoint complete.")
+            return True
+        except Exception as e:
+            logger.warning(f"Retention checkpoint failed: {e}")
+            return False
+
+    def run(self, dry_run: bool = False, checkpoint: bool = False) -> Dict[str, Any]:
+        """Run one retention pass over all tables"""
+        with self._lock, storage.workload("batch"):
+            self._write(self._ensure_stats_table)
+            conn = get_connection(self.db_path, profile="batch")
+            try:
+                now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+                results: Dict[str, Any] = {}
+                total_deleted = 0
+
+                for table, column in RETENTION_TABLES.items():
+                    if not self._table_exists(conn, table):
+                        continue
+                    started = time.perf_counter()
+                    try:
+                        result = self._purge(conn, table, column, now, dry_run)
+                    except Exception as e:
+                        logger.error(f"Retention failed for table '{table}': {e}")
+                        results[table] = {"error": str(e)}
+                        continue
+                    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                    total_deleted += result["deleted"]
+                    results[table] = result
+
+                shard_results = self._purge_shards(now, dry_run)
+                # Shard tables are reported and recorded as <shard alias>.<table>
+                shard_tables = {
+                    f"{shards.shard_alias(name)}.{table}": result
+                    for name, tables in shard_results.items() for table, result in tables.items()
+                }
+                total_deleted += sum(r["deleted"] for r in shard_tables.values() if "error" not in r)
+
+                checkpointed = False
+                if not dry_run and (checkpoint or total_deleted > 0):
+                    checkpointed = self.checkpoint(conn, force=checkpoint)
+
+                if not dry_run:
+                    runs = [
+                        [now, table, result["deleted"], result.get("chunks", 0),
+                         result["duration_ms"], result["cutoff"], checkpointed]
+                        for table, result in {**results, **shard_tables}.items() if "error" not in result
+                    ]
+                    if runs:
+                        self._write(lambda write_conn: write_conn.executemany(
+                            "INSERT INTO retention_runs (run_at, table_name, deleted_rows, chunks, duration_ms, cutoff, checkpointed) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            runs,
+                        ))
+
+                for result in list(results.values()) + list(shard_tables.values()):
+                    if isinstance(result.get("cutoff"), dt.datetime):
+                        result["cutoff"] = result["cutoff"].isoformat()
+
+                logger.info(f"Retention {'dry run' if dry_run else 'run'} complete: {total_deleted} rows")
+                return {
+                    "run_at": now.isoformat(),
+                    "dry_run": dry_run,
+                    "deleted": total_deleted,
+                    "checkpointed": checkpointed,
+                    "tables": results,
+                    "shards": shard_results,
+                }
+            finally:
+                conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get retention statistics: last run per table and current table extents"""
+        self._write(self._ensure_stats_table)
+        conn = get_connection(self.db_path, profile="batch")
+        try:
+            tables: Dict[str, Any] = {}
+            for table, column in RETENTION_TABLES.items():
+                if not self._table_exists(conn, table):
+                    continue
+                rows, oldest = conn.execute(f"SELECT COUNT(*), MIN({column}) FROM {table}").fetchone()
+                last = conn.execute("""
+                    SELECT run_at, deleted_rows, duration_ms
+                    FROM retention_runs
+                    WHERE table_name = ?
+                    ORDER BY run_at DESC
+                    LIMIT 1
+                """, [table]).fetchone()
+                total = conn.execute(
+                    "SELECT COALESCE(SUM(deleted_rows), 0), COUNT(*) FROM retention_runs WHERE table_name = ?",
+                    [table]
+                ).fetchone()
+                tables[table] = {
+                    "rows": rows,
+                    "oldest": oldest.isoformat() if oldest else None,
+                    "retention_days": self._retention_days(table),
+                    "last_run": last[0].isoformat() if last else None,
+                    "last_deleted": last[1] if last else 0,
+                    "last_duration_ms": last[2] if last else None,
+                    "total_deleted": total[0],
+                    "runs": total[1],
+                }
+            return {"tables": tables, "sources": self._source_overrides()}
+        finally:
+            conn.close()
+
+    def start(self, interval_seconds: int = DEFAULT_INTERVAL_SECONDS) -> None:
+        """Start periodic retention in a background thread"""
+        if self._running:
+            return
+        self._running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._retention_loop,
+            args=(interval_seconds,),
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop periodic retention"""
+        self._running = False
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _retention_loop(self, interval_seconds: int) -> None:
+        while self._running:
+            if self._stop_event.wait(interval_seconds):
+                break
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"Error in retention loop: {e}")
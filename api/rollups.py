@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import datetime as dt
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import bulk, log_dictionary
+
+logger = logging.getLogger("chimera")
+
+
+# Rollup grains: label, table and the date_trunc unit of each bucket
+ROLLUP_GRAINS = [
+    ("1m", "logs_rollup_1m", "minute"),
+    ("1h", "logs_rollup_1h", "hour"),
+    ("1d", "logs_rollup_1d", "day"),
+]
+
+# Dimensions every rollup table is keyed by (besides the bucket)
+ROLLUP_DIMENSIONS = ["hostname", "source", "unit", "severity", "severity_level"]
+
+# Bumped whenever the rollup layout changes; stale databases are rebuilt
+ROLLUP_VERSION = "2"
+
+
+def truncate(ts: dt.datetime, unit: str) -> dt.datetime:
+    """Floor a timestamp to the start of its minute, hour or day"""
+    if unit == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if unit == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ceil(ts: dt.datetime, unit: str) -> dt.datetime:
+    floor = truncate(ts, unit)
+    if floor == ts:
+        return ts
+    step = {"minute": dt.timedelta(minutes=1), "hour": dt.timedelta(hours=1)}.get(unit, dt.timedelta(days=1))
+    return floor + step
+
+
+def _to_naive_utc(ts: dt.datetime) -> dt.datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _bucket_deltas(rows: Sequence[Dict[str, Any]], sign: int = 1) -> List[tuple]:
+    """Aggregate rows into (grain, bucket, dims..., count) deltas"""
+    counts: Counter = Counter()
+    for row in rows:
+        dims = tuple(row.get(d) for d in ROLLUP_DIMENSIONS)
+        for grain, _table, unit in ROLLUP_GRAINS:
+            counts[(grain, truncate(row["ts"], unit)) + dims] += sign
+    return [key + (count,) for key, count in counts.items() if count]
+
+
+def _apply_deltas(conn, deltas: List[tuple]) -> None:
+    """Merge count deltas into every rollup table; rows that reach zero are dropped"""
+    if not deltas:
+        return
+    shrinking = any(delta[-1] < 0 for delta in deltas)
+    dims = ", ".join(ROLLUP_DIMENSIONS)
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS rollup_delta "
+        "(grain TEXT, bucket TIMESTAMP, hostname TEXT, source TEXT, unit TEXT, severity TEXT, "
+        "severity_level TINYINT, count BIGINT)"
+    )
+    conn.execute("DELETE FROM rollup_delta")
+    columns = ["grain", "bucket"] + ROLLUP_DIMENSIONS + ["count"]
+    types = {**{name: object for name in columns}, "bucket": "datetime64[us]", "count": "int64"}
+    bulk.insert_columns(conn, "rollup_delta", dict(zip(columns, zip(*deltas))), types)
+    # NULL dimensions are real values here, so match with IS NOT DISTINCT FROM
+    key_match = " AND ".join(
+        ["r.bucket = d.bucket"] + [f"r.{d} IS NOT DISTINCT FROM d.{d}" for d in ROLLUP_DIMENSIONS]
+    )
+    for grain, table, _unit in ROLLUP_GRAINS:
+        conn.execute(
+            f"UPDATE {table} AS r SET count = r.count + d.count "
+            f"FROM rollup_delta d WHERE d.grain = ? AND {key_match}",
+            [grain],
+        )
+        conn.execute(
+            f"INSERT INTO {table} (bucket, {dims}, count) "
+            f"SELECT d.bucket, {', '.join('d.' + c for c in ROLLUP_DIMENSIONS)}, d.count FROM rollup_delta d "
+            f"WHERE d.grain = ? AND d.count > 0 AND NOT EXISTS (SELECT 1 FROM {table} r WHERE {key_match})",
+            [grain],
+        )
+        if shrinking:
+            conn.execute(f"DELETE FROM {table} WHERE count <= 0")
+    conn.execute("DELETE FROM rollup_delta")
+
+
+def add_log_rows(conn, rows: Sequence[Dict[str, Any]]) -> None:
+    """Count newly inserted log rows into the rollups"""
+    _apply_deltas(conn, _bucket_deltas(rows))
+
+
+def remove_log_ids(conn, log_ids: List[int]) -> None:
+    """Subtract logs that are about to be deleted from the rollups"""
+    if not log_ids:
+        return
+    dims = ", ".join(ROLLUP_DIMENSIONS)
+    rows = conn.execute(
+        f"SELECT ts, {dims} FROM logs WHERE id IN (SELECT UNNEST(?::BIGINT[]))", [log_ids]
+    ).fetchall()
+    _apply_deltas(conn, _bucket_deltas(
+        [dict(zip(["ts"] + ROLLUP_DIMENSIONS, r)) for r in rows], sign=-1
+    ))
+
+
+def rebuild(conn, since: Optional[dt.datetime] = None) -> int:
+    """Rebuild the rollup tables from the logs table; returns 1m bucket rows rebuilt.
+
+    With `since`, only buckets from the start of that day on are recounted,
+    so a reconcile reads the recent logs instead of all of them.
+    """
+    dims = ", ".join(ROLLUP_DIMENSIONS)
+    encoded = log_dictionary.is_encoded(conn)
+    start = truncate(_to_naive_utc(since), "day") if since is not None else None
+    window = " WHERE ts >= ?" if start is not None else ""
+    params = [start] if start is not None else []
+    for _grain, table, unit in ROLLUP_GRAINS:
+        conn.execute(f"DELETE FROM {table}" + (" WHERE bucket >= ?" if start is not None else ""), params)
+        if encoded:
+            # Group on the integer codes, decode only the resulting buckets
+            codes = ", ".join(log_dictionary.code_column(d) for d in ROLLUP_DIMENSIONS)
+            source = log_dictionary.decode_sql(
+                f"SELECT date_trunc('{unit}', ts) AS bucket, {codes}, COUNT(*) AS count "
+                f"FROM {log_dictionary.ENCODED_TABLE}{window} GROUP BY ALL",
+                ["bucket"] + ROLLUP_DIMENSIONS + ["count"],
+            )
+        else:
+            source = f"SELECT date_trunc('{unit}', ts), {dims}, COUNT(*) FROM logs{window} GROUP BY ALL"
+        conn.execute(f"INSERT INTO {table} (bucket, {dims}, count) {source}", params)
+    buckets = conn.execute(
+        "SELECT COUNT(*) FROM logs_rollup_1m" + (" WHERE bucket >= ?" if start is not None else ""), params
+    ).fetchone()[0]
+    logger.info(f"Rebuilt log rollups ({buckets} minute buckets{f' since {start}' if start else ''})")
+    return buckets
+
+
+def counts_since_sql(since_ts: dt.datetime, group_by: Sequence[str],
+                     filters: Optional[Dict[str, Sequence[Any]]] = None,
+                     max_severity_level: Optional[int] = None) -> Tuple[str, list]:
+    """Build a subquery counting logs with ts >= since_ts, grouped by `group_by`.
+
+    The window is covered exactly by raw rows for the partial leading minute,
+    then 1m buckets up to the next hour, 1h buckets up to the next day and 1d
+    buckets after that. The subquery yields the group columns plus `count`.
+    `max_severity_level` keeps rows at that level or more severe.
+    """
+    for col in list(group_by) + list(filters or {}):
+        if col not in ROLLUP_DIMENSIONS:
+            raise ValueError(f"Unsupported rollup dimension: {col}")
+
+    start = _to_naive_utc(since_ts)
+    minute, hour, day = _ceil(start, "minute"), _ceil(start, "hour"), _ceil(start, "day")
+
+    filter_sql = ""
+    filter_params: list = []
+    for col, values in (filters or {}).items():
+        filter_sql += f" AND {col} IN ({', '.join('?' for _ in values)})"
+        filter_params.extend(values)
+    if max_severity_level is not None:
+        filter_sql += " AND severity_level <= ?"
+        filter_params.append(max_severity_level)
+
+    cols = ", ".join(group_by)
+    select_cols = f"{cols}, " if cols else ""
+    group_sql = f" GROUP BY {cols}" if cols else ""
+    segments = [
+        (f"SELECT {select_cols}COUNT(*) AS count FROM logs WHERE ts >= ? AND ts < ?", [start, minute]),
+        (f"SELECT {select_cols}SUM(count) AS count FROM logs_rollup_1m WHERE bucket >= ? AND bucket < ?", [minute, hour]),
+        (f"SELECT {select_cols}SUM(count) AS count FROM logs_rollup_1h WHERE bucket >= ? AND bucket < ?", [hour, day]),
+        (f"SELECT {select_cols}SUM(count) AS count FROM logs_rollup_1d WHERE bucket >= ?", [day]),
+    ]
+    parts = []
+    params: list = []
+    for sql, seg_params in segments:
+        parts.append(sql + filter_sql + group_sql)
+        params.extend(seg_params + filter_params)
+
+    union = " UNION ALL ".join(parts)
+    sql = f"SELECT {select_cols}CAST(COALESCE(SUM(count), 0) AS BIGINT) AS count FROM ({union}){group_sql}"
+    return sql, params
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+import datetime as dt
+import os
+import random
+import shutil
+import subprocess
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("chimera")
+
+
+# Background maintenance: periodic jobs run one at a time (by default) in
+# niced, idle-IO threads and step aside while interactive requests are in flight
+DEFAULT_MAX_CONCURRENT = 1
+DEFAULT_JITTER = 0.1  # +/- fraction of the interval
+DEFAULT_NICE = 10
+DEFAULT_IONICE_CLASS = "idle"
+DEFAULT_DEFER_SECONDS = 5
+DEFAULT_MAX_DEFER_SECONDS = 300
+
+IONICE_CLASSES = {"realtime": "1", "best-effort": "2", "idle": "3"}
+
+
+def lower_thread_priority(nice: int = DEFAULT_NICE, ionice_class: Optional[str] = DEFAULT_IONICE_CLASS) -> None:
+    """Lower the CPU and IO priority of the calling thread (Linux, best effort).
+
+    Linux schedules threads individually, so this leaves the request threads
+    untouched. Work done inside DuckDB's own thread pool is sized by the
+    storage profile instead.
+    """
+    tid = threading.get_native_id()
+    if nice:
+        try:
+            current = os.getpriority(os.PRIO_PROCESS, tid)
+            os.setpriority(os.PRIO_PROCESS, tid, min(19, max(current, int(nice))))
+        except (AttributeError, OSError) as exc:
+            logger.debug(f"Could not renice maintenance thread: {exc}")
+    io_class = IONICE_CLASSES.get(ionice_class or "")
+    if io_class and shutil.which("ionice"):
+        try:
+            subprocess.run(["ionice", "-c", io_class, "-p", str(tid)], capture_output=True, timeout=5)
+        except Exception as exc:
+            logger.debug(f"Could not ionice maintenance thread: {exc}")
+
+
+class Job:
+    """A periodic maintenance job and its run statistics"""
+
+    def __init__(self, name: str, func: Callable[[], Any], interval_seconds: int,
+                 priority: int = 5, jitter: float = DEFAULT_JITTER, enabled: bool = True,
+                 run_at_start: bool = False):
+        self.name = name
+        self.func = func
+        self.interval_seconds = max(1, int(interval_seconds))
+        self.priority = int(priority)
+        self.jitter = max(0.0, float(jitter))
+        self.enabled = enabled
+        self.next_run = time.monotonic() + (0 if run_at_start else self._next_delay())
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.deferrals = 0
+        self.deferred_since: Optional[float] = None
+        self.last_run: Optional[str] = None
+        self.last_duration_ms: Optional[float] = None
+        self.total_duration_ms = 0.0
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+
+    def _next_delay(self) -> float:
+        spread = self.interval_seconds * self.jitter
+        return max(1.0, self.interval_seconds + random.uniform(-spread, spread))
+
+    def schedule_next(self) -> None:
+        self.next_run = time.monotonic() + self._next_delay()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "priority": self.priority,
+            "interval_seconds": self.interval_seconds,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "deferrals": self.deferrals,
+            "last_run": self.last_run,
+            "last_duration_ms": self.last_duration_ms,
+            "avg_duration_ms": round(self.total_duration_ms / self.runs, 2) if self.runs else None,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "next_run_in_seconds": max(0.0, round(self.next_run - time.monotonic(), 1)),
+        }
+
+
+class MaintenanceScheduler:
+    """Run registered jobs when due, highest priority (lowest number) first"""
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT, nice: int = DEFAULT_NICE,
+                 ionice_class: Optional[str] = DEFAULT_IONICE_CLASS,
+                 busy: Optional[Callable[[], bool]] = None,
+                 defer_seconds: float = DEFAULT_DEFER_SECONDS,
+                 max_defer_seconds: float = DEFAULT_MAX_DEFER_SECONDS):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.nice = nice
+        self.ionice_class = ionice_class
+        self.busy = busy
+        self.defer_seconds = max(0.1, float(defer_seconds))
+        self.max_defer_seconds = max(0.0, float(max_defer_seconds))
+        self.jobs: Dict[str, Job] = {}
+        self._cond = threading.Condition()
+        self._active = 0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, settings: Dict[str, Any], busy: Optional[Callable[[], bool]] = None) -> "MaintenanceScheduler":
+        return cls(
+            max_concurrent=int(settings.get("max_concurrent", DEFAULT_MAX_CONCURRENT)),
+            nice=int(settings.get("nice", DEFAULT_NICE)),
+            ionice_class=settings.get("ionice_class", DEFAULT_IONICE_CLASS),
+            busy=busy,
+            defer_seconds=float(settings.get("defer_seconds", DEFAULT_DEFER_SECONDS)),
+            max_defer_seconds=float(settings.get("max_defer_seconds", DEFAULT_MAX_DEFER_SECONDS)),
+        )
+
+    def register(self, job: Job) -> Job:
+        with self._cond:
+            self.jobs[job.name] = job
+            self._cond.notify_all()
+        return job
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="chimera-maintenance", daemon=True)
+        self._thread.start()
+        logger.info(f"Maintenance scheduler started with jobs: {', '.join(sorted(self.jobs))}")
+
+    def stop(self, timeout: float = 30.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def run_now(self, name: str, wait: bool = True) -> Dict[str, Any]:
+        """Run a job out of schedule, respecting the concurrency cap"""
+        job = self.jobs.get(name)
+        if job is None:
+            raise ValueError(f"Unknown job: {name}")
+        with self._cond:
+            while job.running or self._active >= self.max_concurrent:
+                self._cond.wait()
+            self._claim(job)
+        worker = threading.Thread(target=self._execute, args=(job,), name=f"chimera-job-{name}", daemon=True)
+        worker.start()
+        if wait:
+            worker.join()
+        return job.stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "max_concurrent": self.max_concurrent,
+                "active": self._active,
+                "nice": self.nice,
+                "ionice_class": self.ionice_class,
+                "jobs": [job.stats() for job in sorted(self.jobs.values(), key=lambda j: (j.priority, j.name))],
+            }
+
+    def _claim(self, job: Job) -> None:
+        job.running = True
+        job.deferred_since = None
+        self._active += 1
+
+    def _is_busy(self) -> bool:
+        try:
+            return bool(self.busy and self.busy())
+        except Exception:
+            return False
+
+    def _due_jobs(self, now: float) -> List[Job]:
+        due = [job for job in self.jobs.values() if job.enabled and not job.running and job.next_run <= now]
+        return sorted(due, key=lambda j: (j.priority, j.next_run))
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                now = time.monotonic()
+                started: List[Job] = []
+                busy = None
+                for job in self._due_jobs(now):
+                    if self._active >= self.max_concurrent:
+                        break
+                    if busy is None:
+                        busy = self._is_busy()
+                    if busy:
+                        # Interactive requests in flight: wait, but not past max_defer_seconds
+                        if job.deferred_since is None:
+                            job.deferred_since = now
+                        if now - job.deferred_since < self.max_defer_seconds:
+                            job.deferrals += 1
+                            job.next_run = now + self.defer_seconds
+                            continue
+                    self._claim(job)
+                    started.append(job)
+                pending = [job.next_run for job in self.jobs.values() if job.enabled and not job.running]
+                timeout = max(0.05, min(pending) - now) if pending else None
+                if not started:
+                    self._cond.wait(timeout)
+                    continue
+            for job in started:
+                threading.Thread(target=self._execute, args=(job,), name=f"chimera-job-{job.name}", daemon=True).start()
+
+    def _execute(self, job: Job) -> None:
+        lower_thread_priority(self.nice, self.ionice_class)
+        started = time.perf_counter()
+        job.last_run = dt.datetime.now(dt.timezone.utc).isoformat()
+        try:
+            result = job.func()
+            job.last_result = result if isinstance(result, (int, float, str, bool, dict, list, type(None))) else str(result)
+            job.last_error = None
+        except Exception as exc:
+            job.failures += 1
+            job.last_error = str(exc)
+            logger.error(f"Maintenance job {job.name} failed: {exc}")
+        finally:
+            elapsed = round((time.perf_counter() - started) * 1000, 2)
+            with self._cond:
+                job.runs += 1
+                job.last_duration_ms = elapsed
+                job.total_duration_ms += elapsed
+                job.running = False
+                job.schedule_next()
+                self._active -= 1
+                self._cond.notify_all()
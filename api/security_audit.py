@@ -8,7 +8,35 @@ import time
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 
-from .db import get_connection
+from .db import ensure_id_sequence, get_connection
+from . import jobs, writer
+
+
+def write_audit_record(conn, record: List[Any]) -> Optional[int]:
+    """Insert one (tool, status, result_data, summary, severity) audit; returns its id"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS security_audits (
+            id BIGINT PRIMARY KEY,
+            tool TEXT NOT NULL,
+            scan_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT NOT NULL,
+            result_data TEXT,
+            summary TEXT,
+            severity TEXT DEFAULT 'info'
+        )
+    """)
+
+    ensure_id_sequence(conn, "security_audits_id_seq", "security_audits")
+
+    row = conn.execute("""
+        INSERT INTO security_audits (id, tool, status, result_data, summary, severity)
+        VALUES (nextval('security_audits_id_seq'), ?, ?, ?, ?, ?)
+        RETURNING id
+    """, record).fetchone()
+    return row[0] if row else None
+
+
+writer.register_handler("audits", write_audit_record)
 
 
 class SecurityAuditor:
@@ -38,34 +66,20 @@ class SecurityAuditor:
 
     def _store_audit_result(self, tool: str, result: Dict[str, Any]) -> Optional[int]:
         """Store audit result in database"""
-        conn = get_connection(self.db_path)
-        try:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS security_audits (
-                    id BIGINT PRIMARY KEY,
-                    tool TEXT NOT NULL,
-                    scan_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT NOT NULL,
-                    result_data TEXT,
-                    summary TEXT,
-                    severity TEXT DEFAULT 'info'
-                )
-            """)
-
-            conn.execute("""
-                INSERT INTO security_audits (tool, status, result_data, summary, severity)
-                VALUES (?, ?, ?, ?, ?)
-            """, [
-                tool,
-                result.get("status", "unknown"),
-                json.dumps(result),
-                result.get("summary", ""),
-                result.get("severity", "info")
-            ])
-
-            last_row_id_result = conn.execute("SELECT last_insert_rowid()").fetchone()
-            return last_row_id_result[0] if last_row_id_result else None
+        record = [
+            tool,
+            result.get("status", "unknown"),
+            json.dumps(result),
+            result.get("summary", ""),
+            result.get("severity", "info")
+        ]
+        request = writer.submit(self.db_path, "audits", record)
+        if request:
+            return request.result
 
+        conn = get_connection(self.db_path, profile="batch")
+        try:
+            return write_audit_record(conn, record)
         finally:
             conn.close()
 
@@ -468,7 +482,10 @@ class SecurityAuditor:
             ("lynis", self.run_lynis_check)
         ]
 
-        for tool_name, audit_func in audit_functions:
+        for done, (tool_name, audit_func) in enumerate(audit_functions):
+            # Async AUDIT FULL jobs report each tool and can be cancelled between tools
+            jobs.check_cancelled()
+            jobs.report_progress(done, len(audit_functions), tool_name)
             try:
                 result = audit_func()
                 audit_results["audits"][tool_name] = result
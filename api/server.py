@@ -6,10 +6,13 @@ import socket
 import signal
 import sys
 import threading
+import time
 import logging
 import logging.handlers
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
 # --- Logging Setup ---
 LOG_FILE = os.environ.get("CHIMERA_LOG_FILE", "/var/log/chimera/api.log")
@@ -45,21 +48,45 @@ except Exception as _log_exc:
 # --- End Logging Setup ---
 
 try:
-    from .db import get_connection, initialize_schema, clear_table
+    from .db import get_connection, initialize_schema, clear_table, ensure_promoted_fields
     from .ingest import ingest_journal_into_duckdb
     from .config import ChimeraConfig
     from .ingest_framework import IngestionFramework
     from .embeddings import SemanticSearchEngine, AnomalyDetector, RAGChatEngine
     from .system_health import SystemHealthMonitor, SystemMetricsCollector
+    from .retention import RetentionManager
+    from . import (
+        embeddings, indexer, jobs, log_dictionary, promoted_fields, query_guard, raw_store, rollups, scheduler,
+        shards, snapshots, storage, templates, text_index, trigram_index, writer,
+    )
+    from .log_store import severity_level
 except Exception as e:
     logger.error(f"Failed to import modules: {e}")
     # Fallback to relative imports when executed directly
-    from db import get_connection, initialize_schema
+    from db import get_connection, initialize_schema, ensure_promoted_fields
     from ingest import ingest_journal_into_duckdb
     from config import ChimeraConfig
     from ingest_framework import IngestionFramework
     from embeddings import SemanticSearchEngine, AnomalyDetector, RAGChatEngine
     from system_health import SystemHealthMonitor, SystemMetricsCollector
+    from retention import RetentionManager
+    import embeddings
+    import indexer
+    import jobs
+    import log_dictionary
+    import promoted_fields
+    import query_guard
+    import raw_store
+    from log_store import severity_level
+    import rollups
+    import scheduler
+    import shards
+    import snapshots
+    import storage
+    import templates
+    import text_index
+    import trigram_index
+    import writer
     logger.warning("Using fallback relative imports.")
 
 
@@ -69,6 +96,57 @@ DEFAULT_SOCKET_PATH = os.environ.get("CHIMERA_API_SOCKET", config.socket_path)
 DEFAULT_DB_PATH = os.environ.get("CHIMERA_DB_PATH", config.db_path)
 logger.info(f"Configuration loaded. Socket: {DEFAULT_SOCKET_PATH}, DB: {DEFAULT_DB_PATH}")
 
+# Background retention manager (started by main)
+retention_manager: Optional["RetentionManager"] = None
+
+# Background maintenance scheduler (started by main) and its report cache
+maintenance: Optional["scheduler.MaintenanceScheduler"] = None
+pregenerated_reports: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+
+# Background embedding indexer (started by main when enabled)
+embedding_indexer: Optional["indexer.EmbeddingIndexer"] = None
+
+# SEARCH retrieval modes: vector only, or BM25 and vectors fused (see hybrid_search)
+SEARCH_MODES = ("semantic", "hybrid")
+
+# Background jobs for long-running commands sent with async=true (see JOB)
+ASYNC_COMMANDS = {"INDEX", "AUDIT", "REPORT", "INGEST_ALL"}
+job_manager = jobs.JobManager()
+
+# Built-in maintenance jobs; lower priority numbers run first when several are due
+MAINTENANCE_JOB_DEFAULTS = {
+    "metrics": {"interval_seconds": 60, "priority": 0},
+    "retention": {"interval_seconds": 3600, "priority": 1},
+    "checkpoint": {"interval_seconds": 21600, "priority": 2},
+    "embeddings_cleanup": {"interval_seconds": 86400, "priority": 3},
+    "rollups": {"interval_seconds": 86400, "priority": 4},
+    "report": {"interval_seconds": 3600, "priority": 5},
+    "text_index": {"interval_seconds": 3600, "priority": 1, "run_at_start": True},
+}
+REPORT_PREGENERATE_SINCE_SECONDS = 86400
+# Days of rollup buckets the rollups job recounts (it runs daily, so two overlap)
+ROLLUP_RECONCILE_DAYS = 2
+
+# Interactive requests in flight; maintenance jobs wait while any are running
+INTERACTIVE_COMMANDS = {"QUERY_LOGS", "DISCOVER", "SEARCH", "RAW", "TEMPLATES", "ANOMALIES", "METRICS", "ALERTS", "CHAT"}
+_interactive_lock = threading.Lock()
+_interactive_in_flight = 0
+
+# Process split (started by main): the API process reads published snapshots and
+# forwards everything else to the worker, which publishes them
+read_snapshots: Optional["snapshots.SnapshotReader"] = None
+worker_socket_path: Optional[str] = None
+snapshot_publisher: Optional["snapshots.SnapshotPublisher"] = None
+
+# Per-source shard directory when sharding is enabled (set by main)
+shard_dir: Optional[str] = None
+
+# Commands a split-mode API process answers itself from the current snapshot
+SNAPSHOT_READ_COMMANDS = {
+    "PING", "HEALTH", "VERSION", "QUERY_LOGS", "DISCOVER", "SEARCH",
+    "ANOMALIES", "METRICS", "ALERTS", "REPORT", "RAW", "TEMPLATES",
+}
+
 
 def cleanup_socket(path: str) -> None:
     try:
@@ -97,6 +175,9 @@ def set_permissions(path: str) -> None:
 
 APP_VERSION = "0.1.0"
 
+# Wall-clock cap for QUERY_LOGS regex scans (seconds)
+QUERY_REGEX_TIMEOUT_SECONDS = float(os.environ.get("CHIMERA_REGEX_TIMEOUT", "5"))
+
 
 def validate_integer_param(value: str, param_name: str, min_val: int = 0, max_val: Optional[int] = None) -> int:
     """Validate and sanitize integer parameters"""
@@ -173,7 +254,7 @@ def _handle_ingest_journal(conn: socket.socket, db_path: Optional[str], tokens:
             conn.sendall(f"ERR {e}\n".encode())
             return
         try:
-            inserted, total = ingest_journal_into_duckdb(db_conn, last_seconds=seconds, limit=limit)
+            inserted, total = ingest_journal_into_duckdb(db_conn, last_seconds=seconds, limit=limit, db_path=db_path)
             conn.sendall(f"OK inserted={inserted} total={total}\n".encode())
         except Exception as exc:
             conn.sendall(f"ERR {exc}\n".encode())
@@ -211,8 +292,30 @@ def _parse_query_logs_params(tokens: list):
     unit = validate_string_param(args.get("unit", ""), "unit", max_length=100) if args.get("unit") else None
     hostname = validate_string_param(args.get("hostname", ""), "hostname", max_length=255) if args.get("hostname") else None
     contains = validate_string_param(args.get("contains", ""), "contains", max_length=500) if args.get("contains") else None
+    match = validate_string_param(args.get("match", ""), "match", max_length=500) if args.get("match") else None
+    regex = validate_string_param(args.get("regex", ""), "regex", max_length=500) if args.get("regex") else None
+    # Promoted journald fields: fields=_COMM,_EXE projects, field._COMM=sshd filters
+    fields = validate_string_param(args.get("fields", ""), "fields", max_length=500) if args.get("fields") else None
+    field_names = [name.strip().upper() for name in fields.split(",") if name.strip()] if fields else []
+    field_filters = {
+        k[len("field."):].upper(): validate_string_param(v, k, max_length=500)
+        for k, v in args.items() if k.startswith("field.") and v != ""
+    }
 
-    return since_seconds, limit, order, min_sev, source, unit, hostname, contains
+    return {
+        "since_seconds": since_seconds,
+        "limit": limit,
+        "order": order,
+        "min_severity": min_sev,
+        "source": source,
+        "unit": unit,
+        "hostname": hostname,
+        "contains": contains,
+        "match": match,
+        "regex": regex,
+        "fields": field_names,
+        "field_filters": field_filters,
+    }
 
 
 def _handle_query_logs(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
@@ -220,70 +323,149 @@ def _handle_query_logs(conn: socket.socket, db_path: Optional[str], tokens: list
     try:
         db_conn = get_connection(db_path)
         initialize_schema(db_conn)
+        federated = shards.federate(db_conn, shard_dir) if shard_dir else []
+        # Encoded layout: filter and sort logs_data on codes, decode only the page
+        encoded = not federated and log_dictionary.is_encoded(db_conn)
     except Exception:
         conn.sendall(b"ERR db-not-initialized\n")
     else:
         now = dt.datetime.now(dt.timezone.utc)
 
         try:
-            since_seconds, limit, order, min_sev, source, unit, hostname, contains = _parse_query_logs_params(tokens)
+            params_in = _parse_query_logs_params(tokens)
         except ValueError as e:
             conn.sendall(f"ERR {e}\n".encode())
             return
 
-        since_ts = now - dt.timedelta(seconds=since_seconds)
+        since_ts = now - dt.timedelta(seconds=params_in["since_seconds"])
+        min_sev = params_in["min_severity"]
+        order = params_in["order"]
 
         where_clauses = ["ts >= ?"]
         params: list = [since_ts]
 
+        threshold = None
         if min_sev:
-            sev_map = {
-                "emerg": 0,
-                "alert": 1,
-                "crit": 2,
-                "err": 3,
-                "warning": 4,
-                "notice": 5,
-                "info": 6,
-                "debug": 7,
-            }
-            threshold = sev_map.get(min_sev.lower())
+            threshold = severity_level(min_sev.lower())
             if threshold is not None:
-                where_clauses.append(
-                    "(CASE severity WHEN 'emerg' THEN 0 WHEN 'alert' THEN 1 WHEN 'crit' THEN 2 WHEN 'err' THEN 3 WHEN 'warning' THEN 4 WHEN 'notice' THEN 5 WHEN 'info' THEN 6 WHEN 'debug' THEN 7 ELSE 99 END) <= ?"
-                )
+                where_clauses.append("severity_level <= ?")
                 params.append(threshold)
 
-        if source:
-            where_clauses.append("source = ?")
-            params.append(source)
-        if unit:
-            where_clauses.append("unit = ?")
-            params.append(unit)
-        if hostname:
-            where_clauses.append("hostname = ?")
-            params.append(hostname)
-        if contains:
+        for column in ("source", "unit", "hostname"):
+            if params_in[column]:
+                if encoded:
+                    clause, values = log_dictionary.equals_clause(db_conn, column, params_in[column])
+                else:
+                    clause, values = f"{column} = ?", [params_in[column]]
+                where_clauses.append(clause)
+                params.extend(values)
+
+        # Promoted fields resolve to registered columns only
+        if params_in["fields"] or params_in["field_filters"]:
+            registered = {spec[0]: spec for spec in promoted_fields.get_specs(db_conn)}
+            unknown = [name for name in list(params_in["fields"]) + list(params_in["field_filters"]) if name not in registered]
+            if unknown:
+                conn.sendall(f"ERR unknown-field:{unknown[0]}\n".encode())
+                db_conn.close()
+                return
+            for name, value in params_in["field_filters"].items():
+                _field, column, sql_type = registered[name]
+                where_clauses.append(f"{column} = ?")
+                params.append(promoted_fields.convert(value, sql_type))
+            projected = [(name, registered[name][1]) for name in params_in["fields"]]
+        else:
+            projected = []
+        field_select = "".join(f", {column}" for _name, column in projected)
+        # Substring / regex: prune candidates through the trigram index, then verify exactly
+        required_trigrams: set = set()
+        if params_in["contains"]:
+            required_trigrams |= trigram_index.substring_trigrams(params_in["contains"])
+        if params_in["regex"]:
+            required_trigrams |= trigram_index.regex_trigrams(params_in["regex"])
+        candidates = trigram_index.build_candidate_sql(required_trigrams, since_ts.replace(tzinfo=None))
+        if candidates:
+            where_clauses.append(f"id IN ({candidates[0]})")
+            params.extend(candidates[1])
+        if params_in["contains"]:
             where_clauses.append("message ILIKE ?")
-            params.append(f"%{contains}%")
+            params.append(f"%{params_in['contains']}%")
+        if params_in["regex"]:
+            where_clauses.append("regexp_matches(message, ?)")
+            params.append(params_in["regex"])
+
+        # Token match: rank by BM25 over the incremental term index
+        hits_sql = ""
+        hits_params: list = []
+        if params_in["match"]:
+            match_cte = text_index.build_match_cte(db_conn, params_in["match"], since_ts.replace(tzinfo=None))
+            if match_cte is None:
+                conn.sendall(b"ERR match-query-has-no-terms\n")
+                db_conn.close()
+                return
+            hits_sql, hits_params = match_cte
 
         where_sql = " AND ".join(where_clauses)
-        sql = (
-            "SELECT ts, hostname, source, unit, severity, pid, message "
-            "FROM logs WHERE "
-            + where_sql
-            + f" ORDER BY ts {order} LIMIT ?"
-        )
-        params.append(limit)
-
+        columns = ["id", "ts", "hostname", "source", "unit", "severity", "pid", "message"]
+        if encoded:
+            table = log_dictionary.ENCODED_TABLE
+            column_select = ", ".join(log_dictionary.code_column(c) for c in columns)
+        else:
+            table = "logs"
+            column_select = ", ".join(columns)
+        if hits_sql:
+            order_sql = f"score DESC, ts {order}"
+            sql = (
+                f"SELECT {column_select}, hits.score AS score{field_select} "
+                f"FROM {table} logs JOIN hits ON logs.id = hits.log_id WHERE "
+                + where_sql
+                + f" ORDER BY {order_sql} LIMIT ?"
+            )
+            params = hits_params + params
+        else:
+            order_sql = f"ts {order}"
+            sql = (
+                f"SELECT {column_select}, NULL AS score{field_select} "
+                f"FROM {table} logs WHERE "
+                + where_sql
+                + f" ORDER BY {order_sql} LIMIT ?"
+            )
+        if encoded:
+            output = columns + ["score"] + [column for _name, column in projected]
+            sql = log_dictionary.decode_sql(sql, output, order_by=order_sql)
+        if hits_sql:
+            sql = f"WITH hits AS ({hits_sql}) " + sql
+        params.append(params_in["limit"])
+
+        # Every query runs under the command deadline and stops when the client
+        # goes away; RE2 is linear-time, but a broad regex gets a tighter cap
+        deadline_seconds = query_guard.timeout_for("QUERY_LOGS")
+        regex_capped = bool(params_in["regex"]) and QUERY_REGEX_TIMEOUT_SECONDS < deadline_seconds
+        if regex_capped:
+            deadline_seconds = QUERY_REGEX_TIMEOUT_SECONDS
+        guard = None
         try:
             cur = db_conn.cursor()
-            cur.execute(sql, params)
-            rows = cur.fetchall()
+            if shard_dir:
+                # Temp views are per connection; the cursor needs its own
+                shards.federate(cur, shard_dir)
+            # Size the ts window from the rollups; the planner cannot see it
+            window_filters = {column: [params_in[column]] for column in ("source", "unit", "hostname") if params_in[column]}
+            cost = query_guard.check_cost(cur, sql, params, since=since_ts.replace(tzinfo=None),
+                                          filters=window_filters, max_severity_level=threshold)
+            if cost == "reject":
+                conn.sendall(b"ERR too-expensive\n")
+                return
+            if cost == "downgrade":
+                regex_capped = False
+                deadline_seconds = min(deadline_seconds, float(query_guard.cost_guard()["downgrade_timeout_seconds"]))
+            with query_guard.Deadline(cur, deadline_seconds, client=conn) as guard:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
             # Stream JSONL back to client
             for r in rows:
-                ts, host, src, u, sev, pid, msg = r
+                log_id, ts, host, src, u, sev, pid, msg, score = r[:9]
                 item = {
+                    "id": log_id,
                     "ts": ts.isoformat(sep=" "),
                     "hostname": host,
                     "source": src,
@@ -292,10 +474,28 @@ def _handle_query_logs(conn: socket.socket, db_path: Optional[str], tokens: list
                     "pid": pid,
                     "message": msg,
                 }
+                if score is not None:
+                    item["score"] = round(score, 4)
+                if projected:
+                    item["fields"] = {name: value for (name, _column), value in zip(projected, r[9:])}
                 conn.sendall((json.dumps(item) + "\n").encode())
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("QUERY_LOGS client disconnected mid-stream")
         except Exception as exc:
-            logger.error(f"Database error in QUERY_LOGS command: {exc}")
-            conn.sendall(b"ERR database-error\n")
+            reason = guard.reason if guard is not None else None
+            if reason == query_guard.DISCONNECTED:
+                logger.info("QUERY_LOGS cancelled: client disconnected")
+            elif reason == query_guard.TIMEOUT and regex_capped:
+                logger.warning(f"QUERY_LOGS regex exceeded {QUERY_REGEX_TIMEOUT_SECONDS}s: {params_in['regex']!r}")
+                conn.sendall(b"ERR regex-timeout\n")
+            elif reason == query_guard.TIMEOUT:
+                logger.warning(f"QUERY_LOGS exceeded {deadline_seconds}s deadline")
+                conn.sendall(b"ERR timeout\n")
+            elif params_in["regex"] and type(exc).__name__ == "InvalidInputException":
+                conn.sendall(b"ERR invalid-regex\n")
+            else:
+                logger.error(f"Database error in QUERY_LOGS command: {exc}")
+                conn.sendall(b"ERR database-error\n")
         finally:
             try:
                 db_conn.close()
@@ -347,21 +547,34 @@ def _handle_discover(conn: socket.socket, db_path: Optional[str], tokens: list)
         if not col:
             conn.sendall(b"ERR discover-kind-required\n")
         else:
+            guard = None
             try:
                 cur = db_conn.cursor()
-                # Use parameterized column name from whitelist
+                if shard_dir:
+                    shards.federate(cur, shard_dir)
+                # Use parameterized column name from whitelist; counts come from the rollups
+                counts_sql, counts_params = rollups.counts_since_sql(since_ts, [col])
                 sql = (
-                    f"SELECT {col} AS value, COUNT(*) AS count FROM logs WHERE ts >= ? "
-                    f"GROUP BY {col} ORDER BY count DESC NULLS LAST, value NULLS LAST LIMIT ?"
+                    f"SELECT {col} AS value, count FROM ({counts_sql}) "
+                    "ORDER BY count DESC NULLS LAST, value NULLS LAST LIMIT ?"
                 )
-                cur.execute(sql, [since_ts, limit])
-                rows = cur.fetchall()
+                with query_guard.Deadline(cur, query_guard.timeout_for("DISCOVER"), client=conn) as guard:
+                    cur.execute(sql, counts_params + [limit])
+                    rows = cur.fetchall()
                 for value, count in rows:
                     item = {"value": value, "count": count}
                     conn.sendall((json.dumps(item) + "\n").encode())
+            except (BrokenPipeError, ConnectionResetError):
+                logger.info("DISCOVER client disconnected mid-stream")
             except Exception as exc:
-                logger.error(f"Database error in DISCOVER command: {exc}")
-                conn.sendall(b"ERR database-error\n")
+                reason = guard.reason if guard is not None else None
+                if reason == query_guard.DISCONNECTED:
+                    logger.info("DISCOVER cancelled: client disconnected")
+                elif reason == query_guard.TIMEOUT:
+                    conn.sendall(b"ERR timeout\n")
+                else:
+                    logger.error(f"Database error in DISCOVER command: {exc}")
+                    conn.sendall(b"ERR database-error\n")
             finally:
                 try:
                     db_conn.close()
@@ -502,18 +715,37 @@ def _handle_ingest_all(conn: socket.socket, db_path: Optional[str], tokens: list
     """Handle INGEST_ALL command"""
     # Ingest from all enabled sources
     try:
-        framework = IngestionFramework(db_path)
+        framework = IngestionFramework(db_path, shard_dir=shard_dir)
         total_inserted = 0
         total_sources = 0
 
-        for source in config.get_enabled_sources():
+        job = jobs.current_job()
+        sources = config.get_enabled_sources()
+        finished = []
+
+        def ingest(source):
+            jobs.check_cancelled(job)
             try:
                 inserted, _ = framework.ingest_source(source, last_seconds=3600, limit=1000)
-                total_inserted += inserted
-                total_sources += 1
+                return inserted
             except Exception as exc:
                 # Log error but continue with other sources
                 print(f"Error ingesting {source.name}: {exc}", file=sys.stderr)
+                return None
+            finally:
+                finished.append(source.name)
+                jobs.report_progress(len(finished), len(sources), source.name, job=job)
+
+        if shard_dir and len(sources) > 1:
+            # Shards do not share a writer, so sources ingest in parallel
+            with ThreadPoolExecutor(max_workers=min(len(sources), os.cpu_count() or 1)) as pool:
+                results = list(pool.map(ingest, sources))
+        else:
+            results = [ingest(source) for source in sources]
+        for inserted in results:
+            if inserted is not None:
+                total_inserted += inserted
+                total_sources += 1
 
         conn.sendall(f"OK inserted={total_inserted} sources={total_sources}\n".encode())
 
@@ -524,6 +756,7 @@ def _handle_ingest_all(conn: socket.socket, db_path: Optional[str], tokens: list
 def _handle_search(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
     """Handle SEARCH command"""
     # Usage: SEARCH query="text" [n_results=N] [since=SECONDS] [source=SOURCE] [unit=UNIT] [severity=SEVERITY]
+    #        [mode=semantic|hybrid]
     try:
         if len(tokens) < 2:
             conn.sendall(b"ERR search-query-required\n")
@@ -555,28 +788,71 @@ def _handle_search(conn: socket.socket, db_path: Optional[str], tokens: list) ->
             source = validate_string_param(args.get("source", ""), "source", max_length=100) if args.get("source") else None
             unit = validate_string_param(args.get("unit", ""), "unit", max_length=100) if args.get("unit") else None
             severity = validate_string_param(args.get("severity", ""), "severity", max_length=20) if args.get("severity") else None
+            mode = args.get("mode", "semantic").lower()
+            if mode not in SEARCH_MODES:
+                raise ValueError(f"mode must be one of: {', '.join(SEARCH_MODES)}")
         except ValueError as e:
             conn.sendall(f"ERR {e}\n".encode())
             return
 
         search_engine = SemanticSearchEngine(db_path)
-        results = search_engine.search_logs(
-            query=query,
-            n_results=n_results,
-            since_seconds=since_seconds,
-            source=source,
-            unit=unit,
-            severity=severity
-        )
+        meta = None
+        if mode == "hybrid":
+            found, reason = _run_with_deadline(conn, "SEARCH", lambda: search_engine.search_hybrid(
+                query=query,
+                n_results=n_results,
+                since_seconds=since_seconds,
+                source=source,
+                unit=unit,
+                severity=severity
+            ))
+            if reason:
+                return
+            results, meta = found
+        else:
+            results, reason = _run_with_deadline(conn, "SEARCH", lambda: search_engine.search_logs(
+                query=query,
+                n_results=n_results,
+                since_seconds=since_seconds,
+                source=source,
+                unit=unit,
+                severity=severity
+            ))
+            if reason:
+                return
 
-        # Stream results as JSONL
+        # Stream results as JSONL; hybrid searches end with a {"meta": ...} line
         for result in results:
-            conn.sendall((json.dumps(result) + "\n").encode())
+            conn.sendall((json.dumps(result, default=str) + "\n").encode())
+        if meta is not None:
+            conn.sendall((json.dumps({"meta": meta}) + "\n").encode())
 
     except Exception as exc:
         conn.sendall(f"ERR {exc}\n".encode())
 
 
+def _run_with_deadline(conn: socket.socket, command: str, func) -> Tuple[Any, Optional[str]]:
+    """Run func() under the command's deadline; returns (result, interrupt reason).
+
+    Connections opened inside func join the deadline. On a timeout the client
+    gets ERR timeout; a client that went away gets nothing.
+    """
+    guard = query_guard.Deadline(None, query_guard.timeout_for(command), client=conn)
+    result = None
+    try:
+        with guard:
+            result = func()
+    except Exception:
+        if guard.reason is None:
+            raise
+    if guard.reason == query_guard.DISCONNECTED:
+        logger.info(f"{command} cancelled: client disconnected")
+    elif guard.reason == query_guard.TIMEOUT:
+        logger.warning(f"{command} exceeded {guard.seconds}s deadline")
+        conn.sendall(b"ERR timeout\n")
+    return result, guard.reason
+
+
 def _handle_index(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
     """Handle INDEX command"""
     # Usage: INDEX [since=SECONDS] [limit=N]
@@ -595,8 +871,21 @@ def _handle_index(conn: socket.socket, db_path: Optional[str], tokens: list) ->
 
         search_engine = SemanticSearchEngine(db_path)
         indexed, total = search_engine.index_logs(since_seconds=since_seconds)
-
-        conn.sendall(f"OK indexed={indexed} total={total}\n".encode())
+        stats = dict(search_engine.last_index_stats)
+
+        # Per-source shards keep their own log_embeddings; index each under its writer lock
+        for name in (shards.list_shards(shard_dir) if shard_dir else []):
+            jobs.check_cancelled()
+            shard_engine = SemanticSearchEngine(db_path, shard=name)
+            with shards.writing(name):
+                shard_indexed, shard_total = shard_engine.index_logs(since_seconds=since_seconds)
+            indexed += shard_indexed
+            total += shard_total
+            for key in ("unique", "cached"):
+                stats[key] = stats.get(key, 0) + shard_engine.last_index_stats.get(key, 0)
+
+        conn.sendall(f"OK indexed={indexed} total={total} unique={stats.get('unique', 0)} "
+                     f"cached={stats.get('cached', 0)}\n".encode())
 
     except Exception as exc:
         conn.sendall(f"ERR {exc}\n".encode())
@@ -619,7 +908,9 @@ def _handle_anomalies(conn: socket.socket, db_path: Optional[str], tokens: list)
             return
 
         detector = AnomalyDetector(db_path)
-        anomalies = detector.detect_anomalies(since_seconds=since_seconds)
+        anomalies, reason = _run_with_deadline(conn, "ANOMALIES", lambda: detector.detect_anomalies(since_seconds=since_seconds))
+        if reason:
+            return
 
         # Stream anomalies as JSONL
         for anomaly in anomalies:
@@ -790,6 +1081,16 @@ def _handle_chat_stats(conn: socket.socket, db_path: Optional[str], tokens: list
     except Exception as exc:
         conn.sendall(f"ERR {exc}\n".encode())
 
+def _cached_report(since_seconds: int) -> Optional[Dict[str, Any]]:
+    """A report pre-generated within the report job's interval, if any"""
+    cached = pregenerated_reports.get(since_seconds)
+    job = maintenance.jobs.get("report") if maintenance is not None else None
+    if cached is None or job is None:
+        return None
+    generated_at, report = cached
+    return report if time.monotonic() - generated_at <= job.interval_seconds else None
+
+
 def _handle_report_generate(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
     """Handle REPORT GENERATE subcommand"""
     # Usage: REPORT GENERATE [since=SECONDS] [format=FORMAT] [output=PATH]
@@ -817,8 +1118,12 @@ def _handle_report_generate(conn: socket.socket, db_path: Optional[str], tokens:
     generator = ReportGenerator(db_path)
     delivery = ReportDelivery()
 
-    # Generate report
-    report = generator.generate_daily_report(since_seconds)
+    # Generate report, unless maintenance pre-generated a fresh one
+    report = _cached_report(since_seconds)
+    if report is None:
+        report, reason = _run_with_deadline(conn, "REPORT", lambda: generator.generate_daily_report(since_seconds))
+        if reason:
+            return
 
     if format_type == "json":
         result = json.dumps(report, indent=2)
@@ -866,8 +1171,12 @@ def _handle_report_send(conn: socket.socket, db_path: Optional[str], tokens: lis
     generator = ReportGenerator(db_path)
     delivery = ReportDelivery()
 
-    # Generate report
-    report = generator.generate_daily_report(since_seconds)
+    # Generate report, unless maintenance pre-generated a fresh one
+    report = _cached_report(since_seconds)
+    if report is None:
+        report, reason = _run_with_deadline(conn, "REPORT", lambda: generator.generate_daily_report(since_seconds))
+        if reason:
+            return
     report_text = generator.format_report_as_text(report)
     report_html = generator.format_report_as_html(report)
 
@@ -1083,6 +1392,351 @@ def _handle_audit(conn: socket.socket, db_path: Optional[str], tokens: list) ->
         conn.sendall(f"ERR {exc}\n".encode())
 
 
+def _get_retention_manager(db_path: Optional[str]) -> "RetentionManager":
+    """Return the server's retention manager, or a one-off manager for db_path"""
+    if retention_manager is not None and retention_manager.db_path == db_path:
+        return retention_manager
+    return RetentionManager(db_path, config)
+
+
+def _handle_retention_run(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle RETENTION RUN subcommand"""
+    # Usage: RETENTION RUN [dry_run=true] [checkpoint=true]
+    args = {}
+    for tok in tokens[2:]:
+        if "=" in tok:
+            k, v = tok.split("=", 1)
+            args[k.lower()] = v.lower() == "true"
+
+    result = _get_retention_manager(db_path).run(
+        dry_run=args.get("dry_run", False),
+        checkpoint=args.get("checkpoint", False)
+    )
+    conn.sendall((json.dumps(result) + "\n").encode())
+
+
+def _handle_retention_stats(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle RETENTION STATS subcommand"""
+    stats = _get_retention_manager(db_path).get_stats()
+    conn.sendall((json.dumps(stats) + "\n").encode())
+
+
+def _handle_retention_policy(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle RETENTION POLICY subcommand"""
+    policy = _get_retention_manager(db_path).get_policy()
+    conn.sendall((json.dumps(policy) + "\n").encode())
+
+
+# Retention action dispatcher
+RETENTION_HANDLERS = {
+    "RUN": _handle_retention_run,
+    "STATS": _handle_retention_stats,
+    "POLICY": _handle_retention_policy,
+}
+
+
+def _handle_retention(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle RETENTION command"""
+    # Usage: RETENTION RUN|STATS|POLICY [args...]
+    try:
+        if len(tokens) < 2:
+            conn.sendall(b"ERR missing retention action\n")
+            return
+
+        handler = RETENTION_HANDLERS.get(tokens[1].upper())
+        if handler:
+            handler(conn, db_path, tokens)
+        else:
+            conn.sendall(b"ERR unknown retention action\n")
+    except Exception as exc:
+        conn.sendall(f"ERR {exc}\n".encode())
+
+
+def _handle_writer(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle WRITER command"""
+    # Usage: WRITER STATS
+    action = tokens[1].upper() if len(tokens) >= 2 else ""
+    if action != "STATS":
+        conn.sendall(b"ERR writer action required: STATS\n")
+        return
+    active = writer.get_writer(db_path)
+    if active is None:
+        conn.sendall((json.dumps({"running": False}) + "\n").encode())
+        return
+    conn.sendall((json.dumps(active.get_stats()) + "\n").encode())
+
+
+def _handle_indexer(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle INDEXER command"""
+    # Usage: INDEXER STATS
+    action = tokens[1].upper() if len(tokens) >= 2 else "STATS"
+    if action != "STATS":
+        conn.sendall(b"ERR indexer action required: STATS\n")
+        return
+    try:
+        if embedding_indexer is not None:
+            stats = embedding_indexer.get_stats()
+        else:
+            db_conn = get_connection(db_path)
+            try:
+                stats = {"running": False, **indexer.lag_stats(db_conn)}
+            finally:
+                db_conn.close()
+        conn.sendall((json.dumps(stats, default=str) + "\n").encode())
+    except Exception as exc:
+        conn.sendall(f"ERR {exc}\n".encode())
+
+
+def _handle_maintenance(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle MAINTENANCE command"""
+    # Usage: MAINTENANCE STATS | MAINTENANCE RUN job=NAME
+    action = tokens[1].upper() if len(tokens) >= 2 else "STATS"
+    if maintenance is None:
+        conn.sendall(b"ERR maintenance not running\n")
+        return
+    if action == "STATS":
+        conn.sendall((json.dumps(maintenance.get_stats(), default=str) + "\n").encode())
+    elif action == "RUN":
+        args = dict(tok.split("=", 1) for tok in tokens[2:] if "=" in tok)
+        try:
+            stats = maintenance.run_now(args.get("job", ""))
+        except ValueError as exc:
+            conn.sendall(f"ERR {exc}\n".encode())
+            return
+        conn.sendall((json.dumps(stats, default=str) + "\n").encode())
+    else:
+        conn.sendall(b"ERR maintenance action required: STATS|RUN\n")
+
+
+def _handle_job(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle JOB command"""
+    # Usage: JOB LIST | JOB STATUS|CANCEL id=ID | JOB WAIT id=ID [timeout=SECONDS]
+    action = tokens[1].upper() if len(tokens) >= 2 else ""
+    args = dict(tok.split("=", 1) for tok in tokens[2:] if "=" in tok)
+    if action == "LIST":
+        for job in job_manager.list():
+            conn.sendall((json.dumps(job.to_dict(include_result=False)) + "\n").encode())
+        return
+    if action not in ("STATUS", "WAIT", "CANCEL"):
+        conn.sendall(b"ERR job action required: STATUS|WAIT|CANCEL|LIST\n")
+        return
+    job_id = args.get("id", "")
+    if action == "WAIT":
+        try:
+            timeout = validate_integer_param(str(args.get("timeout", "30")), "timeout", min_val=0, max_val=86400)
+        except ValueError as e:
+            conn.sendall(f"ERR {e}\n".encode())
+            return
+        job = job_manager.wait(job_id, timeout)
+    elif action == "CANCEL":
+        job = job_manager.cancel(job_id)
+    else:
+        job = job_manager.get(job_id)
+    if job is None:
+        conn.sendall(f"ERR unknown job: {job_id}\n".encode())
+        return
+    conn.sendall((json.dumps(job.to_dict()) + "\n").encode())
+
+
+def _handle_snapshot(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle SNAPSHOT command"""
+    # Usage: SNAPSHOT STATUS|PUBLISH
+    action = tokens[1].upper() if len(tokens) >= 2 else "STATUS"
+    if action == "PUBLISH":
+        if snapshot_publisher is None:
+            conn.sendall(b"ERR process split not enabled\n")
+            return
+        try:
+            manifest = snapshot_publisher.publish()
+        except Exception as exc:
+            logger.error(f"Snapshot publish failed: {exc}")
+            conn.sendall(b"ERR snapshot-publish-failed\n")
+            return
+        conn.sendall((json.dumps(manifest) + "\n").encode())
+    elif action == "STATUS":
+        if read_snapshots is not None:
+            status = read_snapshots.status()
+        elif snapshot_publisher is not None:
+            status = snapshots.SnapshotReader(snapshot_publisher.snapshot_dir).status()
+        else:
+            status = {"enabled": False}
+        conn.sendall((json.dumps(status) + "\n").encode())
+    else:
+        conn.sendall(b"ERR unknown snapshot action\n")
+
+
+def _handle_shards(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle SHARDS command"""
+    # Usage: SHARDS LIST | SHARDS DROP name=SHARD | SHARDS ARCHIVE name=SHARD
+    if not shard_dir:
+        conn.sendall(b"ERR sharding not enabled\n")
+        return
+    action = tokens[1].upper() if len(tokens) >= 2 else "LIST"
+    args = {}
+    for tok in tokens[2:]:
+        if "=" in tok:
+            k, v = tok.split("=", 1)
+            args[k.lower()] = v
+    try:
+        db_conn = get_connection(db_path)
+    except Exception:
+        conn.sendall(b"ERR db-not-initialized\n")
+        return
+    try:
+        if action == "LIST":
+            for name in shards.list_shards(shard_dir):
+                shards.attach_shard(db_conn, shard_dir, name)
+            for item in shards.shard_stats(db_conn, shard_dir):
+                conn.sendall((json.dumps(item) + "\n").encode())
+        elif action in ("DROP", "ARCHIVE"):
+            name = validate_string_param(args.get("name", ""), "name", max_length=100)
+            archived = shards.detach_shard(db_conn, shard_dir, name, archive=action == "ARCHIVE")
+            conn.sendall((json.dumps({"name": name, "archived_to": archived}) + "\n").encode())
+        else:
+            conn.sendall(b"ERR unknown shards action\n")
+    except ValueError as exc:
+        conn.sendall(f"ERR {exc}\n".encode())
+    except Exception as exc:
+        logger.error(f"Database error in SHARDS command: {exc}")
+        conn.sendall(b"ERR database-error\n")
+    finally:
+        try:
+            db_conn.close()
+        except Exception:
+            pass
+
+
+def _handle_raw(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle RAW command"""
+    # Usage: RAW id=LOG_ID
+    args = {}
+    for tok in tokens[1:]:
+        if "=" in tok:
+            k, v = tok.split("=", 1)
+            args[k.lower()] = v
+    try:
+        log_id = validate_integer_param(str(args.get("id", "")), "id", min_val=-(2**63), max_val=2**63 - 1)
+    except ValueError as e:
+        conn.sendall(f"ERR {e}\n".encode())
+        return
+    try:
+        db_conn = get_connection(db_path)
+        initialize_schema(db_conn)
+        if shard_dir:
+            shards.federate(db_conn, shard_dir)
+    except Exception:
+        conn.sendall(b"ERR db-not-initialized\n")
+        return
+    try:
+        if not db_conn.execute("SELECT COUNT(*) FROM logs WHERE id = ?", [log_id]).fetchone()[0]:
+            conn.sendall(b"ERR not-found\n")
+            return
+        payload = raw_store.fetch(db_conn, log_id)
+        raw = json.loads(payload) if payload is not None else None
+        conn.sendall((json.dumps({"id": log_id, "raw": raw}) + "\n").encode())
+    except Exception as exc:
+        logger.error(f"Database error in RAW command: {exc}")
+        conn.sendall(b"ERR database-error\n")
+    finally:
+        try:
+            db_conn.close()
+        except Exception:
+            pass
+
+
+def _handle_templates(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle TEMPLATES command"""
+    # Usage: TEMPLATES [since=SECONDS] [limit=N]
+    args = {}
+    for tok in tokens[1:]:
+        if "=" in tok:
+            k, v = tok.split("=", 1)
+            args[k.lower()] = v
+    try:
+        since_seconds = validate_integer_param(str(args.get("since", "86400")), "since", min_val=1, max_val=86400*365)
+        limit = validate_integer_param(str(args.get("limit", "50")), "limit", min_val=1, max_val=10000)
+    except ValueError as e:
+        conn.sendall(f"ERR {e}\n".encode())
+        return
+    try:
+        db_conn = get_connection(db_path)
+        initialize_schema(db_conn)
+        if shard_dir:
+            shards.federate(db_conn, shard_dir)
+    except Exception:
+        conn.sendall(b"ERR db-not-initialized\n")
+        return
+    try:
+        since_ts = (dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=since_seconds)).replace(tzinfo=None)
+        sql, params = templates.top_templates_sql(since_ts, limit)
+        for template_id, template, count, first_seen, last_seen in db_conn.execute(sql, params).fetchall():
+            item = {
+                "template_id": template_id,
+                "template": template,
+                "count": count,
+                "first_seen": first_seen.isoformat(sep=" ") if first_seen else None,
+                "last_seen": last_seen.isoformat(sep=" ") if last_seen else None,
+            }
+            conn.sendall((json.dumps(item) + "\n").encode())
+    except Exception as exc:
+        logger.error(f"Database error in TEMPLATES command: {exc}")
+        conn.sendall(b"ERR database-error\n")
+    finally:
+        try:
+            db_conn.close()
+        except Exception:
+            pass
+
+
+# Logs layout migrations (dictionary-encoded dimension columns)
+MIGRATE_ACTIONS = {
+    "STATUS": log_dictionary.status,
+    "ENCODE": log_dictionary.encode_logs,
+    "DECODE": log_dictionary.decode_logs,
+}
+
+
+def _handle_migrate(conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Handle MIGRATE command"""
+    # Usage: MIGRATE STATUS|ENCODE|DECODE
+    action = MIGRATE_ACTIONS.get(tokens[1].upper()) if len(tokens) >= 2 else None
+    if not action:
+        conn.sendall(b"ERR migrate action required: STATUS|ENCODE|DECODE\n")
+        return
+    if tokens[1].upper() == "STATUS":
+        try:
+            db_conn = get_connection(db_path)
+        except Exception:
+            conn.sendall(b"ERR db-not-initialized\n")
+            return
+        try:
+            conn.sendall((json.dumps(action(db_conn)) + "\n").encode())
+        except Exception as exc:
+            logger.error(f"MIGRATE STATUS failed: {exc}")
+            conn.sendall(f"ERR migrate-failed: {exc}\n".encode())
+        finally:
+            try:
+                db_conn.close()
+            except Exception:
+                pass
+        return
+
+    def migrate(write_conn):
+        initialize_schema(write_conn)
+        result = action(write_conn)
+        # Recreate indexes on whichever table is now physical
+        initialize_schema(write_conn)
+        return result
+
+    # Layout migrations run on the writer between ingest transactions; they manage their own
+    try:
+        result = writer.run_write(db_path, migrate, transactional=False)
+        conn.sendall((json.dumps(result) + "\n").encode())
+    except Exception as exc:
+        logger.error(f"MIGRATE {tokens[1].upper()} failed: {exc}")
+        conn.sendall(f"ERR migrate-failed: {exc}\n".encode())
+
+
 # Command dispatcher mapping
 COMMAND_HANDLERS = {
     "PING": _handle_ping,
@@ -1105,9 +1759,43 @@ COMMAND_HANDLERS = {
     "CHAT_STATS": _handle_chat_stats,
     "REPORT": _handle_report,
     "AUDIT": _handle_audit,
+    "RETENTION": _handle_retention,
+    "MIGRATE": _handle_migrate,
+    "RAW": _handle_raw,
+    "TEMPLATES": _handle_templates,
+    "WRITER": _handle_writer,
+    "SNAPSHOT": _handle_snapshot,
+    "SHARDS": _handle_shards,
+    "MAINTENANCE": _handle_maintenance,
+    "INDEXER": _handle_indexer,
+    "JOB": _handle_job,
 }
 
 
+def _is_snapshot_read(command: str, tokens: list) -> bool:
+    """Whether a split-mode API process answers this command from the snapshot"""
+    if command == "SNAPSHOT":
+        return len(tokens) < 2 or tokens[1].upper() == "STATUS"
+    return command in SNAPSHOT_READ_COMMANDS
+
+
+def _forward_to_worker(conn: socket.socket, data: bytes) -> None:
+    """Relay a command to the worker process and stream its reply back"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as upstream:
+            upstream.connect(worker_socket_path)
+            upstream.sendall(data)
+            upstream.shutdown(socket.SHUT_WR)
+            while True:
+                chunk = upstream.recv(65536)
+                if not chunk:
+                    break
+                conn.sendall(chunk)
+    except OSError as exc:
+        logger.error(f"Worker unavailable at {worker_socket_path}: {exc}")
+        conn.sendall(b"ERR worker-unavailable\n")
+
+
 def handle_client(conn: socket.socket, db_path: Optional[str]) -> None:
     """Handle client connection with command dispatcher pattern"""
     try:
@@ -1119,34 +1807,82 @@ def handle_client(conn: socket.socket, db_path: Optional[str]) -> None:
         tokens = text.split()
         command = tokens[0].upper() if tokens else ""
 
-        # Find matching handler
-        handler = None
-        for cmd_prefix, cmd_handler in COMMAND_HANDLERS.items():
-            if command.startswith(cmd_prefix):
-                handler = cmd_handler
-                break
+        # Find the handler by exact command name; prefixes overlap (INDEX/INDEXER, CHAT/CHAT_STATS)
+        handler = COMMAND_HANDLERS.get(command)
 
-        if handler:
+        if handler and read_snapshots is not None:
+            # Split mode: reads use the latest published snapshot, writes and jobs go to the worker
+            if not _is_snapshot_read(command, tokens) or _is_async(tokens):
+                _forward_to_worker(conn, data)
+                return
+            snapshot_path = read_snapshots.current_path()
+            if snapshot_path is None and command not in ("PING", "VERSION", "SNAPSHOT"):
+                conn.sendall(b"ERR snapshot-not-ready\n")
+                return
+            db_path = snapshot_path
+
+        if handler and _is_async(tokens):
+            _submit_async(conn, handler, command, db_path, tokens)
+        elif handler and command == "SHARDS":
+            # Detaching waits for every other request using shards to finish
             handler(conn, db_path, tokens)
+        elif handler and command in INTERACTIVE_COMMANDS:
+            with shards.in_use():
+                _run_interactive(handler, conn, db_path, tokens)
+        elif handler and command in ASYNC_COMMANDS:
+            with shards.in_use(), storage.workload("batch"):
+                handler(conn, db_path, tokens)
+        elif handler:
+            with shards.in_use():
+                handler(conn, db_path, tokens)
         else:
             conn.sendall(b"ERR unknown command\n")
     finally:
         conn.close()
 
 
-def main() -> None:
-    """Main server function"""
-    # Load configuration
-    _cfg = ChimeraConfig.load()
-    global DEFAULT_SOCKET_PATH, DEFAULT_DB_PATH
-    DEFAULT_SOCKET_PATH = os.environ.get("CHIMERA_API_SOCKET", _cfg.socket_path)
-    DEFAULT_DB_PATH = os.environ.get("CHIMERA_DB_PATH", _cfg.db_path)
-    logger.info(f"Runtime configuration. Socket: {DEFAULT_SOCKET_PATH}, DB: {DEFAULT_DB_PATH}")
+def _is_async(tokens: list) -> bool:
+    return any(tok.lower() == "async=true" for tok in tokens[1:])
+
 
+def _submit_async(conn: socket.socket, handler, command: str, db_path: Optional[str], tokens: list) -> None:
+    """Start a long-running command as a background job and reply with its id"""
+    if command not in ASYNC_COMMANDS:
+        conn.sendall(f"ERR async not supported for {command}\n".encode())
+        return
+    job_tokens = [tok for tok in tokens if tok.lower() != "async=true"]
+    def run(output):
+        with shards.in_use(), storage.workload("batch"):
+            handler(output, db_path, job_tokens)
+
+    job = job_manager.submit(" ".join(job_tokens), run)
+    conn.sendall(f"OK job={job.id}\n".encode())
+
+
+def _run_interactive(handler, conn: socket.socket, db_path: Optional[str], tokens: list) -> None:
+    """Run an interactive request, holding off maintenance jobs while it runs"""
+    global _interactive_in_flight
+    with _interactive_lock:
+        _interactive_in_flight += 1
+    try:
+        with storage.workload("interactive"):
+            handler(conn, db_path, tokens)
+    finally:
+        with _interactive_lock:
+            _interactive_in_flight -= 1
+
+
+def _interactive_busy() -> bool:
+    return _interactive_in_flight > 0
+
+
+def _start_write_side(cfg: ChimeraConfig, db_path: str) -> None:
+    """Initialize the database and start the writer and maintenance scheduler"""
     # Quick DB check
     try:
-        _init_conn = get_connection(DEFAULT_DB_PATH)
+        _init_conn = get_connection(db_path)
         initialize_schema(_init_conn)
+        ensure_promoted_fields(_init_conn, cfg.promoted_fields)
         clear_table(_init_conn, 'ingest_state')
         try:
             _init_conn.close()
@@ -1155,21 +1891,128 @@ def main() -> None:
     except Exception as exc:
         print(f"[chimera] warning: DB not initialized: {exc}", file=sys.stderr)
 
-    ensure_dir(DEFAULT_SOCKET_PATH)
-    cleanup_socket(DEFAULT_SOCKET_PATH)
+    # Single writer owning the write connection; producers queue batches to it
+    if cfg.writer.get("enabled", True):
+        try:
+            writer.start_writer(db_path, cfg.writer)
+        except Exception as exc:
+            logger.warning(f"Writer not started, producers write directly: {exc}")
+
+    # Periodic maintenance: retention, checkpoints, rollups, metrics, reports
+    global retention_manager, maintenance, embedding_indexer
+    retention_manager = RetentionManager(db_path, cfg)
+    if cfg.maintenance.get("enabled", True):
+        maintenance = scheduler.MaintenanceScheduler.from_config(cfg.maintenance, busy=_interactive_busy)
+        for job in _maintenance_jobs(cfg, db_path):
+            maintenance.register(job)
+        maintenance.start()
+
+    # Incremental embedding of new rows past a persisted watermark
+    if cfg.indexer.get("enabled", False):
+        embedding_indexer = indexer.EmbeddingIndexer(db_path, cfg.indexer, busy=_interactive_busy)
+        embedding_indexer.start()
+
+
+def _checkpoint_job(db_path: str) -> Dict[str, Any]:
+    db_conn = get_connection(db_path, profile="batch")
+    try:
+        return {"checkpointed": retention_manager.checkpoint(db_conn, force=True)}
+    finally:
+        db_conn.close()
+
+
+def _rollups_job(db_path: str, days: int = ROLLUP_RECONCILE_DAYS) -> Dict[str, Any]:
+    """Recount the recent rollup buckets from logs, correcting any drift in the incremental counts.
+
+    Older buckets only change through retention, which subtracts what it
+    deletes. The recount runs on the writer, so ingest cannot interleave.
+    """
+    since = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) - dt.timedelta(days=days)
+    buckets = writer.run_write(db_path, lambda conn: rollups.rebuild(conn, since=since))
+    return {"buckets": buckets, "since": since.isoformat(sep=" ")}
+
+
+def _embeddings_cleanup_job(cfg: ChimeraConfig, db_path: str) -> Dict[str, Any]:
+    engine = SemanticSearchEngine(db_path)
+    return {"deleted": engine.cleanup_old_embeddings(days=cfg.get_retention_days("log_embeddings"))}
+
+
+def _report_job(db_path: str, since_seconds: int) -> Dict[str, Any]:
+    """Pre-generate the default report so REPORT GENERATE answers from cache"""
+    try:
+        from .reporting import ReportGenerator
+    except ImportError:
+        from reporting import ReportGenerator
+    report = ReportGenerator(db_path).generate_daily_report(since_seconds)
+    pregenerated_reports[since_seconds] = (time.monotonic(), report)
+    return {"since_seconds": since_seconds}
+
+
+def _batch_workload(func):
+    """Run a maintenance job in one of the batch workload's slots"""
+    def run():
+        with storage.workload("batch"):
+            return func()
+    return run
+
+
+def _maintenance_jobs(cfg: ChimeraConfig, db_path: str) -> list:
+    """Periodic jobs with their configured interval, priority and jitter"""
+    health = SystemHealthMonitor(db_path)
+    builtin = {
+        "metrics": lambda: health.collect_once(),
+        "retention": lambda: {"deleted": retention_manager.run()["deleted"]},
+        "checkpoint": lambda: _checkpoint_job(db_path),
+        "embeddings_cleanup": lambda: _embeddings_cleanup_job(cfg, db_path),
+        "rollups": lambda: _rollups_job(db_path),
+        "report": lambda: _report_job(db_path, REPORT_PREGENERATE_SINCE_SECONDS),
+        "text_index": lambda: {"indexed": text_index.build_pending(db_path)},
+    }
+    # Retention keeps honoring its own section for enablement and interval
+    legacy = {
+        "retention": {"enabled": cfg.retention.get("enabled", True),
+                      "interval_seconds": cfg.retention.get("interval_seconds", 3600)},
+        "checkpoint": {"interval_seconds": cfg.retention.get("checkpoint_interval_seconds", 21600)},
+    }
+    jobs = []
+    for name, func in builtin.items():
+        settings = {**MAINTENANCE_JOB_DEFAULTS[name], **legacy.get(name, {}),
+                    **cfg.maintenance.get("jobs", {}).get(name, {})}
+        jobs.append(scheduler.Job(
+            name,
+            _batch_workload(func),
+            interval_seconds=int(settings["interval_seconds"]),
+            priority=int(settings["priority"]),
+            jitter=float(settings.get("jitter", cfg.maintenance.get("jitter", scheduler.DEFAULT_JITTER))),
+            enabled=bool(settings.get("enabled", True)),
+            run_at_start=bool(settings.get("run_at_start", False)),
+        ))
+    return jobs
+
+
+def _serve(socket_path: str, db_path: str) -> None:
+    """Accept clients on socket_path until shut down"""
+    ensure_dir(socket_path)
+    cleanup_socket(socket_path)
     # Create socket with restricted permissions
     old_umask = os.umask(0o117)
     try:
         with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
-            server.bind(DEFAULT_SOCKET_PATH)
-            set_permissions(DEFAULT_SOCKET_PATH)
+            server.bind(socket_path)
+            set_permissions(socket_path)
             server.listen(5)
 
             def shutdown_handler(signum, frame):
                 try:
                     server.close()
+                    if maintenance is not None:
+                        maintenance.stop(timeout=5)
+                    if embedding_indexer is not None:
+                        embedding_indexer.stop(timeout=5)
+                    job_manager.shutdown()
+                    writer.stop_writer()
                 finally:
-                    cleanup_socket(DEFAULT_SOCKET_PATH)
+                    cleanup_socket(socket_path)
                     sys.exit(0)
 
             # Only install signal handlers in the main thread
@@ -1182,12 +2025,93 @@ def main() -> None:
 
             while True:
                 conn, _ = server.accept()
-                t = threading.Thread(target=handle_client, args=(conn, DEFAULT_DB_PATH), daemon=True)
+                t = threading.Thread(target=handle_client, args=(conn, db_path), daemon=True)
                 t.start()
     finally:
         os.umask(old_umask)
 
 
+def _split_settings(cfg: ChimeraConfig) -> dict:
+    split = dict(cfg.process_split)
+    split["worker_socket_path"] = os.environ.get(
+        "CHIMERA_WORKER_SOCKET", split.get("worker_socket_path", "/run/chimera/worker.sock"))
+    split.setdefault("snapshot_dir", os.path.join(os.path.dirname(DEFAULT_DB_PATH) or ".", "snapshots"))
+    return split
+
+
+def _configure_sharding(cfg: ChimeraConfig) -> None:
+    global shard_dir
+    if cfg.sharding.get("enabled", False):
+        shard_dir = cfg.sharding.get("directory") or os.path.join(os.path.dirname(DEFAULT_DB_PATH) or ".", "shards")
+        logger.info(f"Per-source shards in {shard_dir}")
+    shards.configure(shard_dir)
+
+
+def _configure_jobs(cfg: ChimeraConfig) -> None:
+    global job_manager
+    job_manager = jobs.JobManager(
+        max_workers=int(cfg.jobs.get("max_workers", jobs.DEFAULT_MAX_WORKERS)),
+        keep_finished=int(cfg.jobs.get("keep_finished", jobs.DEFAULT_KEEP_FINISHED)),
+    )
+
+
+def worker_main() -> None:
+    """Worker process for split mode: owns the read-write database"""
+    _cfg = ChimeraConfig.load()
+    global DEFAULT_DB_PATH, snapshot_publisher
+    DEFAULT_DB_PATH = os.environ.get("CHIMERA_DB_PATH", _cfg.db_path)
+    split = _split_settings(_cfg)
+    _configure_sharding(_cfg)
+    _configure_jobs(_cfg)
+    storage.configure(_cfg.storage)
+    query_guard.configure(_cfg.query_limits)
+    embeddings.configure(_cfg.embeddings)
+    templates.configure(_cfg.templates)
+    raw_store.configure(_cfg.log_sources)
+    logger.info(f"Worker starting. Socket: {split['worker_socket_path']}, DB: {DEFAULT_DB_PATH}")
+
+    _start_write_side(_cfg, DEFAULT_DB_PATH)
+    snapshot_publisher = snapshots.SnapshotPublisher(
+        DEFAULT_DB_PATH,
+        split["snapshot_dir"],
+        interval_seconds=int(split.get("publish_interval_seconds", snapshots.DEFAULT_PUBLISH_INTERVAL_SECONDS)),
+        keep=int(split.get("keep_snapshots", snapshots.DEFAULT_KEEP_SNAPSHOTS)),
+    )
+    snapshot_publisher.start()
+    _serve(split["worker_socket_path"], DEFAULT_DB_PATH)
+
+
+def main() -> None:
+    """Main server function"""
+    # Load configuration
+    _cfg = ChimeraConfig.load()
+    global DEFAULT_SOCKET_PATH, DEFAULT_DB_PATH
+    DEFAULT_SOCKET_PATH = os.environ.get("CHIMERA_API_SOCKET", _cfg.socket_path)
+    DEFAULT_DB_PATH = os.environ.get("CHIMERA_DB_PATH", _cfg.db_path)
+    logger.info(f"Runtime configuration. Socket: {DEFAULT_SOCKET_PATH}, DB: {DEFAULT_DB_PATH}")
+    _configure_sharding(_cfg)
+    _configure_jobs(_cfg)
+    storage.configure(_cfg.storage)
+    query_guard.configure(_cfg.query_limits)
+    embeddings.configure(_cfg.embeddings)
+    templates.configure(_cfg.templates)
+    raw_store.configure(_cfg.log_sources)
+
+    if _cfg.process_split.get("enabled", False):
+        # The worker process owns the database file; this process only reads snapshots
+        global read_snapshots, worker_socket_path
+        split = _split_settings(_cfg)
+        worker = multiprocessing.get_context("spawn").Process(target=worker_main, name="chimera-worker", daemon=True)
+        worker.start()
+        read_snapshots = snapshots.SnapshotReader(split["snapshot_dir"])
+        worker_socket_path = split["worker_socket_path"]
+        logger.info(f"Split mode: worker pid {worker.pid}, snapshots in {split['snapshot_dir']}")
+    else:
+        _start_write_side(_cfg, DEFAULT_DB_PATH)
+
+    _serve(DEFAULT_SOCKET_PATH, DEFAULT_DB_PATH)
+
+
 if __name__ == "__main__":
     try:
         main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+import glob
+import os
+import re
+import shutil
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .db import get_connection, initialize_schema
+from .snapshots import is_snapshot_path, shard_snapshot_dir
+
+logger = logging.getLogger("chimera")
+
+
+# Per-source shard files: each source writes its own DuckDB file, attached to the
+# main database and federated behind temp views on read connections
+SHARD_PATTERN = re.compile(r"^shard-([a-z0-9_]+)\.duckdb$")
+ALIAS_PREFIX = "shard_"
+ARCHIVE_SUBDIR = "archive"
+
+# Tables unioned across main and every shard on federated read connections
+FEDERATED_TABLES = [
+    "logs",
+    "log_raw",
+    "log_trigrams",
+    "log_terms",
+    "log_templates",
+    "log_template_ids",
+    "logs_rollup_1m",
+    "logs_rollup_1h",
+    "logs_rollup_1d",
+    "log_vectors",
+]
+
+# How long SHARDS DROP|ARCHIVE waits for readers and the shard's writer
+DETACH_TIMEOUT_SECONDS = 30.0
+
+_attach_lock = threading.Lock()
+
+# Shard directory of this process (set from the sharding config); None when unsharded
+_directory: Optional[str] = None
+
+
+def configure(directory: Optional[str]) -> None:
+    global _directory
+    _directory = directory
+
+
+def directory() -> Optional[str]:
+    return _directory
+
+
+class _ShardGate:
+    """Shared by requests that may touch attached shards; detaching takes it exclusively.
+
+    Attachments belong to the whole database instance, so a DETACH must not
+    land between another request's federate and its query. Shared holds are
+    reentrant per thread, so nested federated reads cannot deadlock a detach.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._detaching = False
+        self._local = threading.local()
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            with self._cond:
+                self._cond.wait_for(lambda: not self._detaching)
+                self._readers += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                with self._cond:
+                    self._readers -= 1
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self, timeout: float) -> Iterator[None]:
+        with self._cond:
+            self._cond.wait_for(lambda: not self._detaching)
+            self._detaching = True
+            if not self._cond.wait_for(lambda: self._readers == 0, timeout):
+                self._detaching = False
+                self._cond.notify_all()
+                raise ValueError("shard-busy")
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._detaching = False
+                self._cond.notify_all()
+
+
+_gate = _ShardGate()
+
+# One writer per shard: its source's ingest, retention, the indexer and snapshot publishing
+_write_locks: Dict[str, threading.Lock] = {}
+
+
+def in_use():
+    """Hold while a request may use attached shards (federated reads, shard writes)"""
+    return _gate.shared()
+
+
+@contextmanager
+def writing(name: str) -> Iterator[None]:
+    """Serialize writes to one shard file"""
+    with _attach_lock:
+        lock = _write_locks.setdefault(name, threading.Lock())
+    with _gate.shared(), lock:
+        yield
+
+
+def shard_name(source_name: str) -> str:
+    """File-safe shard name for a log source, e.g. 'web-1 files' -> 'web_1_files'"""
+    name = re.sub(r"[^a-z0-9_]+", "_", source_name.lower()).strip("_")
+    if not name:
+        raise ValueError(f"Cannot derive a shard name from source '{source_name}'")
+    return name
+
+
+def shard_alias(name: str) -> str:
+    return f"{ALIAS_PREFIX}{name}"
+
+
+def shard_file(shard_dir: str, name: str) -> str:
+    return os.path.join(shard_dir, f"shard-{name}.duckdb")
+
+
+def list_shards(shard_dir: str) -> Dict[str, str]:
+    """Shard name -> file for every shard on disk"""
+    shards = {}
+    for path in sorted(glob.glob(os.path.join(shard_dir, "shard-*.duckdb"))):
+        match = SHARD_PATTERN.match(os.path.basename(path))
+        if match:
+            shards[match.group(1)] = path
+    return shards
+
+
+def attached_shards(conn) -> Dict[str, str]:
+    """Shard name -> file for shards attached to conn's database instance"""
+    rows = conn.execute(
+        "SELECT database_name, path FROM duckdb_databases() WHERE database_name LIKE ?",
+        [f"{ALIAS_PREFIX}%"],
+    ).fetchall()
+    return {alias[len(ALIAS_PREFIX):]: path for alias, path in rows}
+
+
+def attach_shard(conn, shard_dir: str, name: str) -> str:
+    """Attach (creating and initializing if needed) a shard; returns its alias.
+
+    Attachments belong to the database instance, so every connection to the
+    main database sees them. A file can only be open once per process, which
+    is why shards are attached read-write and shared by writers and readers.
+    """
+    alias = shard_alias(name)
+    with _attach_lock:
+        if name in attached_shards(conn):
+            return alias
+        os.makedirs(shard_dir, exist_ok=True)
+        conn.execute(f"ATTACH '{shard_file(shard_dir, name)}' AS {alias}")
+        cur = conn.cursor()
+        try:
+            cur.execute(f"USE {alias}")
+            initialize_schema(cur)
+        finally:
+            cur.close()
+    logger.info(f"Attached shard {name}")
+    return alias
+
+
+def connect(db_path: Optional[str], name: str, profile: str = "batch", shard_dir: Optional[str] = None):
+    """Connection whose unqualified table names are one shard's"""
+    conn = get_connection(db_path, profile=profile)
+    try:
+        conn.execute(f"USE {attach_shard(conn, shard_dir or _directory, name)}")
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def use_source_shard(conn, shard_dir: str, source_name: str) -> str:
+    """Point conn's unqualified table names at a source's shard"""
+    alias = attach_shard(conn, shard_dir, shard_name(source_name))
+    conn.execute(f"USE {alias}")
+    return alias
+
+
+def _table_exists(conn, catalog: str, table: str) -> bool:
+    row = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_catalog = ? AND table_name = ?",
+        [catalog, table],
+    ).fetchone()
+    return bool(row and row[0])
+
+
+def _database_path(conn) -> Optional[str]:
+    row = conn.execute("SELECT path FROM duckdb_databases() WHERE database_name = current_database()").fetchone()
+    return row[0] if row else None
+
+
+def federate(conn, shard_dir: Optional[str] = None) -> List[str]:
+    """Shadow the log tables on this (read) connection with main + shard unions.
+
+    DuckDB pushes filters through UNION ALL into each branch, so time and
+    dimension predicates are evaluated per shard. On a published snapshot the
+    shard clones of that generation are attached read-only instead. Returns
+    the federated shards; without a shard directory this is a no-op.
+    """
+    shard_dir = shard_dir or _directory
+    if not shard_dir:
+        return []
+    main_path = _database_path(conn)
+    if is_snapshot_path(main_path):
+        clones = shard_snapshot_dir(main_path)
+        with _attach_lock:
+            attached = attached_shards(conn)
+            for name, path in list_shards(clones).items():
+                if name not in attached:
+                    conn.execute(f"ATTACH '{path}' AS {shard_alias(name)} (READ_ONLY)")
+    else:
+        for name in list_shards(shard_dir):
+            try:
+                attach_shard(conn, shard_dir, name)
+            except Exception as exc:
+                logger.warning(f"Skipping shard {name}: {exc}")
+    names = sorted(attached_shards(conn))
+    if not names:
+        return []
+    main = conn.execute("SELECT current_database()").fetchone()[0]
+    catalogs = [f'"{main}"'] + [shard_alias(name) for name in names]
+    for table in FEDERATED_TABLES:
+        parts = [f"SELECT * FROM {catalog}.main.{table}" for catalog in catalogs
+                 if _table_exists(conn, catalog.strip('"'), table)]
+        if not parts:
+            # Created on first use (log_vectors)
+            continue
+        conn.execute(f"CREATE OR REPLACE TEMP VIEW {table} AS {' UNION ALL BY NAME '.join(parts)}")
+    # BM25 corpus statistics add up across shards
+    stats = " UNION ALL ".join(f"SELECT doc_count, total_len FROM {catalog}.main.log_term_stats" for catalog in catalogs)
+    conn.execute(
+        "CREATE OR REPLACE TEMP VIEW log_term_stats AS SELECT 'logs' AS name, "
+        f"CAST(SUM(doc_count) AS BIGINT) AS doc_count, CAST(SUM(total_len) AS BIGINT) AS total_len FROM ({stats})"
+    )
+    return names
+
+
+def shard_stats(conn, shard_dir: str) -> List[Dict[str, Any]]:
+    """Rows, time range and file size per shard on disk"""
+    attached = attached_shards(conn)
+    stats = []
+    for name, path in list_shards(shard_dir).items():
+        item: Dict[str, Any] = {"name": name, "path": path, "size_bytes": os.path.getsize(path), "attached": name in attached}
+        if name in attached:
+            rows, oldest, newest = conn.execute(
+                f"SELECT COUNT(*), MIN(ts), MAX(ts) FROM {shard_alias(name)}.main.logs"
+            ).fetchone()
+            item.update({
+                "rows": rows,
+                "oldest": oldest.isoformat(sep=" ") if oldest else None,
+                "newest": newest.isoformat(sep=" ") if newest else None,
+            })
+        stats.append(item)
+    return stats
+
+
+def detach_shard(conn, shard_dir: str, name: str, archive: bool = False) -> Optional[str]:
+    """Detach a shard and archive or delete its file; returns the archived path.
+
+    The detach is instance-wide, so it waits until no request holds the shard
+    gate (federated reads and shard writers both do); ValueError("shard-busy")
+    after DETACH_TIMEOUT_SECONDS.
+    """
+    path = list_shards(shard_dir).get(name)
+    if path is None:
+        raise ValueError(f"Unknown shard: {name}")
+    with _gate.exclusive(DETACH_TIMEOUT_SECONDS), _attach_lock:
+        if name in attached_shards(conn):
+            conn.execute(f"DETACH {shard_alias(name)}")
+        return _retire_file(shard_dir, name, path, archive)
+
+
+def _retire_file(shard_dir: str, name: str, path: str, archive: bool) -> Optional[str]:
+    wal = path + ".wal"
+    if archive:
+        archive_dir = os.path.join(shard_dir, ARCHIVE_SUBDIR)
+        os.makedirs(archive_dir, exist_ok=True)
+        target = os.path.join(archive_dir, os.path.basename(path))
+        shutil.move(path, target)
+        if os.path.exists(wal):
+            shutil.move(wal, target + ".wal")
+        logger.info(f"Archived shard {name} to {target}")
+        return target
+    os.unlink(path)
+    if os.path.exists(wal):
+        os.unlink(wal)
+    logger.info(f"Dropped shard {name}")
+    return None
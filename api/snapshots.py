@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+import datetime as dt
+import fcntl
+import glob
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("chimera")
+
+
+# Published read snapshots: the worker process owns the read-write database and
+# periodically clones it into a new file that API processes open read-only
+MANIFEST_NAME = "current.json"
+SNAPSHOT_PATTERN = re.compile(r"^snapshot-(\d+)\.duckdb$")
+
+DEFAULT_PUBLISH_INTERVAL_SECONDS = 60
+DEFAULT_KEEP_SNAPSHOTS = 3
+
+# ioctl cloning a file's extents (btrfs, XFS); other filesystems get a plain copy
+FICLONE = 0x40049409
+
+
+def snapshot_file(snapshot_dir: str, generation: int) -> str:
+    return os.path.join(snapshot_dir, f"snapshot-{generation}.duckdb")
+
+
+def shard_snapshot_dir(snapshot_path: str) -> str:
+    """Directory holding the shard clones published with a snapshot generation"""
+    return snapshot_path[:-len(".duckdb")] + "-shards"
+
+
+def is_snapshot_path(path: Optional[str]) -> bool:
+    """True for published snapshot files, which are only ever opened read-only"""
+    return bool(path) and SNAPSHOT_PATTERN.match(os.path.basename(path)) is not None
+
+
+def read_manifest(snapshot_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_manifest(snapshot_dir: str, manifest: Dict[str, Any]) -> None:
+    tmp = os.path.join(snapshot_dir, f".{MANIFEST_NAME}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(snapshot_dir, MANIFEST_NAME))
+
+
+def _prune(snapshot_dir: str, keep: int, current: int) -> None:
+    """Remove old generations; readers still holding one keep their open file"""
+    generations = []
+    for path in glob.glob(os.path.join(snapshot_dir, "snapshot-*.duckdb")):
+        match = SNAPSHOT_PATTERN.match(os.path.basename(path))
+        if match:
+            generations.append(int(match.group(1)))
+    for generation in sorted(generations, reverse=True)[max(1, keep):]:
+        if generation == current:
+            continue
+        for suffix in ("", ".wal"):
+            try:
+                os.unlink(snapshot_file(snapshot_dir, generation) + suffix)
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(shard_snapshot_dir(snapshot_file(snapshot_dir, generation)), ignore_errors=True)
+
+
+def _database_path(conn) -> Optional[str]:
+    row = conn.execute("SELECT path FROM duckdb_databases() WHERE database_name = current_database()").fetchone()
+    return row[0] if row and row[0] else None
+
+
+def _clone_file(source: str, target: str) -> str:
+    """Copy source to target as a reflink where the filesystem supports it; returns the method"""
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return "reflink"
+        except OSError:
+            pass
+    # copyfile copies inside the kernel (sendfile) on Linux
+    shutil.copyfile(source, target)
+    return "copy"
+
+
+def _publish_database(conn, catalog: str, source_path: Optional[str], target: str) -> str:
+    """Checkpoint one attached database and clone its file to target; returns the method"""
+    conn.execute(f'CHECKPOINT "{catalog}"')
+    wal = f"{source_path}.wal" if source_path else None
+    if source_path and not (os.path.exists(wal) and os.path.getsize(wal)):
+        return _clone_file(source_path, target)
+    conn.execute(f"ATTACH '{target}' AS chimera_snapshot")
+    try:
+        conn.execute(f'COPY FROM DATABASE "{catalog}" TO chimera_snapshot')
+    finally:
+        conn.execute("DETACH chimera_snapshot")
+    return "export"
+
+
+def _publish_shards(conn, target_dir: str) -> Dict[str, str]:
+    """Clone every per-source shard next to the snapshot; returns shard name -> method"""
+    from . import shards
+    methods: Dict[str, str] = {}
+    shard_dir = shards.directory()
+    if not shard_dir:
+        return methods
+    for name, path in shards.list_shards(shard_dir).items():
+        os.makedirs(target_dir, exist_ok=True)
+        # Under the shard's write lock, so its source cannot checkpoint mid-clone
+        with shards.writing(name):
+            alias = shards.attach_shard(conn, shard_dir, name)
+            methods[name] = _publish_database(conn, alias, path, os.path.join(target_dir, os.path.basename(path)))
+    return methods
+
+
+def publish_snapshot(conn, snapshot_dir: str, keep: int = DEFAULT_KEEP_SNAPSHOTS) -> Dict[str, Any]:
+    """Publish the database behind conn as a new snapshot generation.
+
+    The database is checkpointed and its file cloned (a reflink where the
+    filesystem supports it), so a publish costs a file copy rather than a
+    rewrite of every table and index. Run it where no other write can
+    checkpoint the file meanwhile (the writer's maintenance slot). When the
+    checkpoint left a WAL behind, it falls back to COPY FROM DATABASE, which
+    reads one transactional view. Per-source shards are cloned the same way
+    into `snapshot-<generation>-shards/`. The manifest is swapped atomically.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    started = time.monotonic()
+    previous = read_manifest(snapshot_dir) or {}
+    generation = max(int(previous.get("generation", 0)) + 1, int(time.time() * 1000))
+    target = snapshot_file(snapshot_dir, generation)
+    tmp = os.path.join(snapshot_dir, f".building-{generation}.duckdb")
+    tmp_shards = os.path.join(snapshot_dir, f".building-{generation}-shards")
+    for path in (tmp, tmp + ".wal"):
+        if os.path.exists(path):
+            os.unlink(path)
+    shutil.rmtree(tmp_shards, ignore_errors=True)
+
+    source = conn.execute("SELECT current_database()").fetchone()[0]
+    method = _publish_database(conn, source, _database_path(conn), tmp)
+    shard_methods = _publish_shards(conn, tmp_shards)
+    if shard_methods:
+        os.replace(tmp_shards, shard_snapshot_dir(target))
+    os.replace(tmp, target)
+
+    manifest = {
+        "generation": generation,
+        "path": target,
+        "published_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "duration_ms": round((time.monotonic() - started) * 1000, 2),
+        "size_bytes": os.path.getsize(target),
+        "method": method,
+    }
+    if shard_methods:
+        manifest["shards"] = shard_methods
+    _write_manifest(snapshot_dir, manifest)
+    _prune(snapshot_dir, keep, generation)
+    logger.info(f"Published snapshot {generation} ({method}) in {manifest['duration_ms']}ms")
+    return manifest
+
+
+class SnapshotReader:
+    """Resolve the current published snapshot for read-only connections"""
+
+    def __init__(self, snapshot_dir: str):
+        self.snapshot_dir = snapshot_dir
+
+    def current_path(self) -> Optional[str]:
+        manifest = read_manifest(self.snapshot_dir)
+        if not manifest or not os.path.exists(manifest.get("path", "")):
+            return None
+        return manifest["path"]
+
+    def status(self) -> Dict[str, Any]:
+        manifest = read_manifest(self.snapshot_dir)
+        if not manifest:
+            return {"ready": False, "snapshot_dir": self.snapshot_dir}
+        published = dt.datetime.fromisoformat(manifest["published_at"])
+        age = (dt.datetime.now(dt.timezone.utc) - published).total_seconds()
+        return {**manifest, "ready": os.path.exists(manifest["path"]), "age_seconds": round(age, 1)}
+
+
+class SnapshotPublisher:
+    """Background loop publishing snapshots of the worker's database"""
+
+    def __init__(self, db_path: Optional[str], snapshot_dir: str,
+                 interval_seconds: int = DEFAULT_PUBLISH_INTERVAL_SECONDS, keep: int = DEFAULT_KEEP_SNAPSHOTS):
+        self.db_path = db_path
+        self.snapshot_dir = snapshot_dir
+        self.interval_seconds = max(1, int(interval_seconds))
+        self.keep = max(1, int(keep))
+        self.last_manifest: Optional[Dict[str, Any]] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self) -> Dict[str, Any]:
+        from .writer import run_write
+        # Exclusive on the writer: no ingest batch checkpoints the file mid-clone
+        self.last_manifest = run_write(
+            self.db_path, lambda conn: publish_snapshot(conn, self.snapshot_dir, self.keep), transactional=False
+        )
+        return self.last_manifest
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="chimera-snapshots", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.publish()
+            except Exception as exc:
+                logger.error(f"Snapshot publish failed: {exc}")
+            self._stop_event.wait(self.interval_seconds)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import os
+import re
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger("chimera")
+
+
+# DuckDB resource settings. They belong to the database instance, so they are
+# applied once per instance from the base section; "auto" values are sized
+# from host cores and RAM. Connections name the workload they serve, and each
+# workload gets a cap on how many of its requests run at once.
+PROFILES = ("ingest", "interactive", "batch")
+DEFAULT_PROFILE = "interactive"
+
+DEFAULT_STORAGE = {
+    "threads": "auto",
+    "memory_limit": "auto",
+    "cpu_share": 0.5,  # fraction of host cores used when threads is "auto"
+    "memory_share": 0.25,  # fraction of host RAM used when memory_limit is "auto"
+    "temp_directory": None,  # DuckDB default: <database>.tmp next to the file
+    "preserve_insertion_order": True,
+    "checkpoint_threshold": "16MB",
+    "profiles": {
+        "ingest": {"concurrency": 4},
+        "interactive": {"concurrency": 16},
+        "batch": {"concurrency": 2},
+    },
+}
+
+MIN_MEMORY_MB = 256
+
+# Settings applied to DuckDB, in order; keys mirror DuckDB option names
+DUCKDB_SETTINGS = ("threads", "memory_limit", "temp_directory", "preserve_insertion_order", "checkpoint_threshold")
+
+# Byte multipliers of DuckDB size literals, and of the values current_setting() reports
+SIZE_UNITS = {
+    "b": 1, "bytes": 1, "kb": 1000, "mb": 1000 ** 2, "gb": 1000 ** 3, "tb": 1000 ** 4,
+    "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4,
+}
+
+# None until configure() runs; unconfigured processes keep DuckDB's defaults
+_storage: Optional[Dict[str, Any]] = None
+_slots: Dict[str, threading.BoundedSemaphore] = {}
+_held = threading.local()
+
+
+def host_resources() -> Dict[str, int]:
+    """Cores available to this process and total RAM in MB"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cores = os.cpu_count() or 1
+    try:
+        memory_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        memory_mb = 0
+    return {"cores": max(1, cores), "memory_mb": int(memory_mb)}
+
+
+def configure(storage: Optional[Dict[str, Any]]) -> None:
+    """Set the storage section used by get_connection and workload() in this process"""
+    global _storage, _slots
+    _storage = dict(storage or {})
+    _slots = {profile: threading.BoundedSemaphore(concurrency(profile)) for profile in PROFILES}
+    logger.info(f"DuckDB instance settings: {resolve_settings()}")
+    for profile, overrides in _storage.get("profiles", {}).items():
+        ignored = sorted(set(overrides) - {"concurrency"})
+        if ignored:
+            logger.warning(f"Storage profile {profile}: {', '.join(ignored)} are instance-wide; set them in the base section")
+    for profile in PROFILES:
+        logger.info(f"DuckDB {profile} workload: at most {concurrency(profile)} at once")
+
+
+def concurrency(profile: Optional[str] = None, storage: Optional[Dict[str, Any]] = None) -> int:
+    """How many requests of a workload may use the database at once"""
+    storage = (_storage or {}) if storage is None else storage
+    profile = profile or DEFAULT_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown storage profile: {profile}")
+    value = storage.get("profiles", {}).get(profile, {}).get("concurrency")
+    if value is None:
+        value = DEFAULT_STORAGE["profiles"][profile]["concurrency"]
+    return max(1, int(value))
+
+
+@contextmanager
+def workload(profile: Optional[str] = None) -> Iterator[None]:
+    """Hold one of the workload's slots; reentrant per thread, a no-op until configure()"""
+    profile = profile or DEFAULT_PROFILE
+    slot = _slots.get(profile)
+    depth = getattr(_held, profile, 0)
+    if slot is None or depth:
+        setattr(_held, profile, depth + 1)
+        try:
+            yield
+        finally:
+            setattr(_held, profile, depth)
+        return
+    with slot:
+        setattr(_held, profile, 1)
+        try:
+            yield
+        finally:
+            setattr(_held, profile, 0)
+
+
+def resolve_settings(storage: Optional[Dict[str, Any]] = None,
+                     resources: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """DuckDB instance settings: the base section over the defaults, then auto-sizing"""
+    storage = (_storage or {}) if storage is None else storage
+    merged = {k: v for k, v in DEFAULT_STORAGE.items() if k != "profiles"}
+    merged.update({k: v for k, v in storage.items() if k != "profiles"})
+    resources = resources or host_resources()
+
+    settings: Dict[str, Any] = {}
+    threads = merged.get("threads", "auto")
+    if threads in (None, "auto"):
+        threads = int(resources["cores"] * float(merged.get("cpu_share", 0.5)))
+    settings["threads"] = max(1, int(threads))
+
+    memory_limit = merged.get("memory_limit", "auto")
+    if memory_limit in (None, "auto"):
+        if resources["memory_mb"]:
+            share = int(resources["memory_mb"] * float(merged.get("memory_share", 0.25)))
+            settings["memory_limit"] = f"{max(MIN_MEMORY_MB, share)}MB"
+    else:
+        settings["memory_limit"] = str(memory_limit)
+
+    if merged.get("temp_directory"):
+        settings["temp_directory"] = str(merged["temp_directory"])
+    settings["preserve_insertion_order"] = bool(merged.get("preserve_insertion_order", True))
+    if merged.get("checkpoint_threshold"):
+        settings["checkpoint_threshold"] = str(merged["checkpoint_threshold"])
+    return settings
+
+
+def _size_bytes(text: str) -> Optional[Tuple[float, int]]:
+    """(bytes, unit multiplier) of a size such as '16MB' or '15.2 MiB'"""
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([a-zA-Z]*)\s*", str(text))
+    if not match:
+        return None
+    unit = SIZE_UNITS.get((match.group(2) or "b").lower())
+    if unit is None:
+        return None
+    return float(match.group(1)) * unit, unit
+
+
+def _differs(name: str, current: Any, wanted: Any) -> bool:
+    if isinstance(wanted, (bool, int)):
+        return str(current).lower() != str(wanted).lower()
+    if name in ("memory_limit", "checkpoint_threshold"):
+        have, want = _size_bytes(current), _size_bytes(wanted)
+        if have and want:
+            # Reported sizes are truncated to one decimal of their unit
+            return abs(have[0] - want[0]) > 0.1 * have[1]
+    return str(current) != str(wanted)
+
+
+def apply_settings(conn, profile: Optional[str] = None) -> Dict[str, Any]:
+    """Apply the instance settings to conn's database instance; returns them.
+
+    The first connection to an instance sets them; later connections find
+    them in place and set nothing. profile only names the caller's workload.
+    """
+    if _storage is None:
+        return {}
+    settings = resolve_settings()
+    current = dict(conn.execute(
+        "SELECT name, value FROM duckdb_settings() WHERE name IN (" + ", ".join("?" * len(DUCKDB_SETTINGS)) + ")",
+        list(DUCKDB_SETTINGS),
+    ).fetchall())
+    for name in DUCKDB_SETTINGS:
+        if name not in settings:
+            continue
+        value = settings[name]
+        if not _differs(name, current.get(name), value):
+            continue
+        literal = str(value).lower() if isinstance(value, bool) else value if isinstance(value, int) else f"'{value}'"
+        try:
+            conn.execute(f"SET {name} = {literal}")
+        except Exception as exc:
+            logger.warning(f"Could not set DuckDB {name}={value}: {exc}")
+    return settings
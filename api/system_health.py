@@ -8,7 +8,60 @@ from typing import Dict, Any, List, Optional
 import threading
 import time
 
-from .db import get_connection
+from .db import ensure_id_sequence, get_connection
+from . import writer
+
+
+def write_metric_records(conn, records: List[list]) -> int:
+    """Insert (timestamp, metric_type, metric_data) records"""
+    # Ensure metrics table exists
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS system_metrics (
+            timestamp TIMESTAMP NOT NULL,
+            metric_type TEXT NOT NULL,
+            metric_data TEXT
+        );
+    """)
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_system_metrics_ts_type ON system_metrics (timestamp, metric_type);")
+
+    for record in records:
+        conn.execute(
+            "INSERT INTO system_metrics (timestamp, metric_type, metric_data) VALUES (?, ?, ?)",
+            record
+        )
+    return len(records)
+
+
+def write_alert_records(conn, records: List[list]) -> int:
+    """Insert (timestamp, alert_type, severity, message, metric_data) records"""
+    # Ensure alerts table exists
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS system_alerts (
+            id BIGINT PRIMARY KEY,
+            timestamp TIMESTAMP NOT NULL,
+            alert_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            message TEXT NOT NULL,
+            metric_data TEXT,
+            acknowledged BOOLEAN DEFAULT FALSE,
+            acknowledged_at TIMESTAMP
+        );
+    """)
+
+    ensure_id_sequence(conn, "system_alerts_id_seq", "system_alerts")
+
+    for record in records:
+        conn.execute(
+            "INSERT INTO system_alerts (id, timestamp, alert_type, severity, message, metric_data) "
+            "VALUES (nextval('system_alerts_id_seq'), ?, ?, ?, ?, ?)",
+            record
+        )
+    return len(records)
+
+
+writer.register_handler("metrics", write_metric_records)
+writer.register_handler("alerts", write_alert_records)
 
 
 class SystemMetricsCollector:
@@ -220,41 +273,19 @@ class SystemMetricsCollector:
 
     def store_metrics(self, metrics: Dict[str, Any]) -> int:
         """Store metrics in DuckDB"""
+        records = []
+        for metric_type, metric_data in metrics.items():
+            # Multiple metrics (disk, network, services) or a single one (cpu, memory, uptime)
+            for metric in (metric_data if isinstance(metric_data, list) else [metric_data]):
+                records.append([metric["timestamp"], metric_type, json.dumps(self._convert_timestamps_to_iso(metric))])
+
+        # The server's writer batches these with other writes; nobody waits on them
+        if writer.submit(self.db_path, "metrics", records, wait=False):
+            return len(records)
+
         conn = get_connection(self.db_path)
         try:
-            # Ensure metrics table exists
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS system_metrics (
-                    timestamp TIMESTAMP NOT NULL,
-                    metric_type TEXT NOT NULL,
-                    metric_data TEXT
-                );
-            """)
-
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_system_metrics_ts_type ON system_metrics (timestamp, metric_type);")
-
-            total_stored = 0
-
-            # Store each metric type
-            for metric_type, metric_data in metrics.items():
-                if isinstance(metric_data, list):
-                    # Multiple metrics (disk, network, services)
-                    for metric in metric_data:
-                        conn.execute(
-                            "INSERT INTO system_metrics (timestamp, metric_type, metric_data) VALUES (?, ?, ?)",
-                            [metric["timestamp"], metric_type, json.dumps(self._convert_timestamps_to_iso(metric))]
-                        )
-                        total_stored += 1
-                else:
-                    # Single metric (cpu, memory, uptime)
-                    conn.execute(
-                        "INSERT INTO system_metrics (timestamp, metric_type, metric_data) VALUES (?, ?, ?)",
-                        [metric_data["timestamp"], metric_type, json.dumps(self._convert_timestamps_to_iso(metric_data))]
-                    )
-                    total_stored += 1
-
-            return total_stored
-
+            return write_metric_records(conn, records)
         finally:
             conn.close()
 
@@ -287,18 +318,22 @@ class SystemHealthMonitor:
         if self._monitor_thread:
             self._monitor_thread.join(timeout=5)
 
+    def collect_once(self) -> Dict[str, int]:
+        """Collect and store one round of metrics and any alerts they raise"""
+        metrics = self.collector.collect_all_metrics()
+        stored = self.collector.store_metrics(metrics)
+
+        # Check for alerts
+        alerts = self.check_alerts(metrics)
+        if alerts:
+            self.store_alerts(alerts)
+        return {"metrics": stored, "alerts": len(alerts)}
+
     def _monitor_loop(self, interval_seconds: int):
         """Monitoring loop"""
         while self._monitoring:
             try:
-                metrics = self.collector.collect_all_metrics()
-                self.collector.store_metrics(metrics)
-
-                # Check for alerts
-                alerts = self.check_alerts(metrics)
-                if alerts:
-                    self.store_alerts(alerts)
-
+                self.collect_once()
             except Exception as e:
                 print(f"Error in monitoring loop: {e}")
 
@@ -361,34 +396,22 @@ class SystemHealthMonitor:
 
     def store_alerts(self, alerts: List[Dict[str, Any]]):
         """Store alerts in database"""
+        records = [
+            [
+                alert["timestamp"],
+                alert["alert_type"],
+                alert["severity"],
+                alert["message"],
+                json.dumps(alert["metric_data"])
+            ]
+            for alert in alerts
+        ]
+        if writer.submit(self.db_path, "alerts", records, wait=False):
+            return
+
         conn = get_connection(self.db_path)
         try:
-            # Ensure alerts table exists
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS system_alerts (
-                    timestamp TIMESTAMP NOT NULL,
-                    alert_type TEXT NOT NULL,
-                    severity TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    metric_data TEXT,
-                    acknowledged BOOLEAN DEFAULT FALSE,
-                    acknowledged_at TIMESTAMP,
-                    INDEX (timestamp, alert_type, severity)
-                );
-            """)
-
-            for alert in alerts:
-                conn.execute(
-                    "INSERT INTO system_alerts (timestamp, alert_type, severity, message, metric_data) VALUES (?, ?, ?, ?, ?)",
-                    [
-                        alert["timestamp"],
-                        alert["alert_type"],
-                        alert["severity"],
-                        alert["message"],
-                        json.dumps(alert["metric_data"])
-                    ]
-                )
-
+            write_alert_records(conn, records)
         finally:
             conn.close()
 
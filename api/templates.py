@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+import datetime as dt
+import hashlib
+import re
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("chimera")
+
+
+# Online log template mining (Drain). Messages are routed through a fixed-depth
+# prefix tree (token count, then the first tokens) to a few candidate clusters;
+# the most similar one absorbs the message, turning differing tokens into <*>.
+# Templates and their tree routes live in log_templates, so a restart rebuilds
+# the exact same tree without re-reading any logs.
+WILDCARD = "<*>"
+
+DEFAULT_TEMPLATE_SETTINGS = {
+    "enabled": True,
+    "depth": 4,  # tree depth including the root and token-count levels
+    "similarity": 0.4,  # share of matching template tokens needed to join a cluster
+    "max_children": 100,  # per tree node; further distinct tokens share the <*> branch
+}
+
+# Tokens that are always parameters: IPs, numbers with units, hex ids, UUIDs
+MASKS = [
+    re.compile(r"(\d{1,3}\.){3}\d{1,3}(:\d+)?"),
+    re.compile(r"[-+]?\d+([.,:]\d+)*[a-zA-Z%]{0,3}"),
+    re.compile(r"(0x)?[0-9a-fA-F]{8,}"),
+    re.compile(r"[0-9a-fA-F]{8}(-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}"),
+]
+_HAS_DIGIT = re.compile(r"\d")
+
+_settings: Dict[str, Any] = {}
+
+
+def configure(settings: Optional[Dict[str, Any]]) -> None:
+    """Set the templates section used by log writes in this process"""
+    global _settings
+    _settings = dict(settings or {})
+    with _miners_lock:
+        _miners.clear()
+
+
+def template_settings() -> Dict[str, Any]:
+    return {**DEFAULT_TEMPLATE_SETTINGS, **_settings}
+
+
+def mask_tokens(tokens: List[str]) -> List[str]:
+    return [WILDCARD if any(mask.fullmatch(token) for mask in MASKS) else token for token in tokens]
+
+
+def template_id_for(tokens: List[str], salt: int = 0) -> int:
+    """Stable signed 64-bit id derived from the tokens that founded a cluster"""
+    digest = hashlib.sha256(("\x1f".join(tokens) + (f"\x1e{salt}" if salt else "")).encode()).digest()
+    return int.from_bytes(digest[:8], byteorder="big", signed=True)
+
+
+class Cluster:
+    """One template: its tokens, tree route and counters"""
+
+    def __init__(self, template_id: int, tokens: List[str], route: List[str], count: int = 0,
+                 first_seen=None, last_seen=None):
+        self.id = template_id
+        self.tokens = tokens
+        self.route = route
+        self.count = count
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+    def similarity(self, tokens: List[str]) -> Tuple[float, int]:
+        """(share of equal tokens, wildcard count); identical lengths are guaranteed by the tree"""
+        if not tokens:
+            return 1.0, 0
+        same = wildcards = 0
+        for expected, token in zip(self.tokens, tokens):
+            if expected == WILDCARD:
+                wildcards += 1
+            elif expected == token:
+                same += 1
+        return same / len(tokens), wildcards
+
+    def params(self, tokens: List[str]) -> List[str]:
+        return [token for expected, token in zip(self.tokens, tokens) if expected == WILDCARD]
+
+
+class _Node:
+    __slots__ = ("children", "clusters")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.clusters: List[int] = []
+
+
+class TemplateMiner:
+    """Drain prefix tree plus the clusters it routes to"""
+
+    def __init__(self, depth: int = 4, similarity: float = 0.4, max_children: int = 100):
+        self.prefix_len = max(0, int(depth) - 2)
+        self.threshold = float(similarity)
+        self.max_children = max(1, int(max_children))
+        self.root: Dict[int, _Node] = {}
+        self.clusters: Dict[int, Cluster] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "TemplateMiner":
+        return cls(settings["depth"], settings["similarity"], settings["max_children"])
+
+    def load(self, conn) -> None:
+        rows = conn.execute(
+            "SELECT template_id, template, route, count, first_seen, last_seen "
+            "FROM log_templates ORDER BY first_seen, template_id"
+        ).fetchall()
+        for template_id, template, route, count, first_seen, last_seen in rows:
+            cluster = Cluster(template_id, template.split(), list(route or []), count, first_seen, last_seen)
+            self.clusters[cluster.id] = cluster
+            self._leaf(len(cluster.tokens), cluster.route).clusters.append(cluster.id)
+
+    def _key(self, token: str) -> str:
+        return WILDCARD if token == WILDCARD or _HAS_DIGIT.search(token) else token
+
+    def _find_route(self, tokens: List[str]) -> Optional[List[str]]:
+        """Existing route for tokens: exact token branches first, then <*>"""
+        node = self.root.get(len(tokens))
+        if node is None:
+            return None
+        route = []
+        for token in tokens[:self.prefix_len]:
+            key = self._key(token)
+            if key not in node.children:
+                key = WILDCARD
+            child = node.children.get(key)
+            if child is None:
+                return None
+            route.append(key)
+            node = child
+        return route
+
+    def _new_route(self, tokens: List[str]) -> List[str]:
+        """Route for a new cluster, spilling into <*> once a node is full"""
+        node = self.root.get(len(tokens)) or _Node()
+        route = []
+        for token in tokens[:self.prefix_len]:
+            key = self._key(token)
+            if key not in node.children and len(node.children) >= self.max_children:
+                key = WILDCARD
+            route.append(key)
+            node = node.children.get(key) or _Node()
+        return route
+
+    def _leaf(self, length: int, route: List[str]) -> _Node:
+        node = self.root.setdefault(length, _Node())
+        for key in route:
+            node = node.children.setdefault(key, _Node())
+        return node
+
+    def match(self, tokens: List[str]) -> Optional[Cluster]:
+        route = self._find_route(tokens)
+        if route is None:
+            return None
+        best, best_score = None, (-1.0, -1)
+        for cluster_id in self._leaf(len(tokens), route).clusters:
+            cluster = self.clusters[cluster_id]
+            score = cluster.similarity(tokens)
+            if score > best_score:
+                best, best_score = cluster, score
+        return best if best is not None and best_score[0] >= self.threshold else None
+
+    def add(self, message: Optional[str], ts=None) -> Tuple[Cluster, List[str]]:
+        """Assign a message to a template; returns (cluster, params)"""
+        tokens = (message or "").split()
+        masked = mask_tokens(tokens)
+        ts = _naive_utc(ts) if ts is not None else None
+        cluster = self.match(masked)
+        if cluster is None:
+            salt = 0
+            template_id = template_id_for(masked)
+            while template_id in self.clusters:
+                salt += 1
+                template_id = template_id_for(masked, salt)
+            route = self._new_route(masked)
+            cluster = Cluster(template_id, list(masked), route, first_seen=ts)
+            self.clusters[template_id] = cluster
+            self._leaf(len(masked), route).clusters.append(template_id)
+        else:
+            cluster.tokens = [expected if expected == token else WILDCARD for expected, token in zip(cluster.tokens, masked)]
+        cluster.count += 1
+        if ts is not None:
+            cluster.last_seen = ts if cluster.last_seen is None else max(cluster.last_seen, ts)
+            cluster.first_seen = ts if cluster.first_seen is None else min(cluster.first_seen, ts)
+        return cluster, cluster.params(tokens)
+
+
+def _naive_utc(ts: dt.datetime) -> dt.datetime:
+    return ts.astimezone(dt.timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _database_key(conn) -> str:
+    row = conn.execute(
+        "SELECT path FROM duckdb_databases() WHERE database_name = current_database()"
+    ).fetchone()
+    return (row[0] if row else None) or f"memory:{id(conn)}"
+
+
+_miners: Dict[str, TemplateMiner] = {}
+_miners_lock = threading.Lock()
+
+
+def get_miner(conn) -> TemplateMiner:
+    """Process-wide miner for the database behind `conn`, warm-started from log_templates"""
+    key = _database_key(conn)
+    with _miners_lock:
+        miner = _miners.get(key)
+        if miner is None:
+            miner = TemplateMiner.from_settings(template_settings())
+            miner.load(conn)
+            _miners[key] = miner
+        return miner
+
+
+def invalidate(conn) -> None:
+    """Forget the in-memory tree, e.g. after a rollback discarded template writes"""
+    try:
+        key = _database_key(conn)
+    except Exception:
+        return
+    with _miners_lock:
+        _miners.pop(key, None)
+
+
+def index_log_rows(conn, rows: List[Dict[str, Any]]) -> int:
+    """Assign templates to newly inserted rows (setting row["template_id"] and row["template_params"])"""
+    if not rows or not template_settings()["enabled"]:
+        return 0
+    miner = get_miner(conn)
+    assignments = []
+    touched: Dict[int, Cluster] = {}
+    with miner.lock:
+        for row in rows:
+            cluster, params = miner.add(row.get("message"), row.get("ts"))
+            row["template_id"] = cluster.id
+            row["template_params"] = params
+            assignments.append((row["id"], row["ts"], cluster.id, params))
+            touched[cluster.id] = cluster
+        templates = [
+            (c.id, c.template, len(c.tokens), c.route, c.count, c.first_seen, c.last_seen)
+            for c in touched.values()
+        ]
+    conn.executemany(
+        "INSERT INTO log_templates (template_id, template, token_count, route, count, first_seen, last_seen) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (template_id) DO UPDATE SET "
+        "template = excluded.template, count = excluded.count, "
+        "first_seen = excluded.first_seen, last_seen = excluded.last_seen",
+        templates,
+    )
+    conn.executemany(
+        "INSERT INTO log_template_ids (log_id, ts, template_id, params) VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING",
+        assignments,
+    )
+    return len(assignments)
+
+
+def remove_log_ids(conn, log_ids: List[int]) -> None:
+    """Drop template assignments for deleted logs; template counters are lifetime totals"""
+    if log_ids:
+        conn.execute("DELETE FROM log_template_ids WHERE log_id IN (SELECT UNNEST(?::BIGINT[]))", [log_ids])
+
+
+def top_templates_sql(since_ts, limit: int) -> Tuple[str, list]:
+    """Templates by row count since a timestamp; safe over federated (unioned) tables"""
+    sql = """
+        SELECT t.template_id, arg_max(lt.template, lt.last_seen) AS template, t.count,
+               t.first_seen, t.last_seen
+        FROM (
+            SELECT template_id, COUNT(*) AS count, MIN(ts) AS first_seen, MAX(ts) AS last_seen
+            FROM log_template_ids WHERE ts >= ? GROUP BY template_id
+        ) t
+        JOIN log_templates lt USING (template_id)
+        GROUP BY t.template_id, t.count, t.first_seen, t.last_seen
+        ORDER BY t.count DESC, t.template_id
+        LIMIT ?
+    """
+    return sql, [since_ts, limit]
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+import re
+import datetime as dt
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import bulk
+
+logger = logging.getLogger("chimera")
+
+
+# Tokens keep embedded punctuation so IPs, paths and user@host stay whole;
+# the compound's alphanumeric parts are indexed alongside it.
+TOKEN_PATTERN = re.compile(r"[\w][\w.@:/\-]*")
+PART_SPLIT_PATTERN = re.compile(r"[.@:/\-]+")
+TRAILING_PUNCTUATION = ".:/-@"
+
+MAX_TOKEN_LENGTH = 64
+
+# Index build for logs written before the index existed: id-ordered pages,
+# resumable from the cursor kept in chimera_meta
+META_KEY = "text_index"
+BACKFILL_BATCH_SIZE = 50000
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: Optional[str], with_parts: bool = True) -> List[str]:
+    """Split a message into lowercase index terms"""
+    if not text:
+        return []
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group(0).rstrip(TRAILING_PUNCTUATION)
+        if not token or len(token) > MAX_TOKEN_LENGTH:
+            continue
+        terms.append(token)
+        if with_parts and PART_SPLIT_PATTERN.search(token):
+            terms.extend(part for part in PART_SPLIT_PATTERN.split(token) if len(part) >= 2)
+    return terms
+
+
+def index_log_rows(conn, rows: List[Dict[str, Any]]) -> int:
+    """Add postings for newly inserted log rows; returns the number of postings"""
+    postings = []
+    total_len = 0
+    for row in rows:
+        terms = tokenize(row.get("message"))
+        if not terms:
+            continue
+        counts = Counter(terms)
+        doc_len = len(terms)
+        total_len += doc_len
+        for term, tf in counts.items():
+            postings.append((term, row["id"], row["ts"], tf, doc_len))
+
+    if not postings:
+        return 0
+
+    terms, ids, stamps, tfs, lengths = zip(*postings)
+    bulk.insert_columns(
+        conn, "log_terms",
+        {"term": terms, "log_id": ids, "ts": stamps, "tf": tfs, "doc_len": lengths},
+        {"term": object, "log_id": "int64", "ts": "datetime64[us]", "tf": "int64", "doc_len": "int64"},
+    )
+    doc_count = len({p[1] for p in postings})
+    conn.execute(
+        "UPDATE log_term_stats SET doc_count = doc_count + ?, total_len = total_len + ? WHERE name = 'logs'",
+        [doc_count, total_len],
+    )
+    return len(postings)
+
+
+def remove_log_ids(conn, log_ids: List[int], max_ts: Optional[dt.datetime] = None) -> int:
+    """Drop postings for deleted logs; max_ts lets the scan prune by time"""
+    if not log_ids:
+        return 0
+    ts_clause = " AND ts <= ?" if max_ts is not None else ""
+    ts_params = [max_ts] if max_ts is not None else []
+    docs = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(doc_len), 0) FROM ("
+        "SELECT log_id, ANY_VALUE(doc_len) AS doc_len FROM log_terms "
+        f"WHERE log_id IN (SELECT UNNEST(?::BIGINT[])){ts_clause} GROUP BY log_id)",
+        [log_ids] + ts_params,
+    ).fetchone()
+    if not docs or not docs[0]:
+        return 0
+    conn.execute(
+        f"DELETE FROM log_terms WHERE log_id IN (SELECT UNNEST(?::BIGINT[])){ts_clause}",
+        [log_ids] + ts_params,
+    )
+    conn.execute(
+        "UPDATE log_term_stats SET doc_count = GREATEST(doc_count - ?, 0), "
+        "total_len = GREATEST(total_len - ?, 0) WHERE name = 'logs'",
+        [docs[0], docs[1]],
+    )
+    return docs[0]
+
+
+def build_match_cte(conn, query: str, since_ts: dt.datetime,
+                    require_all: bool = True) -> Optional[Tuple[str, list]]:
+    """Build a BM25-scored `hits(log_id, score)` subquery for a token query.
+
+    Every query term must be present (AND semantics) unless require_all is
+    False, in which case rows matching any term are scored. Returns None when
+    the query has no indexable terms.
+    """
+    terms = sorted(set(tokenize(query, with_parts=False)))
+    if not terms:
+        return None
+
+    stats = conn.execute("SELECT doc_count, total_len FROM log_term_stats WHERE name = 'logs'").fetchone()
+    doc_count = max(stats[0], 1) if stats else 1
+    avg_len = (stats[1] / doc_count) if stats and stats[1] else 1.0
+
+    placeholders = ", ".join("?" for _ in terms)
+    sql = f"""
+        SELECT p.log_id,
+               SUM(ln(1 + (? - df.df + 0.5) / (df.df + 0.5))
+                   * p.tf * {BM25_K1 + 1} / (p.tf + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * p.doc_len / ?))) AS score
+        FROM log_terms p
+        JOIN (
+            SELECT term, COUNT(*) AS df FROM log_terms WHERE term IN ({placeholders}) GROUP BY term
+        ) df ON df.term = p.term
+        WHERE p.term IN ({placeholders}) AND p.ts >= ?
+        GROUP BY p.log_id
+        HAVING COUNT(*) >= ?
+    """
+    params = [doc_count, avg_len] + terms + terms + [since_ts, len(terms) if require_all else 1]
+    return sql, params
+
+
+def backfill_page(conn, after_id: Optional[int], batch_size: int = BACKFILL_BATCH_SIZE) -> Tuple[Optional[int], int]:
+    """Index the next id-ordered page of logs that have no postings yet.
+
+    Returns (last id of the page, rows indexed); the id is None once past the
+    last row. Pages are found by keyset, so each costs the same however far in.
+    """
+    id_clause = "WHERE id > ? " if after_id is not None else ""
+    rows = conn.execute(
+        f"SELECT id, ts, message FROM logs {id_clause}ORDER BY id LIMIT ?",
+        ([after_id] if after_id is not None else []) + [batch_size],
+    ).fetchall()
+    if not rows:
+        return None, 0
+    indexed = {row[0] for row in conn.execute(
+        "SELECT DISTINCT log_id FROM log_terms WHERE log_id IN (SELECT UNNEST(?::BIGINT[]))",
+        [[r[0] for r in rows]],
+    ).fetchall()}
+    pending = [{"id": r[0], "ts": r[1], "message": r[2]} for r in rows if r[0] not in indexed]
+    index_log_rows(conn, pending)
+    return rows[-1][0], len(pending)
+
+
+def rebuild(conn, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Rebuild the term index from the logs table on one connection"""
+    conn.execute("DELETE FROM log_terms")
+    conn.execute("UPDATE log_term_stats SET doc_count = 0, total_len = 0 WHERE name = 'logs'")
+    indexed = 0
+    after_id = None
+    while True:
+        after_id, count = backfill_page(conn, after_id, batch_size)
+        if after_id is None:
+            break
+        indexed += count
+    logger.info(f"Rebuilt text index over {indexed} logs")
+    return indexed
+
+
+def build_pending(db_path: Optional[str], batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Finish a pending index build, one page per write transaction; returns rows indexed.
+
+    Schema setup only marks the build as pending, so startup stays fast; this
+    runs as a maintenance job and picks up where the last page left off.
+    """
+    from .db import get_meta, set_meta
+    from .writer import run_write
+
+    def page(conn) -> Optional[int]:
+        state = get_meta(conn, META_KEY) or ""
+        if not state.startswith("pending"):
+            return None
+        after_id = int(state.split(":", 1)[1]) if ":" in state else None
+        last_id, count = backfill_page(conn, after_id, batch_size)
+        set_meta(conn, META_KEY, "built" if last_id is None else f"pending:{last_id}")
+        return count if last_id is not None else None
+
+    indexed = 0
+    while True:
+        count = run_write(db_path, page)
+        if count is None:
+            break
+        indexed += count
+    if indexed:
+        logger.info(f"Text index built for {indexed} existing logs")
+    return indexed
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import datetime as dt
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse  # type: ignore
+
+from . import bulk
+
+logger = logging.getLogger("chimera")
+
+
+# Only the head of very long messages is indexed; such rows carry a marker
+# posting and are always treated as candidates so pruning stays exact.
+MAX_INDEXED_CHARS = 1024
+OVERFLOW_MARKER = ""
+
+# Upper bound on trigrams used to prune a single query; any subset of the
+# required trigrams still yields a superset of the true matches.
+MAX_QUERY_TRIGRAMS = 32
+
+# ILIKE wildcards: a needle containing them is not a plain substring
+LIKE_WILDCARDS = ("%", "_")
+
+
+def trigrams(text: Optional[str]) -> Set[str]:
+    """Distinct lowercase trigrams of a string"""
+    if not text:
+        return set()
+    lowered = text.lower()
+    return {lowered[i:i + 3] for i in range(len(lowered) - 2)}
+
+
+def index_log_rows(conn, rows: List[Dict[str, Any]]) -> int:
+    """Add trigram postings for newly inserted log rows; returns the number of postings"""
+    grams_column: List[str] = []
+    ids: List[int] = []
+    stamps: List[Any] = []
+    for row in rows:
+        message = row.get("message") or ""
+        grams = trigrams(message[:MAX_INDEXED_CHARS])
+        if len(message) > MAX_INDEXED_CHARS:
+            grams.add(OVERFLOW_MARKER)
+        grams_column.extend(grams)
+        ids.extend([row["id"]] * len(grams))
+        stamps.extend([row["ts"]] * len(grams))
+
+    # A message yields ~100 postings; they go in as one columnar insert
+    return bulk.insert_columns(
+        conn, "log_trigrams",
+        {"trigram": grams_column, "log_id": ids, "ts": stamps},
+        {"trigram": object, "log_id": "int64", "ts": "datetime64[us]"},
+    )
+
+
+def remove_log_ids(conn, log_ids: List[int], max_ts: Optional[dt.datetime] = None) -> None:
+    """Drop trigram postings for deleted logs; max_ts lets the scan prune by time"""
+    if not log_ids:
+        return
+    ts_clause = " AND ts <= ?" if max_ts is not None else ""
+    ts_params = [max_ts] if max_ts is not None else []
+    conn.execute(
+        f"DELETE FROM log_trigrams WHERE log_id IN (SELECT UNNEST(?::BIGINT[])){ts_clause}",
+        [log_ids] + ts_params,
+    )
+
+
+def substring_trigrams(needle: str) -> Set[str]:
+    """Trigrams every message containing `needle` (case-insensitively) must have"""
+    if any(w in needle for w in LIKE_WILDCARDS):
+        return set()
+    return trigrams(needle)
+
+
+def _required_literals(items: Iterable) -> List[str]:
+    """Collect literal runs that every match of a parsed pattern must contain"""
+    runs: List[str] = []
+    current: List[str] = []
+
+    def flush() -> None:
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    for op, av in items:
+        name = str(op)
+        if name == "LITERAL":
+            current.append(chr(av))
+        elif name == "AT":
+            # Anchors and word boundaries are zero-width; the run continues
+            continue
+        elif name == "SUBPATTERN":
+            flush()
+            runs.extend(_required_literals(av[-1]))
+        elif name == "ATOMIC_GROUP":
+            flush()
+            runs.extend(_required_literals(av))
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            flush()
+            min_count, _max_count, sub = av
+            if min_count >= 1:
+                runs.extend(_required_literals(sub))
+        else:
+            # Alternation, classes, wildcards, backreferences: nothing guaranteed
+            flush()
+    flush()
+    return runs
+
+
+def regex_trigrams(pattern: str) -> Set[str]:
+    """Trigrams implied by the literals a regex requires.
+
+    Patterns Python cannot parse (RE2-only syntax) yield no trigrams, which
+    simply disables pruning; DuckDB remains the judge of validity.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return set()
+    grams: Set[str] = set()
+    for literal in _required_literals(parsed):
+        grams |= trigrams(literal)
+    return grams
+
+
+def build_candidate_sql(required: Set[str], since_ts: dt.datetime) -> Optional[Tuple[str, list]]:
+    """Build a `SELECT log_id` subquery of rows holding every required trigram.
+
+    Returns None when there is nothing to prune with.
+    """
+    grams = sorted(g for g in required if g)[:MAX_QUERY_TRIGRAMS]
+    if not grams:
+        return None
+    placeholders = ", ".join("?" for _ in grams)
+    sql = f"""
+        SELECT log_id FROM log_trigrams
+        WHERE trigram IN ({placeholders}) AND ts >= ?
+        GROUP BY log_id
+        HAVING COUNT(DISTINCT trigram) = ?
+        UNION
+        SELECT log_id FROM log_trigrams WHERE trigram = ? AND ts >= ?
+    """
+    params = grams + [since_ts, len(grams), OVERFLOW_MARKER, since_ts]
+    return sql, params
+
+
+def rebuild(conn, batch_size: int = 50000) -> int:
+    """Rebuild the trigram index from the logs table"""
+    conn.execute("DELETE FROM log_trigrams")
+    indexed = 0
+    after_id = None
+    while True:
+        id_clause = "WHERE id > ? " if after_id is not None else ""
+        rows = conn.execute(
+            f"SELECT id, ts, message FROM logs {id_clause}ORDER BY id LIMIT ?",
+            ([after_id] if after_id is not None else []) + [batch_size],
+        ).fetchall()
+        if not rows:
+            break
+        indexed += len(rows)
+        index_log_rows(conn, [{"id": r[0], "ts": r[1], "message": r[2]} for r in rows])
+        after_id = rows[-1][0]
+    logger.info(f"Rebuilt trigram index over {indexed} logs")
+    return indexed
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("chimera")
+
+
+# Embedded vector backend: fixed-size FLOAT[N] columns in DuckDB scored with
+# array_cosine_similarity. Filters run in the same SQL as the similarity, so
+# filtered searches are exact and there is no second store to keep in sync.
+LOG_VECTORS = "log_vectors"  # key: logs.id
+TEMPLATE_VECTORS = "template_vectors"  # key: log_templates.template_id
+
+
+def table_exists(conn, table: str) -> bool:
+    row = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ? AND table_catalog = current_database()",
+        [table],
+    ).fetchone()
+    return bool(row and row[0])
+
+
+def dimensions(conn, table: str) -> Optional[int]:
+    """N of the table's FLOAT[N] column, None when the table does not exist yet"""
+    # A federated connection shadows the table with a temp view over main and shards
+    row = conn.execute(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_name = ? AND column_name = 'embedding' AND table_catalog IN ('temp', current_database()) "
+        "ORDER BY table_catalog = 'temp' DESC LIMIT 1",
+        [table],
+    ).fetchone()
+    if not row:
+        return None
+    return int(row[0].rsplit("[", 1)[1].rstrip("]"))
+
+
+def ensure_table(conn, table: str, dim: int) -> None:
+    """Create the vector table on first use; the width is fixed by the first model"""
+    existing = dimensions(conn, table)
+    if existing is None:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key BIGINT PRIMARY KEY, embedding FLOAT[{int(dim)}] NOT NULL)")
+    elif existing != dim:
+        raise ValueError(f"{table} holds {existing}-dimensional vectors, got {dim}; drop it to switch models")
+
+
+def upsert(conn, table: str, keys: Sequence[int], vectors: Sequence[List[float]]) -> int:
+    if not keys:
+        return 0
+    dim = len(vectors[0])
+    ensure_table(conn, table, dim)
+    conn.executemany(
+        f"INSERT INTO {table} (key, embedding) VALUES (?, ?::FLOAT[{dim}]) "
+        "ON CONFLICT (key) DO UPDATE SET embedding = excluded.embedding",
+        [(key, vector) for key, vector in zip(keys, vectors)],
+    )
+    return len(keys)
+
+
+def remove_keys(conn, table: str, keys: Sequence[int]) -> None:
+    if keys and table_exists(conn, table):
+        conn.execute(f"DELETE FROM {table} WHERE key IN (SELECT UNNEST(?::BIGINT[]))", [list(keys)])
+
+
+def nearest(conn, table: str, query: List[float], limit: int) -> List[Tuple[int, float]]:
+    """(key, cosine similarity) of the closest vectors, best first"""
+    dim = dimensions(conn, table)
+    if dim is None:
+        return []
+    if dim != len(query):
+        raise ValueError(f"{table} holds {dim}-dimensional vectors, query has {len(query)}")
+    return conn.execute(
+        f"SELECT key, array_cosine_similarity(embedding, ?::FLOAT[{dim}]) AS similarity "
+        f"FROM {table} ORDER BY similarity DESC, key LIMIT ?",
+        [query, limit],
+    ).fetchall()
+
+
+def search_logs_sql(dim: int, filters: List[str]) -> str:
+    """Rows most similar to a query vector among logs passing `filters` (SQL over alias l)"""
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    return f"""
+        SELECT l.id, l.ts, l.hostname, l.source, l.unit, l.severity, l.pid, l.message,
+               array_cosine_similarity(v.embedding, ?::FLOAT[{dim}]) AS similarity
+        FROM {LOG_VECTORS} v
+        JOIN logs l ON l.id = v.key
+        {where}
+        ORDER BY similarity DESC, l.ts DESC
+        LIMIT ?
+    """
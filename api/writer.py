@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from .db import DEFAULT_DB_PATH, get_connection
+from . import log_dictionary, raw_store, templates
+from .log_store import insert_log_rows
+
+logger = logging.getLogger("chimera")
+
+
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_MAX_BATCH_ROWS = 5000
+DEFAULT_MAX_LATENCY_MS = 50
+
+# Write kinds in drain order; each maps to a handler(conn, payload) -> result that
+# runs inside a transaction owned by the caller
+WRITE_KINDS = ["logs", "embeddings", "metrics", "alerts", "audits", "maintenance"]
+# Kinds applied alone, in their own transaction, ahead of grouped writes
+EXCLUSIVE_KINDS = ("maintenance",)
+_handlers: Dict[str, Callable[[Any, Any], Any]] = {}
+
+
+def register_handler(kind: str, handler: Callable[[Any, Any], Any]) -> None:
+    """Register the function that applies one payload of a write kind"""
+    if kind not in WRITE_KINDS:
+        raise ValueError(f"Unknown write kind: {kind}")
+    _handlers[kind] = handler
+
+
+def run_in_transaction(conn, kind: str, payload: Any) -> Any:
+    """Apply one payload in its own transaction (the path used without a writer)"""
+    conn.begin()
+    try:
+        result = _handlers[kind](conn, payload)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # Dictionary codes and templates written during the failed write were rolled back too
+        log_dictionary.invalidate(conn)
+        templates.invalidate(conn)
+        raise
+    return result
+
+
+def write_ingest_batch(conn, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Insert parsed log rows and advance the source's ingest cursor together.
+
+    payload: {"rows": [...], "source": name, "cursor": last seen cursor or None,
+              "source_config": the source's config (optional, else looked up by name)}
+    """
+    source_config = payload.get("source_config") or raw_store.source_config(payload.get("source"))
+    inserted = insert_log_rows(conn, payload["rows"], source_config)
+    if payload.get("cursor"):
+        conn.execute(
+            "INSERT OR REPLACE INTO ingest_state(source, cursor, updated_at) VALUES(?, ?, CURRENT_TIMESTAMP)",
+            [payload["source"], payload["cursor"]],
+        )
+    return inserted
+
+
+class MaintenanceTask:
+    """Work on the write connection outside the ingest path (retention chunk, migration, backfill).
+
+    Transactional tasks run inside the writer's transaction; the others (schema
+    migrations that manage their own) get the bare connection.
+    """
+
+    def __init__(self, func: Callable[[Any], Any], transactional: bool = True):
+        self.func = func
+        self.transactional = transactional
+
+
+def apply_maintenance(conn, task: MaintenanceTask) -> Any:
+    return task.func(conn)
+
+
+def _payload_rows(payload: Any) -> int:
+    if isinstance(payload, dict) and isinstance(payload.get("rows"), list):
+        return max(1, len(payload["rows"]))
+    if isinstance(payload, list):
+        return max(1, len(payload))
+    return 1
+
+
+class WriteRequest:
+    """A typed batch queued for the writer; producers may wait for its result"""
+
+    def __init__(self, kind: str, payload: Any):
+        self.kind = kind
+        self.payload = payload
+        self.rows = _payload_rows(payload)
+        self.enqueued_at = time.monotonic()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self._done = threading.Event()
+
+    def finish(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        self.result = result
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.kind} write not applied within {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class DatabaseWriter:
+    """Single thread owning the write connection.
+
+    Producers push typed batches onto bounded per-kind queues (blocking when a
+    queue is full). The writer drains them into one transaction until the row
+    budget or the latency budget is reached. If a grouped transaction fails,
+    its requests are retried one by one so a bad batch only fails its producer.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 max_batch_rows: int = DEFAULT_MAX_BATCH_ROWS, max_latency_ms: int = DEFAULT_MAX_LATENCY_MS):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self.max_batch_rows = max(1, int(max_batch_rows))
+        self.max_latency = max(0, int(max_latency_ms)) / 1000.0
+        self._queues: Dict[str, queue.Queue] = {kind: queue.Queue(maxsize=max(1, int(queue_size))) for kind in WRITE_KINDS}
+        self._pending = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn = None
+        self._stats: Dict[str, Any] = {
+            "transactions": 0,
+            "failed_transactions": 0,
+            "requests": {kind: 0 for kind in WRITE_KINDS},
+            "rows": {kind: 0 for kind in WRITE_KINDS},
+            "errors": {kind: 0 for kind in WRITE_KINDS},
+            "max_group_requests": 0,
+            "total_wait_ms": 0.0,
+            "total_commit_ms": 0.0,
+        }
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, db_path: Optional[str], settings: Dict[str, Any]) -> "DatabaseWriter":
+        return cls(
+            db_path,
+            queue_size=settings.get("queue_size", DEFAULT_QUEUE_SIZE),
+            max_batch_rows=settings.get("max_batch_rows", DEFAULT_MAX_BATCH_ROWS),
+            max_latency_ms=settings.get("max_latency_ms", DEFAULT_MAX_LATENCY_MS),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._conn = get_connection(self.db_path, profile="ingest")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="chimera-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"Writer started for {self.db_path} (max_batch_rows={self.max_batch_rows}, "
+                    f"max_latency_ms={int(self.max_latency * 1000)})")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Drain queued writes, then close the write connection"""
+        self._stop_event.set()
+        with self._pending:
+            self._pending.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        logger.info("Writer stopped")
+
+    def submit(self, kind: str, payload: Any, timeout: Optional[float] = None) -> WriteRequest:
+        """Queue a payload; blocks while the kind's queue is full"""
+        if kind not in _handlers:
+            raise ValueError(f"No write handler registered for {kind}")
+        if self._stop_event.is_set():
+            raise RuntimeError("writer is stopping")
+        request = WriteRequest(kind, payload)
+        self._queues[kind].put(request, timeout=timeout)
+        with self._pending:
+            self._pending.notify()
+        return request
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {kind: q.qsize() for kind, q in self._queues.items()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = {key: (dict(value) if isinstance(value, dict) else value) for key, value in self._stats.items()}
+        requests = sum(stats["requests"].values())
+        transactions = stats["transactions"]
+        stats["avg_requests_per_transaction"] = round(requests / transactions, 2) if transactions else 0.0
+        total_wait_ms = stats.pop("total_wait_ms")
+        total_commit_ms = stats.pop("total_commit_ms")
+        stats["avg_wait_ms"] = round(total_wait_ms / requests, 3) if requests else 0.0
+        stats["avg_commit_ms"] = round(total_commit_ms / transactions, 3) if transactions else 0.0
+        stats["queue_depths"] = self.queue_depths()
+        stats["running"] = self.running
+        stats["db_path"] = self.db_path
+        return stats
+
+    def _has_pending(self) -> bool:
+        return any(not q.empty() for q in self._queues.values())
+
+    def _take_exclusive(self) -> Optional[WriteRequest]:
+        for kind in EXCLUSIVE_KINDS:
+            try:
+                return self._queues[kind].get_nowait()
+            except queue.Empty:
+                continue
+        return None
+
+    def _drain(self, group: List[WriteRequest], rows: int) -> int:
+        for kind in WRITE_KINDS:
+            if kind in EXCLUSIVE_KINDS:
+                continue
+            q = self._queues[kind]
+            while rows < self.max_batch_rows:
+                try:
+                    request = q.get_nowait()
+                except queue.Empty:
+                    break
+                group.append(request)
+                rows += request.rows
+        return rows
+
+    def _collect_group(self) -> List[WriteRequest]:
+        with self._pending:
+            while not self._has_pending() and not self._stop_event.is_set():
+                self._pending.wait(timeout=0.5)
+        # Maintenance work is bounded per request and never shares a transaction
+        exclusive = self._take_exclusive()
+        if exclusive is not None:
+            return [exclusive]
+        group: List[WriteRequest] = []
+        rows = self._drain(group, 0)
+        if not group:
+            return group
+        # Let the group fill until the row budget or the oldest request's latency budget
+        deadline = group[0].enqueued_at + self.max_latency
+        while rows < self.max_batch_rows and not self._stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._pending:
+                if not self._has_pending():
+                    self._pending.wait(timeout=remaining)
+            rows = self._drain(group, rows)
+        return group
+
+    def _record(self, group: List[WriteRequest], commit_ms: float, failed: bool) -> None:
+        now = time.monotonic()
+        with self._stats_lock:
+            self._stats["transactions"] += 1
+            if failed:
+                self._stats["failed_transactions"] += 1
+            self._stats["max_group_requests"] = max(self._stats["max_group_requests"], len(group))
+            self._stats["total_commit_ms"] += commit_ms
+            for request in group:
+                self._stats["requests"][request.kind] += 1
+                self._stats["rows"][request.kind] += request.rows
+                self._stats["total_wait_ms"] += (now - request.enqueued_at) * 1000
+                if request.error is not None:
+                    self._stats["errors"][request.kind] += 1
+
+    def _apply_bare(self, request: WriteRequest) -> None:
+        started = time.monotonic()
+        try:
+            request.finish(request.payload.func(self._conn))
+        except Exception as exc:
+            log_dictionary.invalidate(self._conn)
+            templates.invalidate(self._conn)
+            logger.error(f"{request.kind} write failed: {exc}")
+            request.finish(error=exc)
+        self._record([request], (time.monotonic() - started) * 1000, failed=request.error is not None)
+
+    def _apply_group(self, group: List[WriteRequest]) -> None:
+        conn = self._conn
+        if len(group) == 1 and not getattr(group[0].payload, "transactional", True):
+            self._apply_bare(group[0])
+            return
+        started = time.monotonic()
+        results = []
+        try:
+            conn.begin()
+            for request in group:
+                results.append(_handlers[request.kind](conn, request.payload))
+            conn.commit()
+        except Exception as exc:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            log_dictionary.invalidate(conn)
+            templates.invalidate(conn)
+            logger.warning(f"Grouped write of {len(group)} requests failed ({exc}); retrying individually")
+            for request in group:
+                try:
+                    request.finish(run_in_transaction(conn, request.kind, request.payload))
+                except Exception as single_exc:
+                    logger.error(f"{request.kind} write failed: {single_exc}")
+                    request.finish(error=single_exc)
+            self._record(group, (time.monotonic() - started) * 1000, failed=True)
+            return
+        for request, result in zip(group, results):
+            request.finish(result)
+        self._record(group, (time.monotonic() - started) * 1000, failed=False)
+
+    def _run(self) -> None:
+        while True:
+            group = self._collect_group()
+            if group:
+                self._apply_group(group)
+            elif self._stop_event.is_set():
+                break
+
+
+register_handler("logs", write_ingest_batch)
+register_handler("maintenance", apply_maintenance)
+
+
+# The server's writer; producers writing elsewhere use their own connection
+_active_writer: Optional[DatabaseWriter] = None
+_active_lock = threading.Lock()
+
+
+def _same_database(a: Optional[str], b: Optional[str]) -> bool:
+    a = a or DEFAULT_DB_PATH
+    b = b or DEFAULT_DB_PATH
+    if a == ":memory:" or b == ":memory:":
+        return False
+    return os.path.abspath(a) == os.path.abspath(b)
+
+
+def start_writer(db_path: Optional[str], settings: Optional[Dict[str, Any]] = None) -> DatabaseWriter:
+    global _active_writer
+    with _active_lock:
+        if _active_writer is not None:
+            _active_writer.stop()
+        _active_writer = DatabaseWriter.from_config(db_path, settings or {})
+        _active_writer.start()
+        return _active_writer
+
+
+def stop_writer() -> None:
+    global _active_writer
+    with _active_lock:
+        if _active_writer is not None:
+            _active_writer.stop()
+            _active_writer = None
+
+
+def get_writer(db_path: Optional[str] = None) -> Optional[DatabaseWriter]:
+    """The running writer that owns db_path, if any"""
+    writer = _active_writer
+    if writer is not None and writer.running and _same_database(writer.db_path, db_path):
+        return writer
+    return None
+
+
+def submit(db_path: Optional[str], kind: str, payload: Any, wait: bool = True,
+           timeout: Optional[float] = None) -> Optional[WriteRequest]:
+    """Queue a write on the writer owning db_path.
+
+    Returns None when no writer owns the database; the caller then writes on its
+    own connection. With wait=True the request has already been applied (or has
+    raised) when it is returned.
+    """
+    writer = get_writer(db_path)
+    if writer is None:
+        return None
+    request = writer.submit(kind, payload, timeout=timeout)
+    if wait:
+        request.wait(timeout)
+    return request
+
+
+def run_write(db_path: Optional[str], func: Callable[[Any], Any], profile: str = "batch",
+              transactional: bool = True) -> Any:
+    """Apply func(conn) on the writer owning db_path, between grouped ingest writes.
+
+    With transactional set, func runs in a transaction of its own and must not
+    begin or commit one itself; otherwise it gets the bare connection. Without
+    a running writer (CLI tools, tests, schema setup at startup) func runs on a
+    connection of its own the same way.
+    """
+    task = MaintenanceTask(func, transactional)
+    request = submit(db_path, "maintenance", task)
+    if request is not None:
+        return request.result
+    conn = get_connection(db_path, profile=profile)
+    try:
+        if transactional:
+            return run_in_transaction(conn, "maintenance", task)
+        return func(conn)
+    finally:
+        conn.close()
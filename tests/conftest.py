@@ -1,4 +1,6 @@
 import contextlib
+import datetime as dt
+
 import pytest
 
 try:
@@ -6,6 +8,65 @@ try:
 except ImportError:
     duckdb = None
 
+from api.log_store import compute_log_identity
+
+
+# Shared test doubles and row factory; test modules import them from conftest
+
+
+class FakeSocket:
+    """Client socket stand-in that records what a handler sends"""
+
+    def __init__(self):
+        self.data = b""
+
+    def sendall(self, data):
+        self.data += data
+
+    def lines(self):
+        return [line for line in self.data.decode().splitlines() if line]
+
+
+class FakeCompleted:
+    """subprocess.run result stand-in"""
+
+    def __init__(self, code: int, out: str, err: str = ""):
+        self.returncode = code
+        self.stdout = out
+        self.stderr = err
+
+
+class FakeEmbeddingClient:
+    """Embeds text as per-word counts over a fixed vocabulary plus a constant component"""
+
+    model = "fake"
+
+    def __init__(self, words, presence=False, bias=0.1):
+        self.words = list(words)
+        self.presence = presence
+        self.bias = bias
+
+    def get_embedding(self, text):
+        if self.presence:
+            return [float(word in text) for word in self.words] + [self.bias]
+        return [float(text.count(word)) for word in self.words] + [self.bias]
+
+    def get_embeddings_batch(self, texts):
+        return [self.get_embedding(text) for text in texts]
+
+
+def log_row(message="event", seconds_ago=0, **fields):
+    """A logs row for write_log_batch with its id and fingerprint; fields override the defaults"""
+    row = {
+        "ts": dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) - dt.timedelta(seconds=seconds_ago),
+        "hostname": "h", "source": "journald", "unit": "app", "facility": None,
+        "severity": "info", "pid": 1, "uid": None, "gid": None,
+        "message": message, "raw": None, "cursor": None,
+        **fields,
+    }
+    row["id"], row["fingerprint"] = compute_log_identity(row)
+    return row
+
 
 @pytest.fixture()
 def temp_db_path(tmp_path):
@@ -25,7 +25,7 @@ def test_config_to_dict():
     config_dict = config.to_dict()
     
     # Check all expected keys are present
-    expected_keys = {"log_sources", "db_path", "socket_path", "max_ingest_limit", "default_retention_days"}
+    expected_keys = {"log_sources", "db_path", "socket_path", "max_ingest_limit", "default_retention_days", "retention", "promoted_fields", "writer", "process_split", "sharding", "storage", "maintenance", "jobs", "query_limits", "embeddings", "templates", "indexer"}
     assert set(config_dict.keys()) == expected_keys
     
     # Check log sources structure
@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api import embeddings
+from api.embeddings import OllamaEmbeddingClient
+
+
+REQUEST_LATENCY = 0.01  # per HTTP request, as with a local model server
+
+
+class FakeOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    legacy_only = False
+    fail_first = 0
+    calls = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        cls.calls.append((self.path, len(body.get("input", [])) or 1))
+        time.sleep(REQUEST_LATENCY)
+        if cls.fail_first > 0:
+            cls.fail_first -= 1
+            return self._reply(503, {"error": "busy"})
+        if self.path == "/api/embed" and not cls.legacy_only:
+            return self._reply(200, {"embeddings": [[float(len(text)), 1.0] for text in body["input"]]})
+        if self.path == "/api/embeddings":
+            return self._reply(200, {"embedding": [float(len(body["prompt"])), 1.0]})
+        self._reply(404, {"error": "not found"})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    handler = type("Handler", (FakeOllama,), {"calls": [], "legacy_only": False, "fail_first": 0})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(embeddings, "_settings", {"backoff_seconds": 0.01})
+    yield handler, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_batched_embeddings_beat_per_text_requests(ollama):
+    handler, url = ollama
+    texts = [f"log line {i}" * (i % 3 + 1) for i in range(200)]
+    client = OllamaEmbeddingClient(url)
+
+    started = time.monotonic()
+    per_text = [client.get_embedding(text) for text in texts]
+    per_text_seconds = time.monotonic() - started
+    handler.calls.clear()
+
+    started = time.monotonic()
+    batched = client.get_embeddings_batch(texts)
+    batched_seconds = time.monotonic() - started
+
+    assert batched == per_text  # same vectors, same order
+    assert all(path == "/api/embed" for path, _ in handler.calls)
+    assert len(handler.calls) < 10
+    assert batched_seconds * 5 < per_text_seconds
+    # Fast responses grow the batch towards the cap
+    assert client.batch_size > embeddings.DEFAULT_EMBEDDING_SETTINGS["initial_batch_size"]
+
+
+def test_batch_size_shrinks_when_slow(ollama, monkeypatch):
+    _handler, url = ollama
+    monkeypatch.setattr(embeddings, "_settings", {"initial_batch_size": 16, "target_latency_ms": 1})
+    client = OllamaEmbeddingClient(url)
+    client.get_embeddings_batch([f"t{i}" for i in range(40)])
+    assert client.batch_size < 16
+
+
+def test_retries_then_falls_back_to_legacy_endpoint(ollama):
+    handler, url = ollama
+    handler.fail_first = 2
+    client = OllamaEmbeddingClient(url)
+    assert client.get_embeddings_batch(["a", "bb"]) == [[1.0, 1.0], [2.0, 1.0]]
+    assert client.stats["retries"] == 2
+
+    handler.legacy_only = True
+    handler.calls.clear()
+    assert client.get_embeddings_batch(["ccc"]) == [[3.0, 1.0]]
+    assert [path for path, _ in handler.calls] == ["/api/embed", "/api/embeddings"]
+    # The capability check sticks
+    handler.calls.clear()
+    client.get_embeddings_batch(["d"])
+    assert [path for path, _ in handler.calls] == ["/api/embeddings"]
+
+
+def test_exhausted_retries_yield_none(ollama):
+    handler, url = ollama
+    handler.fail_first = 100
+    client = OllamaEmbeddingClient(url)
+    assert client.get_embeddings_batch(["a", "b"]) == [None, None]
+    assert client.stats["failed_texts"] == 2
@@ -0,0 +1,133 @@
+import datetime as dt
+import threading
+from unittest.mock import MagicMock
+
+import duckdb
+
+from api import embedding_cache, embeddings
+from api.db import initialize_schema
+from api.embeddings import SemanticSearchEngine
+
+
+class CountingClient:
+    model = "nomic-embed-text"
+
+    def __init__(self):
+        self.calls = []
+
+    def get_embeddings_batch(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def seed_logs(db_path, messages):
+    now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        conn.executemany(
+            "INSERT INTO logs (id, ts, hostname, source, unit, message) VALUES (?, ?, 'h', 'journald', 'sshd.service', ?)",
+            [(i, now - dt.timedelta(seconds=i), message) for i, message in enumerate(messages)],
+        )
+    finally:
+        conn.close()
+
+
+def make_engine(db_path):
+    engine = SemanticSearchEngine(db_path)
+    engine.embedding_client = CountingClient()
+    engine.chroma_client = MagicMock()
+    return engine
+
+
+def test_dedupe_collapses_whitespace_variants():
+    hashes, unique, mapping = embedding_cache.dedupe(["a  b", "c", "a b ", "C"])
+    assert unique == ["a  b", "c", "C"]
+    assert mapping == [0, 1, 0, 2]
+    assert hashes[0] == embedding_cache.text_hash("a b")
+
+
+def test_index_embeds_each_distinct_text_once(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "cache.duckdb")
+    seed_logs(db_path, ["Accepted publickey"] * 50 + ["session opened"] * 30 + ["reboot"])
+    engine = make_engine(db_path)
+
+    assert engine.index_logs() == (81, 81)
+    assert sorted(len(call) for call in engine.embedding_client.calls) == [3]
+    assert engine.last_index_stats == {"texts": 81, "unique": 3, "cached": 0, "embedded": 3}
+    ids, vectors = engine.chroma_client.add_embeddings.call_args[0][:2]
+    assert len(ids) == 81 and vectors[0] == [float(len("[h] sshd.service: Accepted publickey")), 1.0]
+
+    # A second engine (fresh process) hits the persisted cache and makes no calls
+    conn = duckdb.connect(db_path)
+    try:
+        conn.execute("DELETE FROM log_embeddings")
+    finally:
+        conn.close()
+    engine = make_engine(db_path)
+    assert engine.index_logs() == (81, 81)
+    assert engine.embedding_client.calls == []
+    assert engine.last_index_stats["cached"] == 3
+
+    # Other models do not share vectors; the cache can be switched off
+    engine = make_engine(db_path)
+    engine.embedding_client.model = "other-model"
+    conn = duckdb.connect(db_path)
+    try:
+        conn.execute("DELETE FROM log_embeddings")
+        hits = conn.execute("SELECT SUM(hits) FROM embedding_cache").fetchone()[0]
+    finally:
+        conn.close()
+    assert hits == 3
+    monkeypatch.setattr(embeddings, "_settings", {"cache": False})
+    engine.index_logs()
+    assert len(engine.embedding_client.calls) == 1
+
+
+def test_prune_drops_unused_entries(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "prune.duckdb"))
+    try:
+        initialize_schema(conn)
+        embedding_cache.store(conn, "m", {"old": [1.0], "new": [2.0]})
+        conn.execute("UPDATE embedding_cache SET last_used_at = CURRENT_TIMESTAMP - INTERVAL 40 DAY WHERE text_hash = 'old'")
+        assert embedding_cache.prune(conn, 30) == 1
+        assert embedding_cache.lookup(conn, "m", ["old", "new"]) == {"new": [2.0]}
+    finally:
+        conn.close()
+
+
+def test_cache_writes_go_through_the_writer(tmp_path):
+    from api import writer
+    from api.db import get_connection
+
+    db_path = str(tmp_path / "writer.duckdb")
+    seed_logs(db_path, ["Accepted publickey"] * 3 + ["reboot"])
+    engine = make_engine(db_path)
+    with engine._connect() as conn:
+        embedding_cache.store(conn, engine.embedding_client.model,
+                              {embedding_cache.text_hash("[h] sshd.service: reboot"): [9.0, 1.0]})
+
+    writer.start_writer(db_path, {"max_latency_ms": 5})
+    writes = []
+    original = writer._handlers["embeddings"]
+    def recording(conn, payload):
+        writes.append((threading.current_thread().name, payload))
+        return original(conn, payload)
+
+    writer.register_handler("embeddings", recording)
+    try:
+        assert engine.index_logs() == (4, 4)
+    finally:
+        writer.register_handler("embeddings", original)
+        writer.stop_writer()
+
+    # One write on the writer thread marks the logs and records the cache hit and the new vector
+    assert [thread for thread, _payload in writes] == ["chimera-writer"]
+    payload = writes[0][1]
+    assert sorted(payload["log_ids"]) == [0, 1, 2, 3]
+    assert len(payload["cache"]["used"]) == 1 and len(payload["cache"]["entries"]) == 1
+    conn = get_connection(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*), SUM(hits) FROM embedding_cache").fetchone() == (2, 1)
+    finally:
+        conn.close()
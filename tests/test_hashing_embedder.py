@@ -0,0 +1,64 @@
+import time
+
+import duckdb
+import numpy as np
+
+from api import embeddings, templates
+from api.db import initialize_schema
+from api.embeddings import SemanticSearchEngine
+from api.hashing_embedder import HashingEmbeddingClient, tokenize
+from api.log_store import write_log_batch
+from conftest import log_row
+
+
+def cosine(a, b):
+    return float(np.dot(a, b))
+
+
+def test_hashing_vectors_are_deterministic_normalized_and_local():
+    client = HashingEmbeddingClient(dim=256)
+    a, b, c, empty = client.get_embeddings_batch([
+        "Failed password for root from 10.0.0.1 port 22 ssh2",
+        "Failed password for admin from 192.168.1.7 port 2222 ssh2",
+        "nvme0n1: I/O error, dev nvme0n1, sector 81234",
+        "",
+    ])
+    assert len(a) == 256
+    assert all(abs(np.linalg.norm(v) - 1.0) < 1e-5 for v in (a, b, c, empty))
+    assert cosine(a, b) > 0.5 > cosine(a, c)
+    # Same text, same vector, in any process: no randomized hashing
+    assert HashingEmbeddingClient(dim=256).get_embedding("Failed password for root from 10.0.0.1 port 22 ssh2") == a
+    assert tokenize("Port 8080/TCP id=42") == ["port", "0/tcp", "id", "0"]
+    assert client.model != HashingEmbeddingClient(dim=512).model
+
+
+def test_hashing_batches_thousands_of_lines_quickly():
+    client = HashingEmbeddingClient.from_settings({"batch_size": 1000})
+    lines = [f"session {i} opened for user u{i % 50} by (uid={i})" for i in range(5000)]
+    started = time.perf_counter()
+    vectors = client.get_embeddings_batch(lines)
+    assert time.perf_counter() - started < 10
+    assert len(vectors) == 5000 and len(vectors[0]) == 512
+    assert client.stats["texts"] == 5000
+
+
+def test_engine_indexes_offline_with_hashing_provider(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "hashing.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [
+            log_row("Failed password for root from 10.0.0.1 port 22 ssh2", unit="sshd.service"),
+            log_row("Started Daily apt upgrade and clean activities", unit="apt-daily.service"),
+            log_row("eth0: link becomes ready", unit="kernel"),
+        ])
+    finally:
+        templates.invalidate(conn)
+        conn.close()
+    monkeypatch.setattr(embeddings, "_settings", {"provider": "hashing", "hashing": {"dim": 512}, "vector_backend": "duckdb"})
+    engine = SemanticSearchEngine(db_path, ollama_url="http://127.0.0.1:9")
+    assert isinstance(engine.embedding_client, HashingEmbeddingClient)
+
+    assert engine.index_logs(since_seconds=3600) == (3, 3)
+    results = engine.search_logs("failed password for user", n_results=1)
+    assert results[0]["unit"] == "sshd.service"
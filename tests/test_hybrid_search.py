@@ -0,0 +1,118 @@
+import duckdb
+import pytest
+
+from api import embeddings, server, templates, text_index
+from api.db import initialize_schema
+from api.hybrid_search import mmr, reciprocal_rank_fusion
+from api.log_store import write_log_batch
+from conftest import FakeSocket, log_row
+
+
+def test_rank_fusion_and_mmr():
+    lexical = [{"id": 1, "message": "a", "bm25": 3.0}, {"id": 2, "message": "b", "bm25": 2.0}]
+    vector = [{"id": 3, "message": "c", "similarity": 0.9, "bm25": None}, {"id": 1, "message": "a", "similarity": 0.5}]
+    fused = reciprocal_rank_fusion({"lexical": lexical, "vector": vector}, k=60)
+    assert [r["id"] for r in fused] == [1, 3, 2]
+    assert fused[0]["score"] == pytest.approx(1 / 61 + 1 / 62)
+    assert (fused[0]["lexical_rank"], fused[0]["vector_rank"], fused[0]["similarity"]) == (1, 2, 0.5)
+    assert (fused[1]["lexical_rank"], fused[1]["vector_rank"]) == (None, 1)
+
+    # Near-duplicates give way to a different line once one of them is picked
+    candidates = [
+        {"id": 1, "message": "disk sda full on /var", "score": 1.0},
+        {"id": 2, "message": "disk sda full on /var", "score": 0.95},
+        {"id": 3, "message": "link eth0 down", "score": 0.6},
+    ]
+    assert [r["id"] for r in mmr(candidates, 2, lambda_=0.5)] == [1, 3]
+    assert [r["id"] for r in mmr(candidates, 2, lambda_=1.0)] == [1, 2]
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "hybrid.duckdb")
+    conn = duckdb.connect(path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [
+            log_row("request failed with error code E4711 from 10.1.2.3", unit="api.service"),
+            log_row("request failed with error code E1234 from 10.1.2.4", unit="api.service"),
+            log_row("out of memory: killed process 4242 (java)", unit="kernel"),
+            log_row("unable to allocate memory, process terminated", unit="worker.service"),
+            log_row("backup completed successfully", unit="backup.service"),
+        ])
+    finally:
+        templates.invalidate(conn)
+        conn.close()
+    monkeypatch.setattr(embeddings, "_settings", {"provider": "hashing", "vector_backend": "duckdb"})
+    engine = embeddings.SemanticSearchEngine(path)
+    assert engine.index_logs(since_seconds=3600) == (5, 5)
+    return path
+
+
+def test_hybrid_search_finds_identifiers_and_paraphrases(db_path):
+    engine = embeddings.SemanticSearchEngine(db_path)
+    results, meta = engine.search_hybrid("E4711", n_results=3, since_seconds=3600)
+    assert results[0]["message"].startswith("request failed with error code E4711")
+    assert results[0]["lexical_rank"] == 1 and results[0]["bm25"] > 0
+
+    results, meta = engine.search_hybrid("memory process killed", n_results=2)
+    assert {r["unit"] for r in results} == {"kernel", "worker.service"}
+    assert all(r["score"] > 0 for r in results)
+    assert meta["lexical_hits"] >= 2 and meta["vector_hits"] >= 2
+    assert meta["lexical_ms"] >= 0 and meta["vector_ms"] >= 0 and meta["total_ms"] >= meta["fusion_ms"]
+
+    results, _meta = engine.search_hybrid("memory", n_results=5, unit="kernel")
+    assert [r["unit"] for r in results] == ["kernel"]
+
+
+def test_search_command_hybrid_mode(db_path, monkeypatch):
+    sock = FakeSocket()
+    server._handle_search(sock, db_path, ["SEARCH", "query=E1234", "mode=hybrid", "n_results=2"])
+    lines = [server.json.loads(line) for line in sock.lines()]
+    assert "E1234" in lines[0]["message"]
+    assert set(lines[-1]) == {"meta"} and lines[-1]["meta"]["mode"] == "hybrid"
+
+    # A failing retriever is reported, the other one still answers
+    def broken(*args, **kwargs):
+        raise RuntimeError("vector index unavailable")
+
+    monkeypatch.setattr(embeddings.SemanticSearchEngine, "search_logs", broken)
+    sock = FakeSocket()
+    server._handle_search(sock, db_path, ["SEARCH", "query=E1234", "mode=hybrid", "n_results=1"])
+    lines = [server.json.loads(line) for line in sock.lines()]
+    assert "E1234" in lines[0]["message"]
+    assert lines[-1]["meta"]["vector_error"] == "vector index unavailable"
+
+    sock = FakeSocket()
+    server._handle_search(sock, db_path, ["SEARCH", "query=x", "mode=fuzzy"])
+    assert sock.lines()[0].startswith("ERR ")
+
+
+def test_lexical_search_defaults_to_a_bounded_window(db_path, monkeypatch):
+    conn = duckdb.connect(db_path)
+    try:
+        write_log_batch(conn, [log_row("request failed with error code E9999 long ago", seconds_ago=30 * 86400, unit="api.service")])
+    finally:
+        conn.close()
+    conn = duckdb.connect(db_path)
+    try:
+        text_index.backfill_page(conn, None)
+    finally:
+        conn.close()
+    engine = embeddings.SemanticSearchEngine(db_path)
+    assert engine.search_lexical("E9999") == []
+    assert [r["message"] for r in engine.search_lexical("E9999", since_seconds=60 * 86400)] == [
+        "request failed with error code E9999 long ago"]
+
+    # A lexical search that runs out of time fails alone; the vector results still come back
+    monkeypatch.setattr(embeddings.query_guard, "timeout_for", lambda command: 0.3)
+    real_match = embeddings.text_index.build_match_cte
+
+    def slow_match(conn, query, since_ts, require_all=True):
+        sql, params = real_match(conn, query, since_ts, require_all)
+        return f"SELECT * FROM ({sql}) CROSS JOIN range(10000000000) r WHERE r.range < 0", params
+
+    monkeypatch.setattr(text_index, "build_match_cte", slow_match)
+    results, meta = engine.search_hybrid("E4711", n_results=2, since_seconds=3600)
+    assert "timeout" in meta["lexical_error"] and meta["lexical_hits"] == 0
+    assert results and meta["vector_hits"] > 0
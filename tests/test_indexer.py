@@ -0,0 +1,152 @@
+import socket
+
+import duckdb
+import pytest
+
+from api import indexer, ingest_seq, server, templates
+from api.db import initialize_schema
+from api.indexer import EmbeddingIndexer
+from api.log_store import write_log_batch
+from conftest import log_row
+
+
+class FakeEngine:
+    def __init__(self):
+        self.batches = []
+        self.fail = 0  # texts per batch that fail to embed
+        self.error = None
+
+    def index_logs(self, log_ids=None, since_seconds=86400):
+        if self.error:
+            raise RuntimeError(self.error)
+        self.batches.append(list(log_ids))
+        return len(log_ids) - self.fail, len(log_ids)
+
+
+def write(db_path, rows):
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, rows)
+    finally:
+        templates.invalidate(conn)
+        conn.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "indexer.duckdb")
+
+
+def test_indexer_follows_ingest_sequence_and_resumes(db_path):
+    # Rows from before the indexer's first start are backfilled; event time order does not matter
+    write(db_path, [log_row("old", seconds_ago=600)])
+    engine = FakeEngine()
+    worker = EmbeddingIndexer(db_path, {"batch_rows": 2, "idle_seconds": 7, "duty_cycle": 0.5}, engine=engine)
+    assert worker.run_once()["rows"] == 1
+
+    rows = [log_row(f"message {i}", seconds_ago=300 - i) for i in range(3)]
+    write(db_path, rows)
+    stats = worker.get_stats()
+    assert (stats["lag_rows"], stats["head_seq"], stats["watermark_seq"]) == (3, 4, 1)
+    assert stats["lag_seconds"] is not None and stats["lag_seconds"] >= 0
+
+    assert worker.run_once() == {"rows": 2, "indexed": 2, "waiting_on_gap": False}
+    assert worker.wait_seconds < 7  # still behind: throttled by the duty cycle, not polling
+    assert engine.batches[-1] == [rows[0]["id"], rows[1]["id"]]
+
+    # A fresh process picks up at the persisted watermark
+    engine2 = FakeEngine()
+    resumed = EmbeddingIndexer(db_path, {"batch_rows": 2, "idle_seconds": 7}, engine=engine2)
+    assert resumed.run_once()["rows"] == 1
+    assert engine2.batches == [[rows[2]["id"]]]
+    assert resumed.wait_seconds == 7
+    assert resumed.run_once()["rows"] == 0
+    stats = resumed.get_stats()
+    assert (stats["lag_rows"], stats["watermark_seq"], stats["indexed"]) == (0, 4, 4)
+
+
+def test_indexer_backs_off_and_skips_rows_that_keep_failing(db_path):
+    write(db_path, [log_row("a"), log_row("b")])
+    engine = FakeEngine()
+    worker = EmbeddingIndexer(db_path, {"idle_seconds": 1, "max_backoff_seconds": 3, "max_attempts": 3},
+                              engine=engine)
+
+    engine.error = "ollama unavailable"
+    waits = []
+    for _ in range(3):
+        assert worker.run_once()["error"] == "ollama unavailable"
+        waits.append(worker.wait_seconds)
+    assert waits == [1, 2, 3]
+    assert worker.watermark == 0
+
+    engine.error = None
+    engine.fail = 1
+    # Outages do not count towards skipping; rows that fail to embed are retried, then skipped
+    assert "error" in worker.run_once()
+    assert "error" in worker.run_once()
+    assert worker.run_once()["indexed"] == 1
+    assert (worker.watermark, worker.skipped, worker.last_error) == (2, 1, None)
+
+
+def test_indexer_waits_on_sequence_gaps(db_path, monkeypatch):
+    write(db_path, [log_row("first")])
+    conn = duckdb.connect(db_path)
+    try:
+        # Number 2 is taken by a write that has not committed (or rolled back)
+        conn.execute("SELECT nextval('log_ingest_counter')")
+        conn.execute("INSERT INTO log_ingest_seq (seq, log_id, ts) VALUES (3, 42, CURRENT_TIMESTAMP::TIMESTAMP)")
+        assert ingest_seq.head(conn)[0] == 3
+    finally:
+        conn.close()
+
+    clock = [1000.0]
+    monkeypatch.setattr(indexer.time, "monotonic", lambda: clock[0])
+    worker = EmbeddingIndexer(db_path, {"gap_grace_seconds": 30}, engine=FakeEngine())
+    assert worker.run_once() == {"rows": 1, "indexed": 1, "waiting_on_gap": True}
+    assert worker.run_once()["rows"] == 0
+    clock[0] += 31
+    assert worker.run_once()["rows"] == 1
+    assert worker.watermark == 3
+
+    conn = duckdb.connect(db_path)
+    try:
+        assert indexer.lag_stats(conn)["watermark_seq"] == 3
+    finally:
+        conn.close()
+
+
+def test_indexer_holds_the_watermark_when_every_text_fails(db_path):
+    from unittest.mock import MagicMock
+
+    from api.embeddings import SemanticSearchEngine
+
+    class DownClient:
+        model = "nomic-embed-text"
+
+        def get_embeddings_batch(self, texts):
+            return [None] * len(texts)
+
+    write(db_path, [log_row("a"), log_row("b")])
+    engine = SemanticSearchEngine(db_path)
+    engine.embedding_client = DownClient()
+    engine.chroma_client = MagicMock()
+    worker = EmbeddingIndexer(db_path, {"idle_seconds": 1, "max_attempts": 3}, engine=engine)
+
+    result = worker.run_once()
+    assert result["error"] == "2 of 2 texts failed to embed"
+    assert worker.watermark == 0 and worker.wait_seconds == 1
+    engine.chroma_client.add_embeddings.assert_not_called()
+
+
+def test_indexer_stats_command_is_not_taken_for_index(monkeypatch):
+    calls = []
+    monkeypatch.setitem(server.COMMAND_HANDLERS, "INDEX", lambda conn, db_path, tokens: calls.append(("INDEX", tokens)))
+    monkeypatch.setitem(server.COMMAND_HANDLERS, "INDEXER",
+                        lambda conn, db_path, tokens: calls.append(("INDEXER", tokens)) or conn.sendall(b"OK\n"))
+    client, served = socket.socketpair()
+    with client:
+        client.sendall(b"INDEXER STATS")
+        server.handle_client(served, None)
+        assert client.recv(4096) == b"OK\n"
+    assert calls == [("INDEXER", ["INDEXER", "STATS"])]
@@ -5,13 +5,7 @@ import duckdb
 
 from api.db import initialize_schema
 from api import ingest as ingest_mod
-
-
-class FakeCompleted:
-    def __init__(self, code: int, out: str, err: str = ""):
-        self.returncode = code
-        self.stdout = out
-        self.stderr = err
+from conftest import FakeCompleted
 
 
 def test_journald_ingest_basic(monkeypatch, tmp_path):
@@ -7,13 +7,7 @@ import duckdb
 from api.ingest_framework import IngestionFramework
 from api.db import initialize_schema
 from api.config import LogSource
-
-
-class FakeCompleted:
-    def __init__(self, code: int, out: str, err: str = ""):
-        self.returncode = code
-        self.stdout = out
-        self.stderr = err
+from conftest import FakeCompleted
 
 
 def test_framework_journald_ingest_with_exclude(tmp_path, monkeypatch):
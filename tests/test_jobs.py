@@ -0,0 +1,121 @@
+import json
+import socket
+import threading
+
+from api import jobs, server
+
+
+def request(command):
+    client, served = socket.socketpair()
+    with client:
+        client.sendall(command.encode())
+        server.handle_client(served, None)
+        data = b""
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return [line for line in data.decode().splitlines() if line]
+
+
+def job_status(action, job_id, *extra):
+    return json.loads(request(" ".join(["JOB", action, f"id={job_id}", *extra]))[0])
+
+
+def test_async_command_runs_as_job(monkeypatch):
+    monkeypatch.setattr(server, "job_manager", jobs.JobManager(max_workers=2))
+    release = threading.Event()
+    started = threading.Event()
+
+    def fake_index(conn, db_path, tokens):
+        jobs.report_progress(1, 2, "embedding")
+        started.set()
+        release.wait(5)
+        conn.sendall(f"OK indexed=2 total=2 args={' '.join(tokens[1:])}\n".encode())
+
+    def endless_audit(conn, db_path, tokens):
+        while True:
+            jobs.check_cancelled()
+            release.wait(0.01)
+
+    monkeypatch.setitem(server.COMMAND_HANDLERS, "INDEX", fake_index)
+    monkeypatch.setitem(server.COMMAND_HANDLERS, "AUDIT", endless_audit)
+
+    # The reply comes back at once and the client socket is closed
+    reply = request("INDEX since=60 async=true")
+    assert reply[0].startswith("OK job=")
+    index_id = reply[0].split("=", 1)[1]
+    assert started.wait(5)
+    status = job_status("STATUS", index_id)
+    assert status["status"] == "running" and status["progress"] == {"done": 1, "total": 2, "step": "embedding"}
+    assert "result" not in status
+
+    audit_id = request("AUDIT FULL async=true")[0].split("=", 1)[1]
+    release.set()
+    done = job_status("WAIT", index_id, "timeout=5")
+    assert done["status"] == "done" and done["result"] == ["OK indexed=2 total=2 args=since=60"]
+    assert done["command"] == "INDEX since=60"
+
+    assert job_status("CANCEL", audit_id)["id"] == audit_id
+    assert job_status("WAIT", audit_id, "timeout=5")["status"] == "cancelled"
+
+    listed = [json.loads(line) for line in request("JOB LIST")]
+    assert {item["id"] for item in listed} == {index_id, audit_id}
+    assert request("JOB STATUS id=nope") == ["ERR unknown job: nope"]
+    assert request("PING async=true") == ["ERR async not supported for PING"]
+
+
+def test_failed_job_reports_error():
+    manager = jobs.JobManager(max_workers=1)
+    failed = manager.submit("REPORT GENERATE", lambda out: out.sendall(b"ERR missing report action\n"))
+    crashed = manager.submit("INDEX", lambda out: 1 / 0)
+    assert manager.wait(failed.id, 5).to_dict()["error"] == "missing report action"
+    assert manager.wait(crashed.id, 5).status == jobs.FAILED
+    assert crashed.error == "division by zero"
+
+
+def test_index_and_report_stop_at_cancel_checkpoints(monkeypatch):
+    from api.embeddings import OllamaEmbeddingClient
+    from api.reporting import ReportGenerator
+
+    manager = jobs.JobManager(max_workers=2)
+    client = OllamaEmbeddingClient()
+    client.concurrency, client.batch_size, client.max_batch_size = 1, 2, 2
+    calls = []
+    submitted = threading.Event()
+
+    def embed_batch(texts):
+        # Runs on the client's pool thread, outside the job's thread-local context
+        calls.append(texts)
+        if len(calls) == 2:
+            manager.cancel(index_job.id)
+        return [[1.0]] * len(texts)
+
+    monkeypatch.setattr(client, "_embed_batch", embed_batch)
+    monkeypatch.setattr(client, "_adapt", lambda size, elapsed: None)
+    def index(out):
+        submitted.wait(5)
+        client.get_embeddings_batch([f"t{i}" for i in range(10)])
+
+    index_job = manager.submit("INDEX", index)
+    submitted.set()
+    assert manager.wait(index_job.id, 5).status == jobs.CANCELLED
+    # The batch in flight finishes; no further batch goes out after the cancel
+    assert len(calls) == 2
+    assert index_job.progress == {"done": 4, "total": 10, "step": "embedding"}
+
+    generator = ReportGenerator(None)
+    sections = []
+
+    def log_summary(since_seconds):
+        sections.append("log_analytics")
+        manager.cancel(jobs.current_job().id)
+        return {}
+
+    monkeypatch.setattr(generator, "_get_log_summary", log_summary)
+    monkeypatch.setattr(generator, "_get_system_health_summary", lambda since_seconds: sections.append("system_health"))
+    report_job = manager.submit("REPORT GENERATE", lambda out: generator.generate_daily_report())
+    assert manager.wait(report_job.id, 5).status == jobs.CANCELLED
+    assert sections == ["log_analytics"]
+    assert report_job.progress == {"done": 0, "total": 3, "step": "log_analytics"}
@@ -0,0 +1,130 @@
+import json
+from unittest.mock import MagicMock
+
+import duckdb
+
+from api import log_dictionary, rollups, server
+from api.config import ChimeraConfig
+from api.db import initialize_schema
+from api.log_store import write_log_batch
+from api.retention import RetentionManager
+from conftest import FakeSocket, log_row
+
+
+def snapshot(conn):
+    return conn.execute("SELECT * FROM logs ORDER BY id").fetchall()
+
+
+def test_encode_decode_round_trip_and_encoded_writes(tmp_path):
+    db_path = str(tmp_path / "dict.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        rows = [log_row(f"event {i}", seconds_ago=i, unit=["sshd", "cron", None][i % 3]) for i in range(6)]
+        write_log_batch(conn, rows)
+        conn.execute("INSERT INTO log_embeddings (log_id) VALUES (?)", [rows[0]["id"]])
+        before = snapshot(conn)
+    finally:
+        conn.close()
+
+    sock = FakeSocket()
+    server._handle_migrate(sock, db_path, ["MIGRATE", "ENCODE"])
+    result = json.loads(sock.lines()[0])
+    assert result["layout"] == "encoded"
+    assert result["dictionary"]["unit"] == 2
+    assert result["rows"] == 6
+
+    conn = duckdb.connect(db_path)
+    try:
+        assert snapshot(conn) == before
+        assert conn.execute("SELECT COUNT(*) FROM log_embeddings").fetchone()[0] == 1
+        assert conn.execute(
+            "SELECT COUNT(*) FROM duckdb_indexes() WHERE table_name = 'logs_data' AND sql LIKE '%unit_code%'"
+        ).fetchone()[0] == 1
+
+        # New values are appended to the dictionary on miss; known ones reuse codes
+        new_rows = [log_row("event 10", unit="nginx"), log_row("event 11", unit="sshd")]
+        assert len(write_log_batch(conn, new_rows)) == 2
+        assert write_log_batch(conn, new_rows) == []
+        assert conn.execute("SELECT code, value FROM log_dim_unit ORDER BY code").fetchall() == [
+            (1, "cron"), (2, "sshd"), (3, "nginx")
+        ]
+        after_writes = snapshot(conn)
+    finally:
+        conn.close()
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "unit=nginx"])
+    assert [json.loads(line)["message"] for line in sock.lines()] == ["event 10"]
+
+    sock = FakeSocket()
+    server._handle_migrate(sock, db_path, ["MIGRATE", "DECODE"])
+    assert json.loads(sock.lines()[0])["layout"] == "plain"
+
+    conn = duckdb.connect(db_path)
+    try:
+        assert not log_dictionary.is_encoded(conn)
+        assert snapshot(conn) == after_writes
+        assert conn.execute("SELECT COUNT(*) FROM log_embeddings").fetchone()[0] == 1
+        assert conn.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name LIKE 'log_dim_%'"
+        ).fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+def test_retention_deletes_from_encoded_table(tmp_path):
+    db_path = str(tmp_path / "dict_ret.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [log_row("event 1", seconds_ago=90 * 86400), log_row("event 2")])
+        log_dictionary.encode_logs(conn)
+    finally:
+        conn.close()
+
+    cfg = ChimeraConfig(log_sources=[], db_path=db_path, socket_path="s", default_retention_days=30)
+    result = RetentionManager(db_path, cfg, chroma_client=MagicMock()).run()
+    assert result["tables"]["logs"]["deleted"] == 1
+
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT message FROM logs").fetchall() == [("event 2",)]
+    finally:
+        conn.close()
+
+    sock = FakeSocket()
+    server._handle_migrate(sock, db_path, ["MIGRATE"])
+    assert sock.lines()[0].startswith("ERR migrate action required")
+
+
+def test_hot_paths_compare_codes_on_logs_data(tmp_path, caplog):
+    db_path = str(tmp_path / "dict_hot.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [log_row(f"event {i}", seconds_ago=i, hostname="web-1", unit=["sshd", "cron"][i % 2]) for i in range(6)])
+        before = conn.execute("SELECT * FROM logs_rollup_1m ORDER BY ALL").fetchall()
+        log_dictionary.encode_logs(conn)
+
+        assert log_dictionary.equals_clause(conn, "unit", "cron") == ("unit_code = ?", [1])
+        assert log_dictionary.equals_clause(conn, "unit", "missing") == ("FALSE", [])
+        rollups.rebuild(conn)
+        assert conn.execute("SELECT * FROM logs_rollup_1m ORDER BY ALL").fetchall() == before
+
+        # Schema upkeep targets logs_data, never the view
+        caplog.clear()
+        initialize_schema(conn)
+        assert "Pre-migration" not in caplog.text
+    finally:
+        conn.close()
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "unit=sshd", "hostname=web-1", "order=asc"])
+    items = [json.loads(line) for line in sock.lines()]
+    assert [item["message"] for item in items] == ["event 4", "event 2", "event 0"]
+    assert {item["unit"] for item in items} == {"sshd"}
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "unit=nginx"])
+    assert sock.lines() == []
@@ -0,0 +1,149 @@
+import datetime as dt
+import os
+
+import duckdb
+import numpy as np
+import pytest
+
+from api import embeddings, templates
+from api.db import initialize_schema
+from api.embeddings import SemanticSearchEngine
+from api.log_store import write_log_batch
+from api.mmap_index import MmapVectorIndex
+from conftest import FakeEmbeddingClient, log_row
+
+
+DAY = dt.datetime(2024, 3, 1, 12, 0, tzinfo=dt.timezone.utc)
+
+
+def random_vectors(count, dim=32, seed=7):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def exact_top(vectors, query, k):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ (query / np.linalg.norm(query))
+    return list(np.argsort(-scores)[:k])
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_scan_matches_exact_search(tmp_path, dtype):
+    vectors = random_vectors(500)
+    index = MmapVectorIndex(str(tmp_path / "vectors"), dtype=dtype, ivf_min_vectors=10**9, batch_rows=64)
+    # Appended in two writes to exercise growing the memory-mapped files
+    index.add(list(range(250)), [DAY] * 250, vectors[:250])
+    index.add(list(range(250, 500)), [DAY] * 250, vectors[250:])
+
+    queries = random_vectors(20, seed=11)
+    recall = np.mean([
+        len(set(key for key, _ in index.search(q, 10)) & set(exact_top(vectors, q, 10))) / 10
+        for q in queries
+    ])
+    assert recall >= 0.9
+
+    hits = index.search(vectors[42], 3)
+    assert hits[0][0] == 42 and hits[0][1] == pytest.approx(1.0, abs=0.02)
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_ivf_partition_probes_nearest_lists(tmp_path):
+    rng = np.random.default_rng(3)
+    centers = rng.normal(size=(8, 16)).astype(np.float32) * 5
+    vectors = np.concatenate([center + rng.normal(size=(100, 16)).astype(np.float32) for center in centers])
+    index = MmapVectorIndex(str(tmp_path / "vectors"), ivf_min_vectors=400, ivf_lists=8, nprobe=3)
+    index.add(list(range(len(vectors))), [DAY] * len(vectors), vectors)
+
+    partition = index.partitions()["2024-03-01"]
+    assert partition.centroids() is not None and partition.centroids().shape == (8, 16)
+
+    recall = np.mean([
+        len(set(key for key, _ in index.search(vectors[i], 10)) & set(exact_top(vectors, vectors[i], 10))) / 10
+        for i in range(0, 800, 40)
+    ])
+    assert recall >= 0.9
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_append_after_torn_write_keeps_rows_aligned(tmp_path, dtype):
+    vectors = random_vectors(30)
+    index = MmapVectorIndex(str(tmp_path / "vectors"), dtype=dtype, ivf_min_vectors=10**9)
+    index.add(list(range(10)), [DAY] * 10, vectors[:10])
+    partition = index.partitions()["2024-03-01"]
+
+    # A crash mid-append: every array but keys got 5 more rows, keys half a key
+    torn = MmapVectorIndex(str(tmp_path / "torn"), dtype=dtype, ivf_min_vectors=10**9)
+    torn.add(list(range(100, 105)), [DAY] * 5, vectors[10:15])
+    torn_partition = torn.partitions()["2024-03-01"]
+    for name in os.listdir(torn_partition.path):
+        if name.endswith((".i8", ".f16", ".f32", ".i64")) and name != "keys.i64":
+            with open(os.path.join(torn_partition.path, name), "rb") as src, \
+                    open(os.path.join(partition.path, name), "ab") as dst:
+                dst.write(src.read())
+    with open(os.path.join(partition.path, "keys.i64"), "ab") as f:
+        f.write(b"\x01\x02\x03")
+    assert partition.count() == 10
+
+    index.add(list(range(10, 30)), [DAY] * 20, vectors[10:30])
+    assert partition.count() == 30
+    for i in (0, 9, 10, 29):
+        hits = index.search(vectors[i], 1)
+        assert hits[0][0] == i and hits[0][1] == pytest.approx(1.0, abs=0.02)
+
+
+def test_day_partitions_prune_by_time_and_drop_whole(tmp_path):
+    vectors = random_vectors(3, dim=8)
+    days = [DAY - dt.timedelta(days=2), DAY - dt.timedelta(days=1), DAY]
+    index = MmapVectorIndex(str(tmp_path / "vectors"))
+    index.add([1, 2, 3], days, vectors)
+    assert list(index.partitions()) == ["2024-02-28", "2024-02-29", "2024-03-01"]
+
+    since = DAY - dt.timedelta(hours=30)
+    assert {key for key, _ in index.search(vectors[0], 3, since=since)} == {2, 3}
+    # Rows earlier on the first day in scope are masked, not just earlier days
+    assert {key for key, _ in index.search(vectors[0], 3, since=DAY - dt.timedelta(hours=1))} == {3}
+
+    assert index.drop_before(DAY) == 2
+    assert list(index.partitions()) == ["2024-03-01"]
+    assert [key for key, _ in index.search(vectors[0], 3)] == [3]
+
+    with pytest.raises(ValueError):
+        index.search([1.0, 2.0], 1)
+
+
+WORDS = ["disk", "password", "network", "memory"]
+
+
+def test_engine_with_mmap_backend(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "logs.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [
+            log_row("disk disk full on /var", seconds_ago=10, unit="monitor.service"),
+            log_row("disk error on sda", seconds_ago=30, unit="kernel"),
+            log_row("old disk disk disk warning", seconds_ago=7200, unit="monitor.service"),
+            log_row("network link down", seconds_ago=40, unit="networkd.service"),
+        ])
+    finally:
+        templates.invalidate(conn)
+        conn.close()
+    monkeypatch.setattr(embeddings, "_settings", {
+        "vector_backend": "mmap", "mmap": {"directory": str(tmp_path / "vectors"), "dtype": "int8"},
+    })
+    engine = SemanticSearchEngine(db_path)
+    engine.embedding_client = FakeEmbeddingClient(WORDS)
+    engine.chroma_client = None  # never touched with the mmap backend
+
+    assert engine.index_logs(since_seconds=86400) == (4, 4)
+    results = engine.search_logs("disk disk disk", n_results=10)
+    assert results[0]["message"] == "old disk disk disk warning"
+    assert len(results) == 4
+
+    results = engine.search_logs("disk disk disk", n_results=1, since_seconds=3600, unit="monitor.service")
+    assert [r["message"] for r in results] == ["disk disk full on /var"]
+
+    monkeypatch.setattr(embeddings, "_settings", {
+        "vector_backend": "mmap", "index_mode": "templates", "mmap": {"directory": str(tmp_path / "vectors")},
+    })
+    with pytest.raises(ValueError):
+        engine.index_logs()
@@ -0,0 +1,121 @@
+import datetime as dt
+import json
+import subprocess
+
+import duckdb
+import pytest
+
+from api import db, log_dictionary, promoted_fields, server
+from api.config import DEFAULT_PROMOTED_FIELDS, LogSource
+from api.db import ensure_promoted_fields, initialize_schema
+from api.ingest_framework import IngestionFramework
+from conftest import FakeCompleted, FakeSocket
+
+
+def journal_line(micros, cursor, message, comm):
+    return json.dumps({
+        "__REALTIME_TIMESTAMP": str(micros), "_HOSTNAME": "h", "_SYSTEMD_UNIT": f"{comm}.service",
+        "MESSAGE": message, "PRIORITY": "6", "_COMM": comm, "_BOOT_ID": "b1", "_UID": "1000",
+        "_TRANSPORT": "journal", "__CURSOR": cursor,
+    })
+
+
+def ingest(db_path, monkeypatch, lines):
+    monkeypatch.setattr(subprocess, "run", lambda *a, **k: FakeCompleted(0, "\n".join(lines)))
+    IngestionFramework(db_path).ingest_source(LogSource(name="j", type="journald"), last_seconds=3600, limit=10)
+
+
+def query(db_path, *args):
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", *args])
+    return sock.lines()
+
+
+def test_validate_and_convert():
+    assert promoted_fields.validate({"_BOOT_ID": "text", "_UID": "INTEGER"}) == [
+        ("_BOOT_ID", "field_boot_id", "TEXT"), ("_UID", "field_uid", "INTEGER")
+    ]
+    with pytest.raises(ValueError):
+        promoted_fields.validate({"_comm": "TEXT"})
+    with pytest.raises(ValueError):
+        promoted_fields.validate({"_COMM": "BLOB"})
+    with pytest.raises(ValueError):
+        promoted_fields.validate({"_COMM": "TEXT", "COMM": "TEXT"})
+    assert promoted_fields.convert("42", "INTEGER") == 42
+    assert promoted_fields.convert("x", "INTEGER") is None
+    assert promoted_fields.convert([1, 2], "TEXT") is None
+
+
+def test_default_fields_projection_and_filters(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "fields.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        assert [spec[0] for spec in promoted_fields.get_specs(conn)] == sorted(DEFAULT_PROMOTED_FIELDS)
+    finally:
+        conn.close()
+
+    now = int(dt.datetime.now(tz=dt.timezone.utc).timestamp() * 1_000_000)
+    ingest(db_path, monkeypatch, [journal_line(now, "c1", "accepted key", "sshd"), journal_line(now + 1, "c2", "job ran", "cron")])
+
+    lines = query(db_path, "fields=_comm,_BOOT_ID", "field._comm=sshd")
+    assert len(lines) == 1
+    item = json.loads(lines[0])
+    assert item["message"] == "accepted key"
+    assert item["fields"] == {"_COMM": "sshd", "_BOOT_ID": "b1"}
+
+    # Plain queries are unchanged
+    assert "fields" not in json.loads(query(db_path)[0])
+    assert query(db_path, "fields=_UID") == ["ERR unknown-field:_UID"]
+    assert query(db_path, "field._pid=1") == ["ERR unknown-field:_PID"]
+
+
+def test_new_field_is_backfilled_and_removed_fields_unregistered(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "fields_new.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        # A row written before the side table existed keeps its payload inline
+        conn.execute("""INSERT INTO logs (id, ts, message, raw) VALUES (42, now(), 'legacy', '{"_UID": "0"}')""")
+        added = ensure_promoted_fields(conn, {"_COMM": "TEXT", "_UID": "INTEGER"})
+        assert added == ["_UID"]
+        assert conn.execute("SELECT field_uid FROM logs WHERE id = 42").fetchone()[0] == 0
+        assert [spec[0] for spec in promoted_fields.get_specs(conn)] == ["_COMM", "_UID"]
+        # The column of an unregistered field stays in place
+        assert conn.execute("SELECT COUNT(*) FROM logs WHERE field_boot_id IS NULL").fetchone()[0] == 1
+        log_dictionary.encode_logs(conn)
+        initialize_schema(conn)
+    finally:
+        conn.close()
+
+    now = int(dt.datetime.now(tz=dt.timezone.utc).timestamp() * 1_000_000)
+    ingest(db_path, monkeypatch, [journal_line(now, "c1", "accepted key", "sshd")])
+
+    lines = query(db_path, "fields=_UID,_COMM", "field._uid=1000")
+    assert [json.loads(line)["fields"] for line in lines] == [{"_UID": 1000, "_COMM": "sshd"}]
+    assert query(db_path, "fields=_BOOT_ID") == ["ERR unknown-field:_BOOT_ID"]
+
+
+def test_new_field_is_backfilled_from_compressed_raw_in_pages(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "fields_raw.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+    finally:
+        conn.close()
+    now = int(dt.datetime.now(tz=dt.timezone.utc).timestamp() * 1_000_000)
+    ingest(db_path, monkeypatch, [journal_line(now + i, f"c{i}", f"m{i}", f"comm{i}") for i in range(5)])
+
+    conn = duckdb.connect(db_path)
+    try:
+        # Payloads live only in the compressed side table
+        assert conn.execute("SELECT COUNT(*) FROM logs WHERE raw IS NOT NULL").fetchone()[0] == 0
+        conn.execute("DELETE FROM promoted_fields WHERE field = '_COMM'")
+        conn.execute("UPDATE logs SET field_comm = NULL")
+        monkeypatch.setattr(db, "PROMOTED_BACKFILL_BATCH_SIZE", 2)
+        assert ensure_promoted_fields(conn, {"_COMM": "TEXT"}) == ["_COMM"]
+        assert sorted(r[0] for r in conn.execute("SELECT field_comm FROM logs").fetchall()) == [
+            f"comm{i}" for i in range(5)
+        ]
+    finally:
+        conn.close()
@@ -0,0 +1,107 @@
+import datetime as dt
+import socket
+import time
+
+import duckdb
+import pytest
+
+from api import query_guard, rollups, server
+from api.db import initialize_schema
+from conftest import FakeSocket
+
+
+SLOW_SQL = "SELECT COUNT(*) FROM range(100000000000) t(i) WHERE i % 7 = 3"
+
+
+def test_deadline_interrupts_on_timeout():
+    conn = duckdb.connect()
+    cur = conn.cursor()
+    started = time.monotonic()
+    with pytest.raises(duckdb.InterruptException):
+        with query_guard.Deadline(cur, 0.05) as guard:
+            cur.execute(SLOW_SQL).fetchall()
+    assert guard.reason == query_guard.TIMEOUT
+    assert time.monotonic() - started < 5
+    conn.close()
+
+
+def test_deadline_interrupts_when_client_goes_away():
+    client, served = socket.socketpair()
+    client.shutdown(socket.SHUT_WR)  # half-closed clients are still waiting for the reply
+    assert not query_guard.client_disconnected(served)
+    client.close()
+    assert query_guard.client_disconnected(served)
+
+    conn = duckdb.connect()
+    cur = conn.cursor()
+    with pytest.raises(duckdb.InterruptException):
+        with query_guard.Deadline(cur, 60, client=served) as guard:
+            cur.execute(SLOW_SQL).fetchall()
+    assert guard.reason == query_guard.DISCONNECTED
+    served.close()
+    conn.close()
+
+
+def test_cost_guard_rejects_or_downgrades(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "cost.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        conn.execute("INSERT INTO logs (id, ts, message) SELECT i, now(), 'event ' || i FROM range(1000) t(i)")
+        conn.execute(
+            "INSERT INTO logs (id, ts, message) SELECT i, now() - INTERVAL 10 DAY, 'old ' || i FROM range(1000, 21000) t(i)"
+        )
+        rollups.rebuild(conn)
+        since = dt.datetime.now() - dt.timedelta(hours=1)
+        # Only the filtered scan counts, not the late-materialization row fetch
+        estimate = query_guard.estimate_scan_rows(
+            conn.cursor(), "SELECT id FROM logs WHERE ts >= ? ORDER BY ts DESC LIMIT 5", [since])
+        assert 0 < estimate <= 21000
+        # The planner guesses a fraction of the table; the rollups count the window
+        assert query_guard.estimate_window_rows(conn.cursor(), since) == 1000
+    finally:
+        conn.close()
+
+    # The last hour holds 1000 rows, well under the limit, though the table is far larger
+    monkeypatch.setattr(query_guard, "_settings", {"cost_guard": {"enabled": True, "max_estimated_rows": 2000}})
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "limit=5"])
+    assert len(sock.lines()) == 5
+
+    monkeypatch.setattr(query_guard, "_settings", {"cost_guard": {"enabled": True, "max_estimated_rows": 10}})
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "limit=5"])
+    assert sock.lines() == ["ERR too-expensive"]
+
+    monkeypatch.setattr(query_guard, "_settings", {"cost_guard": {"enabled": True, "max_estimated_rows": 10, "action": "downgrade"}})
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "limit=5"])
+    assert len(sock.lines()) == 5
+
+
+def test_anomalies_and_search_run_under_their_deadline(tmp_path, monkeypatch):
+    from api.db import get_connection
+    from api.embeddings import AnomalyDetector, SemanticSearchEngine
+
+    db_path = str(tmp_path / "slow.duckdb")
+
+    def slow_query(*args, **kwargs):
+        # Connections opened inside the command join its deadline
+        conn = get_connection(db_path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM range(100000000000) a").fetchall()
+        finally:
+            conn.close()
+
+    monkeypatch.setattr(AnomalyDetector, "detect_anomalies", lambda self, since_seconds: slow_query())
+    monkeypatch.setattr(SemanticSearchEngine, "search_logs", lambda self, **kwargs: slow_query())
+    monkeypatch.setattr(query_guard, "_settings", {"timeouts": {"ANOMALIES": 0.2, "SEARCH": 0.2}})
+
+    started = time.monotonic()
+    sock = FakeSocket()
+    server._handle_anomalies(sock, db_path, ["ANOMALIES"])
+    assert sock.lines() == ["ERR timeout"]
+    sock = FakeSocket()
+    server._handle_search(sock, db_path, ["SEARCH", "query=disk"])
+    assert sock.lines() == ["ERR timeout"]
+    assert time.monotonic() - started < 10
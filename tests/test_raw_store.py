@@ -0,0 +1,120 @@
+import datetime as dt
+import json
+import subprocess
+from unittest.mock import MagicMock
+
+import duckdb
+
+from api import raw_store, server
+from api.config import ChimeraConfig, LogSource
+from api.db import initialize_schema
+from api.ingest_framework import IngestionFramework
+from api.retention import RetentionManager
+from conftest import FakeCompleted, FakeSocket
+
+
+def journal_line(micros, cursor, message):
+    return json.dumps({
+        "__REALTIME_TIMESTAMP": str(micros), "_HOSTNAME": "h", "_SYSTEMD_UNIT": "sshd.service",
+        "MESSAGE": message, "PRIORITY": "6", "_COMM": "sshd", "_BOOT_ID": "b1", "__CURSOR": cursor,
+    })
+
+
+def test_apply_policy():
+    raw = json.dumps({"MESSAGE": "m", "_COMM": "sshd", "_PID": "1"})
+    assert raw_store.apply_policy(raw, None) == raw
+    assert raw_store.apply_policy(raw, {"raw_policy": "none"}) is None
+    assert json.loads(raw_store.apply_policy(raw, {"raw_policy": "fields", "raw_fields": ["_COMM", "_EXE"]})) == {"_COMM": "sshd"}
+    assert raw_store.apply_policy(raw, {"raw_policy": "fields", "raw_fields": ["_EXE"]}) is None
+    assert raw_store.decompress(raw_store.compress(raw)) == raw
+
+
+def test_raw_side_table_policy_and_raw_command(tmp_path, monkeypatch):
+    now = int(dt.datetime.now(tz=dt.timezone.utc).timestamp() * 1_000_000)
+    out = "\n".join([journal_line(now, "c1", "first"), journal_line(now + 1, "c2", "second")])
+    monkeypatch.setattr(subprocess, "run", lambda *a, **k: FakeCompleted(0, out))
+
+    db_path = str(tmp_path / "raw.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+    finally:
+        conn.close()
+
+    source = LogSource(name="j", type="journald", config={"raw_policy": "fields", "raw_fields": ["_COMM", "_BOOT_ID"]})
+    IngestionFramework(db_path).ingest_source(source, last_seconds=3600, limit=10)
+
+    conn = duckdb.connect(db_path)
+    try:
+        # The hot table no longer carries the payload
+        assert conn.execute("SELECT COUNT(*) FROM logs WHERE raw IS NOT NULL").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM log_raw").fetchone()[0] == 2
+        # A row written before the side table existed keeps its inline payload
+        conn.execute("""INSERT INTO logs (id, ts, message, raw) VALUES (42, now(), 'legacy', '{"MESSAGE": "legacy"}')""")
+    finally:
+        conn.close()
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "contains=first"])
+    log_id = json.loads(sock.lines()[0])["id"]
+
+    sock = FakeSocket()
+    server._handle_raw(sock, db_path, ["RAW", f"id={log_id}"])
+    assert json.loads(sock.lines()[0]) == {"id": log_id, "raw": {"_COMM": "sshd", "_BOOT_ID": "b1"}}
+
+    sock = FakeSocket()
+    server._handle_raw(sock, db_path, ["RAW", "id=42"])
+    assert json.loads(sock.lines()[0])["raw"] == {"MESSAGE": "legacy"}
+
+    sock = FakeSocket()
+    server._handle_raw(sock, db_path, ["RAW", "id=7"])
+    assert sock.lines() == ["ERR not-found"]
+
+    sock = FakeSocket()
+    server._handle_raw(sock, db_path, ["RAW"])
+    assert sock.lines()[0].startswith("ERR Invalid id")
+
+
+def test_retention_removes_raw_payloads(tmp_path):
+    db_path = str(tmp_path / "raw_ret.duckdb")
+    old = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) - dt.timedelta(days=90)
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        conn.execute("INSERT INTO logs (id, ts, message) VALUES (1, ?, 'old')", [old])
+        raw_store.store_rows(conn, [{"id": 1, "ts": old, "raw": '{"a": 1}'}])
+    finally:
+        conn.close()
+
+    cfg = ChimeraConfig(log_sources=[], db_path=db_path, socket_path="s", default_retention_days=30)
+    RetentionManager(db_path, cfg, chroma_client=MagicMock()).run()
+
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM log_raw").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+def test_ingest_journal_applies_the_journald_raw_policy(tmp_path, monkeypatch):
+    now = int(dt.datetime.now(tz=dt.timezone.utc).timestamp() * 1_000_000)
+    monkeypatch.setattr(subprocess, "run", lambda *a, **k: FakeCompleted(0, journal_line(now, "c1", "legacy path")))
+    # INGEST_JOURNAL writes as "journald": the first enabled journald source's policy applies
+    raw_store.configure([
+        LogSource(name="off", type="journald", enabled=False, config={"raw_policy": "full"}),
+        LogSource(name="j", type="journald", config={"raw_policy": "none"}),
+    ])
+    db_path = str(tmp_path / "raw_legacy.duckdb")
+    try:
+        assert raw_store.source_config("journald") == {"raw_policy": "none"}
+        sock = FakeSocket()
+        server._handle_ingest_journal(sock, db_path, ["INGEST_JOURNAL", "60"])
+        assert sock.lines() == ["OK inserted=1 total=1"]
+    finally:
+        raw_store.configure([])
+
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM log_raw").fetchone()[0] == 0
+    finally:
+        conn.close()
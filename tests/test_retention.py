@@ -0,0 +1,108 @@
+import datetime as dt
+from unittest.mock import MagicMock
+
+import duckdb
+
+from api.config import ChimeraConfig
+from api.db import initialize_schema
+from api.retention import RetentionManager
+
+
+def make_config(**retention):
+    cfg = ChimeraConfig(log_sources=[], db_path='db', socket_path='sock', default_retention_days=30)
+    cfg.retention = {'chunk_size': 2, 'max_chunks_per_run': 100, **retention}
+    return cfg
+
+
+def seed_logs(db_path):
+    now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+    conn = duckdb.connect(db_path, read_only=False)
+    try:
+        initialize_schema(conn)
+        rows = []
+        for i in range(5):
+            rows.append((i, now - dt.timedelta(days=40 + i), 'journald', f'old {i}'))
+        for i in range(5, 8):
+            rows.append((i, now - dt.timedelta(days=10), 'file', f'mid {i}'))
+        rows.append((8, now, 'journald', 'fresh'))
+        conn.executemany("INSERT INTO logs (id, ts, source, message) VALUES (?, ?, ?, ?)", rows)
+        conn.execute("INSERT INTO log_embeddings (log_id) VALUES (0), (1), (8)")
+    finally:
+        conn.close()
+    return now
+
+
+def test_retention_purges_old_logs_in_chunks_and_vectors(tmp_path):
+    db_path = str(tmp_path / 'ret.duckdb')
+    seed_logs(db_path)
+    chroma = MagicMock()
+
+    manager = RetentionManager(db_path, make_config(), chroma_client=chroma)
+    result = manager.run()
+
+    assert result['tables']['logs']['deleted'] == 5
+    assert result['tables']['logs']['chunks'] == 3
+    assert result['tables']['logs']['vectors_deleted'] == 2
+    deleted_ids = [i for call in chroma.delete_embeddings.call_args_list for i in call.args[0]]
+    assert sorted(deleted_ids) == ['log_0', 'log_1']
+
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 4
+        assert conn.execute("SELECT log_id FROM log_embeddings").fetchall() == [(8,)]
+    finally:
+        conn.close()
+
+
+def test_retention_per_source_override_and_dry_run(tmp_path):
+    db_path = str(tmp_path / 'ret_src.duckdb')
+    seed_logs(db_path)
+    manager = RetentionManager(db_path, make_config(sources={'file': 5}), chroma_client=MagicMock())
+
+    preview = manager.run(dry_run=True)
+    assert preview['tables']['logs']['deleted'] == 8
+
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 9
+    finally:
+        conn.close()
+
+    manager.run()
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT message FROM logs").fetchall() == [('fresh',)]
+    finally:
+        conn.close()
+
+
+def test_retention_stats_and_other_tables(tmp_path):
+    db_path = str(tmp_path / 'ret_stats.duckdb')
+    now = seed_logs(db_path)
+    conn = duckdb.connect(db_path)
+    try:
+        conn.execute("CREATE TABLE system_metrics (timestamp TIMESTAMP NOT NULL, metric_type TEXT NOT NULL, metric_data TEXT)")
+        conn.execute("INSERT INTO system_metrics VALUES (?, 'cpu', '{}'), (?, 'cpu', '{}')",
+                     [now - dt.timedelta(days=3), now])
+    finally:
+        conn.close()
+
+    manager = RetentionManager(db_path, make_config(tables={'system_metrics': 1}), chroma_client=MagicMock())
+    result = manager.run(checkpoint=True)
+    assert result['tables']['system_metrics']['deleted'] == 1
+    assert result['checkpointed'] is True
+
+    stats = manager.get_stats()
+    assert stats['tables']['system_metrics']['rows'] == 1
+    assert stats['tables']['system_metrics']['retention_days'] == 1
+    assert stats['tables']['logs']['total_deleted'] == 5
+    assert stats['tables']['logs']['runs'] == 1
+    assert 'security_audits' not in stats['tables']
+
+
+def test_config_retention_days_resolution():
+    cfg = make_config(tables={'logs': 7}, sources={'journald': 3})
+    assert cfg.get_retention_days('logs') == 7
+    assert cfg.get_retention_days('logs', 'journald') == 3
+    assert cfg.get_retention_days('logs', 'file') == 7
+    assert cfg.get_retention_days('system_alerts') == 30
@@ -0,0 +1,122 @@
+import datetime as dt
+import json
+from unittest.mock import MagicMock
+
+import duckdb
+
+from api import rollups, server
+from api.config import ChimeraConfig
+from api.db import initialize_schema
+from api.embeddings import AnomalyDetector
+from api.log_store import write_log_batch
+from api.reporting import ReportGenerator
+from api.retention import RetentionManager
+from conftest import FakeSocket, log_row
+
+
+NOW = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+
+
+def seed(db_path):
+    rows = []
+    for i in range(120):
+        # Spread across seconds, minutes, hours and days
+        ts = NOW - dt.timedelta(seconds=i * 1777)
+        rows.append(log_row(f"event {i}", ts=ts, hostname="h" if i % 3 else None,
+                            unit=["sshd", "cron", None][i % 3], severity=["info", "err", "warning"][i % 3]))
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, rows[:60])
+        write_log_batch(conn, rows[60:])
+    finally:
+        conn.close()
+
+
+def test_rollup_counts_match_raw_group_by(tmp_path):
+    db_path = str(tmp_path / "rollup.duckdb")
+    seed(db_path)
+    conn = duckdb.connect(db_path)
+    try:
+        for seconds in (30, 90, 3700, 86400, 3 * 86400 + 17):
+            since = NOW - dt.timedelta(seconds=seconds)
+            for dims in ([], ["unit"], ["hostname", "severity"]):
+                sql, params = rollups.counts_since_sql(since, dims)
+                got = sorted(conn.execute(sql, params).fetchall(), key=repr)
+                cols = ", ".join(dims)
+                raw = (f"SELECT {cols}, COUNT(*) FROM logs WHERE ts >= ? GROUP BY {cols}" if dims
+                       else "SELECT COUNT(*) FROM logs WHERE ts >= ?")
+                expected = sorted(conn.execute(raw, [since]).fetchall(), key=repr)
+                assert got == expected, (seconds, dims)
+        sql, params = rollups.counts_since_sql(NOW - dt.timedelta(days=5), ["unit"], {"severity": ["err"]})
+        assert conn.execute(sql, params).fetchall() == [("cron", 40)]
+    finally:
+        conn.close()
+
+
+def test_rollups_follow_retention_and_backfill(tmp_path):
+    db_path = str(tmp_path / "rollup_ret.duckdb")
+    seed(db_path)
+    cfg = ChimeraConfig(log_sources=[], db_path=db_path, socket_path="s", default_retention_days=1)
+    RetentionManager(db_path, cfg, chroma_client=MagicMock()).run()
+
+    conn = duckdb.connect(db_path)
+    try:
+        remaining = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+        for _grain, table, _unit in rollups.ROLLUP_GRAINS:
+            assert conn.execute(f"SELECT SUM(count) FROM {table}").fetchone()[0] == remaining
+            assert conn.execute(f"SELECT COUNT(*) FROM {table} WHERE count <= 0").fetchone()[0] == 0
+        before = conn.execute("SELECT * FROM logs_rollup_1h ORDER BY ALL").fetchall()
+
+        # A database without the built flag gets its rollups rebuilt from logs
+        conn.execute("DELETE FROM chimera_meta WHERE key = 'rollups'")
+        conn.execute("DELETE FROM logs_rollup_1h")
+        initialize_schema(conn)
+        assert conn.execute("SELECT * FROM logs_rollup_1h ORDER BY ALL").fetchall() == before
+    finally:
+        conn.close()
+
+
+def test_rollups_job_recounts_only_recent_buckets(tmp_path):
+    db_path = str(tmp_path / "rollup_job.duckdb")
+    seed(db_path)
+    recent = NOW - dt.timedelta(hours=1)
+    old = NOW - dt.timedelta(days=20)
+    conn = duckdb.connect(db_path)
+    try:
+        expected = conn.execute("SELECT * FROM logs_rollup_1m ORDER BY ALL").fetchall()
+        # Drift in a recent bucket and in one long before the reconcile window
+        conn.execute("UPDATE logs_rollup_1m SET count = count + 5 WHERE bucket >= ?", [recent])
+        conn.execute("INSERT INTO logs_rollup_1d (bucket, source, count) VALUES (?, 'stale', 7)", [old])
+    finally:
+        conn.close()
+
+    result = server._rollups_job(db_path)
+    assert result["buckets"] > 0
+
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT * FROM logs_rollup_1m ORDER BY ALL").fetchall() == expected
+        assert conn.execute("SELECT count FROM logs_rollup_1d WHERE source = 'stale'").fetchall() == [(7,)]
+    finally:
+        conn.close()
+
+
+def test_readers_use_rollups(tmp_path):
+    db_path = str(tmp_path / "readers.duckdb")
+    seed(db_path)
+
+    sock = FakeSocket()
+    server._handle_discover(sock, db_path, ["DISCOVER", "UNITS", "since=604800"])
+    items = [json.loads(line) for line in sock.lines()]
+    assert {item["value"]: item["count"] for item in items} == {"sshd": 40, "cron": 40, None: 40}
+
+    summary = ReportGenerator(db_path)._get_log_summary(since_seconds=604800)
+    assert summary["total_logs"] == 120
+    assert summary["error_count"] == 40
+
+    anomalies = AnomalyDetector(db_path).detect_anomalies(since_seconds=604800)
+    spikes = [a for a in anomalies if a["type"] == "error_spike"]
+    assert spikes == [{"type": "error_spike", "unit": "cron", "count": 40, "severity": "high",
+                       "description": "High error rate in cron: 40 errors"}]
+    assert {a["unit"] for a in anomalies if a["type"] == "missing_logs"} == {"systemd"}
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+
+import pytest
+
+from api import scheduler, server
+from conftest import FakeSocket
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_due_jobs_run_by_priority_one_at_a_time():
+    order = []
+    gate = threading.Event()
+
+    def job(name):
+        def run():
+            order.append(name)
+            gate.wait(1)
+            return {"name": name}
+        return run
+
+    sched = scheduler.MaintenanceScheduler(max_concurrent=1, nice=0, ionice_class=None)
+    sched.register(scheduler.Job("report", job("report"), 3600, priority=5, run_at_start=True))
+    sched.register(scheduler.Job("retention", job("retention"), 3600, priority=1, run_at_start=True))
+    sched.start()
+    try:
+        assert wait_for(lambda: order == ["retention"])
+        assert sched.get_stats()["active"] == 1
+        gate.set()
+        assert wait_for(lambda: all(j["runs"] == 1 for j in sched.get_stats()["jobs"]))
+    finally:
+        sched.stop()
+    assert order == ["retention", "report"]
+    stats = {j["name"]: j for j in sched.get_stats()["jobs"]}
+    assert stats["report"]["last_result"] == {"name": "report"}
+    assert stats["retention"]["last_duration_ms"] is not None
+    assert stats["retention"]["next_run_in_seconds"] > 3000
+
+
+def test_jobs_defer_while_busy_and_record_failures():
+    busy = {"value": True}
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RuntimeError("disk full")
+
+    sched = scheduler.MaintenanceScheduler(nice=0, ionice_class=None, busy=lambda: busy["value"],
+                                           defer_seconds=0.05, max_defer_seconds=60)
+    sched.register(scheduler.Job("checkpoint", failing, 3600, run_at_start=True))
+    sched.start()
+    try:
+        assert wait_for(lambda: sched.jobs["checkpoint"].deferrals >= 2)
+        assert calls == []
+        busy["value"] = False
+        assert wait_for(lambda: sched.jobs["checkpoint"].runs == 1)
+    finally:
+        sched.stop()
+    stats = sched.jobs["checkpoint"].stats()
+    assert stats["failures"] == 1 and stats["last_error"] == "disk full"
+
+    with pytest.raises(ValueError):
+        sched.run_now("nope")
+    assert sched.run_now("checkpoint")["runs"] == 2
+
+
+def test_maintenance_command(monkeypatch):
+    sock = FakeSocket()
+    monkeypatch.setattr(server, "maintenance", None)
+    server._handle_maintenance(sock, None, ["MAINTENANCE", "STATS"])
+    assert sock.data == b"ERR maintenance not running\n"
+
+    sched = scheduler.MaintenanceScheduler(nice=0, ionice_class=None)
+    sched.register(scheduler.Job("metrics", lambda: {"metrics": 3}, 60))
+    monkeypatch.setattr(server, "maintenance", sched)
+    sock = FakeSocket()
+    server._handle_maintenance(sock, None, ["MAINTENANCE", "RUN", "job=metrics"])
+    assert json.loads(sock.data)["last_result"] == {"metrics": 3}
+    sock = FakeSocket()
+    server._handle_maintenance(sock, None, ["MAINTENANCE", "STATS"])
+    assert [j["name"] for j in json.loads(sock.data)["jobs"]] == ["metrics"]
+    sock = FakeSocket()
+    server._handle_maintenance(sock, None, ["MAINTENANCE", "RUN", "job=vacuum"])
+    assert sock.data == b"ERR Unknown job: vacuum\n"
+
+
+def test_maintenance_jobs_follow_config():
+    cfg = server.ChimeraConfig.default()
+    cfg.retention["enabled"] = False
+    cfg.maintenance["jobs"] = {"metrics": {"interval_seconds": 15}, "report": {"enabled": False}}
+    jobs = {job.name: job for job in server._maintenance_jobs(cfg, "/tmp/unused.duckdb")}
+    assert set(jobs) == set(server.MAINTENANCE_JOB_DEFAULTS)
+    assert jobs["metrics"].interval_seconds == 15 and jobs["metrics"].priority == 0
+    assert jobs["retention"].enabled is False and jobs["report"].enabled is False
+    assert jobs["checkpoint"].interval_seconds == cfg.retention["checkpoint_interval_seconds"]
@@ -68,8 +68,8 @@ def test__run_command_not_found(_mock_run, mock_path):
 def test__store_audit_result_inserts(mock_get_conn, mock_path):
     mock_conn = MagicMock()
     mock_cursor = MagicMock()
-    # last_insert_rowid returns a tuple with id
-    mock_conn.execute.side_effect = [None, None, MagicMock(fetchone=lambda: (123,))]
+    # CREATE TABLE, id sequence lookup (exists), INSERT ... RETURNING id
+    mock_conn.execute.side_effect = [None, MagicMock(fetchone=lambda: (1,)), MagicMock(fetchone=lambda: (123,))]
     mock_get_conn.return_value = mock_conn
 
     auditor = SecurityAuditor()
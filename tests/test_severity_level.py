@@ -0,0 +1,74 @@
+import json
+
+import duckdb
+
+from api import log_dictionary, server
+from api.db import initialize_schema
+from api.embeddings import AnomalyDetector
+from api.log_store import severity_level, write_log_batch
+from conftest import FakeSocket, log_row
+
+
+SEVERITIES = ["debug", "info", "warning", "err", "crit", "alert", "custom"]
+
+
+def test_severity_level_mapping():
+    assert severity_level("emerg") == 0
+    assert severity_level("debug") == 7
+    assert severity_level("custom") is None
+    assert severity_level(None) is None
+
+
+def test_min_severity_is_a_level_range(tmp_path):
+    db_path = str(tmp_path / "sev.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [log_row(f"{sev} {i}", seconds_ago=i, severity=sev) for i, sev in enumerate(SEVERITIES)])
+        assert conn.execute("SELECT COUNT(*) FROM duckdb_indexes() WHERE index_name = 'idx_logs_ts_severity_level'").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "min_severity=err"])
+    assert sorted(json.loads(line)["severity"] for line in sock.lines()) == ["alert", "crit", "err"]
+
+    # alert now counts as an error alongside err/crit/emerg
+    conn = duckdb.connect(db_path)
+    try:
+        write_log_batch(conn, [log_row(f"alert {100 + i}", seconds_ago=100 + i, severity="alert") for i in range(11)])
+    finally:
+        conn.close()
+    spikes = [a for a in AnomalyDetector(db_path).detect_anomalies(since_seconds=3600) if a["type"] == "error_spike"]
+    assert spikes[0]["count"] == 14
+
+
+def test_backfill_plain_and_encoded_layouts(tmp_path):
+    db_path = str(tmp_path / "sev_old.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        rows = [log_row(f"{sev} {i}", seconds_ago=i, severity=sev) for i, sev in enumerate(SEVERITIES)]
+        write_log_batch(conn, rows)
+        # An embedding row makes the logs rows FK-referenced during the backfill
+        conn.execute("INSERT INTO log_embeddings (log_id) VALUES (?)", [rows[3]["id"]])
+
+        conn.execute("DROP INDEX idx_logs_ts_severity_level")
+        conn.execute("UPDATE logs SET severity_level = NULL")
+        conn.execute("DELETE FROM chimera_meta WHERE key = 'severity_level'")
+        initialize_schema(conn)
+        levels = dict(conn.execute("SELECT severity, severity_level FROM logs").fetchall())
+        assert levels == {"debug": 7, "info": 6, "warning": 4, "err": 3, "crit": 2, "alert": 1, "custom": None}
+
+        log_dictionary.encode_logs(conn)
+        initialize_schema(conn)
+        conn.execute("DROP INDEX idx_logs_ts_severity_level")
+        conn.execute("UPDATE logs_data SET severity_level = NULL")
+        conn.execute("DELETE FROM chimera_meta WHERE key = 'severity_level'")
+        initialize_schema(conn)
+        assert dict(conn.execute("SELECT severity, severity_level FROM logs").fetchall()) == levels
+        assert conn.execute(
+            "SELECT COUNT(*) FROM duckdb_indexes() WHERE table_name = 'logs_data' AND index_name = 'idx_logs_ts_severity_level'"
+        ).fetchone()[0] == 1
+    finally:
+        conn.close()
@@ -0,0 +1,142 @@
+import datetime as dt
+import json
+import os
+import subprocess
+
+import duckdb
+
+from api import server, shards
+from api.config import LogSource
+from api.db import initialize_schema
+from api.ingest_framework import IngestionFramework
+from conftest import FakeCompleted, FakeSocket
+
+
+def journal_lines(host, unit, count):
+    now = int(dt.datetime.now(tz=dt.timezone.utc).timestamp() * 1_000_000)
+    return "\n".join(json.dumps({
+        "__REALTIME_TIMESTAMP": str(now - i), "_HOSTNAME": host, "_SYSTEMD_UNIT": unit,
+        "MESSAGE": f"{host} event {i}", "PRIORITY": "6", "__CURSOR": f"{host}-{i}",
+    }) for i in range(count))
+
+
+def call(handler, db_path, *tokens):
+    sock = FakeSocket()
+    handler(sock, db_path, list(tokens))
+    return sock.lines()
+
+
+def test_sources_write_own_shards_and_queries_federate(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "main.duckdb")
+    shard_dir = str(tmp_path / "shards")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+    finally:
+        conn.close()
+
+    framework = IngestionFramework(db_path, shard_dir=shard_dir)
+    monkeypatch.setattr(subprocess, "run", lambda *a, **k: FakeCompleted(0, journal_lines("web-1", "nginx.service", 3)))
+    assert framework.ingest_source(LogSource(name="web-1 feed", type="journald"), limit=10) == (3, 3)
+    monkeypatch.setattr(subprocess, "run", lambda *a, **k: FakeCompleted(0, journal_lines("db-1", "postgres.service", 2)))
+    assert framework.ingest_source(LogSource(name="db-1", type="journald"), limit=10) == (2, 2)
+
+    assert sorted(shards.list_shards(shard_dir)) == ["db_1", "web_1_feed"]
+    conn = duckdb.connect(db_path)
+    try:
+        # Nothing lands in the main file; cursors are tracked per shard
+        assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM ingest_state").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+    monkeypatch.setattr(server, "shard_dir", shard_dir)
+    assert len(call(server._handle_query_logs, db_path, "QUERY_LOGS")) == 5
+    assert [json.loads(line)["hostname"] for line in call(server._handle_query_logs, db_path, "QUERY_LOGS", "unit=postgres.service")] == ["db-1", "db-1"]
+    assert len(call(server._handle_query_logs, db_path, "QUERY_LOGS", "match=event")) == 5
+    assert len(call(server._handle_query_logs, db_path, "QUERY_LOGS", "contains=web-1%20event")) == 3
+    discovered = [json.loads(line) for line in call(server._handle_discover, db_path, "DISCOVER", "hostnames")]
+    assert {item["value"]: item["count"] for item in discovered} == {"web-1": 3, "db-1": 2}
+
+    listed = {item["name"]: item for item in map(json.loads, call(server._handle_shards, db_path, "SHARDS", "LIST"))}
+    assert listed["web_1_feed"]["rows"] == 3 and listed["db_1"]["rows"] == 2
+
+    archived = json.loads(call(server._handle_shards, db_path, "SHARDS", "ARCHIVE", "name=web_1_feed")[0])
+    assert os.path.exists(archived["archived_to"])
+    assert sorted(shards.list_shards(shard_dir)) == ["db_1"]
+    assert len(call(server._handle_query_logs, db_path, "QUERY_LOGS")) == 2
+
+    assert call(server._handle_shards, db_path, "SHARDS", "DROP", "name=nope") == ["ERR Unknown shard: nope"]
+    call(server._handle_shards, db_path, "SHARDS", "DROP", "name=db_1")
+    assert shards.list_shards(shard_dir) == {}
+    assert call(server._handle_query_logs, db_path, "QUERY_LOGS") == []
+
+
+def test_shard_name():
+    assert shards.shard_name("Web-1 Files") == "web_1_files"
+    assert shards.shard_file("/s", "db_1") == "/s/shard-db_1.duckdb"
+
+
+def test_retention_snapshots_and_detach_cover_shards(tmp_path, monkeypatch):
+    from unittest.mock import MagicMock
+    import threading
+
+    from api import snapshots
+    from api.config import ChimeraConfig
+    from api.retention import RetentionManager
+
+    db_path = str(tmp_path / "main.duckdb")
+    shard_dir = str(tmp_path / "shards")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+    finally:
+        conn.close()
+    monkeypatch.setattr(subprocess, "run", lambda *a, **k: FakeCompleted(0, journal_lines("web-1", "nginx.service", 4)))
+    IngestionFramework(db_path, shard_dir=shard_dir).ingest_source(LogSource(name="web-1", type="journald"), limit=10)
+    monkeypatch.setattr(shards, "_directory", shard_dir)
+    monkeypatch.setattr(server, "shard_dir", shard_dir)
+
+    conn = shards.connect(db_path, "web_1")
+    try:
+        conn.execute("UPDATE logs SET ts = ts - INTERVAL 40 DAY WHERE message IN ('web-1 event 0', 'web-1 event 1')")
+    finally:
+        conn.close()
+
+    cfg = ChimeraConfig(log_sources=[], db_path="db", socket_path="sock", default_retention_days=30)
+    result = RetentionManager(db_path, cfg, chroma_client=MagicMock()).run()
+    assert result["shards"]["web_1"]["logs"]["deleted"] == 2
+    assert len(call(server._handle_query_logs, db_path, "QUERY_LOGS")) == 2
+
+    conn = duckdb.connect(db_path)
+    try:
+        manifest = snapshots.publish_snapshot(conn, str(tmp_path / "snap"))
+    finally:
+        conn.close()
+    cloned = os.path.join(snapshots.shard_snapshot_dir(manifest["path"]), "shard-web_1.duckdb")
+    assert set(manifest["shards"]) == {"web_1"} and os.path.exists(cloned)
+    conn = duckdb.connect(cloned, read_only=True)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+    # A detach waits for requests holding the shard gate
+    monkeypatch.setattr(shards, "DETACH_TIMEOUT_SECONDS", 0.05)
+    holding, release = threading.Event(), threading.Event()
+
+    def reader():
+        with shards.in_use():
+            holding.set()
+            release.wait()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    holding.wait()
+    try:
+        assert call(server._handle_shards, db_path, "SHARDS", "DROP", "name=web_1") == ["ERR shard-busy"]
+    finally:
+        release.set()
+        thread.join()
+    call(server._handle_shards, db_path, "SHARDS", "DROP", "name=web_1")
+    assert shards.list_shards(shard_dir) == {}
@@ -0,0 +1,137 @@
+import glob
+import json
+import os
+import socket
+import threading
+
+import duckdb
+import pytest
+
+from api import server, snapshots
+from api.db import get_connection, initialize_schema, is_read_only
+from api.log_store import write_log_batch
+from conftest import log_row
+
+
+def request(command):
+    client, served = socket.socketpair()
+    with client:
+        client.sendall(command.encode())
+        server.handle_client(served, "/nonexistent/primary.duckdb")
+        data = b""
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return [line for line in data.decode().splitlines() if line]
+
+
+@pytest.fixture
+def split_mode(tmp_path, monkeypatch):
+    snapshot_dir = str(tmp_path / "snapshots")
+    worker_sock = str(tmp_path / "worker.sock")
+    monkeypatch.setattr(server, "read_snapshots", snapshots.SnapshotReader(snapshot_dir))
+    monkeypatch.setattr(server, "worker_socket_path", worker_sock)
+    return snapshot_dir, worker_sock
+
+
+def test_publish_rotates_generations(tmp_path):
+    db_path = str(tmp_path / "primary.duckdb")
+    snapshot_dir = str(tmp_path / "snapshots")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [log_row("event 1", seconds_ago=1)])
+        first = snapshots.publish_snapshot(conn, snapshot_dir, keep=2)
+        write_log_batch(conn, [log_row("event 2", seconds_ago=2)])
+        snapshots.publish_snapshot(conn, snapshot_dir, keep=2)
+        third = snapshots.publish_snapshot(conn, snapshot_dir, keep=2)
+    finally:
+        conn.close()
+
+    assert not os.path.exists(first["path"])
+    assert len(glob.glob(os.path.join(snapshot_dir, "snapshot-*.duckdb"))) == 2
+    assert snapshots.read_manifest(snapshot_dir)["generation"] == third["generation"]
+
+    snap = get_connection(third["path"])
+    try:
+        assert is_read_only(snap)
+        initialize_schema(snap)  # no-op on a snapshot
+        assert snap.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 2
+        with pytest.raises(duckdb.Error):
+            snap.execute("DELETE FROM logs")
+    finally:
+        snap.close()
+
+
+def test_publish_clones_the_checkpointed_file(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "primary.duckdb")
+    snapshot_dir = str(tmp_path / "snapshots")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [log_row("event 1", seconds_ago=1), log_row("event 2", seconds_ago=2)])
+        manifest = snapshots.publish_snapshot(conn, snapshot_dir)
+        assert manifest["method"] in ("reflink", "copy")
+
+        # A WAL the checkpoint could not fold in means the file alone is stale
+        wal = db_path + ".wal"
+        monkeypatch.setattr(os.path, "getsize", lambda path: 1 if path == wal else os.stat(path).st_size)
+        monkeypatch.setattr(os.path, "exists", lambda path, _exists=os.path.exists: path == wal or _exists(path))
+        write_log_batch(conn, [log_row("event 3", seconds_ago=3)])
+        exported = snapshots.publish_snapshot(conn, snapshot_dir)
+        assert exported["method"] == "export"
+    finally:
+        conn.close()
+    monkeypatch.undo()
+
+    for item, rows in ((manifest, 2), (exported, 3)):
+        snap = get_connection(item["path"])
+        try:
+            assert snap.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == rows
+        finally:
+            snap.close()
+
+
+def test_split_mode_reads_snapshot_and_forwards_writes(tmp_path, split_mode):
+    snapshot_dir, worker_sock = split_mode
+    assert request("QUERY_LOGS") == ["ERR snapshot-not-ready"]
+    assert json.loads(request("SNAPSHOT STATUS")[0])["ready"] is False
+    assert request("INGEST_ALL") == ["ERR worker-unavailable"]
+
+    db_path = str(tmp_path / "primary.duckdb")
+    publisher = snapshots.SnapshotPublisher(db_path, snapshot_dir)
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [log_row("event 1", seconds_ago=1)])
+    finally:
+        conn.close()
+    publisher.publish()
+
+    lines = request("QUERY_LOGS")
+    assert [json.loads(line)["message"] for line in lines] == ["event 1"]
+    status = json.loads(request("SNAPSHOT STATUS")[0])
+    assert status["ready"] is True and status["generation"] == publisher.last_manifest["generation"]
+
+    # Anything that writes is relayed to the worker process
+    received = []
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(worker_sock)
+    listener.listen(1)
+
+    def fake_worker():
+        conn, _ = listener.accept()
+        with conn:
+            received.append(conn.recv(4096).decode())
+            conn.sendall(b'{"inserted": 0}\n')
+
+    t = threading.Thread(target=fake_worker)
+    t.start()
+    try:
+        assert request("INGEST_ALL limit=5") == ['{"inserted": 0}']
+    finally:
+        t.join()
+        listener.close()
+    assert received == ["INGEST_ALL limit=5"]
@@ -0,0 +1,104 @@
+import threading
+
+import duckdb
+import pytest
+
+from api import storage
+from api.db import get_connection
+
+
+HOST = {"cores": 16, "memory_mb": 32768}
+
+
+def test_resolve_settings_auto_sizes_the_instance():
+    assert storage.resolve_settings({}, HOST) == {
+        "threads": 8, "memory_limit": "8192MB", "preserve_insertion_order": True, "checkpoint_threshold": "16MB",
+    }
+
+    # Explicit values beat auto-sizing
+    cfg = {"threads": 2, "memory_limit": "1GB", "temp_directory": "/spill", "profiles": {"batch": {"concurrency": 1}}}
+    settings = storage.resolve_settings(cfg, HOST)
+    assert settings["threads"] == 2 and settings["memory_limit"] == "1GB" and settings["temp_directory"] == "/spill"
+
+    # Tiny hosts still get one thread and a usable memory floor
+    small = storage.resolve_settings({}, {"cores": 1, "memory_mb": 512})
+    assert small["threads"] == 1 and small["memory_limit"] == f"{storage.MIN_MEMORY_MB}MB"
+
+    assert storage.concurrency("batch", cfg) == 1
+    assert storage.concurrency("ingest", cfg) == storage.DEFAULT_STORAGE["profiles"]["ingest"]["concurrency"]
+    with pytest.raises(ValueError):
+        storage.concurrency("reporting", {})
+
+
+def test_get_connection_applies_settings_once(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "chimera.duckdb")
+    conn = get_connection(db_path)
+    try:
+        default_threads = conn.execute("SELECT current_setting('threads')").fetchone()[0]
+    finally:
+        conn.close()
+
+    monkeypatch.setattr(storage, "_storage", {"threads": 3, "memory_limit": "1.5GB", "checkpoint_threshold": "64MB",
+                                              "temp_directory": str(tmp_path / "spill")})
+    first = get_connection(db_path, profile="batch")
+    try:
+        assert first.execute("SELECT current_setting('threads')").fetchone()[0] == 3
+        assert first.execute("SELECT current_setting('memory_limit')").fetchone()[0] != "0 bytes"
+
+        # A later connection to the same instance finds every setting in place
+        statements = []
+
+        class Recording:
+            def execute(self, sql, *args):
+                statements.append(sql)
+                return first.execute(sql, *args)
+
+        storage.apply_settings(Recording(), "interactive")
+        assert not [sql for sql in statements if sql.startswith("SET")]
+    finally:
+        first.close()
+
+    monkeypatch.setattr(storage, "_storage", None)
+    plain = duckdb.connect(str(tmp_path / "other.duckdb"))
+    try:
+        assert storage.apply_settings(plain, "batch") == {}
+        assert plain.execute("SELECT current_setting('threads')").fetchone()[0] == default_threads
+    finally:
+        plain.close()
+
+
+def test_workload_slots_cap_concurrency(monkeypatch):
+    monkeypatch.setattr(storage, "_slots", {})
+    monkeypatch.setattr(storage, "_storage", None)
+    storage.configure({"profiles": {"batch": {"concurrency": 1}}})
+    try:
+        entered, release = threading.Event(), threading.Event()
+        order = []
+
+        def first():
+            with storage.workload("batch"):
+                # Reentrant: nested batch work on the same thread does not wait on itself
+                with storage.workload("batch"):
+                    order.append("first")
+                    entered.set()
+                    release.wait()
+
+        def second():
+            with storage.workload("batch"):
+                order.append("second")
+
+        one = threading.Thread(target=first)
+        one.start()
+        entered.wait()
+        two = threading.Thread(target=second)
+        two.start()
+        two.join(0.1)
+        assert two.is_alive() and order == ["first"]
+        with storage.workload("interactive"):
+            pass  # other workloads keep their own slots
+        release.set()
+        one.join()
+        two.join()
+        assert order == ["first", "second"]
+    finally:
+        monkeypatch.setattr(storage, "_storage", None)
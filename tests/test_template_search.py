@@ -0,0 +1,100 @@
+import duckdb
+import numpy as np
+
+from api import embeddings, templates
+from api.db import initialize_schema
+from api.embeddings import SemanticSearchEngine
+from api.log_store import write_log_batch
+from conftest import FakeEmbeddingClient, log_row
+
+
+WORDS = ["password", "publickey", "session", "disk", "reboot"]
+
+
+class FakeCollection:
+    """Cosine-distance stand-in for a ChromaDB collection"""
+
+    def __init__(self):
+        self.items = {}
+
+    def add_embeddings(self, ids, vectors, metadatas, documents, upsert=False):
+        assert upsert
+        self.items.update({i: (np.array(v), m) for i, v, m in zip(ids, vectors, metadatas)})
+
+    def search(self, query, n_results=10, where=None):
+        q = np.array(query)
+        scored = sorted(
+            ((1 - float(v @ q / (np.linalg.norm(v) * np.linalg.norm(q))), m) for v, m in self.items.values()),
+            key=lambda item: item[0],
+        )[:n_results]
+        return {"metadatas": [[m for _d, m in scored]], "distances": [[d for d, _m in scored]]}
+
+    def delete_embeddings(self, ids):
+        for i in ids:
+            self.items.pop(i, None)
+
+
+def seed(db_path):
+    rows = [log_row(f"Failed password for root from 10.0.0.{i} port {4000 + i}", seconds_ago=i, unit="sshd.service") for i in range(40)]
+    rows += [log_row(f"Accepted publickey for deploy from 10.0.1.{i} port {5000 + i}", seconds_ago=i, unit="sshd.service") for i in range(20)]
+    rows += [log_row(f"Failed password for admin from 10.0.2.{i} port {6000 + i}", seconds_ago=7200 + i, unit="other.service") for i in range(5)]
+    rows += [log_row("disk /dev/sda1 is 91% full", seconds_ago=3, unit="monitor.service")]
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, rows)
+    finally:
+        templates.invalidate(conn)
+        conn.close()
+
+
+def make_engine(db_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "_settings", {"index_mode": "templates", "rows_per_template": 2})
+    engine = SemanticSearchEngine(db_path)
+    engine.embedding_client = FakeEmbeddingClient(WORDS, presence=True, bias=0.01)
+    engine.template_client = FakeCollection()
+    return engine
+
+
+def test_templates_mode_indexes_diversity_not_volume(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "tpl.duckdb")
+    seed(db_path)
+    engine = make_engine(db_path, monkeypatch)
+
+    assert engine.index_logs(since_seconds=86400) == (3, 3)  # 66 rows, 3 templates
+    assert len(engine.template_client.items) == 3
+    assert engine.index_logs(since_seconds=86400) == (0, 0)
+
+    results = engine.search_logs("failed password attempts", n_results=5)
+    assert [r["message"] for r in results[:2]] == [
+        "Failed password for root from 10.0.0.0 port 4000",
+        "Failed password for root from 10.0.0.1 port 4001",
+    ]
+    assert results[0]["matches"] == 45 and results[0]["similarity"] > results[2]["similarity"]
+    assert len({r["template_id"] for r in results}) == 3  # no near-duplicate flood
+
+    # Time and unit filters run in DuckDB against the matching rows
+    scoped = engine.search_logs("failed password", n_results=5, since_seconds=3600, unit="other.service")
+    assert scoped == []
+    scoped = engine.search_logs("failed password", n_results=5, unit="other.service")
+    # matches is the template's total count, not a count of the rows in scope
+    assert {r["unit"] for r in scoped} == {"other.service"} and scoped[0]["matches"] == 45
+
+
+def test_templates_reindex_after_generalizing_and_cleanup(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "tpl2.duckdb")
+    seed(db_path)
+    engine = make_engine(db_path, monkeypatch)
+    engine.index_logs()
+
+    conn = duckdb.connect(db_path)
+    try:
+        write_log_batch(conn, [log_row("disk /dev/sdb2 is 91% full", unit="monitor.service")])
+        conn.execute("UPDATE log_templates SET last_seen = last_seen - INTERVAL 90 DAY WHERE template LIKE 'Accepted%'")
+    finally:
+        templates.invalidate(conn)
+        conn.close()
+
+    assert engine.index_logs() == (1, 1)  # only the generalized disk template
+    assert engine.cleanup_old_embeddings(days=30) == 1
+    assert len(engine.template_client.items) == 2
@@ -0,0 +1,81 @@
+import duckdb
+
+from api import server, templates
+from api.db import initialize_schema
+from api.log_store import write_log_batch
+from conftest import FakeSocket, log_row
+
+
+SSH_LINES = [
+    "Failed password for root from 1.2.3.4 port 5555 ssh2",
+    "Failed password for admin from 10.0.0.7 port 40122 ssh2",
+    "Failed password for root from 192.168.1.20 port 22 ssh2",
+]
+
+
+def test_miner_groups_variable_tokens():
+    miner = templates.TemplateMiner()
+    first, params = miner.add(SSH_LINES[0])
+    assert first.template == "Failed password for root from <*> port <*> ssh2"
+    assert params == ["1.2.3.4", "5555"]
+
+    second, params = miner.add(SSH_LINES[1])
+    assert second is first
+    assert first.template == "Failed password for <*> from <*> port <*> ssh2"
+    assert params == ["admin", "10.0.0.7", "40122"]
+
+    other, _ = miner.add("Accepted publickey for root from 1.2.3.4 port 5555 ssh2")
+    assert other is not first
+    assert miner.add("session closed")[0] is not first  # different length, different branch
+    assert first.count == 2
+
+
+def test_ingest_assigns_templates_and_warm_restarts(tmp_path):
+    db_path = str(tmp_path / "templates.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        rows = [log_row(line, seconds_ago=i) for i, line in enumerate(SSH_LINES)] + [log_row("reboot requested")]
+        write_log_batch(conn, rows)
+        assert rows[0]["template_id"] == rows[2]["template_id"] != rows[3]["template_id"]
+        assert rows[1]["template_params"] == ["admin", "10.0.0.7", "40122"]
+
+        stored = conn.execute(
+            "SELECT template_id, template, count FROM log_templates ORDER BY count DESC"
+        ).fetchall()
+        assert stored[0] == (rows[0]["template_id"], "Failed password for <*> from <*> port <*> ssh2", 3)
+        params = conn.execute(
+            "SELECT params FROM log_template_ids WHERE log_id = ?", [rows[2]["id"]]
+        ).fetchone()[0]
+        assert params == ["root", "192.168.1.20", "22"]
+
+        # A fresh process rebuilds the tree from log_templates and keeps the ids
+        templates.invalidate(conn)
+        row = log_row("Failed password for guest from 5.6.7.8 port 1 ssh2")
+        write_log_batch(conn, [row])
+        assert row["template_id"] == rows[0]["template_id"]
+        assert conn.execute("SELECT COUNT(*) FROM log_templates").fetchone()[0] == 2
+    finally:
+        templates.invalidate(conn)
+        conn.close()
+
+
+def test_templates_command_counts_window(tmp_path):
+    db_path = str(tmp_path / "cmd.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [log_row(line) for line in SSH_LINES] + [log_row("reboot requested", seconds_ago=7200)])
+    finally:
+        templates.invalidate(conn)
+        conn.close()
+
+    sock = FakeSocket()
+    server._handle_templates(sock, db_path, ["TEMPLATES", "since=3600"])
+    lines = [server.json.loads(line) for line in sock.lines()]
+    assert [(item["template"], item["count"]) for item in lines] == [
+        ("Failed password for <*> from <*> port <*> ssh2", 3),
+    ]
+    sock = FakeSocket()
+    server._handle_templates(sock, db_path, ["TEMPLATES", "limit=0"])
+    assert sock.lines()[0].startswith("ERR ")
@@ -0,0 +1,118 @@
+import datetime as dt
+from unittest.mock import MagicMock
+
+import duckdb
+
+from api import server
+from api import text_index
+from api.db import initialize_schema
+from api.log_store import write_log_batch
+from api.retention import RetentionManager
+from api.config import ChimeraConfig
+from conftest import FakeSocket, log_row
+
+
+def test_tokenize_keeps_compounds_and_parts():
+    terms = text_index.tokenize("Failed password for root from 10.0.0.5 port 22: /usr/bin/sudo.")
+    assert "10.0.0.5" in terms
+    assert "/usr/bin/sudo" not in terms  # leading slash is not a word character
+    assert "usr/bin/sudo" in terms and "sudo" in terms
+    assert "password" in terms and "22" in terms
+    assert text_index.tokenize("10.0.0.5", with_parts=False) == ["10.0.0.5"]
+
+
+def test_write_log_batch_indexes_only_new_rows(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "fts.duckdb"))
+    try:
+        initialize_schema(conn)
+        rows = [log_row("Accepted password for alice"), log_row("Failed password for bob")]
+        assert len(write_log_batch(conn, rows)) == 2
+        # Re-sending the same batch inserts nothing and adds no postings
+        assert write_log_batch(conn, rows) == []
+        assert conn.execute("SELECT COUNT(*) FROM log_terms WHERE term = 'password'").fetchone()[0] == 2
+        assert conn.execute("SELECT doc_count FROM log_term_stats").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def test_query_logs_match_ranks_by_bm25(tmp_path):
+    db_path = str(tmp_path / "match.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [
+            log_row("connection from 10.0.0.5 closed"),
+            log_row("failed login from 10.0.0.5 10.0.0.5 repeated"),
+            log_row("failed login from 10.0.0.9"),
+        ])
+    finally:
+        conn.close()
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "since=3600", "match=10.0.0.5"])
+    lines = sock.lines()
+    assert len(lines) == 2
+    assert "repeated" in lines[0]
+    assert '"score"' in lines[0]
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "match=failed%20login"])
+    assert len(sock.lines()) == 2
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "match=%21%21"])
+    assert sock.lines() == ["ERR match-query-has-no-terms"]
+
+
+def test_backfill_and_retention_keep_index_in_sync(tmp_path):
+    db_path = str(tmp_path / "sync.duckdb")
+    old = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) - dt.timedelta(days=60)
+    conn = duckdb.connect(db_path)
+    try:
+        conn.execute("CREATE TABLE logs (id BIGINT PRIMARY KEY, ts TIMESTAMP NOT NULL, hostname TEXT, source TEXT, unit TEXT, "
+                     "facility TEXT, severity TEXT, pid INTEGER, uid INTEGER, gid INTEGER, message TEXT, raw JSON, "
+                     "fingerprint TEXT, cursor TEXT)")
+        conn.execute("INSERT INTO logs (id, ts, message) VALUES (1, ?, 'old kernel panic'), (2, now(), 'kernel ok')", [old])
+        # Schema setup only marks the build as pending
+        initialize_schema(conn)
+        assert conn.execute("SELECT COUNT(*) FROM log_terms").fetchone()[0] == 0
+        assert conn.execute("SELECT value FROM chimera_meta WHERE key = 'text_index'").fetchone()[0] == "pending"
+    finally:
+        conn.close()
+
+    # The maintenance job builds it in pages and is a no-op afterwards
+    assert text_index.build_pending(db_path, batch_size=1) == 2
+    assert text_index.build_pending(db_path) == 0
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM log_terms WHERE term = 'kernel'").fetchone()[0] == 2
+        assert conn.execute("SELECT value FROM chimera_meta WHERE key = 'text_index'").fetchone()[0] == "built"
+    finally:
+        conn.close()
+
+    cfg = ChimeraConfig(log_sources=[], db_path=db_path, socket_path="s", default_retention_days=30)
+    RetentionManager(db_path, cfg, chroma_client=MagicMock()).run()
+
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT log_id FROM log_terms WHERE term = 'kernel'").fetchall() == [(2,)]
+        assert conn.execute("SELECT doc_count, total_len FROM log_term_stats").fetchone() == (1, 2)
+    finally:
+        conn.close()
+
+
+def test_long_messages_index_every_distinct_term(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "long.duckdb"))
+    try:
+        initialize_schema(conn)
+        message = " ".join(f"word{i}" for i in range(300)) + " needle"
+        write_log_batch(conn, [log_row(message)])
+        assert conn.execute("SELECT COUNT(*) FROM log_terms").fetchone()[0] == 301
+        sql, params = text_index.build_match_cte(conn, "needle", dt.datetime(2000, 1, 1))
+        assert len(conn.execute(sql, params).fetchall()) == 1
+
+        # Rebuilding pages by id and gives the same postings
+        assert text_index.rebuild(conn, batch_size=1) == 1
+        assert conn.execute("SELECT COUNT(*) FROM log_terms").fetchone()[0] == 301
+    finally:
+        conn.close()
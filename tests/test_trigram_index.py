@@ -0,0 +1,110 @@
+import duckdb
+
+from api import server
+from api import trigram_index
+from api.db import initialize_schema
+from api.log_store import write_log_batch
+from conftest import FakeSocket, log_row
+
+
+def seed(db_path, messages):
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [log_row(m) for m in messages])
+    finally:
+        conn.close()
+
+
+def test_regex_literal_extraction():
+    assert trigram_index.regex_trigrams(r"abc") == {"abc"}
+    # Escaped dots are literals; classes and repeats split runs
+    assert trigram_index.regex_trigrams(r"10\.0\.\d+") == {"10.", "0.0", ".0."}
+    # Optional pieces and alternations contribute nothing
+    assert trigram_index.regex_trigrams(r"(?:xyz)?(foo|bar)") == set()
+    assert trigram_index.regex_trigrams(r"(beef)+dead") == {"bee", "eef", "dea", "ead"}
+    # RE2-only syntax disables pruning rather than failing
+    assert trigram_index.regex_trigrams(r"\pN+") == set()
+    assert trigram_index.substring_trigrams("50%") == set()
+
+
+def test_query_logs_contains_and_regex_use_trigrams(tmp_path):
+    db_path = str(tmp_path / "tri.duckdb")
+    long_tail = "x" * trigram_index.MAX_INDEXED_CHARS + " token=DEADBEEF"
+    seed(db_path, [
+        "session 0xdeadbeef42 opened",
+        "session 0xcafef00d opened",
+        "open /var/lib/chimera/state.db failed",
+        long_tail,
+    ])
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "contains=adbee"])
+    lines = sock.lines()
+    # The overflow row matches beyond the indexed head but must still be found
+    assert len(lines) == 2
+    assert any("0xdeadbeef42" in line for line in lines)
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "regex=chimera/%5Ba-z%5D%2B%5C.db"])
+    lines = sock.lines()
+    assert len(lines) == 1 and "state.db" in lines[0]
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "regex=0x%5B0-9a-f%5D%7B8%2C10%7D%20opened"])
+    assert len(sock.lines()) == 2
+
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "regex=(unclosed"])
+    assert sock.lines() == ["ERR invalid-regex"]
+
+
+def test_query_logs_regex_timeout(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "slow.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        # Bulk rows straight into logs: no postings, so the regex must scan them all
+        conn.execute(
+            "INSERT INTO logs (id, ts, message) SELECT i, now(), repeat('ab', 200) || i::VARCHAR FROM range(400000) t(i)"
+        )
+    finally:
+        conn.close()
+
+    monkeypatch.setattr(server, "QUERY_REGEX_TIMEOUT_SECONDS", 0.01)
+    sock = FakeSocket()
+    server._handle_query_logs(sock, db_path, ["QUERY_LOGS", "regex=(a%7Cb)*c", "limit=1"])
+    assert sock.lines() == ["ERR regex-timeout"]
+
+
+def test_backfill_builds_trigrams_once(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "bf.duckdb"))
+    try:
+        initialize_schema(conn)
+        conn.execute("INSERT INTO logs (id, ts, message) VALUES (1, now(), 'abcd')")
+        conn.execute("DELETE FROM chimera_meta")
+        initialize_schema(conn)
+        assert sorted(r[0] for r in conn.execute("SELECT trigram FROM log_trigrams").fetchall()) == ["abc", "bcd"]
+        conn.execute("INSERT INTO logs (id, ts, message) VALUES (2, now(), 'wxyz')")
+        initialize_schema(conn)
+        assert conn.execute("SELECT COUNT(*) FROM log_trigrams").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def test_postings_are_bulk_inserted_with_their_row(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "bulk.duckdb"))
+    try:
+        initialize_schema(conn)
+        rows = [log_row("Größe über"), log_row("x" * (trigram_index.MAX_INDEXED_CHARS + 5))]
+        assert trigram_index.index_log_rows(conn, rows) == len(trigram_index.trigrams("Größe über")) + 2
+        assert trigram_index.index_log_rows(conn, []) == 0
+        grams = {r[0] for r in conn.execute(
+            "SELECT trigram FROM log_trigrams WHERE log_id = ? AND ts = ?", [rows[0]["id"], rows[0]["ts"]]
+        ).fetchall()}
+        assert grams == trigram_index.trigrams("Größe über")
+        assert conn.execute(
+            "SELECT COUNT(*) FROM log_trigrams WHERE log_id = ? AND trigram = ''", [rows[1]["id"]]
+        ).fetchone()[0] == 1
+    finally:
+        conn.close()
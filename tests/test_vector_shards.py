@@ -0,0 +1,203 @@
+import datetime as dt
+import math
+
+import duckdb
+import pytest
+
+from api import embeddings, templates
+from api.db import initialize_schema
+from api.embeddings import SemanticSearchEngine, ShardedChromaClient
+from api.log_store import write_log_batch
+from conftest import FakeEmbeddingClient, log_row
+
+
+DAY = dt.datetime(2024, 3, 1, tzinfo=dt.timezone.utc)
+
+
+def matches(metadata, where):
+    if not where:
+        return True
+    if "$and" in where:
+        return all(matches(metadata, condition) for condition in where["$and"])
+    (key, condition), = where.items()
+    if isinstance(condition, dict):
+        return metadata.get(key, 0) >= condition["$gte"]
+    return metadata.get(key) == condition
+
+
+def cosine_distance(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    return 1.0 - dot / (math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b)) or 1.0)
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.rows = {}
+        self.queries = []
+
+    def add(self, ids, embeddings, metadatas, documents):
+        for entry in zip(ids, embeddings, metadatas, documents):
+            self.rows[entry[0]] = entry[1:]
+
+    upsert = add
+
+    def query(self, query_embeddings, n_results, where=None):
+        self.queries.append(where)
+        hits = sorted(
+            (cosine_distance(query_embeddings[0], vector), key, metadata, document)
+            for key, (vector, metadata, document) in self.rows.items() if matches(metadata, where)
+        )[:n_results]
+        return {"ids": [[h[1] for h in hits]], "distances": [[h[0] for h in hits]],
+                "metadatas": [[h[2] for h in hits]], "documents": [[h[3] for h in hits]]}
+
+    def delete(self, ids):
+        for key in ids:
+            self.rows.pop(key, None)
+
+    def count(self):
+        return len(self.rows)
+
+
+class FakeChroma:
+    def __init__(self):
+        self.collections = {}
+
+    def list_collections(self):
+        return list(self.collections.values())
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+    def create_collection(self, name, metadata=None):
+        return self.collections.setdefault(name, FakeCollection(name))
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+
+def sharded(granularity="day"):
+    client = ShardedChromaClient("/nonexistent", granularity)
+    client.base._client = FakeChroma()
+    return client
+
+
+def add(client, entries):
+    client.add_embeddings(
+        [f"log_{log_id}" for log_id, _, _ in entries],
+        [vector for _, _, vector in entries],
+        [{"log_id": log_id, "ts_epoch": ts.timestamp()} for log_id, ts, _ in entries],
+        [f"message {log_id}" for log_id, _, _ in entries],
+    )
+
+
+def test_planner_prunes_shards_and_merges_top_k():
+    client = sharded()
+    add(client, [
+        (1, DAY - dt.timedelta(days=2), [1.0, 0.0]),
+        (2, DAY - dt.timedelta(hours=20), [1.0, 0.1]),
+        (3, DAY + dt.timedelta(hours=3), [1.0, 0.5]),
+        (4, DAY + dt.timedelta(hours=4), [0.0, 1.0]),
+        (5, DAY - dt.timedelta(hours=2), [1.0, 0.05]),
+    ])
+    assert list(client.shards()) == ["log_embeddings_20240228", "log_embeddings_20240229", "log_embeddings_20240301"]
+
+    since = (DAY - dt.timedelta(hours=6)).timestamp()
+    # Newest first; only the shard the window starts in needs the time filter
+    assert client.plan(since) == [("log_embeddings_20240301", True), ("log_embeddings_20240229", False)]
+
+    where = {"ts_epoch": {"$gte": since}}
+    results = client.search([1.0, 0.0], 3, since, where=where, inner_where=None)
+    assert results["ids"] == [["log_5", "log_3", "log_4"]]
+    assert results["distances"][0] == sorted(results["distances"][0])
+    assert results["shards_searched"] == 2
+    collections = client.base._client.collections
+    assert collections["log_embeddings_20240229"].queries == [where]
+    assert collections["log_embeddings_20240301"].queries == [None]
+    assert collections["log_embeddings_20240228"].queries == []
+
+    assert client.search([1.0, 0.0], 2)["ids"] == [["log_1", "log_5"]]
+
+    assert sharded("hour").shard_name(DAY.timestamp() + 3600 * 5) == "log_embeddings_2024030105"
+    with pytest.raises(ValueError):
+        ShardedChromaClient("/nonexistent", "week")
+
+
+def test_drop_before_removes_whole_shards():
+    client = sharded("hour")
+    add(client, [
+        (1, DAY, [1.0, 0.0]),
+        (2, DAY + dt.timedelta(minutes=30), [1.0, 0.0]),
+        (3, DAY + dt.timedelta(hours=1, minutes=10), [1.0, 0.0]),
+        (4, DAY + dt.timedelta(hours=2), [1.0, 0.0]),
+    ])
+    client.base._client.create_collection("log_templates")  # other collections are left alone
+    # The shard holding the cutoff is kept until it ends
+    assert client.drop_before((DAY + dt.timedelta(hours=1, minutes=30)).replace(tzinfo=None)) == (1, 2)
+    assert list(client.shards()) == ["log_embeddings_2024030101", "log_embeddings_2024030102"]
+    assert "log_templates" in client.base._client.collections
+    assert sorted(client.search([1.0, 0.0], 10)["ids"][0]) == ["log_3", "log_4"]
+
+
+WORDS = ["disk", "password", "network"]
+
+
+def test_engine_indexes_searches_and_cleans_up_shards(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "logs.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [
+            log_row("disk full on /var", seconds_ago=10, unit="monitor.service"),
+            log_row("disk disk disk failure", seconds_ago=3 * 86400, unit="kernel"),
+            log_row("network link down", seconds_ago=20, unit="networkd.service"),
+        ])
+    finally:
+        templates.invalidate(conn)
+        conn.close()
+    monkeypatch.setattr(embeddings, "_settings", {"shard_by": "day", "cache": False})
+    engine = SemanticSearchEngine(db_path)
+    engine.embedding_client = FakeEmbeddingClient(WORDS)
+    engine.chroma_client = None  # the unsharded row collection is not used
+    shards = engine.row_shards()
+    shards.base._client = FakeChroma()
+
+    assert engine.index_logs(since_seconds=7 * 86400) == (3, 3)
+    assert len(shards.shards()) >= 2
+
+    results = engine.search_logs("disk disk", n_results=2)
+    assert results[0]["message"] == "disk disk disk failure"
+    results = engine.search_logs("disk disk", n_results=2, since_seconds=3600, unit="monitor.service")
+    assert [r["message"] for r in results] == ["disk full on /var"]
+
+    engine.cleanup_old_embeddings(days=2)
+    assert [r["message"] for r in engine.search_logs("disk disk", n_results=5)] == [
+        "disk full on /var", "network link down"]
+
+
+def test_legacy_unsharded_collection_is_searched_and_emptied():
+    client = sharded()
+    legacy = client.base._client.create_collection("log_embeddings")
+    legacy.add(["log_9", "log_8"], [[1.0, 0.0], [0.0, 1.0]],
+               [{"log_id": 9, "ts_epoch": (DAY - dt.timedelta(days=5)).timestamp()},
+                {"log_id": 8, "ts_epoch": (DAY - dt.timedelta(hours=1)).timestamp()}],
+               ["message 9", "message 8"])
+    add(client, [(1, DAY, [1.0, 0.1])])
+    assert list(client.shards()) == ["log_embeddings_20240301"]
+
+    # Searched after the shards, always with the time filter
+    since = (DAY - dt.timedelta(hours=6)).timestamp()
+    assert client.plan(since) == [("log_embeddings_20240301", True), ("log_embeddings", False)]
+    assert client.search([1.0, 0.0], 2)["ids"] == [["log_9", "log_1"]]
+    where = {"ts_epoch": {"$gte": since}}
+    assert client.search([1.0, 0.0], 3, since, where=where)["ids"] == [["log_1", "log_8"]]
+    assert legacy.queries[-1] == where
+
+    # Deleting by id only touches the legacy collection, which goes once empty
+    client.delete_embeddings(["log_9", "log_1"])
+    assert client.search([1.0, 0.0], 3)["ids"] == [["log_1", "log_8"]]
+    client.delete_embeddings(["log_8"])
+    assert not client.has_legacy()
+    assert client.plan(None) == [("log_embeddings_20240301", True)]
+    client.delete_embeddings(["log_1"])  # no legacy collection left: a no-op
+    assert "log_embeddings" not in client.base._client.collections
@@ -0,0 +1,92 @@
+import datetime as dt
+
+import duckdb
+import pytest
+
+from api import embeddings, templates, vector_store
+from api.db import initialize_schema
+from api.embeddings import SemanticSearchEngine
+from api.log_store import write_log_batch
+from conftest import FakeEmbeddingClient, log_row
+
+
+WORDS = ["disk", "password", "network", "memory"]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "vectors.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+        write_log_batch(conn, [
+            log_row("disk disk full on /var", seconds_ago=10, unit="monitor.service"),
+            log_row("disk nearly full", seconds_ago=20, unit="monitor.service"),
+            log_row("disk error on sda", seconds_ago=30, unit="kernel"),
+            log_row("old disk disk disk warning", seconds_ago=7200, unit="monitor.service"),
+            log_row("network link down", seconds_ago=40, unit="networkd.service"),
+        ])
+    finally:
+        templates.invalidate(conn)
+        conn.close()
+    monkeypatch.setattr(embeddings, "_settings", {"vector_backend": "duckdb"})
+    search_engine = SemanticSearchEngine(db_path)
+    search_engine.embedding_client = FakeEmbeddingClient(WORDS)
+    search_engine.chroma_client = None  # never touched with the duckdb backend
+    return search_engine
+
+
+def test_duckdb_backend_filters_before_ranking(engine):
+    assert engine.index_logs(since_seconds=86400) == (5, 5)
+    conn = duckdb.connect(engine.db_path)
+    try:
+        assert vector_store.dimensions(conn, vector_store.LOG_VECTORS) == 5
+    finally:
+        conn.close()
+
+    results = engine.search_logs("disk disk disk", n_results=10)
+    assert results[0]["message"] == "old disk disk disk warning"
+    assert [r["similarity"] for r in results] == sorted((r["similarity"] for r in results), reverse=True)
+
+    # Time and unit filters are exact: the best global match is out of scope here
+    results = engine.search_logs("disk disk disk", n_results=2, since_seconds=3600, unit="monitor.service")
+    assert [r["message"] for r in results] == ["disk disk full on /var", "disk nearly full"]
+
+    with pytest.raises(ValueError):
+        conn = duckdb.connect(engine.db_path)
+        try:
+            vector_store.upsert(conn, vector_store.LOG_VECTORS, [1], [[1.0, 2.0]])
+        finally:
+            conn.close()
+
+
+def test_duckdb_backend_cleanup_and_template_mode(engine, monkeypatch):
+    engine.index_logs(since_seconds=86400)
+    conn = duckdb.connect(engine.db_path)
+    try:
+        conn.execute("UPDATE log_embeddings SET indexed_at = indexed_at - INTERVAL 40 DAY WHERE log_id IN (SELECT id FROM logs WHERE unit = 'kernel')")
+    finally:
+        conn.close()
+    assert engine.cleanup_old_embeddings(days=30) == 1
+    assert all(r["unit"] != "kernel" for r in engine.search_logs("disk error", n_results=10))
+
+    monkeypatch.setattr(embeddings, "_settings", {"vector_backend": "duckdb", "index_mode": "templates"})
+    indexed, _total = engine.index_logs()
+    assert indexed >= 1
+    results = engine.search_logs("network", n_results=1)
+    assert results[0]["message"] == "network link down" and results[0]["matches"] == 1
+
+
+def test_chroma_where_clause_and_rank_order():
+    engine = SemanticSearchEngine.__new__(SemanticSearchEngine)
+    assert engine._build_where_clause(None, None, "sshd", None) == {"unit": "sshd"}
+    where = engine._build_where_clause(3600, None, "sshd", "err")
+    assert set(where) == {"$and"}
+    assert where["$and"][0]["ts_epoch"]["$gte"] == pytest.approx(dt.datetime.now(dt.timezone.utc).timestamp() - 3600, abs=5)
+    assert where["$and"][1:] == [{"unit": "sshd"}, {"severity": "err"}]
+
+    ts = dt.datetime(2024, 1, 1)
+    logs = [(2, ts, "h", "s", "u", "info", 1, "second"), (1, ts, "h", "s", "u", "info", 1, "first")]
+    results = {"ids": [["log_1", "log_2"]], "metadatas": [[{"log_id": 1}, {"log_id": 2}]], "distances": [[0.1, 0.3]]}
+    combined = engine._combine_results(logs, results)
+    assert [(r["message"], r["similarity"]) for r in combined] == [("first", pytest.approx(0.9)), ("second", pytest.approx(0.7))]
@@ -0,0 +1,150 @@
+import datetime as dt
+import json
+import queue
+import subprocess
+import threading
+
+import duckdb
+import pytest
+
+from api import server, writer
+from api.config import LogSource
+from api.db import initialize_schema
+from api.ingest_framework import IngestionFramework
+from conftest import FakeCompleted, FakeSocket, log_row
+
+
+NOW = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+
+
+def make_db(tmp_path, name):
+    db_path = str(tmp_path / name)
+    conn = duckdb.connect(db_path)
+    try:
+        initialize_schema(conn)
+    finally:
+        conn.close()
+    return db_path
+
+
+def test_concurrent_producers_are_grouped(tmp_path):
+    db_path = make_db(tmp_path, "writer.duckdb")
+    db_writer = writer.DatabaseWriter(db_path, max_latency_ms=200)
+    db_writer.start()
+    results = {}
+
+    def produce(n):
+        payload = {"rows": [log_row(f"event {n * 100 + i}", seconds_ago=n * 100 + i) for i in range(10)], "source": f"src{n}", "cursor": f"c{n}"}
+        results[n] = db_writer.submit("logs", payload).wait(10)
+
+    try:
+        threads = [threading.Thread(target=produce, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = db_writer.get_stats()
+    finally:
+        db_writer.stop()
+
+    assert sorted(len(rows) for rows in results.values()) == [10] * 8
+    assert stats["requests"]["logs"] == 8 and stats["rows"]["logs"] == 80
+    assert stats["transactions"] < 8
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 80
+        assert conn.execute("SELECT COUNT(*) FROM ingest_state").fetchone()[0] == 8
+        assert conn.execute("SELECT SUM(count) FROM logs_rollup_1m").fetchone()[0] == 80
+    finally:
+        conn.close()
+
+
+def test_failed_request_does_not_fail_its_group(tmp_path):
+    db_path = make_db(tmp_path, "writer_fail.duckdb")
+    db_writer = writer.DatabaseWriter(db_path, max_latency_ms=500)
+    db_writer.start()
+    try:
+        good = db_writer.submit("logs", {"rows": [log_row("event 1", seconds_ago=1)], "source": "s", "cursor": None})
+        bad = db_writer.submit("metrics", [["not a timestamp", "cpu", "{}"]])
+        assert len(good.wait(10)) == 1
+        with pytest.raises(Exception):
+            bad.wait(10)
+        stats = db_writer.get_stats()
+    finally:
+        db_writer.stop()
+    assert stats["failed_transactions"] == 1
+    assert stats["errors"]["metrics"] == 1
+
+
+def test_bounded_queue_blocks_producers(tmp_path):
+    # Not started: nothing drains the queue
+    db_writer = writer.DatabaseWriter(str(tmp_path / "unused.duckdb"), queue_size=1)
+    db_writer.submit("metrics", [])
+    with pytest.raises(queue.Full):
+        db_writer.submit("metrics", [], timeout=0.01)
+
+
+def test_ingest_goes_through_the_server_writer(tmp_path, monkeypatch):
+    db_path = make_db(tmp_path, "writer_ingest.duckdb")
+    now = int(dt.datetime.now(tz=dt.timezone.utc).timestamp() * 1_000_000)
+    out = "\n".join(json.dumps({
+        "__REALTIME_TIMESTAMP": str(now + i), "_HOSTNAME": "h", "_SYSTEMD_UNIT": "sshd.service",
+        "MESSAGE": f"m{i}", "PRIORITY": "6", "__CURSOR": f"c{i}",
+    }) for i in range(3))
+    monkeypatch.setattr(subprocess, "run", lambda *a, **k: FakeCompleted(0, out))
+
+    writer.start_writer(db_path, {"max_latency_ms": 5})
+    try:
+        inserted, total = IngestionFramework(db_path).ingest_source(LogSource(name="j", type="journald"), limit=10)
+        assert (inserted, total) == (3, 3)
+        sock = FakeSocket()
+        server._handle_writer(sock, db_path, ["WRITER", "STATS"])
+        stats = json.loads(sock.lines()[0])
+        assert stats["running"] is True
+        assert stats["requests"]["logs"] == 1
+    finally:
+        writer.stop_writer()
+
+    sock = FakeSocket()
+    server._handle_writer(sock, db_path, ["WRITER", "STATS"])
+    assert json.loads(sock.lines()[0]) == {"running": False}
+    conn = duckdb.connect(db_path)
+    try:
+        assert conn.execute("SELECT cursor FROM ingest_state WHERE source = 'j'").fetchone()[0] == "c2"
+    finally:
+        conn.close()
+
+
+def test_maintenance_writes_run_alone_on_the_writer(tmp_path):
+    from api.system_health import write_alert_records
+
+    db_path = make_db(tmp_path, "writer_maintenance.duckdb")
+    conn = duckdb.connect(db_path)
+    try:
+        # An alert written before ids came from a sequence
+        conn.execute("INSERT INTO system_alerts (id, timestamp, alert_type, severity, message) "
+                     "VALUES (7, CURRENT_TIMESTAMP, 'cpu', 'warning', 'old')")
+    finally:
+        conn.close()
+
+    writer.start_writer(db_path, {"max_latency_ms": 5})
+    try:
+        threads = []
+        assert writer.run_write(db_path, lambda c: threads.append(threading.current_thread().name) or 1) == 1
+        assert threads == ["chimera-writer"]
+        with pytest.raises(duckdb.Error):
+            writer.run_write(db_path, lambda c: c.execute("SELECT * FROM missing_table"))
+
+        record = [NOW, "cpu", "warning", "new", "{}"]
+        writer.submit(db_path, "alerts", [record, record])
+        stats = writer.get_writer(db_path).get_stats()
+        assert stats["requests"]["maintenance"] == 2 and stats["errors"]["maintenance"] == 1
+    finally:
+        writer.stop_writer()
+
+    conn = duckdb.connect(db_path)
+    try:
+        write_alert_records(conn, [[NOW, "disk", "info", "direct", "{}"]])
+        assert [row[0] for row in conn.execute("SELECT id FROM system_alerts ORDER BY id").fetchall()] == [7, 8, 9, 10]
+    finally:
+        conn.close()